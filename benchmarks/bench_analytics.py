@@ -0,0 +1,249 @@
+"""Compare spending questions answered from the rollups with raw scans of the transactions.
+
+A synthetic dataset of ``--rows`` transactions (10 million by default) over
+``--users`` users, three accounts each (one in USD) and ``--months``
+months is loaded through ``insert_transactions`` into a SQLite file, so
+the rollups are maintained the way they are in production. Then, for
+``--questions`` random user months, each common question (monthly summary,
+top categories, month over month, per account) is answered three ways:
+
+- rollups: the analytics functions, reading ``fetch_rollups``;
+- indexed scan: the same functions over rollups computed on the fly from
+  the user's transactions of those months (``scan_transactions``);
+- full scan: the same, reading the whole table as a query without the
+  user/date index would; only ``--full-scans`` questions, as each one
+  reads every row.
+
+Every answer must equal the rollup answer. The script also reports the
+load throughput, the extra cost per write of keeping the rollups current,
+and checks that corrupted rollups are reconciled.
+
+Usage:
+    python benchmarks/bench_analytics.py [--rows 10000000] [--users 10000] [--questions 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("BALANCE_RECONCILE_INTERVAL", "0")
+
+from finassist.utils import analytics  # noqa: E402
+from finassist.utils.categorizer import TAXONOMY  # noqa: E402
+from finassist.utils.ledger import rollup_deltas  # noqa: E402
+from finassist.utils.storage import SQLiteStorage  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+ACCOUNTS = [("checking", "MXN"), ("credit_card", "MXN"), ("savings", "USD")]
+EXPENSE_CATEGORIES = [(category, subcategory) for category, subcategories in TAXONOMY.items()
+                      if category != "Income" for subcategory in subcategories]
+INCOME_CATEGORIES = [("Income", subcategory) for subcategory in TAXONOMY["Income"]]
+MERCHANTS = ["Walmart", "Oxxo", "Starbucks", "Uber", "Netflix", "Amazon", "Liverpool", "Soriana", "CFE", "Telcel"]
+QUESTIONS = {
+    "summary": lambda user, month, storage: analytics.spending_summary(user, month, storage=storage),
+    "top_categories": lambda user, month, storage: analytics.top_categories(user, month, storage=storage),
+    "month_over_month": lambda user, month, storage: analytics.compare_months(user, month, storage=storage),
+    "by_account": lambda user, month, storage: analytics.spending_by_account(user, month, storage=storage),
+}
+
+
+class IndexedScanRollups:
+    """Computes the rollups of the asked months from the user's transactions on every question."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def fetch_rollups(self, user_id, months=None):
+        rows = []
+        for month in months:
+            rows += self.storage.scan_transactions(user_id, since=f"{month}-01", until=f"{month}-31")
+        return rollups_of(rows)
+
+
+class FullScanRollups:
+    """Computes the rollups by reading the whole transactions table, without its user/date index."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def fetch_rollups(self, user_id, months=None):
+        months = list(months)
+        with self.storage._lock:
+            rows = [dict(row) for row in self.storage._conn.execute(
+                f"SELECT * FROM transactions NOT INDEXED WHERE user_id = ?"
+                f" AND substr(transaction_date, 1, 7) IN ({', '.join('?' * len(months))})",
+                [user_id] + months,
+            )]
+        return rollups_of(rows)
+
+
+def rollups_of(rows):
+    return [
+        {"month": month, "account_id": account_id, "category": category, "currency": currency,
+         "transaction_type": transaction_type, "total": total, "count": count}
+        for (_, month, account_id, category, currency, transaction_type), (total, count)
+        in rollup_deltas(rows).items()
+    ]
+
+
+def month_list(n_months):
+    today = date.today()
+    return [analytics.shift_month(today.strftime("%Y-%m"), -offset) for offset in range(n_months)]
+
+
+def generate(storage, args, rng):
+    storage.insert_users([{"user_id": f"user_{u:05d}", "full_name": f"User {u}", "preferred_currency": "MXN",
+                           "language": "es", "timezone": "America/Mexico_City", "created_at": TIMESTAMP,
+                           "updated_at": TIMESTAMP} for u in range(args.users)])
+    storage.insert_accounts([{"account_id": f"acc_{u:05d}_{kind}", "user_id": f"user_{u:05d}", "account_name": kind,
+                              "account_type": kind, "institution": "Bank", "currency": currency, "balance": 0.0,
+                              "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+                             for u in range(args.users) for kind, currency in ACCOUNTS])
+    months = month_list(args.months)
+    written = 0
+    start = time.perf_counter()
+    while written < args.rows:
+        chunk = []
+        for number in range(written, min(written + args.chunk_size, args.rows)):
+            user = rng.randrange(args.users)
+            kind, currency = rng.choice(ACCOUNTS)
+            income = rng.random() < 0.1
+            category, subcategory = rng.choice(INCOME_CATEGORIES if income else EXPENSE_CATEGORIES)
+            chunk.append({
+                "transaction_id": f"t{number}", "user_id": f"user_{user:05d}", "account_id": f"acc_{user:05d}_{kind}",
+                "amount": round(rng.uniform(1, 2000 if income else 300), 2), "currency": currency,
+                "transaction_type": "income" if income else "expense",
+                "transaction_date": f"{rng.choice(months)}-{rng.randint(1, 28):02d}", "recorded_date": TIMESTAMP,
+                # One in twenty is left uncategorized
+                "category": None if rng.random() < 0.05 else category, "subcategory": subcategory,
+                "notes": rng.choice(MERCHANTS),
+            })
+        errors = storage.insert_transactions(chunk)
+        if errors:
+            raise RuntimeError(f"Rejected rows while loading: {errors[:3]}")
+        written += len(chunk)
+        if written % (args.chunk_size * 20) == 0:
+            print(f"  loaded {written} rows, {written / (time.perf_counter() - start):.0f} rows/s", flush=True)
+    return written / (time.perf_counter() - start)
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def compare(args, storage, rng, errors):
+    months = month_list(args.months)
+    indexed = IndexedScanRollups(storage)
+    full = FullScanRollups(storage)
+    timings = {name: {"rollups": [], "indexed_scan": [], "full_scan": []} for name in QUESTIONS}
+    for number in range(args.questions):
+        user = f"user_{rng.randrange(args.users):05d}"
+        month = rng.choice(months[:-1])
+        for name, question in QUESTIONS.items():
+            expected, elapsed = time_call(question, user, month, storage)
+            timings[name]["rollups"].append(elapsed)
+            answer, elapsed = time_call(question, user, month, indexed)
+            timings[name]["indexed_scan"].append(elapsed)
+            if answer != expected:
+                errors.append(f"{name} {user} {month}: the indexed scan answer differs from the rollups")
+            if number < args.full_scans:
+                answer, elapsed = time_call(question, user, month, full)
+                timings[name]["full_scan"].append(elapsed)
+                if answer != expected:
+                    errors.append(f"{name} {user} {month}: the full scan answer differs from the rollups")
+
+    print(f"{'question':<17} {'rollups_p50':>12} {'rollups_p99':>12} {'scan_p50':>10} {'scan_p99':>10} "
+          f"{'full_scan':>10} {'speedup':>8}")
+    for name, by_method in timings.items():
+        rollups, scans, fulls = by_method["rollups"], by_method["indexed_scan"], by_method["full_scan"]
+        full_scan = f"{statistics.median(fulls):>9.2f}s" if fulls else f"{'-':>10}"
+        print(f"{name:<17} {percentile(rollups, 0.5) * 1e3:>10.3f}ms {percentile(rollups, 0.99) * 1e3:>10.3f}ms "
+              f"{percentile(scans, 0.5) * 1e3:>8.2f}ms {percentile(scans, 0.99) * 1e3:>8.2f}ms {full_scan} "
+              f"{statistics.median(scans) / statistics.median(rollups):>7.0f}x")
+
+
+def write_overhead(storage, rng, writes=2000):
+    """Per-write cost of the insert with and without the rollup upsert."""
+    rows = [{"transaction_id": f"w{index}", "user_id": "user_00000", "account_id": "acc_00000_checking",
+             "amount": 12.5, "currency": "MXN", "transaction_type": "expense",
+             "transaction_date": f"{month_list(1)[0]}-01", "recorded_date": TIMESTAMP,
+             "category": rng.choice(EXPENSE_CATEGORIES)[0], "subcategory": None, "notes": "write"}
+            for index in range(writes)]
+    start = time.perf_counter()
+    for row in rows[:writes // 2]:
+        storage._insert("transactions", [row], on_inserted=storage._apply_balance_deltas)
+    without = (time.perf_counter() - start) / (writes // 2)
+    start = time.perf_counter()
+    for row in rows[writes // 2:]:
+        storage.insert_transactions([row])
+    with_rollups = (time.perf_counter() - start) / (writes - writes // 2)
+    print(f"write: without_rollups={without * 1e6:.0f}us with_rollups={with_rollups * 1e6:.0f}us "
+          f"overhead={(with_rollups - without) * 1e6:.0f}us")
+    # The rows written without the rollup upsert are what reconciliation must catch
+    return {("user_00000", row["transaction_date"][:7]) for row in rows[:writes // 2]}
+
+
+def check_reconciliation(storage, expected_drift, errors):
+    # A rollup without transactions behind it, which reconciliation must delete
+    storage._conn.execute("INSERT INTO spending_rollups VALUES ('user_00000', '1999-01', 'acc_00000_checking', "
+                          "'Food', 'MXN', 'expense', 10.0, 1)")
+    expected_drift = expected_drift | {("user_00000", "1999-01")}
+    start = time.perf_counter()
+    drift = storage.reconcile_rollups("user_00000")
+    elapsed = time.perf_counter() - start
+    again = storage.reconcile_rollups("user_00000")
+    print(f"reconciliation: corrected={[(item['user_id'], item['month']) for item in drift]} "
+          f"second_run={len(again)} duration={elapsed * 1000:.1f}ms")
+    if {(item["user_id"], item["month"]) for item in drift} != expected_drift or again:
+        errors.append("reconciliation: the rollups written without the upsert were not corrected exactly")
+    def keyed(rollups):
+        return {tuple(row[key] for key in ("month", "account_id", "category", "currency", "transaction_type")):
+                (round(row["total"], 2), row["count"]) for row in rollups}
+
+    if keyed(storage.fetch_rollups("user_00000")) != keyed(rollups_of(storage.scan_transactions("user_00000"))):
+        errors.append("reconciliation: the rollups differ from the transactions after reconciling")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--full-scans", type=int, default=2, help="Questions also answered with a full table scan.")
+    parser.add_argument("--db", default=None, help="SQLite file to build, a temporary file by default.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    errors = []
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(args.db or os.path.join(directory, "analytics.db"))
+        print(f"loading {args.rows} transactions for {args.users} users over {args.months} months")
+        rows_per_second = generate(storage, args, rng)
+        rollups = storage._conn.execute("SELECT COUNT(*) FROM spending_rollups").fetchone()[0]
+        print(f"load: rows={args.rows} rows/s={rows_per_second:.0f} rollup_rows={rollups} "
+              f"rows_per_rollup={args.rows / rollups:.0f}")
+        compare(args, storage, rng, errors)
+        expected_drift = write_overhead(storage, rng)
+        check_reconciliation(storage, expected_drift, errors)
+        storage._conn.close()
+    for error in errors[:20]:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
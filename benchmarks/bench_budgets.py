@@ -0,0 +1,292 @@
+"""Measure the budget tracker: per-write cost, per-turn status reads and exactness.
+
+A SQLite file is loaded with ``--users`` users holding ``--history``
+expenses each over the current and previous month, plus one heavy user
+with ``--heavy-history`` expenses. Every user has a monthly budget on a
+category, one on a subcategory and a weekly budget on all spending. After
+the tracker loads every user, ``--writes`` random expenses go through the
+transaction writer's sink (``store_transactions``), and the script reports:
+
+- write: the tracker's share of each sink call, for light users and for
+  the heavy one (it must not grow with the history);
+- status: the per-turn BUDGET_STATUS read from the tracker, against
+  recomputing it from the user's transactions as a turn would without it;
+- exactness: every budget's spend against a fresh load from storage, and
+  the alerts raised against the thresholds each budget crossed;
+- a load that overlaps two writes counts each of them once;
+- an expense dated in a later period leaves the current spend alone, and
+  counts once that period starts;
+- loading from the columnar store gives the same spend as loading from
+  storage.
+
+Usage:
+    python benchmarks/bench_budgets.py [--users 1000] [--history 100] [--heavy-history 20000] [--writes 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("BALANCE_RECONCILE_INTERVAL", "0")
+
+from finassist.utils import budgets, storage as storage_module  # noqa: E402
+from finassist.utils.budgets import BudgetTracker, format_budget_status, period_bounds, validate_budget  # noqa: E402
+from finassist.utils.categorizer import TAXONOMY  # noqa: E402
+from finassist.utils.columnar import ColumnarStore  # noqa: E402
+from finassist.utils.storage import SQLiteStorage  # noqa: E402
+from finassist.utils.writer import store_transactions  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+HEAVY_USER = "user_heavy"
+CATEGORIES = [(category, subcategory) for category, subcategories in TAXONOMY.items() if category != "Income"
+              for subcategory in subcategories]
+
+
+def expense(number, user_id, rng, today, days=60):
+    category, subcategory = rng.choice(CATEGORIES)
+    return {
+        "transaction_id": f"t{number}", "user_id": user_id, "account_id": f"acc_{user_id}", "amount": round(rng.uniform(1, 120), 2),
+        "currency": "MXN", "transaction_type": "expense",
+        "transaction_date": (today - timedelta(days=rng.randrange(days))).isoformat(),
+        "recorded_date": f"2025-01-01T00:00:00.{number:09d}", "category": category, "subcategory": subcategory,
+        "notes": "bench",
+    }
+
+
+def load(storage, users, args, rng, today):
+    storage.insert_users([{"user_id": user, "full_name": user, "preferred_currency": "MXN", "language": "es",
+                           "timezone": "America/Mexico_City", "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+                          for user in users])
+    rows = []
+    number = 0
+    for user in users:
+        category, subcategory = rng.choice(CATEGORIES)
+        storage.upsert_budgets([
+            validate_budget({"user_id": user, "category": category, "amount": args.history * 4, "currency": "MXN"}),
+            validate_budget({"user_id": user, "category": subcategory, "amount": args.history, "currency": "MXN",
+                             "alert_thresholds": "50,80,100"}),
+            validate_budget({"user_id": user, "category": "All", "amount": args.history * 10, "currency": "MXN",
+                             "period": "weekly"}),
+        ])
+        for _ in range(args.heavy_history if user == HEAVY_USER else args.history):
+            rows.append(expense(number, user, rng, today))
+            number += 1
+    for start in range(0, len(rows), 5000):
+        storage.insert_transactions(rows[start:start + 5000])
+    print(f"load: users={len(users)} rows={len(rows)}")
+    return number
+
+
+def recompute_status(storage, user_id, today):
+    """The BUDGET_STATUS of a user computed from its transactions, without the tracker."""
+    statuses = []
+    for budget in storage.list_budgets(user_id):
+        start, end = period_bounds(budget["period"], today)
+        category = budget["category"]
+        spent = round(sum(
+            row["amount"] for row in storage.scan_transactions(
+                user_id, since=start.isoformat(), until=(end - timedelta(days=1)).isoformat(),
+                transaction_type="expense", category=None if category == "All" else category,
+            )
+        ), 2)
+        statuses.append({"category": category, "period": budget["period"], "spent": spent,
+                         "amount": budget["amount"], "currency": budget["currency"],
+                         "used": round(spent / budget["amount"] * 100)})
+    return format_budget_status(statuses)
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def timed_writes(storage, tracker, users, args, rng, today, number):
+    """Write single expenses through the sink, timing the tracker's share of each call."""
+    latencies = {"light": [], "heavy": []}
+    record = tracker.record
+
+    def timed_record(rows):
+        start = time.perf_counter()
+        alerts = record(rows)
+        latencies["heavy" if rows[0]["user_id"] == HEAVY_USER else "light"].append(time.perf_counter() - start)
+        return alerts
+
+    tracker.record = timed_record
+    raised = Counter()
+    for index in range(args.writes):
+        # One write in ten is the heavy user's
+        user = HEAVY_USER if index % 10 == 0 else rng.choice(users)
+        row = expense(number + index, user, rng, today, days=7)
+        store_transactions([row])
+        for alert in tracker.pop_alerts(row["transaction_id"]):
+            raised[alert["budget_id"]] += 1
+    tracker.record = record
+    print(f"{'write':<14} {'p50':>8} {'p99':>8}")
+    for kind, values in latencies.items():
+        print(f"record {kind:<7} {percentile(values, 0.5) * 1e6:>6.1f}us {percentile(values, 0.99) * 1e6:>6.1f}us")
+    return latencies, raised
+
+
+def check_overlapping_load(storage, today, errors):
+    """Write one expense before a load scans the transactions and one after, while the load is running."""
+    scanned, resume = threading.Event(), threading.Event()
+    scan = storage.scan_transactions
+
+    def paused_scan(*args, **kwargs):
+        rows = scan(*args, **kwargs)
+        scanned.set()
+        resume.wait()
+        return rows
+
+    tracker = BudgetTracker(storage)
+    storage_module.storage = storage
+    budgets.budget_tracker = tracker
+    user = "user_00000"
+    rng = random.Random(1)
+    first, second = expense(10 ** 8, user, rng, today, days=1), expense(10 ** 8 + 1, user, rng, today, days=1)
+    storage.scan_transactions = paused_scan
+    # The first row is stored before the load starts scanning, so the scan also reads it
+    storage.insert_transactions([first])
+    loader = threading.Thread(target=tracker.load, args=(user, today))
+    loader.start()
+    tracker.record([first])
+    scanned.wait()
+    store_transactions([second])
+    resume.set()
+    loader.join()
+    storage.scan_transactions = scan
+    got = {status["budget_id"]: status["spent"] for status in tracker.status(user, today)}
+    expected = {status["budget_id"]: status["spent"] for status in BudgetTracker(storage).status(user, today)}
+    print(f"overlapping load: spent={got == expected}")
+    if got != expected:
+        errors.append(f"overlapping load: {got} != {expected}")
+
+
+def check_future_dated(storage, today, errors):
+    """Write an expense dated in the next week, then read the status this week and next week."""
+    tracker = BudgetTracker(storage)
+    budgets.budget_tracker = tracker
+    user = "user_00001"
+    before = tracker.status(user, today)
+    next_week = period_bounds("weekly", today)[1]
+    row = expense(10 ** 8 + 2, user, random.Random(2), next_week, days=1)
+    store_transactions([row])
+    after = tracker.status(user, today)
+    reloaded = BudgetTracker(storage).status(user, today)
+    later = tracker.status(user, next_week)
+    weekly = next(status for status in later if status["period"] == "weekly")
+    print(f"future-dated: status unchanged={after == before} reload unchanged={reloaded == before} "
+          f"counted next week={weekly['spent'] == row['amount']}")
+    if after != before or reloaded != before:
+        errors.append("future-dated: an expense of the next period changed the current spend")
+    if weekly["spent"] != row["amount"] or later != BudgetTracker(storage).status(user, next_week):
+        errors.append(f"future-dated: the next period's status {weekly} does not count the expense")
+
+
+def check_columnar_load(storage, directory, users, today, errors):
+    """Load every user from a columnar copy of the transactions and from storage; the spend must match."""
+    store = ColumnarStore(os.path.join(directory, "columns"), refresh_interval=0)
+    store.catch_up(storage)
+    timings = {}
+    statuses = {}
+    for name, tracker in (("storage", BudgetTracker(storage)), ("columnar", BudgetTracker(storage, columnar_store=store))):
+        start = time.perf_counter()
+        for user in users:
+            tracker.load(user, today)
+        timings[name] = (time.perf_counter() - start) / len(users)
+        statuses[name] = {status["budget_id"]: status["spent"] for user in users for status in tracker.status(user, today)}
+    mismatched = sum(abs(spent - statuses["storage"][budget_id]) > 0.01
+                     for budget_id, spent in statuses["columnar"].items())
+    print(f"columnar load: {timings['columnar'] * 1e3:.2f}ms per user (storage {timings['storage'] * 1e3:.2f}ms) "
+          f"mismatched={mismatched}")
+    if mismatched or statuses["columnar"].keys() != statuses["storage"].keys():
+        errors.append(f"columnar load: {mismatched} budgets differ from a load from storage")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=100, help="Expenses per user.")
+    parser.add_argument("--heavy-history", type=int, default=20000, help="Expenses of the heavy user.")
+    parser.add_argument("--writes", type=int, default=20000)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    errors = []
+    rng = random.Random(args.seed)
+    today = date.today()
+    users = [f"user_{index:05d}" for index in range(args.users)] + [HEAVY_USER]
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(os.path.join(directory, "budgets.db"))
+        # The writer's sink and the tracker use this storage
+        storage_module.storage = storage
+        tracker = budgets.budget_tracker = BudgetTracker(storage)
+        number = load(storage, users, args, rng, today)
+
+        start = time.perf_counter()
+        for user in users:
+            tracker.load(user, today)
+        print(f"tracker load: {(time.perf_counter() - start) / len(users) * 1e3:.2f}ms per user "
+              f"(heavy user included)")
+        before = {status["budget_id"]: status for user in users for status in tracker.status(user, today)}
+
+        latencies, raised = timed_writes(storage, tracker, users, args, rng, today, number)
+        light, heavy = percentile(latencies["light"], 0.5), percentile(latencies["heavy"], 0.5)
+        if heavy > max(light * 3, light + 20e-6):
+            errors.append(f"record: heavy user p50 {heavy * 1e6:.1f}us grows with history (light {light * 1e6:.1f}us)")
+
+        sample = [rng.choice(users) for _ in range(args.turns)] + [HEAVY_USER] * 20
+        timings = {"tracker": [], "recompute": []}
+        for user in sample:
+            start = time.perf_counter()
+            tracked = format_budget_status(tracker.status(user, today))
+            timings["tracker"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            recomputed = recompute_status(storage, user, today)
+            timings["recompute"].append(time.perf_counter() - start)
+            if tracked != recomputed:
+                errors.append(f"{user}: tracked status differs from the recomputed one:\n{tracked}\n{recomputed}")
+        print(f"{'status':<14} {'p50':>8} {'p99':>8}")
+        for method, values in timings.items():
+            print(f"{method:<14} {percentile(values, 0.5) * 1e6:>6.0f}us {percentile(values, 0.99) * 1e6:>6.0f}us")
+        print(f"status speedup={percentile(timings['recompute'], 0.5) / percentile(timings['tracker'], 0.5):.0f}x")
+
+        fresh = BudgetTracker(storage)
+        mismatched = 0
+        expected_alerts = Counter()
+        for user in users:
+            for status in tracker.status(user, today):
+                reloaded = next(item for item in fresh.status(user, today) if item["budget_id"] == status["budget_id"])
+                mismatched += abs(reloaded["spent"] - status["spent"]) > 0.01
+                old = before[status["budget_id"]]
+                thresholds = [float(value) / 100 for value in status["alert_thresholds"].split(",")]
+                if old["period_start"] == status["period_start"]:
+                    expected_alerts[status["budget_id"]] = sum(
+                        old["spent"] < threshold * status["amount"] - 0.005 <= status["spent"]
+                        for threshold in thresholds
+                    )
+        print(f"exactness: budgets={len(before)} mismatched={mismatched} alerts={sum(raised.values())} "
+              f"expected_alerts={sum(expected_alerts.values())}")
+        if mismatched:
+            errors.append(f"{mismatched} budgets differ from a fresh load")
+        if +raised != +expected_alerts:
+            errors.append("alerts raised differ from the thresholds crossed")
+        print(f"tracker: {tracker.stats()}")
+
+        check_columnar_load(storage, directory, users, today, errors)
+        check_future_dated(storage, today, errors)
+        check_overlapping_load(storage, today, errors)
+        storage._conn.close()
+    for error in errors[:20]:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
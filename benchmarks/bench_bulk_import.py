@@ -0,0 +1,196 @@
+"""Measure bulk statement import: throughput, model calls and peak memory.
+
+Synthetic CSV and OFX statements are written to a temporary directory, one
+at ``--rows`` rows and one four times larger, and imported into an embedded
+SQLite database. Most descriptions name merchants the local categorizer
+knows; the rest (unknown merchant names) have to go to a stub model
+that answers a whole batch per call after ``--model-latency`` seconds, until
+the categorizer has learned them from the rows already stored.
+
+Every file is imported into its own account, then imported again to check
+that the second pass only finds duplicates. For every file the script
+reports rows per minute, the model calls made against the three per row a
+conversation through root_agent -> database_manager -> transaction_agent
+costs, and the Python memory of the import: what it retains in the
+process-wide indexes (duplicate index, merchant cache), which grows with
+the stored transactions, and its working memory on top of that, which
+should not grow with the file size.
+
+It also checks how amounts are read ("1,234" is a thousand, "45,00" is
+forty-five) and that debit/credit columns keep their type whatever
+``expenses_negative`` says.
+
+Usage:
+    python benchmarks/bench_bulk_import.py [--rows 5000] [--model-latency 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from io import StringIO
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("TRANSACTION_AGENT_MODEL", "openai/stub")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from finassist.utils.bulk_import import (  # noqa: E402
+    import_statement, iter_csv_lines, parse_statement_amount, resolve_line,
+)
+from finassist.utils.storage import get_storage  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+KNOWN = [
+    ("STARBUCKS STORE 1234", -4.5), ("WALMART SUPERCENTER", -82.1), ("NETFLIX.COM", -15.99),
+    ("UBER TRIP", -12.3), ("SHELL GASOLINE", -45.0), ("PAYROLL ACME CORP SALARY", 2500.0),
+    ("AMAZON MARKETPLACE", -31.2), ("CFE ELECTRICITY BILL", -64.0), ("SPOTIFY PREMIUM", -9.99),
+]
+UNKNOWN_MERCHANTS = 200  # per file, so the categorizer cannot learn them from an earlier file
+
+
+class BatchStubModel(BaseLlm):
+    """Completes every row of a batch prompt after a fixed delay."""
+
+    model: str = "stub"
+    latency: float = 0.5
+    calls: int = 0
+    rows: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        rows = json.loads(llm_request.contents[-1].parts[0].text)
+        self.rows += len(rows)
+        await asyncio.sleep(self.latency)
+        items = [
+            {"index": row["index"], "amount": None, "transaction_type": None, "transaction_date": None,
+             "category": "Shopping", "subcategory": "Online Shopping"}
+            for row in rows
+        ]
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=json.dumps(items))]))
+
+
+def statement_rows(n_rows, seed):
+    random.seed(seed)
+    today = date.today()
+    unknown = [
+        (" ".join("".join(random.choices("BCDFGHJKLMNPQRSTVWXZ", k=6)) for _ in range(2)), -25.0)
+        for _ in range(UNKNOWN_MERCHANTS)
+    ]
+    for index in range(n_rows):
+        description, amount = random.choice(unknown if index % 7 == 0 else KNOWN)
+        yield today - timedelta(days=1 + index % 360), description, round(amount * random.uniform(0.5, 1.5), 2)
+
+
+def write_csv(path, n_rows, seed):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write("Fecha,Concepto,Importe,Moneda\n")
+        for day, description, amount in statement_rows(n_rows, seed):
+            file.write(f"{day:%d/%m/%Y},\"{description}\",\"{amount:,.2f}\",MXN\n")
+
+
+def write_ofx(path, n_rows, seed):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>MXN\n<BANKTRANLIST>\n")
+        for index, (day, description, amount) in enumerate(statement_rows(n_rows, seed)):
+            file.write(f"<STMTTRN>\n<TRNTYPE>{'CREDIT' if amount > 0 else 'DEBIT'}\n<DTPOSTED>{day:%Y%m%d}120000\n"
+                       f"<TRNAMT>{amount:.2f}\n<FITID>{index}\n<NAME>{description}\n</STMTTRN>\n")
+        file.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+
+def seed_user(account_ids):
+    storage = get_storage()
+    storage.insert_users([{"user_id": "user_import", "full_name": "Import User", "preferred_currency": "MXN",
+                           "language": "es-MX", "timezone": "America/Mexico_City",
+                           "created_at": TIMESTAMP, "updated_at": TIMESTAMP}])
+    storage.insert_accounts([{"account_id": account_id, "user_id": "user_import", "account_name": account_id,
+                              "account_type": "checking", "institution": "BBVA", "balance": 0.0, "currency": "MXN",
+                              "created_at": TIMESTAMP, "updated_at": TIMESTAMP} for account_id in account_ids])
+
+
+async def run(path, account_id, args):
+    model = BatchStubModel(latency=args.model_latency)
+    tracemalloc.start()
+    report = await import_statement(path, "user_import", account_id, chunk_size=args.chunk_size, model=model)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return report, model, retained, peak - retained
+
+
+def check_statement_lines():
+    errors = []
+    amounts = {"1,234": 1234.0, "$1,234": 1234.0, "1,234,567": 1234567.0, "45,00": 45.0, "1.234,56": 1234.56,
+               "1,234.56": 1234.56, "(45.00)": -45.0, "12,5": 12.5}
+    for text, expected in amounts.items():
+        if parse_statement_amount(text) != expected:
+            errors.append(f"amount {text!r} read as {parse_statement_amount(text)}, expected {expected}")
+
+    statement = StringIO("date,description,debit,credit\n2025-06-01,Coffee,4.50,\n2025-06-02,Salary,,2500.00\n")
+    account = SimpleNamespace(account_id="acc_check", currency="MXN")
+    for line, expected in zip(iter_csv_lines(statement), ("expense", "income")):
+        for expenses_negative in (True, False):
+            found = resolve_line(line, "user_import", account, True, expenses_negative)["transaction_type"]
+            if found != expected:
+                errors.append(f"{line.description} with expenses_negative={expenses_negative} read as {found}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--model-latency", type=float, default=0.5, help="Seconds the stub model takes per batch.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    files = [(file_format, n_rows) for file_format in ("csv", "ofx") for n_rows in (args.rows, args.rows * 4)]
+    seed_user([f"acc_{file_format}_{n_rows}" for file_format, n_rows in files])
+    errors = check_statement_lines()
+    peaks = {}
+    expected_written = 0
+    print(f"{'file':<10} {'rows':>6} {'written':>7} {'local':>6} {'llm_rows':>8} {'llm_calls':>9} "
+          f"{'per_row_calls':>13} {'rows/min':>9} {'retained':>9} {'working':>8} {'reimport_dupes':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format, n_rows in files:
+            path = os.path.join(directory, f"statement_{n_rows}.{file_format}")
+            (write_ofx if file_format == "ofx" else write_csv)(path, n_rows, args.seed + n_rows + len(peaks))
+            account_id = f"acc_{file_format}_{n_rows}"
+            report, model, retained, working = asyncio.run(run(path, account_id, args))
+            peaks.setdefault(file_format, []).append(working)
+            expected_written += n_rows
+            again, _, _, _ = asyncio.run(run(path, account_id, args))
+            print(f"{file_format + '_' + str(n_rows):<10} {report.rows_read:>6} {report.rows_written:>7} "
+                  f"{report.resolved_locally:>6} {model.rows:>8} {report.llm_calls:>9} {n_rows * 3:>13} "
+                  f"{report.rows_per_minute:>9.0f} {retained / 1e6:>7.1f}MB {working / 1e6:>6.1f}MB "
+                  f"{again.duplicates:>14}")
+            if report.rows_written != n_rows or report.rejected:
+                errors.append(f"{path}: wrote {report.rows_written} of {n_rows} rows, "
+                              f"rejections {report.rejections[:3]}")
+            if report.uncategorized:
+                errors.append(f"{path}: {report.uncategorized} rows left uncategorized")
+            if again.rows_written or again.duplicates != n_rows:
+                errors.append(f"{path}: importing again wrote {again.rows_written} rows, "
+                              f"{again.duplicates} duplicates of {n_rows}")
+
+    stored = len(get_storage().fetch_transactions())
+    if stored != expected_written:
+        errors.append(f"storage holds {stored} transactions, expected {expected_written}")
+    for file_format, (small, large) in peaks.items():
+        if large > small * 2:
+            errors.append(f"{file_format}: working memory grew from {small / 1e6:.1f}MB to {large / 1e6:.1f}MB")
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Replay a labeled transaction history through the local categorizer.
+
+Transactions in benchmarks/data/categorization_labels.jsonl are categorized
+in order, and each one is then learned the way add_transaction teaches the
+categorizer after storing it. Descriptions at or above the confidence
+threshold skip the LLM; the rest are counted as model calls. The replay
+reports coverage and accuracy, then the per-call latency of a repeated
+merchant once it is in the merchant cache.
+
+It then loads the history into a SQLite database for two users and checks
+that a user's merchants are learned from a bounded read of their own
+recent rows, that another user's merchants never answer for them, and that
+a transaction learned before the load is not counted twice.
+
+Usage:
+    python benchmarks/bench_categorizer.py [--threshold 0.7] [--repeat 10000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from finassist.utils.categorizer import CATEGORIZER_HISTORY_LIMIT, Categorizer  # noqa: E402
+from finassist.utils.storage import SQLiteStorage  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+
+
+def check_per_user_load(labeled, errors):
+    """Learn one user's history from storage and check the other user does not see it."""
+    storage = SQLiteStorage(":memory:")
+    today = date.today()
+    rows = [
+        {**item, "transaction_id": f"t{number}", "user_id": "user_a", "account_id": "acc_a", "amount": 10.0,
+         "currency": "MXN", "transaction_type": item.get("transaction_type") or "expense",
+         "transaction_date": (today - timedelta(days=number % 30)).isoformat(), "recorded_date": TIMESTAMP}
+        for number, item in enumerate(labeled * (CATEGORIZER_HISTORY_LIMIT // len(labeled) + 2))
+    ]
+    storage.insert_transactions(rows)
+    categorizer = Categorizer()
+    # Learned as add_transaction would, before the user's first turn loads the history
+    categorizer.learn(rows[0])
+    read = categorizer.learn_from_storage(storage, "user_a")
+    again = categorizer.learn_from_storage(storage, "user_a")
+    notes = rows[0]["notes"]
+    own = categorizer.categorize(notes, user_id="user_a")
+    other = categorizer.categorize(notes, user_id="user_b")
+    fresh = Categorizer()
+    fresh.learn_from_storage(storage, "user_a")
+    same = categorizer.merchants["user_a"].counts == fresh.merchants["user_a"].counts
+    print(f"per-user load: read={read} of {len(rows)} second_load={again} "
+          f"own={own.source} other={other.source} counts_match_fresh_load={same}")
+    if read > CATEGORIZER_HISTORY_LIMIT:
+        errors.append(f"the load read {read} rows, over the limit of {CATEGORIZER_HISTORY_LIMIT}")
+    if again:
+        errors.append("a loaded user was read again")
+    if other.source == "merchant":
+        errors.append("another user's merchants answered")
+    if not same:
+        errors.append("a transaction learned before the load was counted twice")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", default=os.path.join(os.path.dirname(__file__), "data", "categorization_labels.jsonl"))
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=10000, help="Lookups of a cached merchant for the latency figure.")
+    args = parser.parse_args()
+
+    with open(args.labels) as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+
+    categorizer = Categorizer() if args.threshold is None else Categorizer(threshold=args.threshold)
+    local = correct = 0
+    by_source = {}
+    for item in labeled:
+        result = categorizer.categorize(item["notes"], item.get("transaction_type"))
+        if categorizer.is_confident(result):
+            local += 1
+            by_source[result.source] = by_source.get(result.source, 0) + 1
+            if (result.category, result.subcategory) == (item["category"], item["subcategory"]):
+                correct += 1
+            else:
+                print(f"miscategorized: {item['notes']!r} -> {result.category} > {result.subcategory} "
+                      f"(expected {item['category']} > {item['subcategory']})")
+        categorizer.learn(item)
+
+    total = len(labeled)
+    print(f"transactions={total} categorized_locally={local} ({local / total:.0%}) by_source={by_source}")
+    print(f"accuracy_on_local={correct / local if local else 0:.1%} llm_calls={total - local} (baseline {total})")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        categorizer.categorize("Tacos El Güero")
+    print(f"cached_merchant_latency={(time.perf_counter() - start) / args.repeat * 1e6:.1f}us/call")
+
+    errors = []
+    check_per_user_load(labeled, errors)
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
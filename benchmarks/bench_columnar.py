@@ -0,0 +1,256 @@
+"""Compare one-user history scans on the columnar store with row-at-a-time scans of SQLite.
+
+A synthetic dataset of ``--users`` users with ``--per-month`` transactions
+a month over ``--months`` months is written in writer-sized batches both
+to a SQLite file (``insert_transactions``) and to a columnar store
+(``ColumnarStore.append``, as the transaction writer does). Then, for
+``--questions`` random users, a year of expenses is totalled per category
+and per month two ways:
+
+- columnar: ``scan`` of the user's last twelve months, a mask and two
+  ``group_sum`` calls;
+- rows: ``scan_transactions`` of the same dates, summed per row in Python.
+
+Both answers must be equal. The script also reports the append throughput
+of the batched and one-row write paths and of a statement import, the disk
+cost per row, that a catch-up does not store rows twice, that it picks up
+a row committed after the previous catch-up with an earlier
+``recorded_date``, and that a torn append is repaired.
+
+Usage:
+    python benchmarks/bench_columnar.py [--users 500] [--months 24] [--per-month 60] [--questions 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("BALANCE_RECONCILE_INTERVAL", "0")
+
+from finassist.utils.categorizer import TAXONOMY  # noqa: E402
+from finassist.utils.columnar import COLUMNS, ColumnarStore  # noqa: E402
+from finassist.utils.storage import SQLiteStorage  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+ACCOUNTS = [("checking", "MXN"), ("credit_card", "MXN"), ("savings", "USD")]
+CATEGORIES = [(category, subcategory) for category, subcategories in TAXONOMY.items()
+              for subcategory in subcategories]
+
+
+def generate(args, rng):
+    """Yield batches of transactions, spread over the last ``--months`` months."""
+    today = date.today()
+    first = today - timedelta(days=30 * args.months)
+    days = (today - first).days
+    total = args.users * args.months * args.per_month
+    for start in range(0, total, args.batch_size):
+        batch = []
+        for number in range(start, min(start + args.batch_size, total)):
+            user = rng.randrange(args.users)
+            kind, currency = rng.choice(ACCOUNTS)
+            category, subcategory = rng.choice(CATEGORIES)
+            batch.append({
+                "transaction_id": f"t{number}", "user_id": f"user_{user:05d}", "account_id": f"acc_{user:05d}_{kind}",
+                "amount": round(rng.uniform(1, 300), 2), "currency": currency,
+                "transaction_type": "income" if category == "Income" else "expense",
+                "transaction_date": (first + timedelta(days=rng.randrange(days + 1))).isoformat(),
+                "recorded_date": f"2025-01-01T00:00:00.{number:09d}",
+                # One in twenty is left uncategorized
+                "category": None if rng.random() < 0.05 else category, "subcategory": subcategory,
+                "notes": "bench",
+            })
+        yield batch
+
+
+def load(storage, store, args, rng):
+    storage.insert_users([{"user_id": f"user_{u:05d}", "full_name": f"User {u}", "preferred_currency": "MXN",
+                           "language": "es", "timezone": "America/Mexico_City", "created_at": TIMESTAMP,
+                           "updated_at": TIMESTAMP} for u in range(args.users)])
+    storage.insert_accounts([{"account_id": f"acc_{u:05d}_{kind}", "user_id": f"user_{u:05d}", "account_name": kind,
+                              "account_type": kind, "institution": "Bank", "currency": currency, "balance": 0.0,
+                              "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+                             for u in range(args.users) for kind, currency in ACCOUNTS])
+    rows = 0
+    append_time = 0.0
+    last = []
+    for batch in generate(args, rng):
+        storage.insert_transactions(batch)
+        start = time.perf_counter()
+        store.append(batch)
+        append_time += time.perf_counter() - start
+        rows += len(batch)
+        last = batch
+    print(f"load: rows={rows} batched_append={rows / append_time:.0f} rows/s "
+          f"({append_time / rows * args.batch_size * 1e3:.1f}ms per {args.batch_size}-row batch)")
+    return rows, last
+
+
+def row_answer(storage, user_id, since, until):
+    """Per-category and per-month expense totals, one row dict at a time."""
+    by_category = defaultdict(lambda: [0.0, 0])
+    by_month = defaultdict(lambda: [0.0, 0])
+    for row in storage.scan_transactions(user_id, since=since, until=until, transaction_type="expense"):
+        for sums, key in ((by_category, row["category"] or ""), (by_month, row["transaction_date"][:7])):
+            sums[key][0] += row["amount"]
+            sums[key][1] += 1
+    return tuple({key: (round(total, 2), count) for key, (total, count) in sums.items()}
+                 for sums in (by_category, by_month))
+
+
+def columnar_answer(store, user_id, since, until):
+    columns = store.scan(user_id, since=since, until=until)
+    expenses = columns.where(transaction_type="expense")
+    return columns.group_sum("category", expenses), columns.group_sum("month", expenses)
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def compare(storage, store, args, rng, errors):
+    until = date.today()
+    since = (until.replace(day=1) - timedelta(days=365)).replace(day=1)
+    timings = {"columnar": [], "rows": []}
+    scanned = []
+    for _ in range(args.questions):
+        user_id = f"user_{rng.randrange(args.users):05d}"
+        start = time.perf_counter()
+        expected = row_answer(storage, user_id, since.isoformat(), until.isoformat())
+        timings["rows"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        answer = columnar_answer(store, user_id, since.isoformat(), until.isoformat())
+        timings["columnar"].append(time.perf_counter() - start)
+        scanned.append(sum(count for _, count in answer[1].values()))
+        if answer != expected:
+            errors.append(f"{user_id}: the columnar answer differs from the row scan")
+
+    print(f"year scan ({since} to {until}), {sum(scanned) / len(scanned):.0f} expenses per user on average")
+    print(f"{'method':<10} {'p50':>9} {'p99':>9}")
+    for method, values in timings.items():
+        print(f"{method:<10} {percentile(values, 0.5) * 1e3:>7.2f}ms {percentile(values, 0.99) * 1e3:>7.2f}ms")
+    p50 = percentile(timings["columnar"], 0.5)
+    print(f"speedup={percentile(timings['rows'], 0.5) / p50:.1f}x")
+    if p50 >= 0.01:
+        errors.append(f"columnar year scan p50 {p50 * 1e3:.1f}ms is not in single-digit milliseconds")
+
+
+def single_row_appends(store, rng, writes=1000):
+    """Latency of the one-row batches the writer flushes when traffic is low."""
+    today = date.today().isoformat()
+    latencies = []
+    for index in range(writes):
+        row = {"transaction_id": f"w{index}", "user_id": f"user_{rng.randrange(50):05d}", "account_id": "acc",
+               "amount": 12.5, "currency": "MXN", "transaction_type": "expense", "transaction_date": today,
+               "recorded_date": TIMESTAMP, "category": "Food", "subcategory": None}
+        start = time.perf_counter()
+        store.append([row])
+        latencies.append(time.perf_counter() - start)
+    print(f"one-row append: p50={percentile(latencies, 0.5) * 1e6:.0f}us p99={percentile(latencies, 0.99) * 1e6:.0f}us")
+
+
+def disk_usage(store, rows):
+    column_bytes = files = 0
+    for directory, _, names in os.walk(store.path):
+        files += len(names)
+        column_bytes += sum(os.path.getsize(os.path.join(directory, name)) for name in names if name.endswith(".bin"))
+    print(f"disk: column_bytes_per_row={column_bytes / rows:.0f} "
+          f"(row width {sum(int(dtype[-1]) for dtype in COLUMNS.values())}) files={files}")
+
+
+def check_catch_up(storage, store, last_batch, errors):
+    # Rewind the watermark to before the last batch, which the write path already appended
+    store.watermark = min(row["recorded_date"] for row in last_batch)[:-1]
+    skipped = store.rows_skipped
+    appended = store.catch_up(storage)
+    print(f"catch-up: fetched={store.rows_skipped - skipped + appended} appended={appended}")
+    if appended:
+        errors.append("catch-up: rows already appended by the write path were stored again")
+
+
+def check_late_commit(storage, store, errors):
+    """A row stamped before the watermark but committed after the catch-up that set it."""
+    user_id = "user_00000"
+    before = len(store.scan(user_id))
+    late = (datetime.fromisoformat(store.watermark) - timedelta(seconds=1)).isoformat()
+    storage.insert_transactions([{
+        "transaction_id": "late", "user_id": user_id, "account_id": f"acc_{user_id}_checking", "amount": 1.0,
+        "currency": "MXN", "transaction_type": "expense", "transaction_date": date.today().isoformat(),
+        "recorded_date": late, "category": "Food", "subcategory": None, "notes": "bench",
+    }])
+    appended = store.catch_up(storage)
+    after = len(store.scan(user_id))
+    print(f"late commit: appended={appended} rows before={before} after={after}")
+    if appended != 1 or after != before + 1:
+        errors.append("late commit: a row recorded before the watermark was not caught up")
+
+
+def statement_append(store, rng, rows=500):
+    """Time to append one bank statement: a year of one user's transactions in a batch."""
+    today = date.today()
+    batch = [{"transaction_id": f"s{index}", "user_id": "user_statement", "account_id": "acc", "amount": 10.0,
+              "currency": "MXN", "transaction_type": "expense",
+              "transaction_date": (today - timedelta(days=rng.randrange(365))).isoformat(),
+              "recorded_date": TIMESTAMP, "category": rng.choice(CATEGORIES)[0], "subcategory": None}
+             for index in range(rows)]
+    start = time.perf_counter()
+    store.append(batch)
+    elapsed = time.perf_counter() - start
+    print(f"statement append: rows={rows} time={elapsed * 1e3:.1f}ms ({rows / elapsed:.0f} rows/s)")
+
+
+def check_torn_append(store, errors):
+    user_id = "user_00000"
+    before = len(store.scan(user_id))
+    month = sorted(entry for entry in os.listdir(store._user_path(user_id)) if entry[0].isdigit())[-1]
+    path = os.path.join(store._user_path(user_id), month, "amount.bin")
+    # A crash in the middle of writing the amount of one row
+    with open(path, "ab") as file:
+        file.write(b"\x00\x01\x02")
+    torn = len(store.scan(user_id))
+    # The process restarts, with nothing cached
+    store = ColumnarStore(store.path, refresh_interval=0)
+    store.append([{"transaction_id": "repair", "user_id": user_id, "account_id": "acc", "amount": 1.0,
+                   "currency": "MXN", "transaction_type": "expense", "transaction_date": f"{month}-01",
+                   "recorded_date": TIMESTAMP}])
+    after = len(store.scan(user_id))
+    print(f"torn append: rows before={before} while torn={torn} after next append={after}")
+    if torn != before or after != before + 1:
+        errors.append("torn append: partial rows were read or not repaired")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--per-month", type=int, default=60, help="Transactions per user and month.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per append, like WRITER_MAX_BATCH_SIZE.")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    errors = []
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(os.path.join(directory, "transactions.db"))
+        store = ColumnarStore(os.path.join(directory, "columns"), refresh_interval=0)
+        rows, last_batch = load(storage, store, args, rng)
+        disk_usage(store, rows)
+        compare(storage, store, args, rng, errors)
+        single_row_appends(store, rng)
+        statement_append(store, rng)
+        check_catch_up(storage, store, last_batch, errors)
+        check_late_commit(storage, store, errors)
+        check_torn_append(store, errors)
+        storage._conn.close()
+    for error in errors[:20]:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
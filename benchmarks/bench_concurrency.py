@@ -0,0 +1,134 @@
+"""Run many interleaved sessions in one process and check that no prompt leaks across users.
+
+Each simulated user gets its own accounts in an in-memory SQLite store and
+sends a transaction message with a unique amount. All sessions share one
+Runner (``create_runner``, on the SESSION_BACKEND session service) and one
+agent tree and are run concurrently; the stub model sleeps a
+random few milliseconds per call so their turns interleave. On every
+transaction_agent call the stub checks that the instruction carries only
+the session's own user_id, accounts and drafted amount.
+
+Exits with an error if any instruction contained another user's data.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--users 300] [--turns 2] [--max-delay 0.005]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for var in ("MAIN_AGENT_MODEL", "DATABASE_MANAGER_MODEL", "TRANSACTION_AGENT_MODEL",
+            "ACCOUNT_AGENT_MODEL", "QUESTION_AGENT_MODEL", "ANALYTICS_AGENT_MODEL",
+            "BUDGET_AGENT_MODEL"):
+    os.environ.setdefault(var, "openai/stub")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.genai import types  # noqa: E402
+from pydantic import Field  # noqa: E402
+
+from finassist.agent import create_root_agent, create_runner  # noqa: E402
+from finassist.utils.storage import get_storage  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+
+
+class CheckingModel(BaseLlm):
+    """Stub model that verifies every transaction_agent instruction belongs to the message's user."""
+
+    model: str = "stub"
+    max_delay: float = 0.005
+    calls: int = 0
+    leaks: list = Field(default_factory=list)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        await asyncio.sleep(random.uniform(0, self.max_delay))
+        system = str(llm_request.config.system_instruction or "")
+        agent_name = re.search(r'Your internal name is "(\w+)"', system).group(1)
+        user_tags = [
+            re.match(r"\[(user_\d+)\]", part.text).group(1)
+            for content in llm_request.contents if content.role == "user"
+            for part in content.parts or [] if part.text and re.match(r"\[(user_\d+)\]", part.text)
+        ]
+        expected_user = user_tags[-1] if user_tags else None
+
+        if agent_name == "transaction_agent" and expected_user:
+            seen_users = set(re.findall(r"user_\d+", system))
+            amount = f'"amount": {user_amount(expected_user)}'
+            if seen_users != {expected_user} or amount not in system:
+                self.leaks.append((expected_user, sorted(seen_users)))
+            part = types.Part(text="Which account did you use?")
+        elif agent_name == "root_agent":
+            part = types.Part(function_call=types.FunctionCall(name="transfer_to_agent", args={"agent_name": "transaction_agent"}))
+        else:
+            part = types.Part(text="Noted.")
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def user_amount(user_id: str) -> float:
+    return 100.0 + int(user_id.split("_")[1])
+
+
+def seed_users(n_users: int) -> list:
+    storage = get_storage()
+    user_ids = [f"user_{index:04d}" for index in range(n_users)]
+    storage.insert_users([
+        {"user_id": user_id, "full_name": f"User {user_id}", "preferred_currency": "MXN", "language": "en",
+         "timezone": "America/Mexico_City", "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+        for user_id in user_ids
+    ])
+    storage.insert_accounts([
+        {"account_id": f"{user_id}_{kind}", "user_id": user_id, "account_name": f"{kind} of {user_id}",
+         "account_type": kind, "institution": "Bank", "currency": "MXN", "balance": 0.0,
+         "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+        for user_id in user_ids for kind in ("checking", "credit_card")
+    ])
+    return user_ids
+
+
+async def run_session(runner, session_service, user_id, turns):
+    session = await session_service.create_session(app_name="bench", user_id=user_id)
+    for turn in range(turns):
+        text = f"[{user_id}] I spent {user_amount(user_id):.0f} pesos on groceries yesterday" if turn == 0 else f"[{user_id}] the card"
+        message = types.Content(role="user", parts=[types.Part(text=text)])
+        async for _ in runner.run_async(user_id=user_id, session_id=session.id, new_message=message):
+            pass
+
+
+async def main_async(args):
+    user_ids = seed_users(args.users)
+    model = CheckingModel(max_delay=args.max_delay)
+    runner = create_runner(create_root_agent("flat", model=model), app_name="bench")
+    session_service = runner.session_service
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(runner, session_service, user_id, args.turns) for user_id in user_ids))
+    elapsed = time.perf_counter() - start
+
+    print(f"sessions={len(user_ids)} turns={len(user_ids) * args.turns} model_calls={model.calls} "
+          f"elapsed={elapsed:.2f}s turns/s={len(user_ids) * args.turns / elapsed:.0f}")
+    for expected_user, seen_users in model.leaks[:10]:
+        print(f"cross-talk: {expected_user} saw {seen_users}")
+    print(f"cross_talk={len(model.leaks)}")
+    return 1 if model.leaks else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--max-delay", type=float, default=0.005, help="Upper bound of the random stub latency.")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the user-context rendering agents receive: repr of the dict vs the compact table.
+
+The legacy rendering is ``str(to_dict())`` followed by the two brace-escaping
+passes the transaction callback used to run on every turn. The compact
+rendering is ``UserContext.prompt_text``, computed once and then served from
+the cached context. Sizes are reported in bytes and tiktoken tokens for
+users with a growing number of accounts.
+
+Usage:
+    python benchmarks/bench_context_format.py [--accounts 1 5 20 50] [--repeat 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from finassist.utils.prompt_builder import count_tokens  # noqa: E402
+from finassist.utils.storage import Account, UserContext, format_user_context  # noqa: E402
+
+ACCOUNT_TEMPLATES = [
+    ("BBVA Azul", "credit_card", "BBVA", -3200.456),
+    ("Santander Nómina", "checking", "Santander", 15400.1),
+    ("Nu Cajita", "savings", "Nu", 42000.0),
+    ("Wallet", "cash", None, 900.0),
+    ("GBM Trading", "investment", "GBM", 128400.9912),
+]
+
+
+def build_user_context(n_accounts: int) -> UserContext:
+    return UserContext(
+        user_id="user_001",
+        full_name="Test User",
+        preferred_currency="MXN",
+        language="en",
+        timezone="America/Mexico_City",
+        accounts=[
+            Account(f"3f2c9a10-7e4b-4c55-9d1e-{index:012d}", f"{name} {index}", account_type, institution, "MXN", balance)
+            for index, (name, account_type, institution, balance) in (
+                (index, ACCOUNT_TEMPLATES[index % len(ACCOUNT_TEMPLATES)]) for index in range(n_accounts)
+            )
+        ],
+    )
+
+
+def legacy_format(user_context: UserContext) -> str:
+    return str(user_context.to_dict()).replace("{", "{{").replace("}", "}}")
+
+
+def time_per_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'accounts':>8} {'legacy_bytes':>13} {'compact_bytes':>14} {'legacy_tokens':>14} "
+          f"{'compact_tokens':>15} {'legacy_us':>10} {'compact_us':>11}")
+    for n_accounts in args.accounts:
+        user_context = build_user_context(n_accounts)
+        legacy = legacy_format(user_context)
+        compact = format_user_context(user_context)
+        legacy_us = time_per_call(lambda: legacy_format(user_context), args.repeat)
+        # Every turn after the first reads the rendering cached on the context
+        compact_us = time_per_call(lambda: format_user_context(user_context), args.repeat)
+        print(
+            f"{n_accounts:>8} {len(legacy.encode()):>13} {len(compact.encode()):>14} {count_tokens(legacy):>14} "
+            f"{count_tokens(compact):>15} {legacy_us:>10.1f} {compact_us:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Check duplicate detection on the transaction write path and measure its cost.
+
+1. Retries through add_transaction: a stub transaction agent stores the same
+   purchase twice, as after a user retry; the second call must return the
+   first transaction id as a duplicate, and ``allow_duplicate`` must store a
+   confirmed second purchase.
+2. Concurrency: ``--concurrency`` copies of one transaction are submitted at
+   once, with a shared idempotency key and without one; one row must be
+   stored either way and every copy must get its id.
+3. Matching: copies dated within DEDUP_DATE_WINDOW_DAYS match, copies out of
+   the window or with another amount, account or type do not.
+4. Failed writes: a write that fails releases its claim, so the retry is stored.
+5. Idempotency keys: a key reused for a different transaction is rejected,
+   and a key set in the session state covers one add_transaction call only.
+6. Warm-up: a user's first submit indexes only that user's stored
+   transactions within DEDUP_HORIZON_DAYS, read once for concurrent submits.
+7. Lookup and insert cost: the time to check a transaction against indexes
+   of growing size, and to insert one into an index at capacity, which
+   should both stay flat.
+
+Usage:
+    python benchmarks/bench_dedup.py [--concurrency 50] [--sizes 1000,100000,500000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("TRANSACTION_AGENT_MODEL", "openai/stub")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.adk.runners import Runner  # noqa: E402
+from google.adk.sessions import InMemorySessionService  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from finassist.subagents.data_manager.transaction.agent import create_transaction_manager  # noqa: E402
+from finassist.subagents.data_manager.transaction.tools import IDEMPOTENCY_KEY_STATE_KEY  # noqa: E402
+from finassist.utils import writer as writer_module  # noqa: E402
+from finassist.utils.dedup import DedupIndex, get_dedup_index, submit_transaction  # noqa: E402
+from finassist.utils.storage import get_storage  # noqa: E402
+from finassist.utils.writer import BatchWriter, validate_transaction  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+YESTERDAY = (date.today() - timedelta(days=1)).isoformat()
+
+
+class ToolCallingModel(BaseLlm):
+    """Calls add_transaction with the JSON of the user message, then reports the tool result."""
+
+    model: str = "stub"
+
+    async def generate_content_async(self, llm_request, stream=False):
+        last = llm_request.contents[-1].parts[0]
+        if last.function_response:
+            part = types.Part(text=json.dumps(last.function_response.response))
+        else:
+            call = types.FunctionCall(name="add_transaction", args={"data_transaction": last.text})
+            part = types.Part(function_call=call)
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def transaction(**overrides):
+    data = {"user_id": "user_dedup", "account_id": "acc_dedup", "amount": 84.5, "currency": "MXN",
+            "transaction_type": "expense", "transaction_date": YESTERDAY, "category": "Food",
+            "subcategory": "Groceries", "notes": "Walmart Supercenter"}
+    data.update(overrides)
+    return validate_transaction(data)
+
+
+def seed_user():
+    storage = get_storage()
+    storage.insert_users([{"user_id": "user_dedup", "full_name": "Dedup User", "preferred_currency": "MXN",
+                           "language": "en", "timezone": "America/Mexico_City",
+                           "created_at": TIMESTAMP, "updated_at": TIMESTAMP}])
+    storage.insert_accounts([{"account_id": account_id, "user_id": "user_dedup", "account_name": account_id,
+                              "account_type": "checking", "institution": "Bank", "balance": 0.0, "currency": "MXN",
+                              "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+                             for account_id in ("acc_dedup", "acc_other")])
+
+
+def stored_count(notes):
+    return sum(row["notes"] == notes for row in get_storage().fetch_transactions())
+
+
+async def check_tool_retries(errors):
+    session_service = InMemorySessionService()
+    runner = Runner(agent=create_transaction_manager(model=ToolCallingModel()), app_name="bench",
+                    session_service=session_service)
+    session = await session_service.create_session(app_name="bench", user_id="user_dedup")
+    payload = {"user_id": "user_dedup", "account_id": "acc_dedup", "amount": 12.3, "currency": "MXN",
+               "transaction_type": "expense", "transaction_date": YESTERDAY, "category": "Food", "subcategory": "Coffee/Tea", "notes": "Starbucks"}
+    results = []
+    for message in (payload, payload, {**payload, "allow_duplicate": True}):
+        content = types.Content(role="user", parts=[types.Part(text=json.dumps(message))])
+        async for event in runner.run_async(user_id="user_dedup", session_id=session.id, new_message=content):
+            if event.content and event.content.parts and event.content.parts[0].text:
+                results.append(json.loads(event.content.parts[0].text))
+    first, retry, confirmed = results
+    print(f"tool: first={first.get('duplicate', False)} retry={retry.get('duplicate', False)} "
+          f"confirmed_second_purchase={confirmed.get('duplicate', False)} stored={stored_count('Starbucks')}")
+    if not retry.get("duplicate") or retry["transaction_id"] != first["transaction_id"]:
+        errors.append("tool: the retry did not return the first transaction")
+    if confirmed.get("duplicate") or stored_count("Starbucks") != 2:
+        errors.append("tool: allow_duplicate did not store the second purchase")
+
+
+async def check_concurrency(concurrency, errors):
+    for label, key in (("idempotency_key", "order-42"), ("content", None)):
+        notes = f"Costco {label}"
+        rows = [transaction(notes=notes, amount=50) for _ in range(concurrency)]
+        results = await asyncio.gather(*(submit_transaction(row, idempotency_key=key) for row in rows))
+        ids = {transaction_id for transaction_id, _ in results}
+        written = sum(not duplicate for _, duplicate in results)
+        print(f"concurrent {label:<15} copies={concurrency} written={written} distinct_ids={len(ids)} "
+              f"stored={stored_count(notes)}")
+        if written != 1 or len(ids) != 1 or stored_count(notes) != 1:
+            errors.append(f"concurrent {label}: {written} writes, {len(ids)} ids")
+
+
+async def check_matching(errors):
+    window = get_dedup_index().window_days
+    await submit_transaction(transaction(notes="Soriana Centro"))
+    cases = [
+        ("same day", {}, True),
+        (f"{window} days earlier", {"transaction_date": (date.today() - timedelta(days=1 + window)).isoformat()}, True),
+        (f"{window + 1} days earlier", {"transaction_date": (date.today() - timedelta(days=2 + window)).isoformat()},
+         False),
+        ("other amount", {"amount": 84.51}, False),
+        ("other account", {"account_id": "acc_other"}, False),
+        ("income", {"transaction_type": "income", "category": "Income", "subcategory": "Other Income"}, False),
+        ("store number", {"notes": "SORIANA CENTRO #0421"}, True),
+    ]
+    for label, overrides, expected in cases:
+        row = transaction(**{"notes": "Soriana Centro", **overrides})
+        found = get_dedup_index().find(row) is not None
+        print(f"match {label:<16} duplicate={found}")
+        if found != expected:
+            errors.append(f"match {label}: expected duplicate={expected}")
+
+
+async def check_failed_write(errors):
+    shared = writer_module.transaction_writer
+
+    def failing_sink(rows):
+        raise RuntimeError("storage unavailable")
+
+    writer_module.transaction_writer = BatchWriter(failing_sink, max_delay=0.001)
+    row = transaction(notes="Chedraui failed write")
+    try:
+        await submit_transaction(row, idempotency_key="retry-after-failure")
+        errors.append("failed write: no error raised")
+    except Exception:
+        pass
+    finally:
+        writer_module.transaction_writer = shared
+    _, duplicate = await submit_transaction(transaction(notes="Chedraui failed write"), idempotency_key="retry-after-failure")
+    print(f"failed write: retry_stored={not duplicate} stored={stored_count('Chedraui failed write')}")
+    if duplicate or stored_count("Chedraui failed write") != 1:
+        errors.append("failed write: the retry was not stored")
+
+
+async def check_idempotency_keys(errors):
+    first, _ = await submit_transaction(transaction(notes="Oxxo Reforma", amount=30), idempotency_key="order-7")
+    try:
+        await submit_transaction(transaction(notes="Oxxo Reforma", amount=45), idempotency_key="order-7")
+        errors.append("idempotency: a key reused for another amount returned the first transaction")
+        rejected = False
+    except ValueError:
+        rejected = True
+
+    # A client key in the session state, then two different purchases in one session
+    session_service = InMemorySessionService()
+    runner = Runner(agent=create_transaction_manager(model=ToolCallingModel()), app_name="bench",
+                    session_service=session_service)
+    session = await session_service.create_session(app_name="bench", user_id="user_dedup",
+                                                   state={IDEMPOTENCY_KEY_STATE_KEY: "client-request-1"})
+    results = []
+    for amount in (61.0, 62.0):
+        message = {"user_id": "user_dedup", "account_id": "acc_dedup", "amount": amount, "currency": "MXN", "transaction_type": "expense",
+                   "transaction_date": YESTERDAY, "category": "Food", "subcategory": "Snacks", "notes": "Seven Eleven"}
+        content = types.Content(role="user", parts=[types.Part(text=json.dumps(message))])
+        async for event in runner.run_async(user_id="user_dedup", session_id=session.id, new_message=content):
+            if event.content and event.content.parts and event.content.parts[0].text:
+                results.append(json.loads(event.content.parts[0].text))
+    session = await session_service.get_session(app_name="bench", user_id="user_dedup", session_id=session.id)
+    cleared = not session.state.get(IDEMPOTENCY_KEY_STATE_KEY)
+    print(f"idempotency: reused_key_rejected={rejected} state_key_cleared={cleared} "
+          f"session_purchases_stored={stored_count('Seven Eleven')}")
+    if not cleared:
+        errors.append("idempotency: the session state key was not cleared after the write")
+    if stored_count("Seven Eleven") != 2 or any(result.get("duplicate") for result in results):
+        errors.append(f"idempotency: the session key was applied to the next transaction: {results}")
+
+
+async def check_warm_up(errors):
+    storage = get_storage()
+    horizon = get_dedup_index().horizon_days
+    rows = [transaction(user_id=user_id, notes=f"Farmacia {number}", transaction_date=day)
+            for number, (user_id, day) in enumerate([
+                ("user_warm", YESTERDAY), ("user_warm", YESTERDAY),
+                ("user_warm", (date.today() - timedelta(days=horizon + 5)).isoformat()),
+                ("user_cold", YESTERDAY),
+            ])]
+    for row in rows:
+        row["recorded_date"] = TIMESTAMP
+    storage.insert_transactions(rows)
+    index = DedupIndex()
+    scans = []
+    scan = storage.scan_transactions
+
+    def counted_scan(user_id, **filters):
+        scans.append(user_id)
+        return scan(user_id, **filters)
+
+    storage.scan_transactions = counted_scan
+    try:
+        await asyncio.gather(*(index.aload_user("user_warm") for _ in range(10)))
+    finally:
+        storage.scan_transactions = scan
+    indexed = index.size
+    # A horizon later, the day's prune drops both
+    dropped = index.prune(date.today() + timedelta(days=horizon))
+    print(f"warm-up: scans={scans} indexed={indexed} (expected 2) pruned_a_horizon_later={dropped} left={index.size}")
+    if dropped != 2 or index.size:
+        errors.append(f"prune: dropped {dropped}, {index.size} left")
+    if scans != ["user_warm"]:
+        errors.append(f"warm-up: expected one scan of user_warm, got {scans}")
+    if indexed != 2:
+        errors.append(f"warm-up: indexed {indexed} transactions, expected the user's 2 within the horizon")
+
+
+def lookup_cost(sizes, lookups=20000):
+    print(f"{'indexed':>8} {'lookup_us':>10} {'insert_full_us':>15}")
+    merchants = [f"merchant {uuid.uuid4().hex[:8]}" for _ in range(5000)]
+
+    def row(number):
+        return {"transaction_id": str(number), "user_id": f"user_{number % 1000}", "account_id": "acc",
+                "amount": number % 500 + 0.99, "currency": "MXN", "transaction_type": "expense",
+                "transaction_date": (date.today() - timedelta(days=number % 365)).isoformat(),
+                "notes": merchants[number % len(merchants)]}
+
+    for size in sizes:
+        index = DedupIndex(maxsize=size)
+        for number in range(size):
+            index.add(row(number))
+        probe = {"user_id": "user_7", "account_id": "acc", "amount": 7.99, "currency": "MXN",
+                 "transaction_type": "expense", "transaction_date": YESTERDAY, "notes": merchants[7]}
+        start = time.perf_counter()
+        for _ in range(lookups):
+            index.find(probe)
+        lookup = (time.perf_counter() - start) / lookups
+        # At capacity every insert evicts the transaction indexed first
+        extra = [row(size + number) for number in range(lookups)]
+        start = time.perf_counter()
+        for item in extra:
+            index.add(item)
+        insert = (time.perf_counter() - start) / lookups
+        print(f"{size:>8} {lookup * 1e6:>10.2f} {insert * 1e6:>15.2f}")
+
+
+async def main_async(args):
+    seed_user()
+    errors = []
+    await check_tool_retries(errors)
+    await check_concurrency(args.concurrency, errors)
+    await check_matching(errors)
+    await check_failed_write(errors)
+    await check_idempotency_keys(errors)
+    await check_warm_up(errors)
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sizes", default="1000,100000,500000", help="Index sizes for the lookup cost.")
+    args = parser.parse_args()
+
+    errors = asyncio.run(main_async(args))
+    lookup_cost([int(size) for size in args.sizes.split(",")])
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
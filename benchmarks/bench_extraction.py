@@ -0,0 +1,95 @@
+"""Measure the rule-based transaction field extractor on a labeled message set.
+
+Each message in benchmarks/data/transaction_messages.jsonl lists the fields a
+careful reader would pull out of it. The benchmark reports per-field
+precision and recall, the share of messages resolved completely, which
+are the ones where the transaction agent can go straight to confirmation,
+and the clarifying turns saved: per message, the resolvable fields that are
+pre-filled correctly and that the agent would otherwise have asked for,
+summed over the set. With ``--verbose`` every wrong field is listed.
+
+Usage:
+    python benchmarks/bench_extraction.py [--messages benchmarks/data/transaction_messages.jsonl] [--repeat 200] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from finassist.utils.extraction import RESOLVABLE_FIELDS, extract_transaction_fields  # noqa: E402
+from finassist.utils.storage import Account, UserContext  # noqa: E402
+
+TODAY = date(2025, 6, 10)
+USER_CONTEXT = UserContext(
+    user_id="user_001",
+    full_name="Test User",
+    preferred_currency="MXN",
+    language="en",
+    timezone="America/Mexico_City",
+    accounts=[
+        Account("acc_bbva_cc", "BBVA Azul", "credit_card", "BBVA", "MXN", -3200.0),
+        Account("acc_amex_cc", "Amex Gold", "credit_card", "American Express", "MXN", -800.0),
+        Account("acc_santander_chk", "Santander Nómina", "checking", "Santander", "MXN", 15400.0),
+        Account("acc_nu_sav", "Nu Cajita", "savings", "Nu", "MXN", 42000.0),
+        Account("acc_cash", "Wallet", "cash", None, "MXN", 900.0),
+    ],
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", default=os.path.join(os.path.dirname(__file__), "data", "transaction_messages.jsonl"))
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the set for the throughput figure.")
+    parser.add_argument("--verbose", action="store_true", help="List every wrongly extracted field.")
+    args = parser.parse_args()
+
+    with open(args.messages) as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+
+    extracted = correct = expected = 0
+    per_field = {name: Counter() for name in RESOLVABLE_FIELDS}
+    complete = turns_saved = 0
+    for item in labeled:
+        result = extract_transaction_fields(item["message"], USER_CONTEXT, today=TODAY)
+        complete += result.is_complete
+        for name in RESOLVABLE_FIELDS:
+            got, want = result.fields.get(name), item["expected"].get(name)
+            if got is not None:
+                per_field[name]["extracted"] += 1
+                per_field[name]["correct"] += got == want
+                # A field pre-filled correctly is a question the agent does not have to ask
+                turns_saved += got == want
+            if want is not None:
+                per_field[name]["expected"] += 1
+            if args.verbose and got is not None and got != want:
+                print(f"wrong {name}: {item['message']!r} -> {got!r} (expected {want!r})")
+
+    for name, counts in per_field.items():
+        extracted += counts["extracted"]
+        correct += counts["correct"]
+        expected += counts["expected"]
+        precision = counts["correct"] / counts["extracted"] if counts["extracted"] else 0
+        recall = counts["correct"] / counts["expected"] if counts["expected"] else 0
+        print(f"{name:<17} precision={precision:.0%} recall={recall:.0%}")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for item in labeled:
+            extract_transaction_fields(item["message"], USER_CONTEXT, today=TODAY)
+    elapsed = time.perf_counter() - start
+
+    total = len(labeled)
+    print(f"overall precision={correct / extracted:.1%} recall={correct / expected:.1%}")
+    print(f"fully_resolved={complete}/{total} ({complete / total:.0%}) messages need no clarifying turn")
+    print(f"turns_saved={turns_saved} of {total * len(RESOLVABLE_FIELDS)} resolvable fields "
+          f"({turns_saved / total:.1f} clarifying questions per message)")
+    print(f"throughput={args.repeat * total / elapsed:,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
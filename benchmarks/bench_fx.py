@@ -0,0 +1,179 @@
+"""Compare vectorized FX conversion with a per-row Python lookup.
+
+A rate file of ``--currencies`` currencies against USD is generated, with
+one rate per weekday over ``--years`` years; half of the currencies are
+quoted as USD/XXX and half as XXX/USD. ``--amounts`` random (amount,
+currency, date) rows are then converted to MXN three ways:
+
+- vectorized: ``RateTable.convert`` on the arrays;
+- scalar: ``RateTable.convert_one`` called per row, memoized per pair and
+  date (most rows here are the first lookup of their pair and date);
+- per row: a bisect of the rate lists for each row and a cross through
+  USD, the way a loop over transaction dicts would do it.
+
+All three must agree, including on which rows have no rate (dates before
+the first rate or more than FX_MAX_RATE_AGE_DAYS after the last one). The
+script also checks the ``total_balance`` of a user context with a loan in
+another currency, which must be subtracted.
+
+Usage:
+    python benchmarks/bench_fx.py [--currencies 30] [--years 10] [--amounts 1000000]
+"""
+import argparse
+import bisect
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from finassist.utils import fx  # noqa: E402
+from finassist.utils.fx import RateTable  # noqa: E402
+from finassist.utils.storage import Account, UserContext  # noqa: E402
+
+CURRENCIES = ["MXN", "EUR", "GBP", "JPY", "CAD", "BRL", "ARS", "CLP", "COP", "PEN", "CHF", "AUD", "NZD", "CNY",
+              "INR", "KRW", "SEK", "NOK", "DKK", "PLN", "CZK", "HUF", "ZAR", "TRY", "ILS", "SGD", "HKD", "THB",
+              "PHP", "IDR", "MYR", "TWD", "UYU", "BOB", "PYG"]
+MAX_AGE_DAYS = 7
+
+
+def write_rates(path, args, rng):
+    """Write the rate file and return the USD/XXX series as ``{currency: (days, rates)}``."""
+    first = date.today() - timedelta(days=365 * args.years)
+    series = {}
+    with open(path, "w") as file:
+        file.write("date,base,quote,rate\n")
+        for index, currency in enumerate(CURRENCIES[:args.currencies]):
+            rate = rng.uniform(0.5, 50)
+            days, rates = [], []
+            for offset in range(365 * args.years):
+                day = first + timedelta(days=offset)
+                if day.weekday() >= 5:
+                    continue
+                rate *= 1 + rng.gauss(0, 0.005)
+                days.append(day.toordinal())
+                rates.append(rate)
+                # Half the currencies are quoted the other way round
+                if index % 2:
+                    file.write(f"{day.isoformat()},{currency},USD,{1 / rate!r}\n")
+                else:
+                    file.write(f"{day.isoformat()},USD,{currency},{rate!r}\n")
+            series[currency] = (days, rates)
+    return series, first
+
+
+def per_row_rate(series, currency, to_currency, ordinal):
+    """The rate of one row, looked up without memoization."""
+    if currency == to_currency:
+        return 1.0
+
+    def from_usd(code):
+        if code == "USD":
+            return 1.0
+        days, rates = series[code]
+        index = bisect.bisect_right(days, ordinal) - 1
+        if index < 0 or ordinal - days[index] > MAX_AGE_DAYS:
+            return None
+        return rates[index]
+
+    base, quote = from_usd(currency), from_usd(to_currency)
+    return None if base is None or quote is None else quote / base
+
+
+def check_total_balance(errors):
+    """1000 MXN in checking and a 500 USD loan at 18 MXN per USD are a net of -8000 MXN."""
+    table = fx.rate_table
+    fx.rate_table = RateTable([(date.today(), "USD", "MXN", 18.0)])
+    try:
+        context = UserContext(
+            user_id="user_fx", full_name="FX User", preferred_currency="MXN", language="en",
+            timezone="America/Mexico_City",
+            accounts=[Account("acc_checking", "BBVA debit", "checking", "BBVA", "MXN", 1000.0),
+                      Account("acc_loan", "Car loan", "loan", "Banorte", "USD", 500.0)],
+        )
+        total = context.total_balance()
+    finally:
+        fx.rate_table = table
+    print(f"total_balance with a loan: {total}")
+    if total != -8000.0:
+        errors.append(f"total_balance: {total} with a loan, expected -8000.0")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--currencies", type=int, default=30)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--amounts", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    errors = []
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "fx_rates.csv")
+        series, first = write_rates(path, args, rng)
+        rows = sum(len(days) for days, _ in series.values())
+        start = time.perf_counter()
+        table = RateTable.from_file(path, max_age_days=MAX_AGE_DAYS)
+        print(f"load: rate_rows={rows} time={(time.perf_counter() - start) * 1e3:.0f}ms")
+
+    codes = ["USD"] + list(series)
+    # Dates from before the first rate to after the last one goes stale
+    span = (date.today() - first).days + 2 * MAX_AGE_DAYS + 30
+    amounts = np.round(np.array([rng.uniform(1, 1000) for _ in range(args.amounts)]), 2)
+    currencies = np.array([rng.choice(codes) for _ in range(args.amounts)])
+    ordinals = np.array([first.toordinal() - 15 + rng.randrange(span) for _ in range(args.amounts)])
+    days = (ordinals - date(1970, 1, 1).toordinal()).astype("datetime64[D]")
+
+    start = time.perf_counter()
+    cold = table.convert(amounts, currencies, days, "MXN")
+    cold_time = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = table.convert(amounts, currencies, days, "MXN")
+    vectorized_time = time.perf_counter() - start
+
+    # The loops get plain Python values, as they would from transaction dicts
+    sample = min(args.amounts, 200_000)
+    rows = [(float(amounts[i]), str(currencies[i]), date.fromordinal(int(ordinals[i]))) for i in range(sample)]
+    start = time.perf_counter()
+    scalar = [table.convert_one(amount, currency, "MXN", day) for amount, currency, day in rows]
+    scalar_time = (time.perf_counter() - start) / sample * args.amounts
+    start = time.perf_counter()
+    per_row = []
+    for amount, currency, day in rows:
+        rate = per_row_rate(series, currency, "MXN", day.toordinal())
+        per_row.append(None if rate is None else amount * rate)
+    per_row_time = (time.perf_counter() - start) / sample * args.amounts
+
+    print(f"{'method':<12} {'time':>10} {'ns/row':>8}")
+    for name, elapsed in (("vectorized", vectorized_time), ("first call", cold_time),
+                          ("scalar", scalar_time), ("per row", per_row_time)):
+        print(f"{name:<12} {elapsed * 1e3:>8.1f}ms {elapsed / args.amounts * 1e9:>8.0f}")
+    print(f"speedup over per row: {per_row_time / vectorized_time:.0f}x "
+          f"(scalar and per-row times extrapolated from {sample} rows)")
+
+    missing = int(np.isnan(vectorized).sum())
+    print(f"rows without a rate: {missing} ({missing / args.amounts:.1%})")
+    expected = np.array([np.nan if value is None else value for value in per_row])
+    got_scalar = np.array([np.nan if value is None else value for value in scalar])
+    if not np.array_equal(np.isnan(vectorized[:sample]), np.isnan(expected)):
+        errors.append("vectorized: rows without a rate differ from the per-row lookup")
+    elif not np.allclose(vectorized[:sample], expected, rtol=1e-9, equal_nan=True):
+        errors.append("vectorized: converted amounts differ from the per-row lookup")
+    if not np.allclose(got_scalar, expected, rtol=1e-9, equal_nan=True):
+        errors.append("scalar: converted amounts differ from the per-row lookup")
+    if not np.array_equal(cold, vectorized, equal_nan=True):
+        errors.append("vectorized: the memoized call differs from the first one")
+    check_total_balance(errors)
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
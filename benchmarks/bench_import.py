@@ -0,0 +1,80 @@
+"""Break down the cold-start cost of finassist with ``python -X importtime``.
+
+Each stage runs in a fresh interpreter so nothing is already imported:
+importing ``finassist.agent``, building ``root_agent`` (which loads
+google-adk), and resolving the models (which loads litellm). The script
+prints the wall time of each stage and the slowest top-level packages of
+the importtime trace.
+
+Usage:
+    python benchmarks/bench_import.py [--top 15] [--runs 3]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STAGES = {
+    "import finassist.agent": "import finassist.agent",
+    "+ build root_agent": "import finassist.agent; finassist.agent.root_agent",
+    "+ first model client": (
+        "import finassist.agent; agent = finassist.agent.root_agent; agent.canonical_model.delegate.get_delegate()"
+    ),
+}
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run(code: str, importtime: bool = False):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for var in ("MAIN_AGENT_MODEL", "DATABASE_MANAGER_MODEL", "TRANSACTION_AGENT_MODEL",
+                "ACCOUNT_AGENT_MODEL", "QUESTION_AGENT_MODEL", "ANALYTICS_AGENT_MODEL",
+                "BUDGET_AGENT_MODEL"):
+        env.setdefault(var, "openai/gpt-4o-mini")
+    # The model client is built but never called
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    start = time.perf_counter()
+    result = subprocess.run(command, env=env, capture_output=True, text=True, cwd=ROOT)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return elapsed, result.stderr
+
+
+def top_packages(trace: str, top: int):
+    """Sum the cumulative time of the outermost imports of each top-level package."""
+    totals = defaultdict(int)
+    for line in trace.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            parts = match.group(4).split(".")
+            # google is a namespace package; google.adk and google.cloud are the interesting units
+            totals[".".join(parts[:2]) if parts[0] == "google" else parts[0]] += int(match.group(2))
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per stage; the best time is reported.")
+    args = parser.parse_args()
+
+    baseline = min(run("pass")[0] for _ in range(args.runs))
+    print(f"{'stage':<24} {'wall_s':>8} {'over_bare_python_s':>19}")
+    for stage, code in STAGES.items():
+        elapsed = min(run(code)[0] for _ in range(args.runs))
+        print(f"{stage:<24} {elapsed:>8.2f} {elapsed - baseline:>19.2f}")
+
+    for stage, code in STAGES.items():
+        _, trace = run(code, importtime=True)
+        print(f"\nslowest packages for '{stage}' (cumulative import time):")
+        for package, microseconds in top_packages(trace, args.top):
+            print(f"    {package:<28} {microseconds / 1e6:>7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
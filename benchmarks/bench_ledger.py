@@ -0,0 +1,301 @@
+"""Check the incremental account balances and compare them with recomputing.
+
+1. Correctness: ``--transactions`` random expenses and income (some in a
+   currency the account does not hold) are written concurrently through the
+   transaction writer. Every balance must equal its opening balance plus
+   the aggregate of its transactions, with loans counting what is owed.
+2. Freshness: the user context read after add_transaction's invalidation
+   shows the new balance, also through the accounts mirror before any refresh,
+   and a load the invalidation overtook is not cached.
+3. Reconciliation: balances corrupted by hand are found and corrected.
+4. Migration: a database created before ``opening_balance`` existed gets
+   its balances as opening balances.
+5. Queued deltas, as the BigQuery backend applies them: a batch that hits
+   a streaming-buffer error is retried until it lands once, one that keeps
+   failing otherwise is dropped after DELTA_MAX_ATTEMPTS, and a
+   reconciliation between a write and its flush does not count it twice.
+6. Cost: the time to keep one balance current per write, incrementally
+   (one UPDATE inside the insert) versus re-aggregating the account's
+   transactions, as the history grows.
+
+Usage:
+    python benchmarks/bench_ledger.py [--transactions 20000] [--history 10000,100000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+os.environ.setdefault("BALANCE_RECONCILE_INTERVAL", "0")
+
+from finassist.utils.ledger import BalanceReconciler, DeltaQueue, balance_deltas  # noqa: E402
+from finassist.utils.mirror import MirroredStorage  # noqa: E402
+from finassist.utils.storage import (  # noqa: E402
+    SQLiteStorage,
+    aget_cached_user_context,
+    get_storage,
+    invalidate_user_context,
+    user_context_cache,
+)
+from finassist.utils.writer import BatchWriter, validate_transaction  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+ACCOUNTS = [("checking", "MXN", 5000.0), ("credit_card", "MXN", -1200.0), ("loan", "MXN", 80000.0),
+            ("savings", "USD", 300.0)]
+
+
+def seed(storage, n_users):
+    storage.insert_users([{"user_id": f"user_{u:04d}", "full_name": f"User {u}", "preferred_currency": "MXN",
+                           "language": "es", "timezone": "America/Mexico_City", "created_at": TIMESTAMP,
+                           "updated_at": TIMESTAMP} for u in range(n_users)])
+    storage.insert_accounts([{"account_id": f"acc_{u:04d}_{kind}", "user_id": f"user_{u:04d}", "account_name": kind,
+                              "account_type": kind, "institution": "Bank", "currency": currency, "balance": balance,
+                              "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+                             for u in range(n_users) for kind, currency, balance in ACCOUNTS])
+
+
+def random_transaction(rng, n_users):
+    user = rng.randrange(n_users)
+    kind, currency, _ = rng.choice(ACCOUNTS)
+    return validate_transaction({
+        "user_id": f"user_{user:04d}", "account_id": f"acc_{user:04d}_{kind}",
+        "amount": round(rng.uniform(1, 500), 2),
+        # One in ten is paid in a currency the account does not hold and must not move its balance
+        "currency": ("EUR" if rng.random() < 0.1 else currency),
+        "transaction_type": "income" if rng.random() < 0.2 else "expense",
+        "transaction_date": (date.today() - timedelta(days=rng.randrange(90))).isoformat(),
+        "category": None, "subcategory": None, "notes": "bench",
+    })
+
+
+def expected_balances(storage):
+    """Opening balance plus the aggregate, computed here from the raw rows."""
+    conn = storage._conn
+    accounts = {row["account_id"]: dict(row) for row in conn.execute("SELECT * FROM accounts")}
+    expected = {account_id: account["opening_balance"] for account_id, account in accounts.items()}
+    for row in conn.execute("SELECT account_id, currency, transaction_type, amount FROM transactions"):
+        account = accounts[row["account_id"]]
+        if row["currency"] != account["currency"]:
+            continue
+        delta = row["amount"] if row["transaction_type"] == "income" else -row["amount"]
+        expected[row["account_id"]] += -delta if account["account_type"] == "loan" else delta
+    return {account_id: (accounts[account_id]["balance"], round(value, 2)) for account_id, value in expected.items()}
+
+
+async def check_correctness(args, errors):
+    storage = get_storage()
+    seed(storage, args.users)
+    writer = BatchWriter(storage.insert_transactions, max_batch_size=500, max_delay=0.01)
+    rng = random.Random(args.seed)
+    rows = [random_transaction(rng, args.users) for _ in range(args.transactions)]
+    start = time.perf_counter()
+    await asyncio.gather(*(writer.submit(row) for row in rows))
+    elapsed = time.perf_counter() - start
+    wrong = [(account_id, values) for account_id, values in expected_balances(storage).items()
+             if abs(values[0] - values[1]) > 0.005]
+    print(f"correctness: transactions={len(rows)} accounts={args.users * len(ACCOUNTS)} "
+          f"write_batches={writer.batches} rows/s={len(rows) / elapsed:.0f} wrong_balances={len(wrong)}")
+    if wrong:
+        errors.append(f"correctness: {len(wrong)} balances differ from the aggregate, e.g. {wrong[:3]}")
+
+    # What add_transaction does: store, invalidate, and the next turn reads the context
+    user_context = await aget_cached_user_context("user_0000")
+    before = {account.account_id: account.balance for account in user_context.accounts}["acc_0000_checking"]
+    await writer.submit(validate_transaction({**rows[0], "user_id": "user_0000", "account_id": "acc_0000_checking",
+                                              "currency": "MXN", "amount": 10.0, "transaction_type": "expense"}))
+    invalidate_user_context("user_0000")
+    user_context = await aget_cached_user_context("user_0000")
+    after = {account.account_id: account.balance for account in user_context.accounts}["acc_0000_checking"]
+    print(f"freshness: checking balance {before:.2f} -> {after:.2f} on the next read")
+    if round(before - after, 2) != 10.0:
+        errors.append("freshness: the context did not show the new balance")
+
+    # A write and its invalidation while a load is in flight: the load may have read the old balance
+    invalidate_user_context("user_0000")
+    load = asyncio.ensure_future(aget_cached_user_context("user_0000"))
+    await asyncio.sleep(0)
+    await writer.submit(validate_transaction({**rows[0], "user_id": "user_0000", "account_id": "acc_0000_checking",
+                                              "currency": "MXN", "amount": 10.0, "transaction_type": "expense"}))
+    invalidate_user_context("user_0000")
+    await load
+    cached = "user_0000" in user_context_cache
+    user_context = await aget_cached_user_context("user_0000")
+    latest = {account.account_id: account.balance for account in user_context.accounts}["acc_0000_checking"]
+    print(f"freshness: overtaken load cached={cached}, next read {latest:.2f}")
+    if cached or round(after - latest, 2) != 10.0:
+        errors.append("freshness: a load overtaken by an invalidation was cached")
+
+
+def check_reconciliation(errors):
+    storage = get_storage()
+    storage._conn.execute("UPDATE accounts SET balance = balance + 99 WHERE account_id IN ('acc_0001_checking', "
+                          "'acc_0002_loan')")
+    reconciler = BalanceReconciler(storage, interval=0)
+    drift = reconciler.reconcile()
+    again = reconciler.reconcile()
+    print(f"reconciliation: corrected={sorted(item['account_id'] for item in drift)} "
+          f"second_run={len(again)} duration={reconciler.last_duration * 1000:.1f}ms")
+    if sorted(item["account_id"] for item in drift) != ["acc_0001_checking", "acc_0002_loan"] or again:
+        errors.append("reconciliation: drift not corrected exactly")
+    wrong = [values for values in expected_balances(storage).values() if abs(values[0] - values[1]) > 0.005]
+    if wrong:
+        errors.append("reconciliation: balances still differ from the aggregate")
+
+
+def check_delta_queue(errors):
+    """Drive a DeltaQueue against an in-memory aggregate, with failures and a reconciliation mid-flight."""
+    stored = []  # the transactions table
+    balances = {}  # the aggregate the queue maintains
+    failures = []
+
+    def apply(rows):
+        if failures:
+            raise RuntimeError(failures.pop())
+        for key, delta in balance_deltas(rows).items():
+            balances[key] = round(balances.get(key, 0.0) + delta, 2)
+
+    def recompute(watermark):
+        balances.clear()
+        apply([row for row in stored if row["recorded_date"] <= watermark])
+        return []
+
+    def write(second):
+        row = {"user_id": "user_q", "account_id": "acc_q", "currency": "MXN", "transaction_type": "expense",
+               "amount": 10.0, "recorded_date": f"2025-01-01T00:00:{second:04.1f}"}
+        stored.append(row)
+        return row
+
+    queue = DeltaQueue(apply, is_retryable=lambda error: "streaming buffer" in str(error), max_attempts=3)
+    queue.add([write(10)])
+    failures[:] = ["rows in the streaming buffer"] * 5
+    for _ in range(6):
+        try:
+            queue.flush()
+        except RuntimeError:
+            pass
+    retried = balances.get(("acc_q", "MXN"))
+
+    # Recorded before the applied one but queued after it, as with concurrent writers
+    queue.add([write(8)])
+    queued_late = write(9)  # stored, its deltas not queued yet
+    queue.reconcile(recompute)
+    queue.add([queued_late])
+    queue.add([write(11)])
+    queue.flush()
+    reconciled = balances.get(("acc_q", "MXN"))
+
+    queue.add([write(12)])
+    failures[:] = ["syntax error"] * 3
+    for _ in range(3):
+        try:
+            queue.flush()
+        except RuntimeError:
+            pass
+    print(f"delta queue: after_retries={retried} (expected -10.0) after_reconcile={reconciled} (expected -40.0) "
+          f"dropped={queue.rows_dropped} retries={queue.retries} queued={len(queue)}")
+    if retried != -10.0:
+        errors.append(f"delta queue: a retried batch left the balance at {retried}")
+    if reconciled != -40.0:
+        errors.append(f"delta queue: a reconciliation mid-flight left the balance at {reconciled}")
+    if queue.rows_dropped != 1 or len(queue):
+        errors.append("delta queue: a batch that kept failing was not dropped")
+
+
+def check_mirror(errors):
+    source = SQLiteStorage(":memory:")
+    seed(source, 1)
+    mirrored = MirroredStorage(source, refresh_interval=3600)
+    mirrored.refresh()
+    row = validate_transaction({"user_id": "user_0000", "account_id": "acc_0000_checking", "amount": 25.5,
+                                "currency": "MXN", "transaction_type": "expense",
+                                "transaction_date": date.today().isoformat(), "notes": "mirror"})
+    mirrored.insert_transactions([row])
+    balance = {account.account_id: account.balance for account in mirrored.list_accounts("user_0000")}
+    print(f"mirror: checking balance {balance['acc_0000_checking']:.2f} before any refresh")
+    if balance["acc_0000_checking"] != 5000.0 - 25.5:
+        errors.append("mirror: the balance change did not reach the mirror")
+
+
+def check_migration(errors):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE accounts (account_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, "
+                     "account_name TEXT NOT NULL, account_type TEXT NOT NULL, institution TEXT, balance REAL, "
+                     "currency TEXT NOT NULL, due_date TEXT, statement_closing_date TEXT, created_at TEXT, "
+                     "updated_at TEXT)")
+        conn.execute("INSERT INTO accounts (account_id, user_id, account_name, account_type, balance, currency) "
+                     "VALUES ('acc_old', 'user_old', 'Old', 'checking', 750.0, 'MXN')")
+        conn.commit()
+        conn.close()
+        migrated = SQLiteStorage(path)
+        opening = migrated._conn.execute("SELECT opening_balance FROM accounts").fetchone()[0]
+        migrated._conn.close()
+    print(f"migration: opening_balance={opening}")
+    if opening != 750.0:
+        errors.append("migration: the old balance did not become the opening balance")
+
+
+def write_cost(history_sizes, writes=2000):
+    """Per-write cost of keeping one account's balance current, by history size."""
+    print(f"{'history':>8} {'incremental_us':>15} {'recompute_us':>13}")
+    for size in history_sizes:
+        storage = SQLiteStorage(":memory:")
+        seed(storage, 1)
+        rng = random.Random(size)
+        history = [random_transaction(rng, 1) for _ in range(size)]
+        for row in history:
+            row.update(account_id="acc_0000_checking", currency="MXN")
+        storage.insert_transactions(history)
+        rows = [{**history[index % size], "transaction_id": f"new_{index}"} for index in range(writes)]
+
+        start = time.perf_counter()
+        for row in rows[:writes // 2]:
+            storage.insert_transactions([row])
+        incremental = (time.perf_counter() - start) / (writes // 2)
+
+        # The alternative: insert, then re-aggregate the account's transactions into its balance
+        recompute_sql = (
+            "UPDATE accounts SET balance = opening_balance + (SELECT COALESCE(SUM(CASE WHEN transaction_type = "
+            "'income' THEN amount ELSE -amount END), 0) FROM transactions WHERE account_id = ? AND currency = ?) "
+            "WHERE account_id = ?"
+        )
+        start = time.perf_counter()
+        for row in rows[writes // 2:]:
+            storage._insert("transactions", [row])
+            with storage._lock:
+                storage._conn.execute(recompute_sql, ("acc_0000_checking", "MXN", "acc_0000_checking"))
+        recompute = (time.perf_counter() - start) / (writes - writes // 2)
+        print(f"{size:>8} {incremental * 1e6:>15.1f} {recompute * 1e6:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=20000)
+    parser.add_argument("--history", default="10000,100000", help="Transactions already stored, for the cost table.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    errors = []
+    asyncio.run(check_correctness(args, errors))
+    check_reconciliation(errors)
+    check_delta_queue(errors)
+    check_mirror(errors)
+    check_migration(errors)
+    write_cost([int(size) for size in args.history.split(",")])
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
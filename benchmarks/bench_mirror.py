@@ -0,0 +1,119 @@
+"""Benchmark per-turn user context reads through the local accounts mirror.
+
+The source backend is a SQLite store wrapped in a counter, standing in for
+the warehouse. The run reports how many reads reach the source per turn,
+how many rows an incremental refresh pulls, and the mirror read latency,
+and checks that a row committed after a refresh with an older
+``updated_at`` is still mirrored.
+
+Usage:
+    python benchmarks/bench_mirror.py [--users 5000] [--turns 20000] [--updates 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from finassist.utils.mirror import MirroredStorage  # noqa: E402
+from finassist.utils.storage import SQLiteStorage  # noqa: E402
+
+
+class CountingSource(SQLiteStorage):
+    def __init__(self):
+        super().__init__(":memory:")
+        self.user_reads = 0
+        self.rows_fetched = 0
+
+    def get_user_context(self, user_id):
+        self.user_reads += 1
+        return super().get_user_context(user_id)
+
+    def fetch_changes(self, table, since=None):
+        rows = super().fetch_changes(table, since)
+        self.rows_fetched += len(rows)
+        return rows
+
+
+def stamp(offset_seconds=0):
+    return (datetime(2025, 6, 1, tzinfo=timezone.utc) + timedelta(seconds=offset_seconds)).isoformat()
+
+
+def created(user, args):
+    """Seconds from the last signup to this user's, spread over the previous day."""
+    return -86400 + 86400 * user // args.users
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--accounts-per-user", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--updates", type=int, default=50)
+    args = parser.parse_args()
+
+    source = CountingSource()
+    source.insert_users([
+        {"user_id": f"user_{u:06d}", "full_name": f"User {u}", "preferred_currency": "MXN",
+         "language": "es", "timezone": "America/Mexico_City", "updated_at": stamp(created(u, args))}
+        for u in range(args.users)
+    ])
+    source.insert_accounts([
+        {"account_id": f"acc_{u:06d}_{a}", "user_id": f"user_{u:06d}", "account_name": f"Account {a}",
+         "account_type": "checking", "institution": "BBVA", "currency": "MXN", "balance": 0.0,
+         "updated_at": stamp(created(u, args))}
+        for u in range(args.users)
+        for a in range(args.accounts_per_user)
+    ])
+
+    storage = MirroredStorage(source)
+    start = time.perf_counter()
+    full = storage.refresh()
+    print(f"full sync: rows={full} time={(time.perf_counter() - start) * 1000:.1f}ms")
+
+    latencies = []
+    for _ in range(args.turns):
+        user_id = f"user_{random.randrange(args.users):06d}"
+        start = time.perf_counter()
+        storage.get_user_context(user_id)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(
+        f"turns={args.turns} source_reads={source.user_reads} "
+        f"p50={latencies[len(latencies) // 2] * 1e6:.0f}us "
+        f"p99={latencies[int(len(latencies) * 0.99)] * 1e6:.0f}us"
+    )
+
+    # The first refresh after the full sync also re-reads the lag window behind it, so time the second
+    for offset in (3600, 7200):
+        updated = [
+            {"account_id": f"acc_{u:06d}_0", "user_id": f"user_{u:06d}", "account_name": "Account 0",
+             "account_type": "checking", "institution": "BBVA", "currency": "MXN", "balance": 42.0,
+             "updated_at": stamp(offset)}
+            for u in random.sample(range(args.users), args.updates)
+        ]
+        source.upsert_rows("accounts", updated)
+        before = source.rows_fetched
+        start = time.perf_counter()
+        storage.refresh()
+    print(
+        f"incremental refresh: rows={source.rows_fetched - before} "
+        f"time={(time.perf_counter() - start) * 1000:.2f}ms"
+    )
+    assert storage.get_user_context(updated[0]["user_id"]).accounts[0].balance == 42.0
+
+    # Stamped before the watermark, committed after the refresh that set it
+    late = {**updated[0], "balance": 7.0, "updated_at": stamp(7200 - 10)}
+    source.upsert_rows("accounts", [late])
+    storage.refresh()
+    balance = {account.account_id: account.balance
+               for account in storage.get_user_context(late["user_id"]).accounts}[late["account_id"]]
+    print(f"late commit: mirrored balance={balance}")
+    assert balance == 7.0, "a row committed late with an older updated_at was not mirrored"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Measure TCP connection reuse of the model client against a local OpenAI-compatible server.
+
+A small keep-alive HTTP server answers ``/chat/completions`` after a fixed
+delay and counts the TCP connections it accepts. The same batch of model
+calls is sent through ADK's LiteLlm three ways:
+
+- fresh: a new HTTP client per call, i.e. a new connection (and, against a
+  real provider, a new TLS handshake) per agent hop;
+- default: LiteLlm as litellm builds it, without a client;
+- pooled: ``get_model`` with the shared per-provider pool and the per-agent
+  concurrency limit, followed by the pool metrics.
+
+With ``--stream`` the server answers in server-sent events and the calls
+stream. Stock LiteLlm streams with the synchronous litellm client, which
+holds the event loop for each whole answer, so its batch runs serially.
+
+Usage:
+    python benchmarks/bench_model_pool.py [--calls 200] [--concurrency 20] [--delay 0.02] [--stream]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+STREAM_TOKENS = ["Compound ", "interest ", "is ", "interest ", "on ", "interest."]
+COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+}
+
+
+class KeepAliveServer:
+    """HTTP/1.1 server that keeps connections open and counts how many were opened."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                headers = dict(
+                    line.split(": ", 1) for line in head.decode().split("\r\n")[1:] if ": " in line
+                )
+                length = int({key.lower(): value for key, value in headers.items()}.get("content-length", 0))
+                request = json.loads(await reader.readexactly(length) or b"{}")
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                if request.get("stream"):
+                    content_type, body = "text/event-stream", stream_body()
+                else:
+                    content_type, body = "application/json", json.dumps(COMPLETION).encode()
+                writer.write(
+                    f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n".encode()
+                    + f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def reset(self):
+        self.connections = 0
+        self.requests = 0
+
+
+def stream_body() -> bytes:
+    events = []
+    for index, token in enumerate(STREAM_TOKENS + [None]):
+        delta = {"role": "assistant", "content": token} if token else {}
+        choice = {"index": 0, "delta": delta, "finish_reason": None if token else "stop"}
+        events.append({"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0,
+                       "model": "gpt-4o-mini", "choices": [choice]})
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode() + b"data: [DONE]\n\n"
+
+
+def start_server_thread(server: KeepAliveServer) -> str:
+    """Serve on a separate thread and event loop, so a client that blocks its loop does not block the server."""
+    loop = asyncio.new_event_loop()
+    tcp_server = loop.run_until_complete(asyncio.start_server(server.handle, "127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://127.0.0.1:{tcp_server.sockets[0].getsockname()[1]}"
+
+
+def build_request():
+    from google.adk.models.llm_request import LlmRequest
+    from google.genai import types
+
+    return LlmRequest(
+        model="openai/gpt-4o-mini",
+        contents=[types.Content(role="user", parts=[types.Part(text="I spent 200 on groceries")])],
+        config=types.GenerateContentConfig(system_instruction="You are a bench agent."),
+    )
+
+
+async def call(model, stream: bool = False) -> float:
+    start = time.perf_counter()
+    text = ""
+    async for response in model.generate_content_async(build_request(), stream=stream):
+        if not response.partial and response.content and response.content.parts:
+            text = response.content.parts[0].text
+    if stream and text != "".join(STREAM_TOKENS):
+        raise AssertionError(f"streamed answer was {text!r}")
+    return time.perf_counter() - start
+
+
+async def run_batch(server, make_model, calls, concurrency, stream):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await call(make_model(), stream)
+
+    server.reset()
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one() for _ in range(calls))))
+    elapsed = time.perf_counter() - start
+    return {
+        "connections": server.connections,
+        "requests": server.requests,
+        "elapsed_s": round(elapsed, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+    }
+
+
+async def main_async(args, server: KeepAliveServer, base_url: str):
+    import httpx
+    from google.adk.models.lite_llm import LiteLlm
+    from openai import AsyncOpenAI
+
+    from finassist.utils.async_lite_llm import AsyncStreamingLiteLlm
+    from finassist.utils.models import get_model, model_pool_stats
+
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_BASE"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    os.environ["BENCH_AGENT_MODEL"] = "openai/gpt-4o-mini"
+
+    def fresh_model():
+        client = AsyncOpenAI(base_url=base_url, http_client=httpx.AsyncClient())
+        return AsyncStreamingLiteLlm(model="openai/gpt-4o-mini", client=client)
+
+    default_model = LiteLlm(model="openai/gpt-4o-mini", api_base=base_url)
+    pooled_model = get_model("BENCH_AGENT_MODEL", "bench_agent")
+
+    # Warm-up so import and client construction costs stay out of the timings
+    await call(default_model, args.stream)
+    await call(pooled_model, args.stream)
+    results = {
+        "fresh": await run_batch(server, fresh_model, args.calls, args.concurrency, args.stream),
+        "default": await run_batch(server, lambda: default_model, args.calls, args.concurrency, args.stream),
+        "pooled": await run_batch(server, lambda: pooled_model, args.calls, args.concurrency, args.stream),
+    }
+
+    print(f"calls={args.calls} concurrency={args.concurrency} server_delay={args.delay * 1000:.0f}ms stream={args.stream}")
+    print(f"{'client':<8} {'connections':>11} {'requests':>8} {'elapsed':>8} {'p50':>8} {'p95':>8}")
+    for name, result in results.items():
+        print(f"{name:<8} {result['connections']:>11} {result['requests']:>8} {result['elapsed_s']:>7}s "
+              f"{result['p50_ms']:>6}ms {result['p95_ms']:>6}ms")
+    print(json.dumps(model_pool_stats(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.02, help="Server latency per call, in seconds.")
+    parser.add_argument("--stream", action="store_true", help="Stream the answers as server-sent events.")
+    args = parser.parse_args()
+    server = KeepAliveServer(args.delay)
+    asyncio.run(main_async(args, server, start_server_thread(server)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Report the prompt tokens each agent sends per turn and guard them against regressions.
+
+For every agent and prompt variant, the instruction of a typical turn is
+assembled the way the agents do it (static prompt plus the per-user
+segments) and counted with tiktoken. Two different users are rendered to
+check that their instructions share the whole static prompt as a prefix,
+which is what provider-side prompt caching needs.
+
+With --check, the per-turn totals are compared against
+benchmarks/data/prompt_tokens_baseline.json and the script exits with an
+error if any of them grew by more than --tolerance. --update rewrites the
+baseline.
+
+Usage:
+    python benchmarks/bench_prompts.py [--check] [--update] [--tolerance 0.05]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for var in ("MAIN_AGENT_MODEL", "DATABASE_MANAGER_MODEL", "TRANSACTION_AGENT_MODEL",
+            "ACCOUNT_AGENT_MODEL", "QUESTION_AGENT_MODEL", "ANALYTICS_AGENT_MODEL",
+            "BUDGET_AGENT_MODEL"):
+    os.environ.setdefault(var, "openai/stub")
+
+from finassist.subagents.data_manager.transaction.agent import format_transaction_draft  # noqa: E402
+from finassist.utils.budgets import format_budget_status  # noqa: E402
+from finassist.utils.prompt_builder import PROMPT_VARIANTS, agent_prompts, build_instruction, count_tokens  # noqa: E402
+from finassist.utils.storage import Account, UserContext, format_user_context  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(__file__), "data", "prompt_tokens_baseline.json")
+
+
+def sample_user_context(user_id: str) -> str:
+    user_context = UserContext(
+        user_id=user_id,
+        full_name="Test User",
+        preferred_currency="MXN",
+        language="en",
+        timezone="America/Mexico_City",
+        accounts=[
+            Account(f"{user_id}_acc_{index}", name, account_type, institution, "MXN", balance)
+            for index, (name, account_type, institution, balance) in enumerate([
+                ("BBVA Azul", "credit_card", "BBVA", -3200.0),
+                ("Amex Gold", "credit_card", "American Express", -800.0),
+                ("Santander Nómina", "checking", "Santander", 15400.0),
+                ("Nu Cajita", "savings", "Nu", 42000.0),
+                ("Wallet", "cash", None, 900.0),
+            ])
+        ],
+    )
+    return format_user_context(user_context)
+
+
+def sample_budget_status() -> str:
+    return format_budget_status([
+        {"category": category, "period": period, "period_start": start, "spent": spent, "amount": amount,
+         "currency": "MXN", "used": round(spent / amount * 100)}
+        for category, period, start, spent, amount in [
+            ("Food", "monthly", "2025-06-01", 3120.5, 4000.0),
+            ("Restaurants", "weekly", "2025-06-09", 250.0, 600.0),
+            ("All", "monthly", "2025-06-01", 11840.0, 15000.0),
+        ]
+    ])
+
+
+def dynamic_segments(agent_name: str, user_id: str) -> list:
+    if agent_name == "transaction_agent":
+        draft = {
+            "fields": {"amount": 250.0, "currency": "MXN", "transaction_date": "2025-06-09", "transaction_type": "expense"},
+            "account_candidates": [f"{user_id}_acc_0", f"{user_id}_acc_1"],
+            "missing": ["account_id"],
+        }
+        return [
+            ("USER_CONTEXT", sample_user_context(user_id)),
+            ("PRE_EXTRACTED_TRANSACTION", format_transaction_draft(draft)),
+            ("BUDGET_STATUS", sample_budget_status()),
+        ]
+    if agent_name == "budget_agent":
+        return [("USER_CONTEXT", sample_user_context(user_id)), ("BUDGET_STATUS", sample_budget_status())]
+    if agent_name == "account_agent":
+        return [("USER_CONTEXT", f"user_id = {user_id}")]
+    return []
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    return len(os.path.commonprefix([a, b]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="Fail if a per-turn total exceeds the baseline.")
+    parser.add_argument("--update", action="store_true", help="Write the current totals as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    totals = {}
+    print(f"{'agent':<20} {'variant':<8} {'static':>7} {'dynamic':>8} {'per_turn':>9} {'cacheable':>10}")
+    for agent_name, variants in agent_prompts().items():
+        for variant in PROMPT_VARIANTS:
+            static = variants[variant]
+            first = build_instruction(static, dynamic_segments(agent_name, "user_001"))
+            second = build_instruction(static, dynamic_segments(agent_name, "user_002"))
+            static_tokens = count_tokens(static)
+            per_turn = count_tokens(first)
+            cacheable = common_prefix_length(first, second) >= len(static)
+            totals[f"{agent_name}/{variant}"] = per_turn
+            print(
+                f"{agent_name:<20} {variant:<8} {static_tokens:>7} {per_turn - static_tokens:>8} "
+                f"{per_turn:>9} {'yes' if cacheable else 'NO':>10}"
+            )
+
+    if args.update:
+        with open(BASELINE, "w") as f:
+            json.dump(totals, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {BASELINE}")
+
+    if args.check:
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{key}: {tokens} tokens (baseline {baseline[key]})"
+            for key, tokens in totals.items()
+            if key in baseline and tokens > baseline[key] * (1 + args.tolerance)
+        ]
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("prompt tokens within baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Measure the question_agent response cache: match quality, hit rate and latency.
+
+1. Match quality: each labeled pair in benchmarks/data/question_pairs.jsonl
+   caches the first question and looks up the second. Pairs marked
+   ``same`` should hit, the others (near misses such as "Roth IRA" vs
+   "traditional IRA") must not.
+2. Traffic replay: sessions of English and Spanish users ask questions drawn
+   from a Zipf distribution over the paraphrase groups of the labeled pairs,
+   through an ADK Runner and a stub model with a fixed latency. The replay
+   reports the model calls made, the hit rate, the turn latency of hits and
+   misses, and checks that no answer crossed languages.
+
+Usage:
+    python benchmarks/bench_response_cache.py [--turns 2000] [--users 50] [--model-latency 0.05]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("QUESTION_AGENT_MODEL", "openai/stub")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.adk.runners import Runner  # noqa: E402
+from google.adk.sessions import InMemorySessionService  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from finassist.subagents.question.agent import create_question_agent  # noqa: E402
+from finassist.utils.response_cache import ResponseCache, get_response_cache  # noqa: E402
+from finassist.utils.storage import get_storage  # noqa: E402
+
+PAIRS_PATH = os.path.join(os.path.dirname(__file__), "data", "question_pairs.jsonl")
+TIMESTAMP = "2025-01-01T00:00:00"
+
+
+class StubModel(BaseLlm):
+    """Answers after a fixed delay, tagging the answer with the language and question asked."""
+
+    model: str = "stub"
+    latency: float = 0.05
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        question = llm_request.contents[-1].parts[0].text
+        language = "es" if "[es]" in question else "en"
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"[{language}] answer to: {question}")]))
+
+
+def load_pairs():
+    with open(PAIRS_PATH, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def match_quality(pairs, threshold):
+    tp = fp = fn = tn = 0
+    for pair in pairs:
+        cache = ResponseCache(maxsize=8, threshold=threshold)
+        cache.store(cache.lookup(pair["cached"], "en"), "answer")
+        hit = cache.lookup(pair["query"], "en").answer is not None
+        tp += hit and pair["same"]
+        fp += hit and not pair["same"]
+        fn += not hit and pair["same"]
+        tn += not hit and not pair["same"]
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return precision, recall, fp
+
+
+def paraphrase_groups(pairs):
+    """Group the labeled questions into sets that should share one cached answer."""
+    groups = defaultdict(set)
+    for pair in pairs:
+        groups[pair["cached"]].add(pair["cached"])
+        if pair["same"]:
+            groups[pair["cached"]].add(pair["query"])
+        else:
+            groups[pair["query"]].add(pair["query"])
+    return [sorted(group) for group in groups.values()]
+
+
+def seed_users(n_users):
+    user_ids = [f"user_{index:04d}" for index in range(n_users)]
+    get_storage().insert_users([
+        {"user_id": user_id, "full_name": user_id, "preferred_currency": "MXN",
+         "language": "es-MX" if index % 2 else "en", "timezone": "America/Mexico_City",
+         "created_at": TIMESTAMP, "updated_at": TIMESTAMP}
+        for index, user_id in enumerate(user_ids)
+    ])
+    return user_ids
+
+
+async def replay(args, groups):
+    random.seed(args.seed)
+    user_ids = seed_users(args.users)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(groups))]
+    model = StubModel(latency=args.model_latency)
+    session_service = InMemorySessionService()
+    runner = Runner(agent=create_question_agent(model=model), app_name="bench", session_service=session_service)
+    sessions = {user_id: await session_service.create_session(app_name="bench", user_id=user_id) for user_id in user_ids}
+    latencies = {"hit": [], "miss": []}
+    wrong_language = 0
+
+    for _ in range(args.turns):
+        user_id = random.choice(user_ids)
+        language = "es" if int(user_id.split("_")[1]) % 2 else "en"
+        question = random.choice(random.choices(groups, weights)[0])
+        calls_before = model.calls
+        start = time.perf_counter()
+        answer = ""
+        message = types.Content(role="user", parts=[types.Part(text=f"[{language}] {question}")])
+        async for event in runner.run_async(user_id=user_id, session_id=sessions[user_id].id, new_message=message):
+            if event.content and event.content.parts and event.content.parts[0].text:
+                answer = event.content.parts[0].text
+        latencies["miss" if model.calls > calls_before else "hit"].append(time.perf_counter() - start)
+        wrong_language += not answer.startswith(f"[{language}]")
+    return model, latencies, wrong_language
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Skew of the question popularity.")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="Seconds the stub model takes per answer.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    pairs = load_pairs()
+    print("threshold  precision  recall  false_hits")
+    for threshold in (0.7, 0.8, 0.9, 0.95):
+        precision, recall, false_hits = match_quality(pairs, threshold)
+        print(f"{threshold:>9}  {precision:>9.0%}  {recall:>6.0%}  {false_hits:>10}")
+
+    groups = paraphrase_groups(pairs)
+    model, latencies, wrong_language = asyncio.run(replay(args, groups))
+    stats = get_response_cache().stats()
+    print(f"\nturns={args.turns} question_groups={len(groups)} model_calls={model.calls} "
+          f"hit_rate={stats['hit_rate']:.0%} (exact={stats['exact']} semantic={stats['semantic']} "
+          f"miss={stats['miss']} bypass={stats['bypass']}) wrong_language={wrong_language}")
+    for kind, values in latencies.items():
+        values.sort()
+        if values:
+            print(f"{kind:<5} turns={len(values):<5} p50={values[len(values) // 2] * 1000:.2f}ms "
+                  f"p95={values[int(len(values) * 0.95)] * 1000:.2f}ms")
+    print(f"cache lookup avg={stats['lookup_avg_ms']}ms p95={stats['lookup_p95_ms']}ms entries={stats['entries']}")
+    sys.exit(1 if wrong_language else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Evaluate the fast-path intent router on a labeled message set.
+
+Without the router, every message costs one LLM routing call at root_agent,
+plus a second one at database_manager for transaction and account requests.
+Messages routed locally skip those calls, while low-confidence ones still
+pay them.
+
+Usage:
+    python benchmarks/bench_router.py [--labels benchmarks/data/routing_labels.jsonl] [--threshold 0.85]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from finassist.utils.router import ANALYTICS_AGENT, QUESTION_AGENT, IntentRouter  # noqa: E402
+
+ROUTING_CALLS = {QUESTION_AGENT: 1, ANALYTICS_AGENT: 1}  # transaction, account and budget requests take two hops
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", default=os.path.join(os.path.dirname(__file__), "data", "routing_labels.jsonl"))
+    parser.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args()
+
+    with open(args.labels) as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+
+    router = IntentRouter() if args.threshold is None else IntentRouter(threshold=args.threshold)
+    correct = routed = calls_saved = 0
+    errors = Counter()
+    start = time.perf_counter()
+    for item in labeled:
+        route = router.route(item["message"])
+        if route is None:
+            continue
+        routed += 1
+        if route == item["route"]:
+            correct += 1
+            calls_saved += ROUTING_CALLS.get(item["route"], 2)
+        else:
+            # A wrong fast route still skipped the routing calls, but costs a bounce back
+            errors[(item["route"], route)] += 1
+            print(f"misrouted: {item['message']!r} -> {route} (expected {item['route']})")
+    elapsed = time.perf_counter() - start
+
+    total = len(labeled)
+    baseline_calls = sum(ROUTING_CALLS.get(item["route"], 2) for item in labeled)
+    print(f"messages={total} routed_locally={routed} ({routed / total:.0%}) fallbacks={total - routed}")
+    print(f"accuracy_on_routed={correct / routed if routed else 0:.1%} misroutes={sum(errors.values())}")
+    print(
+        f"llm_routing_calls_per_1000: baseline={baseline_calls / total * 1000:.0f} "
+        f"saved={calls_saved / total * 1000:.0f}"
+    )
+    print(f"classify_latency={elapsed / total * 1e6:.0f}us/message")
+
+
+if __name__ == "__main__":
+    main()
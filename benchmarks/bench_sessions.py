@@ -0,0 +1,181 @@
+"""Measure per-turn history size and session cost as conversations grow, with and without compaction.
+
+A ``--turns``-turn conversation with the transaction agent is replayed
+through three session services: ADK's InMemorySessionService, which keeps
+every event, and the compacting MemorySessionService and SQLiteSessionService
+of ``finassist.utils.sessions``. A stub model answers every message with a
+clarifying question of about 60 tokens and records the history tokens of
+each request (tiktoken over the request contents). The script reports the
+history size at a few turns and the session service's share of a turn
+(``get_session`` plus ``append_event``) on the median turn and on the
+last one, and checks that:
+
+- with compaction, the history of the last turn stays within
+  SESSION_HISTORY_TOKENS plus SESSION_SUMMARY_TOKENS;
+- the SQLite sessions survive a restart: a new service on the same file
+  gets the user_id, the transaction draft and the last events back, and
+  seeds the user context cache from the stored snapshot, and lists and
+  deletes it.
+
+Usage:
+    python benchmarks/bench_sessions.py [--turns 60]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("TRANSACTION_AGENT_MODEL", "openai/stub")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.adk.sessions import InMemorySessionService  # noqa: E402
+from google.genai import types  # noqa: E402
+from pydantic import Field  # noqa: E402
+
+from finassist.agent import create_runner  # noqa: E402
+from finassist.subagents.data_manager.transaction.agent import TRANSACTION_DRAFT_KEY, create_transaction_manager  # noqa: E402
+from finassist.utils import sessions  # noqa: E402
+from finassist.utils.prompt_builder import count_tokens  # noqa: E402
+from finassist.utils.storage import get_storage, user_context_cache  # noqa: E402
+from finassist.utils.utils import USER_ID_STATE_KEY  # noqa: E402
+
+TIMESTAMP = "2025-01-01T00:00:00"
+USER_ID = "user_sessions"
+REPLY = ("I have the amount and the account. Before I record it, could you tell me the exact date of the purchase, "
+         "the store where you paid and whether it was an expense or a refund? I will categorize it automatically.")
+REPORTED_TURNS = (1, 5, 10, 20, 40)
+
+
+class CountingModel(BaseLlm):
+    """Answers every message with the same question and records the history tokens of each request."""
+
+    model: str = "stub"
+    history_tokens: list = Field(default_factory=list)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        history = "\n".join(
+            part.text or str(part.function_call or part.function_response or "")
+            for content in llm_request.contents
+            for part in content.parts or []
+        )
+        self.history_tokens.append(count_tokens(history))
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=REPLY)]))
+
+
+def time_calls(service):
+    """Time the ``get_session`` and ``append_event`` calls of a session service; returns the running total."""
+    elapsed = [0.0]
+    for name in ("get_session", "append_event"):
+        method = getattr(service, name)
+
+        async def timed(*args, method=method, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                elapsed[0] += time.perf_counter() - start
+        setattr(service, name, timed)
+    return elapsed
+
+
+def seed_user():
+    storage = get_storage()
+    storage.insert_users([{"user_id": USER_ID, "full_name": "Sessions User", "preferred_currency": "MXN",
+                           "language": "en", "timezone": "America/Mexico_City",
+                           "created_at": TIMESTAMP, "updated_at": TIMESTAMP}])
+    storage.insert_accounts([{"account_id": "acc_sessions", "user_id": USER_ID, "account_name": "BBVA debit",
+                              "account_type": "checking", "institution": "BBVA", "balance": 0.0, "currency": "MXN",
+                              "created_at": TIMESTAMP, "updated_at": TIMESTAMP}])
+
+
+def message(turn):
+    return f"I spent {100 + turn} pesos with my BBVA debit card, turn {turn} of a long conversation"
+
+
+async def run_turn(runner, session_id, text):
+    content = types.Content(role="user", parts=[types.Part(text=text)])
+    async for _ in runner.run_async(user_id=USER_ID, session_id=session_id, new_message=content):
+        pass
+
+
+async def replay(service, turns):
+    model = CountingModel()
+    runner = create_runner(create_transaction_manager(model=model), app_name="bench", session_service=service)
+    session = await service.create_session(app_name="bench", user_id=USER_ID)
+    elapsed = time_calls(service)
+    per_turn = []
+    for turn in range(1, turns + 1):
+        before = elapsed[0]
+        await run_turn(runner, session.id, message(turn))
+        per_turn.append(elapsed[0] - before)
+    return model.history_tokens, per_turn, session.id
+
+
+async def check_restart(path, session_id, turns, errors):
+    """Reopen the SQLite sessions as a new process would and continue the conversation."""
+    before = await sessions.SQLiteSessionService(path).get_session(
+        app_name="bench", user_id=USER_ID, session_id=session_id)
+    user_context_cache.clear()
+    service = sessions.SQLiteSessionService(path)
+    session = await service.get_session(app_name="bench", user_id=USER_ID, session_id=session_id)
+    seeded = USER_ID in user_context_cache
+    draft = session.state.get(TRANSACTION_DRAFT_KEY) or {}
+    print(f"restart: events={len(session.events)} user_id={session.state.get(USER_ID_STATE_KEY)} "
+          f"draft_amount={draft.get('fields', {}).get('amount')} user_context_seeded={seeded}")
+    if session.state.get(USER_ID_STATE_KEY) != USER_ID:
+        errors.append("restart: the user_id was not stored")
+    if draft.get("fields", {}).get("amount") != 100 + turns:
+        errors.append(f"restart: the draft was not stored: {draft}")
+    if [event.id for event in session.events] != [event.id for event in before.events]:
+        errors.append("restart: the events differ")
+    if not seeded:
+        errors.append("restart: the user context cache was not seeded")
+    model = CountingModel()
+    runner = create_runner(create_transaction_manager(model=model), app_name="bench", session_service=service)
+    await run_turn(runner, session_id, "It was yesterday at Walmart")
+    if not model.history_tokens:
+        errors.append("restart: the conversation could not continue")
+    listed = await service.list_sessions(app_name="bench", user_id=USER_ID)
+    await service.delete_session(app_name="bench", user_id=USER_ID, session_id=session_id)
+    deleted = await service.get_session(app_name="bench", user_id=USER_ID, session_id=session_id) is None
+    print(f"restart: listed={session_id in [session.id for session in listed.sessions]} deleted={deleted}")
+    if session_id not in [session.id for session in listed.sessions] or not deleted:
+        errors.append("restart: the session was not listed or not deleted")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=60)
+    args = parser.parse_args()
+
+    errors = []
+    seed_user()
+    limit = sessions.SESSION_HISTORY_TOKENS + sessions.SESSION_SUMMARY_TOKENS
+    print(f"history budget={sessions.SESSION_HISTORY_TOKENS} summary budget={sessions.SESSION_SUMMARY_TOKENS}")
+    header = " ".join(f"{'turn ' + str(turn):>9}" for turn in REPORTED_TURNS + (args.turns,))
+    print(f"{'service':<12} {header} {'session p50':>12} {'last':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        services = (("adk memory", InMemorySessionService()), ("memory", sessions.MemorySessionService()),
+                    ("sqlite", sessions.SQLiteSessionService(path)))
+        for name, service in services:
+            history, per_turn, session_id = asyncio.run(replay(service, args.turns))
+            columns = " ".join(f"{history[turn - 1]:>9}" for turn in REPORTED_TURNS + (args.turns,) if turn <= len(history))
+            print(f"{name:<12} {columns} {sorted(per_turn)[len(per_turn) // 2] * 1e3:>10.2f}ms "
+                  f"{per_turn[-1] * 1e3:>6.2f}ms")
+            if name != "adk memory" and history[-1] > limit:
+                errors.append(f"{name}: {history[-1]} history tokens on the last turn, over {limit}")
+        asyncio.run(check_restart(path, session_id, args.turns, errors))
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark per-turn user context reads on the embedded SQLite backend.
+
+Seeds a database with users and accounts, then measures the latency of the
+point lookup every transaction turn performs.
+
+Usage:
+    python benchmarks/bench_storage.py [--users 10000] [--accounts-per-user 5] [--lookups 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from finassist.utils.storage import SQLiteStorage  # noqa: E402
+
+
+def seed(storage, users, accounts_per_user):
+    storage.insert_users([
+        {
+            "user_id": f"user_{u:06d}",
+            "full_name": f"User {u}",
+            "preferred_currency": "MXN",
+            "language": "es",
+            "timezone": "America/Mexico_City",
+        }
+        for u in range(users)
+    ])
+    storage.insert_accounts([
+        {
+            "account_id": f"acc_{u:06d}_{a}",
+            "user_id": f"user_{u:06d}",
+            "account_name": f"Account {a}",
+            "account_type": "checking",
+            "institution": "BBVA",
+            "currency": "MXN",
+            "balance": 100.0 * a,
+        }
+        for u in range(users)
+        for a in range(accounts_per_user)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--accounts-per-user", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--path", default=":memory:")
+    args = parser.parse_args()
+
+    storage = SQLiteStorage(args.path)
+    seed(storage, args.users, args.accounts_per_user)
+
+    user_ids = [f"user_{random.randrange(args.users):06d}" for _ in range(args.lookups)]
+    latencies = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        context = storage.get_user_context(user_id)
+        latencies.append(time.perf_counter() - start)
+        assert len(context.accounts) == args.accounts_per_user
+
+    latencies.sort()
+    print(
+        f"lookups={args.lookups} "
+        f"p50={latencies[len(latencies) // 2] * 1e6:.0f}us "
+        f"p99={latencies[int(len(latencies) * 0.99)] * 1e6:.0f}us "
+        f"max={latencies[-1] * 1e6:.0f}us"
+    )
+
+
+if __name__ == "__main__":
+    main()
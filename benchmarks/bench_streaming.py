@@ -0,0 +1,173 @@
+"""Measure time-to-first-token against total latency, buffered vs streamed.
+
+A stub model plays every agent on a schedule: the root agent "thinks" for
+``--routing-delay`` seconds, streams a short routing remark and then
+transfers to question_agent, which waits ``--first-token`` seconds and
+emits ``--tokens`` tokens ``--interval`` seconds apart. Each turn is run
+three ways:
+
+- buffered: ``Runner.run_async`` as before, the reply arrives in one piece;
+- streamed: ``stream_reply``, leaf tokens are forwarded as they arrive;
+- cached: the same question again, answered from the response cache;
+- revised: streamed, but the model's final text differs from its tokens.
+
+The script checks that the streamed text equals the full answer (for
+revised turns, once the replacement chunk is applied) and that no routing
+text or routing agent output reached the caller.
+
+Usage:
+    python benchmarks/bench_streaming.py [--turns 5] [--tokens 120] [--interval 0.01]
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for var in ("MAIN_AGENT_MODEL", "DATABASE_MANAGER_MODEL", "TRANSACTION_AGENT_MODEL",
+            "ACCOUNT_AGENT_MODEL", "QUESTION_AGENT_MODEL", "ANALYTICS_AGENT_MODEL",
+            "BUDGET_AGENT_MODEL"):
+    os.environ.setdefault(var, "openai/stub")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.adk.runners import Runner  # noqa: E402
+from google.adk.sessions import InMemorySessionService  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from finassist.agent import create_root_agent  # noqa: E402
+from finassist.utils.streaming import stream_reply  # noqa: E402
+
+ROUTING_REMARK = "Routing you to the question agent."
+
+
+class ScheduledModel(BaseLlm):
+    """Stub model that emits its tokens on a fixed schedule."""
+
+    model: str = "stub"
+    routing_delay: float = 0.3
+    first_token: float = 0.2
+    tokens: int = 120
+    interval: float = 0.01
+
+    def answer_tokens(self, question: str) -> list:
+        return [f"tok{index} " for index in range(self.tokens - 1)] + [f"({question})"]
+
+    def answer_text(self, question: str) -> str:
+        """The final text, which rewrites the streamed tokens for "revised" questions."""
+        text = "".join(self.answer_tokens(question))
+        return f"Revised: {text}" if "revised" in question else text
+
+    async def generate_content_async(self, llm_request, stream=False):
+        system = str(llm_request.config.system_instruction or "")
+        agent_name = re.search(r'Your internal name is "(\w+)"', system).group(1)
+        if agent_name == "root_agent":
+            await asyncio.sleep(self.routing_delay)
+            if stream:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=ROUTING_REMARK)]), partial=True)
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=ROUTING_REMARK)]))
+            transfer = types.FunctionCall(name="transfer_to_agent", args={"agent_name": "question_agent"})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=transfer)]))
+            return
+
+        # After a transfer the latest contents are "For context:" notes about the routing
+        question = [
+            part.text for content in llm_request.contents if content.role == "user"
+            for part in content.parts or [] if part.text and not part.text.startswith(("For context:", "["))
+        ][-1]
+        tokens = self.answer_tokens(question)
+        await asyncio.sleep(self.first_token)
+        if stream:
+            for index, token in enumerate(tokens):
+                if index:
+                    await asyncio.sleep(self.interval)
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=token)]), partial=True)
+        else:
+            await asyncio.sleep(self.interval * (len(tokens) - 1))
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=self.answer_text(question))]))
+
+
+async def run_buffered(runner, session, message):
+    start = time.perf_counter()
+    first = None
+    text = ""
+    async for event in runner.run_async(user_id=session.user_id, session_id=session.id, new_message=message):
+        parts = event.content.parts if event.content and event.content.parts else []
+        if event.author == "question_agent" and any(part.text for part in parts):
+            first = first or time.perf_counter() - start
+            text += "".join(part.text for part in parts if part.text)
+    return first, time.perf_counter() - start, text, []
+
+
+async def run_streamed(runner, session, message):
+    start = time.perf_counter()
+    first = None
+    chunks = []
+    text = ""
+    async for chunk in stream_reply(runner, session.user_id, session.id, message):
+        if chunk.text:
+            first = first or time.perf_counter() - start
+        chunks.append(chunk)
+        text = chunk.text if chunk.replace else text + chunk.text
+    return first, time.perf_counter() - start, text, chunks
+
+
+async def main_async(args):
+    model = ScheduledModel(
+        routing_delay=args.routing_delay, first_token=args.first_token, tokens=args.tokens, interval=args.interval,
+    )
+    session_service = InMemorySessionService()
+    runner = Runner(
+        agent=create_root_agent("flat", model=model, fast_routing=False), app_name="bench", session_service=session_service,
+    )
+    results = {"buffered": [], "streamed": [], "cached": [], "revised": []}
+    errors = []
+
+    for turn in range(args.turns):
+        for mode in results:
+            session = await session_service.create_session(app_name="bench", user_id=f"user_{turn:03d}_{mode}")
+            question = f"What is compound interest, case {turn} {'streamed' if mode == 'cached' else mode}?"
+            message = types.Content(role="user", parts=[types.Part(text=question)])
+            run = run_buffered if mode == "buffered" else run_streamed
+            first, total, text, chunks = await run(runner, session, message)
+            results[mode].append((first, total))
+
+            expected = model.answer_text(question)
+            if mode != "cached" and text != expected:
+                errors.append(f"{mode} turn {turn}: reply does not match the model answer")
+            if mode == "revised" and not chunks[-1].replace:
+                errors.append(f"revised turn {turn}: final chunk does not replace the streamed text")
+            if mode == "cached" and not text.endswith(f"(What is compound interest, case {turn} streamed?)"):
+                errors.append(f"cached turn {turn}: not served from the cache")
+            if ROUTING_REMARK in text or any(chunk.author != "question_agent" for chunk in chunks):
+                errors.append(f"{mode} turn {turn}: routing output reached the caller")
+
+    print(f"schedule: routing={args.routing_delay}s first_token={args.first_token}s "
+          f"tokens={args.tokens} interval={args.interval * 1000:.0f}ms")
+    print(f"{'mode':<9} {'ttft_p50':>9} {'total_p50':>10}")
+    for mode, values in results.items():
+        print(f"{mode:<9} {statistics.median(v[0] for v in values) * 1000:>7.0f}ms "
+              f"{statistics.median(v[1] for v in values) * 1000:>8.0f}ms")
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--routing-delay", type=float, default=0.3)
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--interval", type=float, default=0.01)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
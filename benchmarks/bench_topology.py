@@ -0,0 +1,129 @@
+"""Compare the hierarchical and flat agent topologies on recorded conversations.
+
+Each conversation in benchmarks/data/conversations.jsonl is replayed through
+both topologies with a stub model in place of every LlmAgent's model. Router
+agents answer with the transfer that leads to the recorded route, and leaf
+agents answer with a short text. The stub counts calls and prompt tokens
+(system instruction plus history, via tiktoken), and charges a simulated
+latency per call so the two topologies can be compared without a provider.
+The question_agent response cache is off by default, and cleared before
+each replay when enabled, so neither topology answers from the other's
+cached replies.
+
+Usage:
+    python benchmarks/bench_topology.py [--call-latency 0.4] [--token-latency 0.00002] [--fast-routing]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for var in ("MAIN_AGENT_MODEL", "DATABASE_MANAGER_MODEL", "TRANSACTION_AGENT_MODEL",
+            "ACCOUNT_AGENT_MODEL", "QUESTION_AGENT_MODEL", "ANALYTICS_AGENT_MODEL",
+            "BUDGET_AGENT_MODEL"):
+    os.environ.setdefault(var, "openai/stub")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+
+import tiktoken  # noqa: E402
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.adk.runners import Runner  # noqa: E402
+from google.adk.sessions import InMemorySessionService  # noqa: E402
+from google.genai import types  # noqa: E402
+from pydantic import Field  # noqa: E402
+
+from finassist.agent import create_root_agent  # noqa: E402
+from finassist.utils.response_cache import get_response_cache  # noqa: E402
+
+ROUTER_AGENTS = ("root_agent", "database_manager")
+ENCODING = tiktoken.get_encoding("cl100k_base")
+
+
+class StubModel(BaseLlm):
+    """Scripted model that routes to ``route`` and records every call it serves."""
+
+    model: str = "stub"
+    route: str = ""
+    calls: list = Field(default_factory=list)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        system = str(llm_request.config.system_instruction or "")
+        agent_name = re.search(r'Your internal name is "(\w+)"', system).group(1)
+        history = " ".join(
+            part.text or json.dumps(part.function_call.args if part.function_call else {})
+            for content in llm_request.contents
+            for part in content.parts or []
+        )
+        self.calls.append((agent_name, len(ENCODING.encode(system + history))))
+
+        last = llm_request.contents[-1] if llm_request.contents else None
+        is_user_turn = last is not None and last.role == "user" and any(p.text for p in last.parts or [])
+        if agent_name in ROUTER_AGENTS and is_user_turn:
+            target = self.route if f"Agent name: {self.route}" in system else "database_manager"
+            part = types.Part(function_call=types.FunctionCall(name="transfer_to_agent", args={"agent_name": target}))
+        else:
+            part = types.Part(text="Noted. Could you confirm the details?")
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+async def replay(routing_mode, conversations, fast_routing):
+    get_response_cache().clear()
+    model = StubModel()
+    session_service = InMemorySessionService()
+    runner = Runner(
+        agent=create_root_agent(routing_mode, model=model, fast_routing=fast_routing),
+        app_name="bench",
+        session_service=session_service,
+    )
+    for conversation in conversations:
+        model.route = conversation["route"]
+        session = await session_service.create_session(app_name="bench", user_id="user_001")
+        for turn in conversation["turns"]:
+            message = types.Content(role="user", parts=[types.Part(text=turn)])
+            async for _ in runner.run_async(user_id="user_001", session_id=session.id, new_message=message):
+                pass
+    return model.calls
+
+
+def report(routing_mode, calls, conversations, call_latency, token_latency):
+    per_agent = defaultdict(lambda: [0, 0])
+    for agent_name, tokens in calls:
+        per_agent[agent_name][0] += 1
+        per_agent[agent_name][1] += tokens
+    routing_calls = sum(per_agent[name][0] for name in ROUTER_AGENTS)
+    prompt_tokens = sum(tokens for _, tokens in calls)
+    latency = sum(call_latency + tokens * token_latency for _, tokens in calls)
+    n = len(conversations)
+    print(
+        f"{routing_mode:<13} llm_calls={len(calls):<4} routing_calls={routing_calls:<4} "
+        f"prompt_tokens={prompt_tokens:<7} tokens/conv={prompt_tokens / n:>7.0f} "
+        f"sim_latency/conv={latency / n:.2f}s"
+    )
+    for agent_name, (count, tokens) in sorted(per_agent.items()):
+        print(f"    {agent_name:<18} calls={count:<4} prompt_tokens={tokens}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", default=os.path.join(os.path.dirname(__file__), "data", "conversations.jsonl"))
+    parser.add_argument("--call-latency", type=float, default=0.4, help="Simulated seconds per model call.")
+    parser.add_argument("--token-latency", type=float, default=0.00002, help="Simulated seconds per prompt token.")
+    parser.add_argument("--fast-routing", action="store_true", help="Keep the local intent router enabled.")
+    args = parser.parse_args()
+
+    with open(args.conversations) as f:
+        conversations = [json.loads(line) for line in f if line.strip()]
+
+    for routing_mode in ("hierarchical", "flat"):
+        calls = asyncio.run(replay(routing_mode, conversations, args.fast_routing))
+        report(routing_mode, calls, conversations, args.call_latency, args.token_latency)
+
+
+if __name__ == "__main__":
+    main()
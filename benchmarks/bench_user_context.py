@@ -0,0 +1,150 @@
+"""Benchmark user context loading against a local stand-in BigQuery client.
+
+Compares the legacy two-job lookup (users, then accounts) with the single-job
+loader in ``finassist.utils.database``. The stand-in client sleeps for a fixed
+per-job latency, so the wall time is dominated by the number of query jobs.
+
+Usage:
+    python benchmarks/bench_user_context.py [--latency 0.05] [--iterations 20]
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("BQ_PROJECT_ID", "bench-project")
+os.environ.setdefault("BQ_DATASET_ID", "bench_dataset")
+
+from google.cloud import bigquery  # noqa: E402
+
+from finassist.utils import database  # noqa: E402
+from finassist.utils.storage import Account, UserContext, format_user_context  # noqa: E402
+
+USERS = {
+    "user_001": {
+        "user_id": "user_001",
+        "full_name": "Ada Lovelace",
+        "preferred_currency": "MXN",
+        "language": "es",
+        "timezone": "America/Mexico_City",
+    },
+}
+
+ACCOUNTS = [
+    {
+        "account_id": f"acc_{i:03d}",
+        "user_id": "user_001",
+        "account_name": f"Account {i}",
+        "account_type": "credit_card" if i % 2 else "checking",
+        "institution": "BBVA",
+        "currency": "MXN",
+        "balance": 1000.0 + i,
+    }
+    for i in range(12)
+]
+
+
+class FakeJob:
+    def __init__(self, rows, latency):
+        self._rows = rows
+        self._latency = latency
+
+    def result(self, timeout=None):
+        if timeout is not None and timeout < self._latency:
+            time.sleep(timeout)
+            raise TimeoutError("Query job did not finish in time.")
+        time.sleep(self._latency)
+        return iter(self._rows)
+
+    def cancel(self):
+        return True
+
+
+class FakeClient:
+    """Answers the three query shapes used by the loaders from in-memory rows."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.jobs = 0
+
+    def query(self, query, job_config=None):
+        self.jobs += 1
+        user_id = job_config.query_parameters[0].value
+        user = USERS.get(user_id)
+        accounts = [a for a in ACCOUNTS if a["user_id"] == user_id]
+
+        if "ARRAY(" in query:
+            rows = [SimpleNamespace(**user, accounts=accounts)] if user else []
+        elif ".accounts`" in query.split("FROM", 1)[1]:
+            rows = [SimpleNamespace(**a) for a in accounts]
+        else:
+            rows = [SimpleNamespace(**user)] if user else []
+        return FakeJob(rows, self.latency)
+
+
+def legacy_get_user_context_info(user_id: str) -> str:
+    """The previous implementation: one job for the user, one for its accounts."""
+    client = database.get_bq_client()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
+    )
+    user_query = f"SELECT * FROM {database.get_table_name('users')} WHERE user_id = @user_id"
+    user_results = list(client.query(user_query, job_config=job_config).result())
+    if not user_results:
+        return format_user_context(None)
+    user_row = user_results[0]
+
+    accounts_query = f"SELECT * FROM {database.get_table_name('accounts')} WHERE user_id = @user_id"
+    accounts_results = list(client.query(accounts_query, job_config=job_config).result())
+    # Rendered like the combined loader so that only the number of query jobs differs
+    return format_user_context(UserContext(
+        user_id=user_row.user_id,
+        full_name=user_row.full_name,
+        preferred_currency=user_row.preferred_currency,
+        language=user_row.language,
+        timezone=user_row.timezone,
+        accounts=[
+            Account(
+                account_id=acc.account_id,
+                account_name=acc.account_name,
+                account_type=acc.account_type,
+                institution=acc.institution,
+                currency=acc.currency,
+                balance=float(acc.balance) if acc.balance is not None else None,
+            )
+            for acc in accounts_results
+        ],
+    ))
+
+def run(name, loader, latency, iterations):
+    client = FakeClient(latency)
+    database.bq_client = client
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = loader("user_001")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} jobs/call={client.jobs / iterations:.1f} "
+        f"avg={elapsed / iterations * 1000:.1f}ms total={elapsed:.2f}s"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per query job.")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    legacy = run("legacy", legacy_get_user_context_info, args.latency, args.iterations)
+    combined = run("combined", database.get_user_context_info, args.latency, args.iterations)
+    assert legacy == combined, "combined loader must return the same context"
+
+    database.bq_client = FakeClient(args.latency)
+    assert database.get_user_context_info("missing") == format_user_context(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark the micro-batched transaction writer against a local stand-in sink.
+
+The sink charges a fixed cost per call plus a small cost per row, which is
+roughly how streaming inserts behave. Running the same load with a batch size
+of 1 shows what one insert per add_transaction call would cost. It also
+checks that transaction dates are validated against the user's today,
+which can be a day ahead of the server's.
+
+Usage:
+    python benchmarks/bench_writer.py [--rows 5000] [--batch-size 500] [--call-latency 0.02]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("BQ_PROJECT_ID", "bench-project")
+os.environ.setdefault("BQ_DATASET_ID", "bench_dataset")
+
+from finassist.utils.writer import BatchWriter, InsertError, parse_transaction  # noqa: E402
+
+
+class FakeSink:
+    """Stores rows in memory and rejects rows whose notes say so."""
+
+    def __init__(self, call_latency, row_latency=0.00001):
+        self.call_latency = call_latency
+        self.row_latency = row_latency
+        self.rows = []
+        self.calls = 0
+
+    def __call__(self, rows):
+        self.calls += 1
+        time.sleep(self.call_latency + self.row_latency * len(rows))
+        errors = []
+        for index, row in enumerate(rows):
+            if row["notes"] == "reject":
+                errors.append({"index": index, "errors": [{"reason": "invalid"}]})
+            else:
+                self.rows.append(row)
+        return errors
+
+
+def make_payload(i):
+    return json.dumps({
+        "transaction_id": "GENERATE_UUID()",
+        "user_id": f"user_{i % 50:03d}",
+        "account_id": "acc_001",
+        "amount": 10 + i % 90,
+        "currency": "mxn",
+        "transaction_type": "expense",
+        "transaction_date": "2025-06-01",
+        "recorded_date": "TIME_NOW()",
+        "category": "Food",
+        "subcategory": "Coffee/Tea",
+        "notes": "reject" if i % 1000 == 999 else "coffee",
+    })
+
+
+async def run(rows, batch_size, max_delay, call_latency):
+    sink = FakeSink(call_latency)
+    writer = BatchWriter(sink, max_batch_size=batch_size, max_delay=max_delay)
+
+    async def add(i):
+        try:
+            await writer.submit(parse_transaction(make_payload(i)))
+            return True
+        except InsertError:
+            return False
+
+    start = time.perf_counter()
+    acks = await asyncio.gather(*(add(i) for i in range(rows)))
+    elapsed = time.perf_counter() - start
+
+    stats = writer.stats()
+    assert acks.count(True) == len(sink.rows) == stats["rows_written"]
+    assert len({row["transaction_id"] for row in sink.rows}) == len(sink.rows)
+    print(
+        f"batch_size={batch_size:<5} sink_calls={sink.calls:<6} "
+        f"rows/sec={stats['rows_written'] / elapsed:>10.0f} "
+        f"acks={acks.count(True)} errors={acks.count(False)} "
+        f"flush_avg={stats['flush_latency_avg_ms']:.1f}ms "
+        f"flush_p95={stats['flush_latency_p95_ms']:.1f}ms"
+    )
+
+
+def check_user_today():
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    payload = json.dumps({**json.loads(make_payload(0)), "transaction_date": tomorrow})
+    # A user east of the server, for whom it is already tomorrow
+    assert parse_transaction(payload, today=date.today() + timedelta(days=1))["transaction_date"] == tomorrow
+    later = (date.today() + timedelta(days=2)).isoformat()
+    payload = json.dumps({**json.loads(make_payload(0)), "transaction_date": later})
+    for today in (date.today(), None):
+        try:
+            parse_transaction(payload, today=today)
+        except ValueError:
+            continue
+        raise AssertionError(f"a transaction dated after {today or 'today everywhere'} was accepted")
+    print("user today: a date ahead of the server is accepted for a user already there")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-delay", type=float, default=0.05)
+    parser.add_argument("--call-latency", type=float, default=0.02, help="Seconds per sink call.")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.rows, 1, args.max_delay, args.call_latency))
+    asyncio.run(run(args.rows, args.batch_size, args.max_delay, args.call_latency))
+    check_user_today()
+
+
+if __name__ == "__main__":
+    main()
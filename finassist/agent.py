@@ -1,29 +1,142 @@
-from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
-from google.genai import types
+from typing import TYPE_CHECKING, Optional
 
-from .subagents.data_manager.agent import database_manager
-from .subagents.question.agent import question_agent
-
-from finassist.utils.utils import get_var_env
-from finassist.prompt import MAIN_AGENT_PROMPT
-
-MAIN_AGENT_MODEL = LiteLlm(get_var_env("MAIN_AGENT_MODEL"))
-
-
-root_agent = Agent(
-    name="root_agent",
-    model=MAIN_AGENT_MODEL,
-    instruction=MAIN_AGENT_PROMPT,
-    description="This is the main agent that orchestrates the financial tasks.",
-    sub_agents=[
-        database_manager,
-        question_agent
-    ],
-    generate_content_config=types.GenerateContentConfig(
-        max_output_tokens=200,
-        temperature=0.2,
-    ),
+from finassist.prompt import (
+    FLAT_AGENT_PROMPT,
+    FLAT_AGENT_PROMPT_COMPACT,
+    MAIN_AGENT_PROMPT,
+    MAIN_AGENT_PROMPT_COMPACT,
 )
+from finassist.utils.prompt_builder import select_prompt
+from finassist.utils.registry import agent_registry
+from finassist.utils.router import intent_router
+from finassist.utils.utils import get_var_env
+
+if TYPE_CHECKING:
+    # google-adk takes seconds to import, so it is only loaded once an agent is built
+    from google.adk.agents import Agent, BaseAgent
+    from google.adk.agents.callback_context import CallbackContext
+    from google.adk.models.base_llm import BaseLlm
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+    from google.adk.runners import Runner
+    from google.adk.sessions import BaseSessionService
+
+ROUTING_MODE = get_var_env("ROUTING_MODE", "hierarchical")
+APP_NAME = "finassist"
+
+
+def fast_route(callback_context: "CallbackContext", llm_request: "LlmRequest") -> Optional["LlmResponse"]:
+    """Transfer clear-cut requests straight to the leaf agent without calling the model."""
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    user_content = callback_context.user_content
+    if not user_content or not llm_request.contents or llm_request.contents[-1] != user_content:
+        # Only route fresh user messages, not turns where a sub-agent handed control back
+        return None
+
+    message = "".join(part.text or "" for part in user_content.parts or [])
+    agent_name = intent_router.route(message)
+    if agent_name is None:
+        return None
+
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    function_call=types.FunctionCall(
+                        name="transfer_to_agent",
+                        args={"agent_name": agent_name},
+                    )
+                )
+            ],
+        )
+    )
+
+
+def create_root_agent(
+    routing_mode: str = ROUTING_MODE,
+    model: Optional["BaseLlm"] = None,
+    fast_routing: bool = True,
+) -> "Agent":
+    """Build the orchestrator and its whole agent tree.
+
+    Args:
+        routing_mode (str): "hierarchical" routes write requests through the
+            database_manager, "flat" transfers straight to the leaf agents.
+        model (BaseLlm): Replaces the model of every agent in the tree.
+        fast_routing (bool): Whether clear-cut messages skip the routing LLM call.
+    """
+    from google.adk.agents import Agent
+    from google.genai import types
+
+    from finassist.utils.models import get_model
+    from .subagents.data_manager.account.agent import create_account_manager
+    from .subagents.data_manager.agent import create_database_manager
+    from .subagents.data_manager.budget.agent import create_budget_manager
+    from .subagents.data_manager.transaction.agent import create_transaction_manager
+    from .subagents.analytics.agent import create_analytics_agent
+    from .subagents.question.agent import create_question_agent
+
+    if routing_mode == "hierarchical":
+        instruction = select_prompt(MAIN_AGENT_PROMPT, MAIN_AGENT_PROMPT_COMPACT)
+        sub_agents = [
+            create_database_manager(model),
+            create_question_agent(model),
+            create_analytics_agent(model),
+        ]
+    elif routing_mode == "flat":
+        instruction = select_prompt(FLAT_AGENT_PROMPT, FLAT_AGENT_PROMPT_COMPACT)
+        sub_agents = [
+            create_transaction_manager(model),
+            create_account_manager(model),
+            create_budget_manager(model),
+            create_question_agent(model),
+            create_analytics_agent(model),
+        ]
+    else:
+        raise ValueError(f"Unknown routing mode '{routing_mode}'. Use 'hierarchical' or 'flat'.")
+
+    return Agent(
+        name="root_agent",
+        model=model or get_model("MAIN_AGENT_MODEL", "root_agent"),
+        instruction=instruction,
+        description="This is the main agent that orchestrates the financial tasks.",
+        sub_agents=sub_agents,
+        before_model_callback=fast_route if fast_routing else None,
+        generate_content_config=types.GenerateContentConfig(
+            max_output_tokens=200,
+            temperature=0.2,
+        ),
+    )
+
+
+def create_runner(
+    agent: Optional["BaseAgent"] = None,
+    app_name: str = APP_NAME,
+    session_service: Optional["BaseSessionService"] = None,
+) -> "Runner":
+    """Build a Runner, by default on the session service selected by SESSION_BACKEND.
+
+    Args:
+        agent (BaseAgent): The agent to run, the shared root_agent by default.
+        app_name (str): The app name the sessions are stored under.
+        session_service (BaseSessionService): Replaces the shared ``get_session_service()``.
+    """
+    from google.adk.runners import Runner
+
+    from finassist.utils.sessions import get_session_service
+
+    return Runner(
+        agent=agent or agent_registry.get("root_agent"),
+        app_name=app_name,
+        session_service=session_service or get_session_service(),
+    )
+
 
-    
\ No newline at end of file
+def __getattr__(name: str):
+    # Built on first access so that importing this module stays cheap
+    if name == "root_agent":
+        return agent_registry.get("root_agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
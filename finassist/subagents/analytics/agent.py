@@ -0,0 +1,53 @@
+from typing import Optional
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models.base_llm import BaseLlm
+from google.genai import types
+
+from finassist.utils.extraction import user_today
+from finassist.utils.models import get_model
+from finassist.utils.prompt_builder import build_instruction, select_prompt
+from finassist.utils.registry import agent_registry
+from finassist.utils.storage import aget_cached_user_context, format_user_context
+from finassist.utils.utils import get_user_id
+from .prompt import ANALYTICS_AGENT_PROMPT, ANALYTICS_AGENT_PROMPT_COMPACT
+from .tools import compare_months, get_spending_by_account, get_spending_summary, get_top_categories, search_transactions
+
+ANALYTICS_AGENT_INSTRUCTION = select_prompt(ANALYTICS_AGENT_PROMPT, ANALYTICS_AGENT_PROMPT_COMPACT)
+
+
+async def analytics_instruction(context: ReadonlyContext) -> str:
+    """Build the instruction for one invocation of the analytics agent, with the user's accounts and date."""
+    segments = []
+    user_context = None
+    try:
+        user_context = await aget_cached_user_context(get_user_id(context))
+        segments.append(("USER_CONTEXT", format_user_context(user_context)))
+    except Exception as e:
+        print(f"Error loading user context: {e}")
+    today = user_today(user_context.timezone if user_context else None)
+    segments.append(("CURRENT_DATE", today.isoformat()))
+    return build_instruction(ANALYTICS_AGENT_INSTRUCTION, segments)
+
+
+def create_analytics_agent(model: Optional[BaseLlm] = None) -> LlmAgent:
+    """Build a new analytics agent, optionally with a different model."""
+    return LlmAgent(
+        name="analytics_agent",
+        model=model or get_model("ANALYTICS_AGENT_MODEL", "analytics_agent"),
+        instruction=analytics_instruction,
+        description="This agent is responsible for answering questions about the user's own spending and income.",
+        tools=[get_spending_summary, get_top_categories, compare_months, get_spending_by_account, search_transactions],
+        generate_content_config=types.GenerateContentConfig(
+            max_output_tokens=1000,
+            temperature=0.2,
+        )
+    )
+
+
+def __getattr__(name: str):
+    # Built on first access so that importing this module stays cheap
+    if name == "analytics_agent":
+        return agent_registry.get("analytics_agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,120 @@
+import json
+from typing import Callable
+
+from google.adk.tools import ToolContext
+
+from finassist.utils import analytics
+from finassist.utils.async_database import run_blocking
+from finassist.utils.extraction import user_today
+from finassist.utils.storage import aget_cached_user_context
+from finassist.utils.utils import get_user_id
+
+
+async def run_analytics_query(query: Callable, tool_context: ToolContext, convert: bool = False, **kwargs) -> dict:
+    """
+    Run an analytics query for the session's user, months resolved in the user's timezone.
+
+    With ``convert``, the query also gets the user's preferred currency to convert totals to.
+    """
+    try:
+        user_id = get_user_id(tool_context)
+        user_context = await aget_cached_user_context(user_id)
+        today = user_today(user_context.timezone if user_context else None)
+        if convert and user_context is not None:
+            kwargs["currency"] = user_context.preferred_currency
+        result = await run_blocking(query, user_id, today=today, **kwargs)
+        return {"status": "success", **result}
+    except Exception as e:
+        print(f"Error running {query.__name__}:", e)
+        return {
+            "status": "error",
+            "message": str(e),
+        }
+
+
+async def get_spending_summary(month: str, tool_context: ToolContext):
+    """This tool gets the user's total income, expenses and net of a month, per currency.
+
+    Args:
+        month (str): The month in YYYY-MM format, or "" for the current month.
+    Returns:
+        dict: The month and its totals per currency, and with several currencies
+            their total converted to the user's preferred currency.
+    """
+    return await run_analytics_query(analytics.spending_summary, tool_context, convert=True, month=month or None)
+
+
+async def get_top_categories(month: str, transaction_type: str, limit: int, tool_context: ToolContext):
+    """This tool gets the categories the user spent (or earned) the most in during a month.
+
+    Args:
+        month (str): The month in YYYY-MM format, or "" for the current month.
+        transaction_type (str): "expense" or "income".
+        limit (int): How many categories to return per currency, e.g. 5.
+    Returns:
+        dict: The categories with their totals, transaction counts and share of the month.
+    """
+    return await run_analytics_query(
+        analytics.top_categories,
+        tool_context,
+        month=month or None,
+        transaction_type=transaction_type or "expense",
+        limit=limit or 5,
+    )
+
+
+async def compare_months(month: str, previous_month: str, category: str, tool_context: ToolContext):
+    """This tool compares the user's expenses of a month with another month, in total and per category.
+
+    Args:
+        month (str): The month in YYYY-MM format, or "" for the current month.
+        previous_month (str): The month to compare with in YYYY-MM format, or "" for the month before.
+        category (str): Only compare this category (e.g. "Food"), or "" for every category.
+    Returns:
+        dict: The totals and categories with their current, previous and change amounts.
+    """
+    return await run_analytics_query(
+        analytics.compare_months,
+        tool_context,
+        month=month or None,
+        previous_month=previous_month or None,
+        category=category or None,
+    )
+
+
+async def get_spending_by_account(month: str, tool_context: ToolContext):
+    """This tool gets the user's income and expenses of a month for each account.
+
+    Args:
+        month (str): The month in YYYY-MM format, or "" for the current month.
+    Returns:
+        dict: The month and its totals per account.
+    """
+    return await run_analytics_query(analytics.spending_by_account, tool_context, month=month or None)
+
+
+async def search_transactions(filters: str, tool_context: ToolContext):
+    """This tool searches the user's transactions with filters the other tools do not support.
+
+    Use it for merchants, subcategories, date ranges or amount ranges. It is
+    slower than the other tools, so prefer them for monthly totals.
+
+    Args:
+        filters (str): A string in JSON format with any of: since and until (YYYY-MM-DD), account_id,
+            category (a category or subcategory), transaction_type ("expense" or "income"),
+            text (words of the description, e.g. a merchant), min_amount, max_amount.
+    Returns:
+        dict: The totals of the matching transactions per currency and type, and the latest matches.
+    """
+    try:
+        parsed = json.loads(filters or "{}")
+        if not isinstance(parsed, dict):
+            raise ValueError("The filters must be a JSON object.")
+        result = await run_blocking(analytics.search_transactions, get_user_id(tool_context), parsed)
+        return {"status": "success", **result}
+    except Exception as e:
+        print("Error searching transactions:", e)
+        return {
+            "status": "error",
+            "message": str(e),
+        }
@@ -1,26 +1,40 @@
+from google.adk.tools import ToolContext
+
+from finassist.utils.async_database import run_blocking
+from finassist.utils.storage import get_storage, invalidate_user_context
+from finassist.utils.utils import get_user_id
+from finassist.utils.writer import parse_account
+
+
 async def add_account(
     data_account: str,
+    tool_context: ToolContext,
 ):
-    """This tool is used to add a transaction to the database.
+    """This tool is used to add an account to the database.
 
     Args:
-        data_transaction (str): A string in JSON format containing the transaction details.
+        data_account (str): A string in JSON format containing the account details.
     Returns:
         dic: An dictionary containing the result of the operation.
     """
     
     try:
-        print("="*50)
-        print("Adding account:", data_account)
-        print("="*50)
+        account = parse_account(data_account)
+        # The account always belongs to the session's user, whatever the model wrote
+        account["user_id"] = get_user_id(tool_context)
+        errors = await run_blocking(get_storage().insert_accounts, [account])
+        if errors:
+            raise ValueError(f"Account was rejected by the database: {errors[0]['errors']}")
+        # A new account changes the user's account list, so drop the cached context
+        invalidate_user_context(account["user_id"])
         return {
             "status": "success",
             "message": "Account added successfully.",
-            "account_id": "12345",  # This would be generated by the database in a real scenario
+            "account_id": account["account_id"],
         }
     except Exception as e:
-        print("Error adding transaction:", e)
+        print("Error adding account:", e)
         return {
             "status": "error",
             "message": str(e),
-        }
\ No newline at end of file
+        }
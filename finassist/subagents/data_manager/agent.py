@@ -1,31 +1,46 @@
+from typing import Optional
+
 from google.adk.agents import LlmAgent
-from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.base_llm import BaseLlm
 from google.genai import types
 
 
-from .transaction.agent import transaction_manager
-from .account.agent import account_manager
+from .transaction.agent import create_transaction_manager
+from .account.agent import create_account_manager
+from .budget.agent import create_budget_manager
 
-from finassist.utils.utils import get_var_env
-from .prompt import DATABASE_MANAGER_INSTRUCTION
+from finassist.utils.models import get_model
+from finassist.utils.prompt_builder import select_prompt
+from finassist.utils.registry import agent_registry
+from .prompt import DATABASE_MANAGER_INSTRUCTION, DATABASE_MANAGER_INSTRUCTION_COMPACT
 
-DATABASE_MANAGER_MODEL = LiteLlm(get_var_env("DATABASE_MANAGER_MODEL"))
 
+def create_database_manager(model: Optional[BaseLlm] = None) -> LlmAgent:
+    """Build a new database manager with its own data agents.
 
-database_manager = LlmAgent(
-    name="database_manager",
-    model=DATABASE_MANAGER_MODEL,
-    description="Routes database write operations to specialized agents",
-    instruction=DATABASE_MANAGER_INSTRUCTION,
-    sub_agents=[
-        transaction_manager,
-        account_manager,  # Assuming account_agent is defined elsewhere
-        # Add other specialized agents here as they are implemented
-        # account_manager,
-        # budget_manager,
-    ],
-    generate_content_config=types.GenerateContentConfig(
-        max_output_tokens=500,
-        temperature=0.2,
+    Args:
+        model (BaseLlm): Replaces the model of the manager and of every data agent.
+    """
+    return LlmAgent(
+        name="database_manager",
+        model=model or get_model("DATABASE_MANAGER_MODEL", "database_manager"),
+        description="Routes database write operations to specialized agents",
+        instruction=select_prompt(DATABASE_MANAGER_INSTRUCTION, DATABASE_MANAGER_INSTRUCTION_COMPACT),
+        sub_agents=[
+            create_transaction_manager(model),
+            create_account_manager(model),
+            create_budget_manager(model),
+            # Add other specialized agents here as they are implemented
+        ],
+        generate_content_config=types.GenerateContentConfig(
+            max_output_tokens=500,
+            temperature=0.2,
+        )
     )
-)
+
+
+def __getattr__(name: str):
+    # Built on first access so that importing this module stays cheap
+    if name == "database_manager":
+        return agent_registry.get("database_manager")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,58 @@
+from typing import Optional
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models.base_llm import BaseLlm
+from google.genai import types
+
+from finassist.utils.budgets import aget_budget_status, format_budget_status
+from finassist.utils.extraction import user_today
+from finassist.utils.models import get_model
+from finassist.utils.prompt_builder import build_instruction, select_prompt
+from finassist.utils.registry import agent_registry
+from finassist.utils.storage import aget_cached_user_context, format_user_context
+from finassist.utils.utils import get_user_id
+from .prompt import BUDGET_AGENT_PROMPT, BUDGET_AGENT_PROMPT_COMPACT
+from .tools import delete_budget, list_budgets, set_budget
+
+BUDGET_AGENT_INSTRUCTION = select_prompt(BUDGET_AGENT_PROMPT, BUDGET_AGENT_PROMPT_COMPACT)
+
+
+async def budget_instruction(context: ReadonlyContext) -> str:
+    """Build the instruction for one invocation of the budget agent, with the user's budgets and their spend."""
+    segments = []
+    user_context = None
+    user_id = get_user_id(context)
+    try:
+        user_context = await aget_cached_user_context(user_id)
+        segments.append(("USER_CONTEXT", format_user_context(user_context)))
+    except Exception as e:
+        print(f"Error loading user context: {e}")
+    try:
+        statuses = await aget_budget_status(user_id, user_today(user_context.timezone if user_context else None))
+        segments.append(("BUDGET_STATUS", format_budget_status(statuses)))
+    except Exception as e:
+        print(f"Error loading budget status: {e}")
+    return build_instruction(BUDGET_AGENT_INSTRUCTION, segments)
+
+
+def create_budget_manager(model: Optional[BaseLlm] = None) -> LlmAgent:
+    """Build a new budget agent, optionally with a different model."""
+    return LlmAgent(
+        name="budget_agent",
+        model=model or get_model("BUDGET_AGENT_MODEL", "budget_agent"),
+        instruction=budget_instruction,
+        description="This agent is responsible for creating, changing and deleting the user's spending budgets.",
+        tools=[set_budget, list_budgets, delete_budget],
+        generate_content_config=types.GenerateContentConfig(
+            max_output_tokens=1000,
+            temperature=0.2,
+        )
+    )
+
+
+def __getattr__(name: str):
+    # Built on first access so that importing this module stays cheap
+    if name == "budget_manager":
+        return agent_registry.get("budget_agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
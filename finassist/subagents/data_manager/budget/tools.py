@@ -0,0 +1,119 @@
+from typing import Optional
+
+from google.adk.tools import ToolContext
+
+from finassist.utils.async_database import run_blocking
+from finassist.utils.budgets import aget_budget_status, canonical_category, get_budget_tracker, validate_budget
+from finassist.utils.extraction import user_today
+from finassist.utils.storage import aget_cached_user_context, get_storage
+from finassist.utils.utils import get_user_id
+
+
+async def _find_budget(user_id: str, category: str, period: str) -> Optional[dict]:
+    """The stored budget of a user for a category and period, matched case-insensitively."""
+    category = canonical_category(category).lower()
+    for budget in await run_blocking(get_storage().list_budgets, user_id):
+        if budget["category"].lower() == category and budget["period"] == period:
+            return budget
+    return None
+
+
+async def set_budget(
+    category: str,
+    amount: float,
+    currency: str,
+    period: str,
+    alert_thresholds: str,
+    tool_context: ToolContext,
+):
+    """This tool creates a budget for a spending category, or changes the limit of the one the user already has.
+
+    Args:
+        category (str): The category or subcategory to limit, e.g. "Food" or "Groceries", or "All" for all expenses.
+        amount (float): The most the user wants to spend in each period.
+        currency (str): ISO 4217 currency code, or "" for the user's preferred currency.
+        period (str): "weekly", "monthly" or "yearly", or "" for monthly.
+        alert_thresholds (str): Percentages of the budget to alert at, e.g. "50,90,100", or "" to keep the default.
+    Returns:
+        dict: The budget and how much has been spent in its current period.
+    """
+    try:
+        user_id = get_user_id(tool_context)
+        user_context = await aget_cached_user_context(user_id)
+        period = (period or "monthly").strip().lower()
+        existing = await _find_budget(user_id, category, period) or {}
+        # An update keeps the budget's id, creation time, and currency and thresholds unless given
+        budget = validate_budget({
+            **existing,
+            "user_id": user_id,
+            "category": category,
+            "amount": amount,
+            "currency": currency or existing.get("currency") or (user_context.preferred_currency if user_context else None),
+            "period": period,
+            "alert_thresholds": alert_thresholds or existing.get("alert_thresholds"),
+        })
+        errors = await run_blocking(get_storage().upsert_budgets, [budget])
+        if errors:
+            raise ValueError(f"Budget was rejected by the database: {errors[0]['errors']}")
+        # The spend-to-date is recomputed against the new budget on the next read
+        get_budget_tracker().invalidate(user_id)
+        statuses = await aget_budget_status(user_id, user_today(user_context.timezone if user_context else None))
+        return {
+            "status": "success",
+            "message": "Budget updated successfully." if existing else "Budget created successfully.",
+            "budget": next(status for status in statuses if status["budget_id"] == budget["budget_id"]),
+        }
+    except Exception as e:
+        print("Error setting budget:", e)
+        return {
+            "status": "error",
+            "message": str(e),
+        }
+
+
+async def list_budgets(tool_context: ToolContext):
+    """This tool lists the user's budgets with how much has been spent and is left in their current period.
+
+    Returns:
+        dict: The budgets, each with its period, amount, spent, remaining and percentage used.
+    """
+    try:
+        user_id = get_user_id(tool_context)
+        user_context = await aget_cached_user_context(user_id)
+        statuses = await aget_budget_status(user_id, user_today(user_context.timezone if user_context else None))
+        return {"status": "success", "budgets": statuses}
+    except Exception as e:
+        print("Error listing budgets:", e)
+        return {
+            "status": "error",
+            "message": str(e),
+        }
+
+
+async def delete_budget(category: str, period: str, tool_context: ToolContext):
+    """This tool deletes one of the user's budgets.
+
+    Args:
+        category (str): The category of the budget, as listed by list_budgets.
+        period (str): "weekly", "monthly" or "yearly", or "" for monthly.
+    Returns:
+        dict: The result of the operation.
+    """
+    try:
+        user_id = get_user_id(tool_context)
+        period = (period or "monthly").strip().lower()
+        budget = await _find_budget(user_id, category, period)
+        if budget is None:
+            raise ValueError(f"There is no {period} budget for {category}.")
+        await run_blocking(get_storage().delete_budgets, user_id, [budget["budget_id"]])
+        get_budget_tracker().invalidate(user_id)
+        return {
+            "status": "success",
+            "message": f"The {period} budget for {budget['category']} was deleted.",
+        }
+    except Exception as e:
+        print("Error deleting budget:", e)
+        return {
+            "status": "error",
+            "message": str(e),
+        }
@@ -1,60 +1,132 @@
+import json
+from typing import Optional
+
 from google.adk.agents import LlmAgent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models.base_llm import BaseLlm
 from google.genai import types
 
-from finassist.utils.utils import get_var_env
-from finassist.utils.database import get_user_context_info
-from .prompt import TRANSACTION_AGENT_PROMPT
-from .tools import add_transaction
+from finassist.utils.utils import get_user_id
+from finassist.utils.budgets import aget_budget_status, format_budget_status
+from finassist.utils.categorizer import aget_categorizer, get_categorizer
+from finassist.utils.extraction import RESOLVABLE_FIELDS, extract_transaction_fields, user_today
+from finassist.utils.models import get_model
+from finassist.utils.prompt_builder import build_instruction, select_prompt
+from finassist.utils.registry import agent_registry
+from finassist.utils.storage import aget_cached_user_context, format_user_context
+from .prompt import TRANSACTION_AGENT_PROMPT, TRANSACTION_AGENT_PROMPT_COMPACT
+from .tools import TRANSACTION_DRAFT_KEY, add_transaction
+
+TRANSACTION_AGENT_INSTRUCTION = select_prompt(TRANSACTION_AGENT_PROMPT, TRANSACTION_AGENT_PROMPT_COMPACT)
+
+
+def update_transaction_draft(callback_context: CallbackContext, user_context) -> dict:
+    """
+    Merge the fields pre-parsed from the latest user message into the session's draft.
+
+    A new amount that differs from the drafted one starts a new transaction,
+    so fields from the previous one are not carried over.
+    """
+    message = ""
+    if callback_context.user_content and callback_context.user_content.parts:
+        message = " ".join(part.text for part in callback_context.user_content.parts if part.text)
 
-TRANSACTION_AGENT_MODEL = LiteLlm(get_var_env("TRANSACTION_AGENT_MODEL"))
+    draft = dict(callback_context.state.get(TRANSACTION_DRAFT_KEY) or {})
+    extracted = extract_transaction_fields(message, user_context)
+    fields = draft.get("fields", {})
+    if "amount" in extracted.fields and fields.get("amount") not in (None, extracted.fields["amount"]):
+        fields = {}
+    fields.update(extracted.fields)
+    categorizer = get_categorizer()
+    categorization = categorizer.categorize(message, fields.get("transaction_type"), get_user_id(callback_context))
+    if categorizer.is_confident(categorization):
+        # Confident local categories are final, the LLM only categorizes the rest
+        fields["category"] = categorization.category
+        fields["subcategory"] = categorization.subcategory
+    candidates = extracted.account_candidates or ([] if "account_id" in fields else draft.get("account_candidates", []))
 
-def setup_before_agent_call(callback_context: CallbackContext) -> None:
-    """Give context about the user to the agent."""
+    draft = {
+        "fields": fields,
+        "account_candidates": candidates,
+        "missing": [name for name in RESOLVABLE_FIELDS if fields.get(name) in (None, "")],
+    }
+    callback_context.state[TRANSACTION_DRAFT_KEY] = draft
+    return draft
+
+
+def format_transaction_draft(draft: dict) -> str:
+    """Render the draft for the instruction."""
+    lines = [f"Resolved fields: {json.dumps(draft['fields'])}"]
+    if draft["missing"]:
+        lines.append(f"Missing fields: {', '.join(draft['missing'])}")
+    else:
+        lines.append("All required fields are resolved: only ask for a description if there is none, then confirm.")
+    if draft["account_candidates"]:
+        lines.append(f"Candidate accounts: {', '.join(draft['account_candidates'])}")
+    lines.append("Do not ask again for resolved fields unless the user contradicts them.")
+    return "\n".join(lines)
+
+
+async def setup_before_agent_call(callback_context: CallbackContext) -> None:
+    """Pre-extract the transaction fields of the new message into the session's draft."""
     try:
-        # Obtener user_id del contexto real en lugar de hardcodearlo
-        user_id = "user_001" # or callback_context.session_state.get("user_id") 
-        if not user_id:
-            # Fallback o manejo de error
-            print("Warning: No user_id found in session state")
-            return
-            
-        user_context = get_user_context_info(user_id)
-        if not user_context:
-            print(f"Warning: No context found for user {user_id}")
-            return
-            
-        # Sanitización más robusta
-        user_context = user_context.replace("{","{{").replace("}","}}") 
-        
-        # Validar que el agente existe
-        if hasattr(callback_context._invocation_context, 'agent'):
-            callback_context._invocation_context.agent.instruction = (
-                TRANSACTION_AGENT_PROMPT +
-                f"""
-                ------ User Context ------
-                {user_context}
-                ---------------------------
-                """
-            )
-        else:
-            print("Error: Agent not found in callback context")
-            
+        user_id = get_user_id(callback_context)
+        user_context = await aget_cached_user_context(user_id)
+        # The user's merchants are learned off the event loop before the draft is categorized
+        await aget_categorizer(user_id)
+        update_transaction_draft(callback_context, user_context)
     except Exception as e:
         print(f"Error in before_agent_callback: {e}")
-        # No modificar la instrucción si hay error
-    
-
-transaction_manager = LlmAgent(
-    name="transaction_agent",
-    model=TRANSACTION_AGENT_MODEL,
-    instruction=TRANSACTION_AGENT_PROMPT,
-    description="This agent is responsible for processing and storing financial transactions.",
-    tools=[add_transaction],
-    before_agent_callback=setup_before_agent_call,
-    generate_content_config=types.GenerateContentConfig(
-        max_output_tokens=1000,
-        temperature=0.2,
+
+
+async def transaction_instruction(context: ReadonlyContext) -> str:
+    """
+    Build the instruction for one invocation of the transaction agent.
+
+    Everything user-specific is read from this invocation's session, so
+    concurrent sessions never see each other's context. The budgets come
+    from the spend the budget tracker keeps current as transactions are
+    written, and are left out for users without any.
+    """
+    segments = []
+    user_context = None
+    user_id = get_user_id(context)
+    try:
+        user_context = await aget_cached_user_context(user_id)
+        segments.append(("USER_CONTEXT", format_user_context(user_context)))
+    except Exception as e:
+        print(f"Error loading user context: {e}")
+    draft = context.state.get(TRANSACTION_DRAFT_KEY)
+    if draft:
+        segments.append(("PRE_EXTRACTED_TRANSACTION", format_transaction_draft(draft)))
+    try:
+        statuses = await aget_budget_status(user_id, user_today(user_context.timezone if user_context else None))
+        if statuses:
+            segments.append(("BUDGET_STATUS", format_budget_status(statuses)))
+    except Exception as e:
+        print(f"Error loading budget status: {e}")
+    return build_instruction(TRANSACTION_AGENT_INSTRUCTION, segments)
+
+
+def create_transaction_manager(model: Optional[BaseLlm] = None) -> LlmAgent:
+    """Build a new transaction agent, optionally with a different model."""
+    return LlmAgent(
+        name="transaction_agent",
+        model=model or get_model("TRANSACTION_AGENT_MODEL", "transaction_agent"),
+        instruction=transaction_instruction,
+        description="This agent is responsible for processing and storing financial transactions.",
+        tools=[add_transaction],
+        before_agent_callback=setup_before_agent_call,
+        generate_content_config=types.GenerateContentConfig(
+            max_output_tokens=1000,
+            temperature=0.2,
+        )
     )
-)
\ No newline at end of file
+
+
+def __getattr__(name: str):
+    # Built on first access so that importing this module stays cheap
+    if name == "transaction_manager":
+        return agent_registry.get("transaction_agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
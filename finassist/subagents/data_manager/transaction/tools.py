@@ -1,8 +1,36 @@
+import json
+
+from google.adk.tools import ToolContext
+
+from finassist.utils.budgets import aload_budgets, get_budget_tracker
+from finassist.utils.categorizer import get_categorizer
+from finassist.utils.dedup import submit_transaction
+from finassist.utils.extraction import user_today
+from finassist.utils.storage import aget_cached_user_context, invalidate_user_context
+from finassist.utils.utils import get_user_id
+from finassist.utils.writer import parse_transaction
+
+IDEMPOTENCY_KEY_STATE_KEY = "idempotency_key"
+TRANSACTION_DRAFT_KEY = "transaction_draft"
+
+
 async def add_transaction(
     data_transaction: str,
+    tool_context: ToolContext,
 ):
     """This tool is used to add a transaction to the database.
 
+    A transaction that is already stored is not stored again: the result then
+    has ``"duplicate": true`` and the id of the existing transaction. Set
+    ``"allow_duplicate": true`` in the JSON to store a second identical
+    purchase the user confirmed. Clients can pass an ``idempotency_key`` in the
+    JSON or the session state so that retries of one request are stored once;
+    a key set in the session state is cleared once the transaction is stored,
+    so it never applies to the next one. A key reused for a different
+    transaction is an error.
+    If the transaction takes a budget past one of its alert thresholds, the
+    result lists them under ``"budget_alerts"``.
+
     Args:
         data_transaction (str): A string in JSON format containing the transaction details.
     Returns:
@@ -10,17 +38,55 @@ async def add_transaction(
     """
     
     try:
-        print("="*50)
-        print("Adding transaction:", data_transaction)
-        print("="*50)
-        return {
+        user_id = get_user_id(tool_context)
+        user_context = await aget_cached_user_context(user_id)
+        # Dates and budget periods follow the user's today, which can be ahead of the server's
+        today = user_today(user_context.timezone) if user_context else None
+        transaction = parse_transaction(data_transaction, today)
+        # The transaction always belongs to the session's user, whatever the model wrote
+        transaction["user_id"] = user_id
+        # parse_transaction already checked that this is a JSON object
+        options = json.loads(data_transaction)
+        try:
+            # Tracked before the write lands, so that it raises the alerts of the budgets it crosses
+            await aload_budgets(transaction["user_id"], today)
+        except Exception as e:
+            print(f"Error loading budgets: {e}")
+        transaction_id, duplicate = await submit_transaction(
+            transaction,
+            idempotency_key=options.get("idempotency_key") or tool_context.state.get(IDEMPOTENCY_KEY_STATE_KEY),
+            allow_duplicate=bool(options.get("allow_duplicate")),
+        )
+        if not duplicate:
+            # A new transaction changes the account balances, so drop the cached context
+            invalidate_user_context(transaction["user_id"])
+            # Repeated merchants are categorized locally from now on
+            get_categorizer().learn(transaction)
+        # The drafted transaction is stored, the next message starts a new one
+        tool_context.state[TRANSACTION_DRAFT_KEY] = {}
+        if tool_context.state.get(IDEMPOTENCY_KEY_STATE_KEY):
+            # The key covered this request only
+            tool_context.state[IDEMPOTENCY_KEY_STATE_KEY] = None
+        if duplicate:
+            return {
+                "status": "success",
+                "message": "This transaction was already recorded, it was not stored again.",
+                "transaction_id": transaction_id,
+                "duplicate": True,
+            }
+        result = {
             "status": "success",
             "message": "Transaction added successfully.",
-            "transaction_id": "12345",  # This would be generated by the database in a real scenario
+            "transaction_id": transaction_id,
         }
+        # Raised by the budget tracker when the write landed
+        budget_alerts = get_budget_tracker().pop_alerts(transaction_id)
+        if budget_alerts:
+            result["budget_alerts"] = budget_alerts
+        return result
     except Exception as e:
         print("Error adding transaction:", e)
         return {
             "status": "error",
             "message": str(e),
-        }
\ No newline at end of file
+        }
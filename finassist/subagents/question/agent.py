@@ -1,20 +1,88 @@
+import time
+from typing import Optional
+
 from google.adk.agents import LlmAgent
-from google.adk.models.lite_llm import LiteLlm
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
 from google.genai import types
 
-from finassist.utils.utils import get_var_env
-from .prompt import QUESTION_AGENT_PROMPT
+from finassist.utils.cache import TTLCache
+from finassist.utils.models import get_model
+from finassist.utils.prompt_builder import select_prompt
+from finassist.utils.registry import agent_registry
+from finassist.utils.response_cache import RESPONSE_CACHE_ENABLED, get_response_cache
+from finassist.utils.storage import aget_cached_user_context
+from finassist.utils.utils import get_user_id
+from .prompt import QUESTION_AGENT_PROMPT, QUESTION_AGENT_PROMPT_COMPACT
+
+# Invocation id -> (cache lookup, model call start) of questions that missed the cache
+pending_answers = TTLCache(maxsize=1024, ttl=600)
+
+
+async def answer_from_cache(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """Answer a question from the response cache, skipping the model call on a hit."""
+    user_content = callback_context.user_content
+    if not user_content or not user_content.parts:
+        return None
+    question = " ".join(part.text for part in user_content.parts if part.text)
+
+    language = None
+    try:
+        user_context = await aget_cached_user_context(get_user_id(callback_context))
+        language = user_context.language if user_context else None
+    except Exception as e:
+        print(f"Error loading user context: {e}")
 
+    lookup = get_response_cache().lookup(question, language)
+    if lookup.answer is not None:
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=lookup.answer)]))
+    if lookup.cacheable:
+        pending_answers.set(callback_context.invocation_id, (lookup, time.perf_counter()))
+    return None
 
-QUESTION_AGENT_MODEL = LiteLlm(get_var_env("QUESTION_AGENT_MODEL"))
 
-question_agent = LlmAgent(
-    name="question_agent",
-    model=QUESTION_AGENT_MODEL,
-    instruction=QUESTION_AGENT_PROMPT,
-    description="This agent is responsible for answering questions about finances.",
-    generate_content_config=types.GenerateContentConfig(
-        max_output_tokens=1000,
-        temperature=0.5,
+def cache_answer(callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+    """Store the model's final answer to a question that missed the cache."""
+    if llm_response.partial or llm_response.error_code or not llm_response.content:
+        return None
+    pending = pending_answers.get(callback_context.invocation_id)
+    if pending is None:
+        return None
+    pending_answers.invalidate(callback_context.invocation_id)
+    lookup, started_at = pending
+    parts = llm_response.content.parts or []
+    if any(part.function_call for part in parts):
+        return None
+    answer = "".join(part.text for part in parts if part.text and not part.thought)
+    get_response_cache().store(lookup, answer, time.perf_counter() - started_at)
+    return None
+
+
+def create_question_agent(model: Optional[BaseLlm] = None, use_cache: bool = RESPONSE_CACHE_ENABLED) -> LlmAgent:
+    """Build a new question agent, optionally with a different model.
+
+    Args:
+        model (BaseLlm): Replaces the agent's model.
+        use_cache (bool): Whether repeated questions are answered from the response cache.
+    """
+    return LlmAgent(
+        name="question_agent",
+        model=model or get_model("QUESTION_AGENT_MODEL", "question_agent"),
+        instruction=select_prompt(QUESTION_AGENT_PROMPT, QUESTION_AGENT_PROMPT_COMPACT),
+        description="This agent is responsible for answering questions about finances.",
+        before_model_callback=answer_from_cache if use_cache else None,
+        after_model_callback=cache_answer if use_cache else None,
+        generate_content_config=types.GenerateContentConfig(
+            max_output_tokens=1000,
+            temperature=0.5,
+        )
     )
-)
\ No newline at end of file
+
+
+def __getattr__(name: str):
+    # Built on first access so that importing this module stays cheap
+    if name == "question_agent":
+        return agent_registry.get("question_agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,301 @@
+import calendar
+import re
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from finassist.utils.fx import get_rate_table
+from finassist.utils.storage import Storage, get_storage
+from finassist.utils.utils import get_var_env
+
+ANALYTICS_SEARCH_LIMIT = int(get_var_env("ANALYTICS_SEARCH_LIMIT", "20"))
+
+UNCATEGORIZED = "Uncategorized"
+TRANSACTION_TYPES = ("expense", "income")
+SEARCH_FILTERS = (
+    "since", "until", "account_id", "category", "transaction_type", "text", "min_amount", "max_amount",
+)
+# Transaction fields listed in search results
+SEARCH_FIELDS = (
+    "transaction_id", "transaction_date", "account_id", "amount", "currency", "transaction_type",
+    "category", "subcategory", "notes",
+)
+
+_MONTH_RE = re.compile(r"^(\d{4})-(\d{2})$")
+
+
+def parse_month(month: Optional[str], today: Optional[date] = None) -> str:
+    """
+    Validate a ``YYYY-MM`` month, defaulting to the month of ``today``.
+
+    Raises:
+        ValueError: If the month is not in ``YYYY-MM`` format.
+    """
+    if not month:
+        return (today or date.today()).strftime("%Y-%m")
+    match = _MONTH_RE.match(month.strip())
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"Invalid month '{month}'. Use the YYYY-MM format.")
+    return match.group(0)
+
+
+def shift_month(month: str, months: int) -> str:
+    """The ``YYYY-MM`` month ``months`` months after ``month`` (before, if negative)."""
+    year, number = map(int, month.split("-"))
+    index = year * 12 + number - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _conversion_date(month: str, today: Optional[date] = None) -> date:
+    """The date whose rates convert a month's totals: its last day, or today while it is in progress."""
+    year, number = map(int, month.split("-"))
+    return min(date(year, number, calendar.monthrange(year, number)[1]), today or date.today())
+
+
+def _converted_totals(totals: List[dict], currency: str, on: date) -> Optional[dict]:
+    """Income, expenses and net of per-currency totals in one currency, None if they are all in it already."""
+    if all(total["currency"] == currency for total in totals):
+        return None
+    rates = get_rate_table()
+    income = expenses = 0.0
+    unconverted = []
+    for total in totals:
+        rate = rates.rate(total["currency"], currency, on)
+        if rate is None:
+            unconverted.append(total["currency"])
+            continue
+        income += total["income"] * rate
+        expenses += total["expenses"] * rate
+    return {
+        "currency": currency,
+        "income": round(income, 2),
+        "expenses": round(expenses, 2),
+        "net": round(income - expenses, 2),
+        "rate_date": on.isoformat(),
+        "unconverted": unconverted,
+    }
+
+
+def _change(current: float, previous: float) -> dict:
+    return {
+        "current": round(current, 2),
+        "previous": round(previous, 2),
+        "change": round(current - previous, 2),
+        "change_pct": round((current - previous) / previous * 100, 1) if previous else None,
+    }
+
+
+def _sum_rollups(rollups: List[dict], key_fields: Tuple[str, ...]) -> Dict[tuple, List]:
+    """Sum rollup rows into ``[total, count]`` per combination of ``key_fields``."""
+    sums: Dict[tuple, List] = defaultdict(lambda: [0.0, 0])
+    for row in rollups:
+        key = tuple(row[field] for field in key_fields)
+        sums[key][0] += float(row["total"])
+        sums[key][1] += row["count"]
+    return sums
+
+
+def spending_summary(user_id: str, month: Optional[str] = None, currency: Optional[str] = None,
+                     today: Optional[date] = None, storage: Optional[Storage] = None) -> dict:
+    """
+    Total income and expenses of a user in one month, per currency.
+
+    Read from the spending rollups, so the cost depends on the number of
+    categories and accounts, not of transactions.
+
+    Args:
+        user_id (str): The user identifier.
+        month (str): ``YYYY-MM``, None for the current month.
+        currency (str): Also total every currency in this one, at the rates
+            of the month's last day (today for the current month). Currencies
+            without a rate are listed as unconverted.
+        today (date): The user's current date, to resolve the current month.
+        storage (Storage): Defaults to the shared backend.
+    """
+    month = parse_month(month, today)
+    sums = _sum_rollups((storage or get_storage()).fetch_rollups(user_id, [month]), ("currency", "transaction_type"))
+    totals = []
+    for row_currency in sorted({row_currency for row_currency, _ in sums}):
+        income, income_count = sums.get((row_currency, "income"), (0.0, 0))
+        expenses, expense_count = sums.get((row_currency, "expense"), (0.0, 0))
+        totals.append({
+            "currency": row_currency,
+            "income": round(income, 2),
+            "expenses": round(expenses, 2),
+            "net": round(income - expenses, 2),
+            "transactions": income_count + expense_count,
+        })
+    summary = {"month": month, "totals": totals}
+    converted = _converted_totals(totals, currency, _conversion_date(month, today)) if currency else None
+    if converted is not None:
+        summary["converted"] = converted
+    return summary
+
+
+def top_categories(user_id: str, month: Optional[str] = None, transaction_type: str = "expense", limit: int = 5,
+                   today: Optional[date] = None, storage: Optional[Storage] = None) -> dict:
+    """
+    The categories with the largest totals in one month, per currency.
+
+    Args:
+        user_id (str): The user identifier.
+        month (str): ``YYYY-MM``, None for the current month.
+        transaction_type (str): ``expense`` or ``income``.
+        limit (int): Categories returned per currency.
+        today (date): The user's current date, to resolve the current month.
+        storage (Storage): Defaults to the shared backend.
+    """
+    month = parse_month(month, today)
+    if transaction_type not in TRANSACTION_TYPES:
+        raise ValueError(f"Invalid transaction type '{transaction_type}'. Use 'expense' or 'income'.")
+    rollups = [
+        row for row in (storage or get_storage()).fetch_rollups(user_id, [month])
+        if row["transaction_type"] == transaction_type
+    ]
+    sums = _sum_rollups(rollups, ("currency", "category"))
+    currency_totals = defaultdict(float)
+    for (currency, _), (total, _) in sums.items():
+        currency_totals[currency] += total
+
+    categories = []
+    for currency in sorted(currency_totals):
+        ranked = sorted(
+            ((category, total, count) for (row_currency, category), (total, count) in sums.items()
+             if row_currency == currency),
+            key=lambda item: -item[1],
+        )
+        for category, total, count in ranked[:max(limit, 1)]:
+            categories.append({
+                "category": category or UNCATEGORIZED,
+                "currency": currency,
+                "total": round(total, 2),
+                "transactions": count,
+                "share_pct": round(total / currency_totals[currency] * 100, 1) if currency_totals[currency] else 0.0,
+            })
+    return {"month": month, "transaction_type": transaction_type, "categories": categories}
+
+
+def compare_months(user_id: str, month: Optional[str] = None, previous_month: Optional[str] = None,
+                   category: Optional[str] = None, today: Optional[date] = None,
+                   storage: Optional[Storage] = None) -> dict:
+    """
+    Expenses of one month against another, in total and per category.
+
+    Args:
+        user_id (str): The user identifier.
+        month (str): ``YYYY-MM``, None for the current month.
+        previous_month (str): ``YYYY-MM`` to compare with, None for the month before ``month``.
+        category (str): Only compare this category, case-insensitive.
+        today (date): The user's current date, to resolve the current month.
+        storage (Storage): Defaults to the shared backend.
+    """
+    month = parse_month(month, today)
+    previous_month = parse_month(previous_month) if previous_month else shift_month(month, -1)
+    rollups = [
+        row for row in (storage or get_storage()).fetch_rollups(user_id, [month, previous_month])
+        if row["transaction_type"] == "expense"
+        and (category is None or (row["category"] or UNCATEGORIZED).lower() == category.lower())
+    ]
+    sums = _sum_rollups(rollups, ("month", "currency", "category"))
+    currencies = sorted({currency for _, currency, _ in sums})
+
+    def total(month_key: str, currency: str, category_key: Optional[str] = None) -> float:
+        return sum(
+            (value for (row_month, row_currency, row_category), (value, _) in sums.items()
+             if row_month == month_key and row_currency == currency
+             and (category_key is None or row_category == category_key)),
+            0.0,
+        )
+
+    totals = [{"currency": currency, **_change(total(month, currency), total(previous_month, currency))}
+              for currency in currencies]
+    categories = [
+        {"category": row_category or UNCATEGORIZED, "currency": currency,
+         **_change(total(month, currency, row_category), total(previous_month, currency, row_category))}
+        for currency, row_category in sorted({(currency, row_category) for _, currency, row_category in sums})
+    ]
+    categories.sort(key=lambda item: -abs(item["change"]))
+    return {
+        "month": month,
+        "previous_month": previous_month,
+        "category": category,
+        "totals": totals,
+        "categories": categories,
+    }
+
+
+def spending_by_account(user_id: str, month: Optional[str] = None, today: Optional[date] = None,
+                        storage: Optional[Storage] = None) -> dict:
+    """
+    Income and expenses of each account in one month.
+
+    Args:
+        user_id (str): The user identifier.
+        month (str): ``YYYY-MM``, None for the current month.
+        today (date): The user's current date, to resolve the current month.
+        storage (Storage): Defaults to the shared backend.
+    """
+    month = parse_month(month, today)
+    sums = _sum_rollups(
+        (storage or get_storage()).fetch_rollups(user_id, [month]), ("account_id", "currency", "transaction_type")
+    )
+    accounts = []
+    for account_id, currency in sorted({(account_id, currency) for account_id, currency, _ in sums}):
+        income, income_count = sums.get((account_id, currency, "income"), (0.0, 0))
+        expenses, expense_count = sums.get((account_id, currency, "expense"), (0.0, 0))
+        accounts.append({
+            "account_id": account_id,
+            "currency": currency,
+            "income": round(income, 2),
+            "expenses": round(expenses, 2),
+            "net": round(income - expenses, 2),
+            "transactions": income_count + expense_count,
+        })
+    accounts.sort(key=lambda item: -item["expenses"])
+    return {"month": month, "accounts": accounts}
+
+
+def search_transactions(user_id: str, filters: Optional[dict] = None, limit: int = ANALYTICS_SEARCH_LIMIT,
+                        storage: Optional[Storage] = None) -> dict:
+    """
+    Totals and the latest matches of an ad-hoc transaction search.
+
+    Filters the rollups cannot answer (a merchant, a subcategory, a date or
+    amount range) read the user's transactions, so this is the slow path.
+
+    Args:
+        user_id (str): The user identifier.
+        filters (dict): Any of SEARCH_FILTERS, see ``Storage.scan_transactions``.
+        limit (int): Matching transactions listed, newest first.
+        storage (Storage): Defaults to the shared backend.
+
+    Raises:
+        ValueError: If a filter is unknown or malformed.
+    """
+    filters = {name: value for name, value in (filters or {}).items() if value not in (None, "")}
+    unknown = set(filters) - set(SEARCH_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {sorted(unknown)}. Use {', '.join(SEARCH_FILTERS)}.")
+    for name in ("since", "until"):
+        if name in filters:
+            filters[name] = date.fromisoformat(str(filters[name])).isoformat()
+    for name in ("min_amount", "max_amount"):
+        if name in filters:
+            filters[name] = float(filters[name])
+    if filters.get("transaction_type", "expense") not in TRANSACTION_TYPES:
+        raise ValueError(f"Invalid transaction type '{filters['transaction_type']}'. Use 'expense' or 'income'.")
+
+    rows = (storage or get_storage()).scan_transactions(user_id, **filters)
+    sums = _sum_rollups(
+        [{**row, "total": row["amount"], "count": 1} for row in rows], ("currency", "transaction_type")
+    )
+    return {
+        "filters": filters,
+        "totals": [
+            {"currency": currency, "transaction_type": transaction_type, "total": round(total, 2),
+             "transactions": count}
+            for (currency, transaction_type), (total, count) in sorted(sums.items())
+        ],
+        "transactions": [{field: row.get(field) for field in SEARCH_FIELDS} for row in rows[:max(limit, 0)]],
+        "matches": len(rows),
+    }
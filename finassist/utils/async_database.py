@@ -0,0 +1,36 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from finassist.utils.utils import get_var_env
+
+DB_QUERY_TIMEOUT = float(get_var_env("DB_QUERY_TIMEOUT", "10"))
+
+db_executor = None
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool that runs blocking database calls off the event loop."""
+    global db_executor
+    if db_executor is None:
+        db_executor = ThreadPoolExecutor(
+            max_workers=int(get_var_env("DB_MAX_WORKERS", "8")),
+            thread_name_prefix="finassist-db",
+        )
+    return db_executor
+
+async def run_blocking(func: Callable, *args, timeout: Optional[float] = DB_QUERY_TIMEOUT, **kwargs) -> Any:
+    """
+    Run a blocking call on the database executor and await its result.
+
+    Args:
+        func (Callable): The blocking function to run.
+        timeout (float): Seconds to wait before raising TimeoutError, None to wait forever.
+
+    Returns:
+        Any: Whatever ``func`` returns.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+    return await asyncio.wait_for(future, timeout)
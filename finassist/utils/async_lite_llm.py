@@ -0,0 +1,114 @@
+import json
+from typing import AsyncGenerator
+
+from google.adk.models.lite_llm import (
+    ChatCompletionAssistantMessage,
+    ChatCompletionMessageToolCall,
+    Function,
+    FunctionChunk,
+    LiteLlm,
+    TextChunk,
+    UsageMetadataChunk,
+    _get_completion_inputs,
+    _message_to_generate_content_response,
+    _model_response_to_chunk,
+)
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+
+class AsyncStreamingLiteLlm(LiteLlm):
+    """
+    LiteLlm whose streaming calls go through ``litellm.acompletion``.
+
+    google-adk 1.2.1 streams with the synchronous ``litellm.completion``,
+    which blocks the event loop, and every other session with it, until the
+    whole answer is generated, and cannot use the shared async HTTP client.
+    This reads the same chunks asynchronously and yields them the way
+    LiteLlm does: partial text responses as they arrive, then the
+    aggregated text and tool-call responses.
+    """
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if not stream:
+            async for response in super().generate_content_async(llm_request, stream=False):
+                yield response
+            return
+
+        self._maybe_append_user_content(llm_request)
+        messages, tools, response_format = _get_completion_inputs(llm_request)
+        completion_args = {
+            "model": self.model,
+            "messages": messages,
+            "tools": tools,
+            "response_format": response_format,
+            **self._additional_args,
+            "stream": True,
+        }
+
+        text = ""
+        function_calls = {}  # index -> {name, args, id}
+        fallback_index = 0
+        usage_metadata = None
+        aggregated_text = None
+        aggregated_tool_calls = None
+        async for part in await self.llm_client.acompletion(**completion_args):
+            for chunk, finish_reason in _model_response_to_chunk(part):
+                if isinstance(chunk, FunctionChunk):
+                    index = chunk.index or fallback_index
+                    function_call = function_calls.setdefault(index, {"name": "", "args": "", "id": None})
+                    function_call["name"] += chunk.name or ""
+                    if chunk.args:
+                        function_call["args"] += chunk.args
+                        try:
+                            # Some providers do not index their chunks, a complete JSON object ends a call
+                            json.loads(function_call["args"])
+                            fallback_index += 1
+                        except json.JSONDecodeError:
+                            pass
+                    function_call["id"] = chunk.id or function_call["id"] or str(index)
+                elif isinstance(chunk, TextChunk):
+                    text += chunk.text
+                    yield _message_to_generate_content_response(
+                        ChatCompletionAssistantMessage(role="assistant", content=chunk.text),
+                        is_partial=True,
+                    )
+                elif isinstance(chunk, UsageMetadataChunk):
+                    usage_metadata = types.GenerateContentResponseUsageMetadata(
+                        prompt_token_count=chunk.prompt_tokens,
+                        candidates_token_count=chunk.completion_tokens,
+                        total_token_count=chunk.total_tokens,
+                    )
+
+                if finish_reason in ("tool_calls", "stop") and function_calls:
+                    aggregated_tool_calls = _message_to_generate_content_response(
+                        ChatCompletionAssistantMessage(
+                            role="assistant",
+                            content="",
+                            tool_calls=[
+                                ChatCompletionMessageToolCall(
+                                    type="function",
+                                    id=call["id"],
+                                    function=Function(name=call["name"], arguments=call["args"], index=index),
+                                )
+                                for index, call in function_calls.items() if call["id"]
+                            ],
+                        )
+                    )
+                    function_calls.clear()
+                elif finish_reason == "stop" and text:
+                    aggregated_text = _message_to_generate_content_response(
+                        ChatCompletionAssistantMessage(role="assistant", content=text)
+                    )
+                    text = ""
+
+        # Usage arrives after the finish chunk, so the aggregated responses are only yielded at the end
+        for response in (aggregated_text, aggregated_tool_calls):
+            if response is not None:
+                if usage_metadata is not None:
+                    response.usage_metadata = usage_metadata
+                    usage_metadata = None
+                yield response
@@ -0,0 +1,517 @@
+import threading
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from finassist.utils.async_database import run_blocking
+from finassist.utils.cache import TTLCache
+from finassist.utils.categorizer import TAXONOMY
+from finassist.utils.columnar import COLUMNAR_STORE_ENABLED, ColumnarStore, TransactionColumns, get_columnar_store
+from finassist.utils.fx import get_rate_table
+from finassist.utils.ledger import BALANCE_TOLERANCE
+from finassist.utils.storage import Storage, get_storage
+from finassist.utils.utils import get_var_env
+
+BUDGET_ALERT_THRESHOLDS = get_var_env("BUDGET_ALERT_THRESHOLDS", "80,100")
+BUDGET_TRACKER_SIZE = int(get_var_env("BUDGET_TRACKER_SIZE", "10000"))
+BUDGET_REFRESH_INTERVAL = float(get_var_env("BUDGET_REFRESH_INTERVAL", "3600"))
+BUDGET_ALERT_TTL = 300.0
+
+BUDGET_FIELDS = (
+    "budget_id",
+    "user_id",
+    "category",
+    "period",
+    "amount",
+    "currency",
+    "alert_thresholds",
+    "created_at",
+    "updated_at",
+)
+BUDGET_PERIODS = ("weekly", "monthly", "yearly")
+# A budget in this category counts every expense
+ALL_CATEGORIES = "All"
+# Budget status fields an alert reports
+ALERT_FIELDS = ("budget_id", "category", "period", "amount", "currency", "spent", "remaining", "used")
+# Budget fields listed in the agents' BUDGET_STATUS, in order
+STATUS_COLUMNS = ("category", "period", "spent", "amount", "currency", "used")
+
+# Lowercase category or subcategory -> its name in the taxonomy
+_CANONICAL_CATEGORIES = {
+    name.lower(): name
+    for category, subcategories in TAXONOMY.items()
+    for name in (category, *subcategories)
+}
+_CANONICAL_CATEGORIES.update({"all": ALL_CATEGORIES, "total": ALL_CATEGORIES})
+
+budget_tracker = None
+_budget_tracker_lock = threading.Lock()
+
+
+def period_bounds(period: str, day: date) -> Tuple[date, date]:
+    """
+    The first day of the budget period containing ``day``, and the first day of the next one.
+
+    Weeks start on Monday.
+
+    Raises:
+        ValueError: If the period is not one of BUDGET_PERIODS.
+    """
+    if period == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period == "monthly":
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    if period == "yearly":
+        start = day.replace(month=1, day=1)
+        return start, start.replace(year=start.year + 1)
+    raise ValueError(f"Budget period must be one of {', '.join(BUDGET_PERIODS)}.")
+
+
+def parse_thresholds(alert_thresholds: str) -> Tuple[float, ...]:
+    """
+    Parse comma-separated alert thresholds in percent of the budget, e.g. ``"80,100"``.
+
+    Returns:
+        tuple: The thresholds as sorted, distinct fractions, e.g. ``(0.8, 1.0)``.
+
+    Raises:
+        ValueError: If a threshold is not a number between 1 and 1000.
+    """
+    thresholds = set()
+    for value in str(alert_thresholds).replace(";", ",").split(","):
+        if not value.strip():
+            continue
+        try:
+            percent = float(value.strip().rstrip("%"))
+        except ValueError:
+            raise ValueError(f"Alert thresholds must be percentages like '80,100', got {alert_thresholds!r}.")
+        if not 1 <= percent <= 1000:
+            raise ValueError(f"Alert thresholds must be between 1 and 1000 percent, got {percent:g}.")
+        thresholds.add(percent / 100)
+    return tuple(sorted(thresholds))
+
+
+def canonical_category(category: str) -> str:
+    """The taxonomy name of a category or subcategory, any case; other names are kept as given."""
+    category = str(category).strip()
+    return _CANONICAL_CATEGORIES.get(category.lower(), category)
+
+
+def validate_budget(data: dict) -> dict:
+    """
+    Validate budget fields and build the row to store, like ``validate_transaction`` does for transactions.
+
+    ``budget_id``, ``created_at`` and ``updated_at`` are generated unless
+    given, so that an update keeps the id and creation time of the budget
+    it replaces.
+
+    Raises:
+        ValueError: If a field is missing or invalid.
+    """
+    missing = [name for name in ("user_id", "category", "amount", "currency") if data.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}.")
+
+    try:
+        amount = float(data["amount"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Amount must be a number, got {data['amount']!r}.")
+    if amount <= 0:
+        raise ValueError("Amount must be a positive number.")
+
+    currency = str(data["currency"]).strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"Currency must be a 3-letter ISO 4217 code, got {data['currency']!r}.")
+
+    period = str(data.get("period") or "monthly").strip().lower()
+    if period not in BUDGET_PERIODS:
+        raise ValueError(f"Budget period must be one of {', '.join(BUDGET_PERIODS)}.")
+
+    thresholds = parse_thresholds(data.get("alert_thresholds") or BUDGET_ALERT_THRESHOLDS)
+    if not thresholds:
+        raise ValueError("At least one alert threshold is required.")
+
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "budget_id": data.get("budget_id") or str(uuid.uuid4()),
+        "user_id": data["user_id"],
+        "category": canonical_category(data["category"]),
+        "period": period,
+        "amount": round(amount, 2),
+        "currency": currency,
+        "alert_thresholds": ",".join(f"{threshold * 100:g}" for threshold in thresholds),
+        "created_at": data.get("created_at") or now,
+        "updated_at": now,
+    }
+
+
+def _row_day(row: dict) -> date:
+    return date.fromisoformat(str(row["transaction_date"])[:10])
+
+
+@dataclass
+class BudgetState:
+    """
+    The spend-to-date of one budget in its current period.
+
+    ``next_alert`` is the spend at which the next threshold is crossed, so
+    adding an expense is one comparison unless it crosses one.
+    """
+    budget: dict
+    thresholds: Tuple[float, ...]
+    period_start: date
+    period_end: date
+    spent: float = 0.0
+    alerted: int = 0
+    next_alert: float = 0.0
+
+    @classmethod
+    def from_row(cls, budget: dict, today: date) -> "BudgetState":
+        state = cls(budget, parse_thresholds(budget["alert_thresholds"]), *period_bounds(budget["period"], today))
+        state._arm()
+        return state
+
+    @property
+    def limit(self) -> float:
+        return float(self.budget["amount"])
+
+    def add(self, amount: float, day: date) -> List[float]:
+        """
+        Add an expense of ``day``, already in the budget's currency.
+
+        Only expenses of the current period count. A future-dated one is
+        counted by the load of the period it falls in.
+
+        Returns:
+            list: The thresholds this expense crossed, usually none.
+        """
+        if not self.period_start <= day < self.period_end:
+            return []
+        self.spent += amount
+        if self.spent < self.next_alert:
+            return []
+        crossed = []
+        while self.alerted < len(self.thresholds) and self._reached(self.thresholds[self.alerted]):
+            crossed.append(self.thresholds[self.alerted])
+            self.alerted += 1
+        self._arm()
+        return crossed
+
+    def mark_alerted(self) -> None:
+        """Treat the thresholds already reached as alerted, e.g. after loading the spend from storage."""
+        while self.alerted < len(self.thresholds) and self._reached(self.thresholds[self.alerted]):
+            self.alerted += 1
+        self._arm()
+
+    def _reached(self, threshold: float) -> bool:
+        return self.spent >= threshold * self.limit - BALANCE_TOLERANCE
+
+    def _arm(self) -> None:
+        self.next_alert = (
+            self.thresholds[self.alerted] * self.limit - BALANCE_TOLERANCE
+            if self.alerted < len(self.thresholds) else float("inf")
+        )
+
+    def to_dict(self) -> dict:
+        spent = round(self.spent, 2)
+        return {
+            "budget_id": self.budget["budget_id"],
+            "category": self.budget["category"],
+            "period": self.budget["period"],
+            "period_start": self.period_start.isoformat(),
+            "period_end": (self.period_end - timedelta(days=1)).isoformat(),
+            "amount": self.limit,
+            "currency": self.budget["currency"],
+            "spent": spent,
+            "remaining": round(self.limit - spent, 2),
+            "used": round(spent / self.limit * 100),
+            "alert_thresholds": self.budget["alert_thresholds"],
+        }
+
+
+class UserBudgets:
+    """The budget states of one user, indexed by the lowercase category or subcategory they count."""
+
+    def __init__(self, states: List[BudgetState]):
+        self.states = states
+        self.by_category: Dict[str, List[BudgetState]] = defaultdict(list)
+        for state in states:
+            self.by_category[state.budget["category"].lower()].append(state)
+
+    def add(self, row: dict) -> Tuple[List[dict], bool]:
+        """
+        Add an expense to the budgets of its category, its subcategory and ALL_CATEGORIES.
+
+        Amounts in another currency than a budget's are converted at the
+        rate of their date; without a rate they do not count.
+
+        Returns:
+            tuple: The alerts of the thresholds it crossed, and whether a conversion was missing.
+        """
+        alerts = []
+        unconverted = False
+        keys = {ALL_CATEGORIES.lower(), (row.get("category") or "").lower(), (row.get("subcategory") or "").lower()}
+        keys.discard("")
+        day = None
+        for key in keys:
+            for state in self.by_category.get(key, ()):
+                day = day or _row_day(row)
+                amount = float(row["amount"])
+                if row["currency"] != state.budget["currency"]:
+                    rate = get_rate_table().rate(row["currency"], state.budget["currency"], day)
+                    if rate is None:
+                        unconverted = True
+                        continue
+                    amount *= rate
+                crossed = state.add(amount, day)
+                if crossed:
+                    status = state.to_dict()
+                    alerts += [{**{name: status[name] for name in ALERT_FIELDS}, "threshold": round(threshold * 100)}
+                               for threshold in crossed]
+        return alerts, unconverted
+
+    def is_current(self, today: date) -> bool:
+        """Whether ``today`` is in the current period of every budget."""
+        return all(today < state.period_end for state in self.states)
+
+    def add_columns(self, columns: TransactionColumns) -> None:
+        """
+        Add the expenses of a columnar scan to the budgets they count against, with one masked sum per budget.
+
+        Like ``add``, amounts are converted at the rate of their date and
+        the ones without a rate do not count.
+        """
+        expenses = columns.where(transaction_type="expense")
+        converted: Dict[str, np.ndarray] = {}
+        for state in self.states:
+            category = state.budget["category"]
+            mask = expenses & columns.where(
+                since=state.period_start.isoformat(),
+                until=(state.period_end - timedelta(days=1)).isoformat(),
+                category=None if category == ALL_CATEGORIES else category,
+            )
+            currency = state.budget["currency"]
+            if currency not in converted:
+                converted[currency] = columns.converted(currency, get_rate_table())
+            state.spent += float(np.nansum(converted[currency][mask]))
+
+
+class BudgetTracker:
+    """
+    Tracks the spend-to-date of every budget as transactions are written.
+
+    The first time a user's budgets are needed, they are loaded with the
+    user's expenses since the start of each budget's period (``load``), and
+    kept for ``ttl`` seconds or until one of the periods ends. With COLUMNAR_STORE enabled the expenses are
+    summed from the columnar store, otherwise read row by row from storage. From then on ``record``, called by the write
+    path with each batch of stored transactions, adds every expense to the
+    budgets of its category, subcategory and ALL_CATEGORIES with dictionary
+    lookups, and checks it against the next alert threshold with one
+    comparison, whatever the size of the user's history. Reading the
+    status of a loaded user does not touch storage.
+
+    Rows of users that are not loaded are skipped, as loading them reads
+    the rows from storage anyway. Rows written while their user loads are
+    held and applied after the load, unless the load already read them.
+    Reloading after ``ttl`` picks up writes of other processes and
+    corrects any drift.
+    """
+
+    def __init__(
+        self,
+        storage: Optional[Storage] = None,
+        ttl: float = BUDGET_REFRESH_INTERVAL,
+        maxsize: int = BUDGET_TRACKER_SIZE,
+        columnar_store: Optional[ColumnarStore] = None,
+    ):
+        self._storage = storage
+        self._columnar_store = columnar_store
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Alerts of recent writes by transaction_id, until add_transaction picks them up
+        self._alerts = TTLCache(maxsize=maxsize, ttl=BUDGET_ALERT_TTL)
+        self._loading: Dict[str, Tuple[List[dict], threading.Event]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.rows_recorded = 0
+        self.rows_unconverted = 0
+        self.alerts_raised = 0
+
+    @property
+    def storage(self) -> Storage:
+        return self._storage or get_storage()
+
+    @property
+    def columnar_store(self) -> Optional[ColumnarStore]:
+        if self._columnar_store is None and COLUMNAR_STORE_ENABLED:
+            return get_columnar_store()
+        return self._columnar_store
+
+    def _load_expenses(self, user_id: str, budgets: UserBudgets, since: date) -> Set[str]:
+        """Add a user's expenses since a date to their budgets; returns the transaction_ids read."""
+        store = self.columnar_store
+        if store is not None:
+            columns = store.scan(user_id, since=since.isoformat(), with_ids=True)
+            budgets.add_columns(columns)
+            return set(columns.transaction_ids)
+        until = max(state.period_end for state in budgets.states) - timedelta(days=1)
+        rows = self.storage.scan_transactions(
+            user_id, since=since.isoformat(), until=until.isoformat(), transaction_type="expense"
+        )
+        for row in rows:
+            budgets.add(row)
+        return {row["transaction_id"] for row in rows}
+
+    def is_loaded(self, user_id: str, today: Optional[date] = None) -> bool:
+        """Whether a user's budgets are loaded for the periods containing ``today``."""
+        budgets = self._users.get(user_id)
+        return budgets is not None and budgets.is_current(today or date.today())
+
+    def load(self, user_id: str, today: Optional[date] = None) -> UserBudgets:
+        """
+        Get the budgets of a user, loading them and their spend-to-date from storage if needed.
+
+        Budgets loaded for a period that has ended since are reloaded.
+        Concurrent loads of the same user share one.
+        """
+        today = today or date.today()
+        with self._lock:
+            budgets = self._users.get(user_id)
+            if budgets is not None and budgets.is_current(today):
+                return budgets
+            loading = self._loading.get(user_id)
+            if loading is None:
+                loading = self._loading[user_id] = ([], threading.Event())
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            loading[1].wait()
+            return self.load(user_id, today)
+
+        try:
+            states = [BudgetState.from_row(row, today) for row in self.storage.list_budgets(user_id)]
+            budgets = UserBudgets(states)
+            loaded = set()
+            if states:
+                loaded = self._load_expenses(user_id, budgets, min(state.period_start for state in states))
+            for state in states:
+                state.mark_alerted()
+            with self._lock:
+                del self._loading[user_id]
+                self._apply(budgets, [row for row in loading[0] if row["transaction_id"] not in loaded])
+                self._users.set(user_id, budgets)
+                self.loads += 1
+        except Exception:
+            with self._lock:
+                self._loading.pop(user_id, None)
+            raise
+        finally:
+            loading[1].set()
+        return budgets
+
+    def record(self, rows: Iterable[dict]) -> Dict[str, List[dict]]:
+        """
+        Add stored transactions to the spend of the budgets they count against.
+
+        Returns:
+            dict: The alerts raised, by transaction_id; they are also kept for ``pop_alerts``.
+        """
+        alerts: Dict[str, List[dict]] = {}
+        with self._lock:
+            for row in rows:
+                if row.get("transaction_type") != "expense":
+                    continue
+                loading = self._loading.get(row["user_id"])
+                if loading is not None:
+                    loading[0].append(row)
+                    continue
+                budgets = self._users.get(row["user_id"])
+                if budgets is not None and budgets.states:
+                    alerts.update(self._apply(budgets, [row]))
+        return alerts
+
+    def _apply(self, budgets: UserBudgets, rows: List[dict]) -> Dict[str, List[dict]]:
+        alerts = {}
+        for row in rows:
+            raised, unconverted = budgets.add(row)
+            self.rows_recorded += 1
+            self.rows_unconverted += unconverted
+            if raised:
+                alerts[row["transaction_id"]] = raised
+                self._alerts.set(row["transaction_id"], raised)
+                self.alerts_raised += len(raised)
+        return alerts
+
+    def pop_alerts(self, transaction_id: str) -> List[dict]:
+        """Get and forget the alerts raised by a stored transaction."""
+        alerts = self._alerts.get(transaction_id) or []
+        self._alerts.invalidate(transaction_id)
+        return alerts
+
+    def status(self, user_id: str, today: Optional[date] = None) -> List[dict]:
+        """
+        Get the spend-to-date of each budget of a user, loading them if needed.
+
+        Budgets whose period ended before ``today`` are reloaded first.
+        """
+        budgets = self.load(user_id, today)
+        with self._lock:
+            return [state.to_dict() for state in budgets.states]
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's budgets after they change, so the next access reloads them."""
+        self._users.invalidate(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._users),
+            "loads": self.loads,
+            "rows_recorded": self.rows_recorded,
+            "rows_unconverted": self.rows_unconverted,
+            "alerts_raised": self.alerts_raised,
+        }
+
+
+def get_budget_tracker() -> BudgetTracker:
+    """Get the shared budget tracker, on the storage backend of ``get_storage``."""
+    global budget_tracker
+    with _budget_tracker_lock:
+        if budget_tracker is None:
+            budget_tracker = BudgetTracker()
+    return budget_tracker
+
+
+async def aload_budgets(user_id: str, today: Optional[date] = None) -> None:
+    """Load a user's budgets on the database executor, unless they are loaded already."""
+    tracker = get_budget_tracker()
+    if not tracker.is_loaded(user_id, today):
+        await run_blocking(tracker.load, user_id, today)
+
+
+async def aget_budget_status(user_id: str, today: Optional[date] = None) -> List[dict]:
+    """Async version of ``BudgetTracker.status``; only a user that is not loaded yet waits on storage."""
+    await aload_budgets(user_id, today)
+    return get_budget_tracker().status(user_id, today)
+
+
+def format_budget_status(statuses: List[dict]) -> str:
+    """Render budget statuses for an agent instruction, one pipe-separated row per budget."""
+    lines = [f"budgets ({'|'.join(STATUS_COLUMNS)}):"]
+    for status in statuses:
+        lines.append("|".join([
+            status["category"],
+            status["period"],
+            f"{status['spent']:.2f}",
+            f"{status['amount']:.2f}",
+            status["currency"],
+            f"{status['used']}%",
+        ]))
+    if not statuses:
+        lines.append("(none)")
+    return "\n".join(lines)
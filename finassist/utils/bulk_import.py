@@ -0,0 +1,507 @@
+import asyncio
+import csv
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import IO, Iterator, List, Optional, Union
+
+from finassist.utils.async_database import run_blocking
+from finassist.utils.categorizer import TAXONOMY, aget_categorizer, get_categorizer
+from finassist.utils.utils import get_var_env
+from finassist.utils.dedup import submit_transaction
+from finassist.utils.writer import validate_transaction
+
+IMPORT_CHUNK_SIZE = int(get_var_env("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_LLM_BATCH_SIZE = int(get_var_env("IMPORT_LLM_BATCH_SIZE", "40"))
+IMPORT_LLM_CONCURRENCY = int(get_var_env("IMPORT_LLM_CONCURRENCY", "4"))
+MAX_REPORTED_REJECTIONS = 100
+
+# Lowercase header names of the columns statement exports use, by field
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "booking date", "fecha", "fecha de operacion",
+             "fecha operación", "fecha de operación", "value date"),
+    "description": ("description", "details", "memo", "narrative", "payee", "name", "merchant", "concepto",
+                    "descripcion", "descripción", "detalle"),
+    "amount": ("amount", "transaction amount", "importe", "monto", "cantidad"),
+    "debit": ("debit", "withdrawal", "withdrawals", "money out", "paid out", "cargo", "cargos", "retiro", "retiros"),
+    "credit": ("credit", "deposit", "deposits", "money in", "paid in", "abono", "abonos", "deposito", "depósito"),
+    "currency": ("currency", "moneda", "divisa"),
+}
+OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+OFX_CURRENCY = re.compile(r"<CURDEF>\s*([A-Za-z]{3})", re.IGNORECASE)
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d %b %Y", "%d %B %Y", "%b %d, %Y", "%B %d, %Y", "%d-%b-%Y", "%d-%b-%y")
+_AMOUNT_CHARACTERS = re.compile(r"[^\d.,()+-]")
+_THOUSANDS_ONLY = re.compile(r"^\d{1,3}(,\d{3})+$")
+_NUMERIC_DATE = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})$")
+
+
+@dataclass
+class StatementLine:
+    """One transaction read from a statement, before it is resolved."""
+    index: int
+    raw_date: str
+    description: str
+    amount: Optional[float]  # signed as in the statement, None if unreadable
+    currency: Optional[str] = None
+    raw_amount: str = ""
+    reference: Optional[str] = None  # the bank's id of the transaction (OFX FITID), if any
+    transaction_type: Optional[str] = None  # "expense" or "income" when a debit or credit column says so
+
+
+@dataclass
+class ImportReport:
+    """What a bulk import did."""
+    rows_read: int = 0
+    rows_written: int = 0
+    duplicates: int = 0
+    resolved_locally: int = 0
+    resolved_by_llm: int = 0
+    uncategorized: int = 0
+    llm_calls: int = 0
+    rejected: int = 0
+    rejections: List[dict] = field(default_factory=list)
+    elapsed_s: float = 0.0
+
+    @property
+    def rows_per_minute(self) -> float:
+        return self.rows_written / self.elapsed_s * 60 if self.elapsed_s else 0.0
+
+    def reject(self, line: StatementLine, reason: str) -> None:
+        self.rejected += 1
+        if len(self.rejections) < MAX_REPORTED_REJECTIONS:
+            self.rejections.append({"index": line.index, "description": line.description, "reason": reason})
+
+
+def parse_statement_amount(text: str) -> Optional[float]:
+    """
+    Read a signed amount as banks export it.
+
+    Handles currency symbols, thousands separators, "1.234,56" decimal commas,
+    and negatives written as "-45.00", "45.00-" or "(45.00)". A lone comma
+    followed by three digits ("1,234") is read as a thousands separator.
+    """
+    text = _AMOUNT_CHARACTERS.sub("", text or "")
+    if not text:
+        return None
+    negative = text.startswith("(") and text.endswith(")") or text.startswith("-") or text.endswith("-")
+    text = text.strip("()+-")
+    if _THOUSANDS_ONLY.match(text):
+        text = text.replace(",", "")
+    elif "," in text and ("." not in text or text.rindex(",") > text.rindex(".")):
+        # The comma is the decimal separator: "1.234,56" or "45,00"
+        text = text.replace(".", "").replace(",", ".")
+    else:
+        text = text.replace(",", "")
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def parse_statement_date(text: str, day_first: bool = True) -> Optional[date]:
+    """Read a statement date: ISO, OFX ("20250615120000"), numeric ("15/06/2025") or with a month name."""
+    text = (text or "").strip()
+    if re.match(r"^\d{8}", text):
+        try:
+            return datetime.strptime(text[:8], "%Y%m%d").date()
+        except ValueError:
+            return None
+    match = _NUMERIC_DATE.match(text)
+    if match:
+        first, second, year = (int(part) for part in match.groups())
+        day, month = (first, second) if day_first else (second, first)
+        if day <= 12 < month:
+            day, month = month, day
+        try:
+            return date(year + 2000 if year < 100 else year, month, day)
+        except ValueError:
+            return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _find_column(header: List[str], names: tuple) -> Optional[int]:
+    normalized = [name.strip().lower() for name in header]
+    for name in names:
+        if name in normalized:
+            return normalized.index(name)
+    return None
+
+
+def iter_csv_lines(file: IO[str]) -> Iterator[StatementLine]:
+    """
+    Read a CSV export row by row.
+
+    Columns are found by their header name (see CSV_COLUMNS): either one
+    signed amount column or separate debit and credit columns. Rows read
+    from debit and credit columns carry their transaction type.
+
+    Raises:
+        ValueError: If the header has no date, description or amount columns.
+    """
+    sample = file.read(4096)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(_chain(sample, file), dialect)
+    header = next(reader, None) or []
+    columns = {name: _find_column(header, aliases) for name, aliases in CSV_COLUMNS.items()}
+    if columns["date"] is None or columns["description"] is None:
+        raise ValueError(f"CSV header needs date and description columns, got {header}.")
+    if columns["amount"] is None and columns["debit"] is None and columns["credit"] is None:
+        raise ValueError(f"CSV header needs an amount column or debit/credit columns, got {header}.")
+
+    def cell(row: List[str], name: str) -> str:
+        index = columns[name]
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    for index, row in enumerate(reader):
+        if not any(value.strip() for value in row):
+            continue
+        transaction_type = None
+        if columns["amount"] is not None:
+            raw_amount = cell(row, "amount")
+            amount = parse_statement_amount(raw_amount)
+        else:
+            debit, credit = parse_statement_amount(cell(row, "debit")), parse_statement_amount(cell(row, "credit"))
+            raw_amount = cell(row, "debit") or cell(row, "credit")
+            amount = -abs(debit) if debit else (abs(credit) if credit else None)
+            if amount:
+                transaction_type = "expense" if debit else "income"
+        yield StatementLine(
+            index=index,
+            raw_date=cell(row, "date"),
+            description=cell(row, "description"),
+            amount=amount,
+            currency=cell(row, "currency").upper() or None,
+            raw_amount=raw_amount,
+            transaction_type=transaction_type,
+        )
+
+
+def _chain(sample: str, file: IO[str]) -> Iterator[str]:
+    """Lines of the already-read sample followed by the rest of the file."""
+    rest = file.readline()
+    yield from (sample + rest).splitlines(keepends=True)
+    yield from file
+
+
+def iter_ofx_lines(file: IO[str], read_size: int = 65536) -> Iterator[StatementLine]:
+    """
+    Read the ``<STMTTRN>`` blocks of an OFX file (SGML 1.x or XML 2.x).
+
+    The file is read in blocks and only unfinished transactions are kept
+    between them, so memory does not grow with the file.
+    """
+    buffer, currency, index = "", None, 0
+    while True:
+        block = file.read(read_size)
+        buffer += block
+        if currency is None:
+            match = OFX_CURRENCY.search(buffer)
+            currency = match.group(1).upper() if match else None
+        end = 0
+        for match in OFX_TRANSACTION.finditer(buffer):
+            fields = {name.upper(): value.strip() for name, value in OFX_FIELD.findall(match.group(1))}
+            description = " ".join(filter(None, (fields.get("NAME"), fields.get("MEMO"))))
+            yield StatementLine(
+                index=index,
+                raw_date=fields.get("DTPOSTED", ""),
+                description=description,
+                amount=parse_statement_amount(fields.get("TRNAMT", "")),
+                currency=currency,
+                raw_amount=fields.get("TRNAMT", ""),
+                reference=fields.get("FITID") or None,
+            )
+            index += 1
+            end = match.end()
+        buffer = buffer[end:]
+        if not block:
+            return
+        # Keep only what can still be part of a transaction
+        start = buffer.upper().rfind("<STMTTRN>")
+        buffer = buffer[start:] if start >= 0 else buffer[-16:]
+
+
+def detect_format(file: IO[str], name: Optional[str] = None) -> str:
+    """Tell "ofx" from "csv" by file extension, or else by the first bytes."""
+    if name and name.lower().endswith((".ofx", ".qfx")):
+        return "ofx"
+    if name and name.lower().endswith((".csv", ".tsv", ".txt")):
+        return "csv"
+    head = file.read(512)
+    file.seek(0)
+    return "ofx" if "OFXHEADER" in head.upper() or "<OFX>" in head.upper() else "csv"
+
+
+def iter_chunks(lines: Iterator[StatementLine], size: int) -> Iterator[List[StatementLine]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def taxonomy_text() -> str:
+    """The category and subcategory pairs the batch prompt may use, one category per line."""
+    return "\n".join(f"{category}: {', '.join(subcategories)}" for category, subcategories in TAXONOMY.items())
+
+
+def resolve_line(line: StatementLine, user_id: str, account, day_first: bool, expenses_negative: bool = True) -> dict:
+    """
+    Turn a statement line into transaction fields without calling a model.
+
+    The type comes from the line's debit or credit column, or else from the
+    sign of the amount; the currency from the line or the account, and the
+    category from the local categorizer when it is confident. Fields that
+    cannot be read are left as None.
+    """
+    transaction_date = parse_statement_date(line.raw_date, day_first)
+    transaction_type = line.transaction_type
+    if transaction_type is None and line.amount:
+        transaction_type = "expense" if (line.amount < 0) == expenses_negative else "income"
+    data = {
+        "user_id": user_id,
+        "account_id": account.account_id,
+        "amount": abs(line.amount) if line.amount else None,
+        "currency": line.currency or account.currency,
+        "transaction_type": transaction_type,
+        "transaction_date": transaction_date.isoformat() if transaction_date else None,
+        "category": None,
+        "subcategory": None,
+        "notes": line.description,
+    }
+    if line.description:
+        categorizer = get_categorizer()
+        result = categorizer.categorize(line.description, transaction_type, user_id)
+        if categorizer.is_confident(result):
+            data.update(category=result.category, subcategory=result.subcategory)
+    return data
+
+
+def is_resolved(data: dict) -> bool:
+    return all(data.get(name) for name in ("amount", "transaction_type", "transaction_date", "category"))
+
+
+def parse_batch_reply(text: str) -> List[dict]:
+    """Read the JSON array of a batch reply, tolerating a Markdown code fence around it."""
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        raise ValueError("Batch reply holds no JSON array.")
+    items = json.loads(text[start:end + 1])
+    return [item for item in items if isinstance(item, dict) and isinstance(item.get("index"), int)]
+
+
+def merge_batch_item(data: dict, item: dict) -> None:
+    """Fill the fields the model resolved, keeping what was already parsed locally."""
+    if not data["amount"] and isinstance(item.get("amount"), (int, float)) and item["amount"] > 0:
+        data["amount"] = float(item["amount"])
+    if not data["transaction_type"] and item.get("transaction_type") in ("expense", "income"):
+        data["transaction_type"] = item["transaction_type"]
+    if not data["transaction_date"] and item.get("transaction_date"):
+        data["transaction_date"] = str(item["transaction_date"])
+    subcategories = TAXONOMY.get(item.get("category"), {})
+    if not data["category"] and item.get("subcategory") in subcategories:
+        data.update(category=item["category"], subcategory=item["subcategory"])
+
+
+async def resolve_with_model(model, batch: List[tuple], instruction: str, semaphore: asyncio.Semaphore) -> None:
+    """
+    Ask the transaction agent's model to complete a batch of unresolved rows in one call.
+
+    Args:
+        model (BaseLlm): The model to call.
+        batch (list): ``(StatementLine, data)`` pairs; ``data`` is updated in place.
+        instruction (str): The batch system instruction.
+        semaphore (asyncio.Semaphore): Bounds the calls in flight.
+    """
+    # Imported here so parsing statements does not load google-adk
+    from google.adk.models.llm_request import LlmRequest
+    from google.genai import types
+
+    rows = [
+        {
+            "index": line.index,
+            "date": data["transaction_date"] or line.raw_date or None,
+            "description": line.description,
+            "amount": data["amount"] or line.raw_amount or None,
+            "transaction_type": data["transaction_type"],
+        }
+        for line, data in batch
+    ]
+    request = LlmRequest(
+        model=model.model,
+        contents=[types.Content(role="user", parts=[types.Part(text=json.dumps(rows, ensure_ascii=False))])],
+        config=types.GenerateContentConfig(system_instruction=instruction),
+    )
+    async with semaphore:
+        text = ""
+        async for response in model.generate_content_async(request, stream=False):
+            if response.content and response.content.parts:
+                text = "".join(part.text for part in response.content.parts if part.text)
+    by_index = {item["index"]: item for item in parse_batch_reply(text)}
+    for line, data in batch:
+        if line.index in by_index:
+            merge_batch_item(data, by_index[line.index])
+
+
+def _open_source(source: Union[str, IO[str]]) -> IO[str]:
+    if isinstance(source, str):
+        # utf-8-sig drops the byte order mark spreadsheet exports start with
+        return open(source, encoding="utf-8-sig", errors="replace", newline="")
+    return source
+
+
+async def import_statement(
+    source: Union[str, IO[str]],
+    user_id: str,
+    account_id: str,
+    file_format: Optional[str] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    model=None,
+    day_first: Optional[bool] = None,
+    expenses_negative: bool = True,
+) -> ImportReport:
+    """
+    Import a bank statement (CSV or OFX) into an account.
+
+    The file is read one chunk of ``chunk_size`` rows at a time. Each row is
+    parsed and categorized locally first; only the rows left without an
+    amount, type, date or category go to the transaction agent's model, in
+    batches of IMPORT_LLM_BATCH_SIZE rows per call. Every chunk is then
+    validated like ``add_transaction`` input and written through the shared
+    transaction writer, so memory stays bounded by the chunk size whatever
+    the file size.
+
+    Rows already stored (an overlapping statement imported before) are
+    skipped and counted as duplicates. OFX transaction ids are used as
+    idempotency keys; other rows are matched on their content, and each
+    stored transaction absorbs at most one row of the import, so identical
+    purchases within one statement are all kept.
+
+    Rows the model could not categorize are stored without a category; rows
+    still missing an amount, type or date are rejected and reported.
+
+    Args:
+        source (str | file): A path, or an open text file.
+        user_id (str): The user the transactions belong to.
+        account_id (str): One of the user's accounts.
+        file_format (str): "csv" or "ofx"; detected from the file when None.
+        chunk_size (int): Rows parsed, resolved and written together.
+        model (BaseLlm): Model for the unresolved rows, TRANSACTION_AGENT_MODEL by default.
+        day_first (bool): Read "03/04/2025" as 3 April. Defaults to True unless
+            the user's language is English.
+        expenses_negative (bool): Whether a signed amount column shows money
+            leaving the account as negative amounts; credit card exports often
+            do the opposite. Debit and credit columns are read as they are.
+
+    Returns:
+        ImportReport: Counts of rows read, written, skipped as duplicates, resolved and rejected.
+
+    Raises:
+        ValueError: If the account is not one of the user's, or the file cannot be read as a statement.
+    """
+    # Imported here so parsing statements does not load the storage backends
+    from finassist.utils.extraction import user_today
+    from finassist.utils.storage import aget_cached_user_context, get_storage, invalidate_user_context
+
+    start = time.perf_counter()
+    accounts = {account.account_id: account for account in await run_blocking(get_storage().list_accounts, user_id)}
+    account = accounts.get(account_id)
+    if account is None:
+        raise ValueError(f"Account {account_id} not found for user {user_id}.")
+    user_context = await aget_cached_user_context(user_id)
+    if day_first is None:
+        day_first = not (user_context and user_context.language.lower().startswith("en"))
+    # Statement dates are checked against the user's today, which can be ahead of the server's
+    today = user_today(user_context.timezone) if user_context else None
+
+    categorizer = await aget_categorizer(user_id)
+    report = ImportReport()
+    matched = set()  # transactions this import wrote or matched as duplicates
+    instruction = None
+    semaphore = asyncio.Semaphore(IMPORT_LLM_CONCURRENCY)
+
+    file = _open_source(source)
+    try:
+        name = source if isinstance(source, str) else getattr(file, "name", None)
+        file_format = file_format or detect_format(file, name if isinstance(name, str) else None)
+        lines = iter_ofx_lines(file) if file_format == "ofx" else iter_csv_lines(file)
+
+        for chunk in iter_chunks(lines, chunk_size):
+            report.rows_read += len(chunk)
+            resolved = [(line, resolve_line(line, user_id, account, day_first, expenses_negative)) for line in chunk]
+            unresolved = [(line, data) for line, data in resolved if not is_resolved(data)]
+            report.resolved_locally += len(resolved) - len(unresolved)
+
+            if unresolved:
+                if model is None:
+                    # Imported here so imports that resolve every row never build a model
+                    from finassist.utils.models import get_model
+                    model = get_model("TRANSACTION_AGENT_MODEL", "transaction_agent")
+                if instruction is None:
+                    # Imported here to keep the agents package out of plain parsing
+                    from finassist.subagents.data_manager.transaction.prompt import TRANSACTION_BATCH_PROMPT
+                    from finassist.utils.prompt_builder import build_instruction
+                    instruction = build_instruction(TRANSACTION_BATCH_PROMPT, [("CATEGORIES", taxonomy_text())])
+                batches = [
+                    unresolved[offset:offset + IMPORT_LLM_BATCH_SIZE]
+                    for offset in range(0, len(unresolved), IMPORT_LLM_BATCH_SIZE)
+                ]
+                report.llm_calls += len(batches)
+                results = await asyncio.gather(
+                    *(resolve_with_model(model, batch, instruction, semaphore) for batch in batches),
+                    return_exceptions=True,
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        print("Error resolving statement rows:", result)
+                report.resolved_by_llm += sum(is_resolved(data) for _, data in unresolved)
+
+            rows, sources = [], []
+            for line, data in resolved:
+                try:
+                    rows.append(validate_transaction(data, today))
+                    sources.append(line)
+                except ValueError as e:
+                    report.reject(line, str(e))
+            results = await asyncio.gather(
+                *(
+                    submit_transaction(
+                        row,
+                        idempotency_key=f"ofx:{account_id}:{line.reference}" if line.reference else None,
+                        exclude=matched,
+                    )
+                    for line, row in zip(sources, rows)
+                ),
+                return_exceptions=True,
+            )
+            for line, row, result in zip(sources, rows, results):
+                if isinstance(result, Exception):
+                    report.reject(line, str(result))
+                    continue
+                if result[1]:
+                    report.duplicates += 1
+                    continue
+                report.rows_written += 1
+                report.uncategorized += row["category"] is None
+                categorizer.learn(row)
+            invalidate_user_context(user_id)
+    finally:
+        if file is not source:
+            file.close()
+
+    report.elapsed_s = time.perf_counter() - start
+    return report
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    A bounded, thread-safe cache with per-entry TTL and LRU eviction.
+
+    Entries expire ``ttl`` seconds after they were stored. When the cache is
+    full, the least recently used entry is evicted to make room.
+
+    ``on_remove(key, value)`` is called, under the cache lock, whenever an
+    entry leaves the cache or is replaced, so it must be quick and must not
+    call back into the cache.
+
+    A value loaded while its key is invalidated would be stale when stored.
+    Loaders read ``generation(key)`` before loading and pass it to ``set``,
+    which then skips the value if the key was invalidated since.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+        on_remove: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._on_remove = on_remove
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Stamp of each key's last invalidation, for the most recent ``maxsize`` keys. Older
+        # keys share the floor, the newest stamp dropped, so a load never misses one.
+        self._generations: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._generation_floor = 0
+        self._stamp = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key``, or ``default`` if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self._removed(key, value)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like ``get``, but leaves the statistics and the LRU order untouched."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= self._clock():
+                return default
+            return entry[0]
+
+    def generation(self, key: Hashable) -> int:
+        """Return the stamp of the last invalidation of ``key``, to pass to ``set`` after a load."""
+        with self._lock:
+            return self._generations.get(key, self._generation_floor)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None) -> None:
+        """
+        Store ``value`` under ``key``, evicting the least recently used entry if full.
+
+        ``ttl`` overrides the cache's TTL for this entry, e.g. for a value
+        that was already cached elsewhere for a while. With ``generation``,
+        as read before loading the value, the value is not stored if ``key``
+        was invalidated since.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, self._generation_floor):
+                return
+            previous = self._data.get(key)
+            if previous is not None and previous[0] is not value:
+                self._removed(key, previous[0])
+            self._data[key] = (value, self._clock() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted_key, (evicted_value, _) = self._data.popitem(last=False)
+                self._removed(evicted_key, evicted_value)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[Hashable], Any]) -> Any:
+        """
+        Return the cached value for ``key``, calling ``loader(key)`` on a miss.
+
+        ``None`` results from the loader are not cached, so lookups for
+        entities that do not exist yet are retried on the next call.
+        """
+        value = self.get(key)
+        if value is None:
+            generation = self.generation(key)
+            value = loader(key)
+            if value is not None:
+                self.set(key, value, generation=generation)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` from the cache if present; values loaded before are not stored."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._removed(key, entry[0])
+            self._stamp += 1
+            self._generations[key] = self._stamp
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.maxsize:
+                self._generation_floor = max(self._generation_floor, self._generations.popitem(last=False)[1])
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters; values loaded before are not stored."""
+        with self._lock:
+            for key, (value, _) in self._data.items():
+                self._removed(key, value)
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+            self._stamp += 1
+            self._generation_floor = self._stamp
+            self._generations.clear()
+
+    def _removed(self, key: Hashable, value: Any) -> None:
+        if self._on_remove is not None:
+            self._on_remove(key, value)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] > self._clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
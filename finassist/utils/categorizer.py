@@ -0,0 +1,378 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from finassist.utils.utils import get_var_env
+
+CATEGORIZER_CONFIDENCE_THRESHOLD = float(get_var_env("CATEGORIZER_CONFIDENCE_THRESHOLD", "0.7"))
+# History a user's merchants are learned from: the newest rows of the last days
+CATEGORIZER_HISTORY_DAYS = int(get_var_env("CATEGORIZER_HISTORY_DAYS", "365"))
+CATEGORIZER_HISTORY_LIMIT = int(get_var_env("CATEGORIZER_HISTORY_LIMIT", "2000"))
+INCOME_CATEGORY = "Income"
+
+# category -> subcategory -> keywords (lowercase words or phrases, merchants included)
+TAXONOMY: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "Food": {
+        "Restaurants": ("restaurant", "dinner", "lunch", "brunch", "bistro", "taqueria", "tacos", "sushi", "restaurante", "comida", "cena"),
+        "Groceries": ("groceries", "grocery", "supermarket", "walmart", "costco", "soriana", "chedraui", "whole foods", "trader joe", "super", "despensa", "mandado"),
+        "Fast Food": ("mcdonalds", "burger king", "kfc", "subway", "fast food", "burger", "hot dog", "dominos", "little caesars", "pizza"),
+        "Coffee/Tea": ("coffee", "starbucks", "cafe", "latte", "cappuccino", "espresso", "tea", "café"),
+        "Delivery": ("delivery", "uber eats", "rappi", "didi food", "doordash", "grubhub", "deliveroo"),
+        "Alcohol": ("beer", "wine", "liquor", "bar", "drinks", "cerveza", "vino", "pub"),
+        "Snacks": ("snack", "snacks", "candy", "chips", "ice cream", "oxxo", "7-eleven", "seven eleven"),
+    },
+    "Transportation": {
+        "Gas": ("gas", "gasoline", "fuel", "petrol", "gasolina", "pemex", "shell", "chevron", "exxon"),
+        "Public Transport": ("metro", "subway ticket", "bus", "train", "metrobus", "transit", "camion"),
+        "Taxi/Uber": ("uber", "lyft", "taxi", "cab", "didi", "cabify"),
+        "Parking": ("parking", "estacionamiento", "valet"),
+        "Car Maintenance": ("mechanic", "oil change", "tires", "car wash", "car repair", "servicio del auto"),
+        "Tolls": ("toll", "tolls", "caseta", "peaje", "tag"),
+        "Flights": ("flight", "airline", "plane ticket", "aeromexico", "volaris", "vivaaerobus", "delta", "united airlines", "american airlines", "vuelo"),
+        "Car Rental": ("car rental", "rental car", "hertz", "avis", "europcar"),
+    },
+    "Entertainment": {
+        "Movies": ("movie", "movies", "cinema", "cinepolis", "cinemex", "amc", "cine"),
+        "Streaming": ("netflix", "spotify", "hbo", "max", "disney", "prime video", "hulu", "youtube premium", "apple tv", "paramount", "streaming"),
+        "Games": ("game", "games", "steam", "playstation", "xbox", "nintendo", "videogame"),
+        "Books": ("novel", "kindle", "audible", "bookstore", "gandhi"),
+        "Music": ("music", "vinyl", "apple music", "guitar"),
+        "Sports Events": ("match", "stadium", "football game", "soccer game", "baseball", "nba", "nfl", "partido"),
+        "Concerts": ("concert", "ticketmaster", "festival", "concierto"),
+        "Hobbies": ("hobby", "crafts", "lego", "painting supplies"),
+    },
+    "Services": {
+        "Utilities": ("electricity", "electric bill", "water bill", "gas bill", "cfe", "utilities", "luz", "agua"),
+        "Internet": ("internet", "wifi", "telmex", "izzi", "totalplay", "comcast", "xfinity", "broadband"),
+        "Phone": ("phone bill", "cell phone", "mobile plan", "telcel", "at&t", "verizon", "t-mobile", "movistar", "recarga"),
+        "Insurance": ("insurance", "seguro", "geico", "axa", "gnp"),
+        "Bank Fees": ("bank fee", "commission", "overdraft", "annual fee", "comision", "atm fee", "anualidad"),
+        "Subscriptions": ("subscription", "membership", "icloud", "google one", "chatgpt", "dropbox", "suscripcion"),
+        "Professional Services": ("lawyer", "accountant", "consultant", "notary", "abogado", "contador"),
+    },
+    "Shopping": {
+        "Clothing": ("clothes", "clothing", "shirt", "jeans", "jacket", "shoes", "dress", "zara", "h&m", "uniqlo", "ropa", "zapatos", "liverpool"),
+        "Electronics": ("laptop", "phone case", "headphones", "charger", "tv", "monitor", "best buy", "apple store", "electronics", "iphone"),
+        "Home Items": ("home depot", "ikea", "kitchen", "sheets", "towels", "homegoods", "decor"),
+        "Gifts": ("gift", "present", "regalo", "birthday gift"),
+        "Personal Care": ("haircut", "barber", "salon", "shampoo", "cosmetics", "makeup", "sephora", "skincare"),
+        "Accessories": ("watch", "sunglasses", "wallet", "backpack", "jewelry", "bag"),
+        "Online Shopping": ("amazon", "mercado libre", "mercadolibre", "aliexpress", "shein", "ebay", "temu", "online order"),
+    },
+    "Health": {
+        "Medical": ("doctor", "hospital", "clinic", "medical", "consulta", "checkup", "lab tests", "medico"),
+        "Pharmacy": ("pharmacy", "medicine", "farmacia", "walgreens", "cvs", "prescription", "medicina", "benavides"),
+        "Dental": ("dentist", "dental", "orthodontist", "dentista", "braces"),
+        "Vision": ("glasses", "contacts", "optometrist", "eye exam", "lentes"),
+        "Fitness": ("gym", "smart fit", "crossfit", "yoga", "pilates", "fitness", "gimnasio"),
+        "Mental Health": ("therapy", "therapist", "psychologist", "psychiatrist", "terapia"),
+        "Supplements": ("vitamins", "protein", "supplements", "creatine", "suplementos"),
+    },
+    "Education": {
+        "Tuition": ("tuition", "school fees", "university", "colegiatura", "semester"),
+        "Books": ("textbook", "textbooks", "school books", "libros"),
+        "Courses": ("course", "class", "workshop", "curso", "lessons"),
+        "Training": ("training", "bootcamp", "capacitacion"),
+        "Certifications": ("certification", "exam fee", "certificate", "certificacion"),
+        "Online Learning": ("udemy", "coursera", "platzi", "duolingo", "edx", "masterclass"),
+    },
+    "Housing": {
+        "Rent": ("rent", "renta", "landlord", "alquiler"),
+        "Mortgage": ("mortgage", "hipoteca", "home loan"),
+        "Home Improvement": ("repairs", "plumber", "electrician", "paint", "renovation", "remodel"),
+        "Furniture": ("furniture", "sofa", "couch", "mattress", "desk", "chair", "muebles"),
+        "Appliances": ("appliance", "fridge", "refrigerator", "washing machine", "microwave", "dryer"),
+        "Cleaning": ("cleaning", "cleaning supplies", "detergent", "maid", "limpieza"),
+        "Gardening": ("garden", "gardening", "plants", "gardener", "jardin"),
+    },
+    INCOME_CATEGORY: {
+        "Salary": ("salary", "paycheck", "payroll", "nomina", "sueldo", "wages"),
+        "Freelance": ("freelance", "client payment", "invoice", "gig", "contract work", "honorarios"),
+        "Investment": ("dividend", "dividends", "interest", "returns", "capital gains", "cetes", "rendimientos"),
+        "Bonus": ("bonus", "aguinaldo", "commission bonus"),
+        "Rental": ("rental income", "tenant", "airbnb payout"),
+        "Business": ("sales", "business income", "revenue", "ventas"),
+        "Other Income": ("refund", "cashback", "gift money", "reimbursement", "reembolso"),
+    },
+}
+
+# Words that never identify a merchant on their own
+STOPWORDS = {
+    "a", "an", "the", "i", "my", "me", "we", "our", "on", "at", "in", "for", "from", "to", "with", "of", "and",
+    "or", "by", "via", "using", "today", "yesterday", "spent", "paid", "pay", "bought", "buy", "purchased",
+    "got", "received", "card", "credit", "debit", "cash", "account", "pesos", "peso", "dollars", "dollar",
+    "usd", "mxn", "eur", "euros", "mx", "en", "de", "la", "el", "con", "mi", "un", "una", "para", "por",
+    "this", "that", "last", "week", "month", "morning", "night", "some", "it", "was", "is", "expense", "income",
+}
+
+_WORD = re.compile(r"[a-z0-9áéíóúñ&'-]+")
+Label = Tuple[str, str]
+
+
+@dataclass
+class Categorization:
+    """The category picked for a transaction and how sure the categorizer is about it."""
+    category: Optional[str]
+    subcategory: Optional[str]
+    confidence: float
+    source: str  # "merchant", "keywords" or "none"
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lowercase words with digits and punctuation-only tokens dropped."""
+    return [word.strip("'-") for word in _WORD.findall((text or "").lower()) if not word.strip("'-").isdigit() and word.strip("'-")]
+
+
+def ngrams(words: List[str], max_n: int = 3) -> Iterable[str]:
+    for n in range(1, max_n + 1):
+        for start in range(len(words) - n + 1):
+            yield " ".join(words[start:start + n])
+
+
+def merchant_keys(text: str) -> List[str]:
+    """
+    Candidate merchant names in a description: its non-stopword words and word pairs.
+
+    "Paid Netflix 219 pesos" gives ``["netflix"]``, and "Uber Eats order"
+    gives ``["uber", "eats", "order", "uber eats", "eats order"]``.
+    """
+    words = [word for word in normalize_words(text) if word not in STOPWORDS and len(word) > 1]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class KeywordIndex:
+    """
+    Inverted index from taxonomy keywords (1-3 word n-grams) to subcategories.
+
+    A keyword shared by several subcategories counts less for each of them,
+    in the spirit of IDF, and longer phrases count more than single words.
+    """
+
+    def __init__(self, taxonomy: Dict[str, Dict[str, Tuple[str, ...]]] = TAXONOMY):
+        self.postings: Dict[str, List[Label]] = defaultdict(list)
+        for category, subcategories in taxonomy.items():
+            for subcategory, keywords in subcategories.items():
+                for keyword in set(keywords) | {subcategory.lower()}:
+                    self.postings[" ".join(normalize_words(keyword))].append((category, subcategory))
+        self.max_n = max(len(keyword.split()) for keyword in self.postings)
+
+    def score(self, text: str) -> Counter:
+        scores = Counter()
+        for gram in set(ngrams(normalize_words(text), self.max_n)):
+            labels = self.postings.get(gram)
+            if labels:
+                weight = len(gram.split()) / len(labels)
+                for label in labels:
+                    scores[label] += weight
+        return scores
+
+
+class MerchantCache:
+    """
+    Merchant -> (category, subcategory) counts learned from stored transactions.
+
+    A merchant key is trusted once it has been seen ``min_support`` times
+    with one label dominating; its confidence grows with support and purity.
+    """
+
+    def __init__(self, min_support: int = 2, maxsize: int = 20_000):
+        self.min_support = min_support
+        self.maxsize = maxsize
+        self.counts: Dict[str, Counter] = {}
+
+    def learn(self, text: str, label: Label) -> None:
+        for key in merchant_keys(text):
+            counter = self.counts.get(key)
+            if counter is None:
+                if len(self.counts) >= self.maxsize:
+                    continue
+                counter = self.counts[key] = Counter()
+            counter[label] += 1
+
+    def lookup(self, text: str) -> Tuple[Optional[Label], float]:
+        best_label, best_confidence = None, 0.0
+        for key in merchant_keys(text):
+            counter = self.counts.get(key)
+            if not counter:
+                continue
+            label, hits = counter.most_common(1)[0]
+            support = sum(counter.values())
+            if support < self.min_support:
+                continue
+            # Purity discounted by support, so one lucky match does not look certain
+            confidence = hits / support * (1 - 1 / (support + 2))
+            if confidence > best_confidence:
+                best_label, best_confidence = label, confidence
+        return best_label, best_confidence
+
+
+class Categorizer:
+    """
+    Assigns a transaction to the taxonomy without calling a model.
+
+    A merchant cache learned from the user's own stored transactions answers
+    for merchants that user has used before ("Netflix", "Starbucks");
+    otherwise the taxonomy keyword index scores the description. When both
+    agree their confidences combine. Callers should only trust results at or
+    above ``threshold`` and let the LLM categorize the rest.
+
+    Merchants are kept per user and a user's recent history is only read the
+    first time that user needs it, see ``aget_categorizer``.
+    """
+
+    def __init__(self, threshold: float = CATEGORIZER_CONFIDENCE_THRESHOLD, taxonomy=TAXONOMY):
+        self.threshold = threshold
+        self.taxonomy = taxonomy
+        self.keywords = KeywordIndex(taxonomy)
+        self.merchants: Dict[Optional[str], MerchantCache] = {}
+        self._loaded: Set[str] = set()
+        # Transactions learned while a user's history was not loaded, so the load does not count them twice
+        self._learned_before_load: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.fallbacks = 0
+        self.loads = 0
+
+    def categorize(self, text: str, transaction_type: Optional[str] = None, user_id: Optional[str] = None) -> Categorization:
+        """
+        Pick a category and subcategory for a transaction description.
+
+        Args:
+            text (str): The user message or transaction notes.
+            transaction_type (str): "income" restricts the result to the Income
+                category, "expense" excludes it.
+            user_id (str): Whose merchants to look the description up in.
+
+        Returns:
+            Categorization: The best label and its confidence between 0 and 1.
+        """
+        def allowed(label: Optional[Label]) -> bool:
+            if label is None or transaction_type not in ("income", "expense"):
+                return label is not None
+            return (label[0] == INCOME_CATEGORY) == (transaction_type == "income")
+
+        merchant_label, merchant_confidence = None, 0.0
+        with self._lock:
+            merchants = self.merchants.get(user_id)
+            if merchants is not None:
+                merchant_label, merchant_confidence = merchants.lookup(text)
+        if not allowed(merchant_label):
+            merchant_label, merchant_confidence = None, 0.0
+
+        scores = Counter({label: score for label, score in self.keywords.score(text).items() if allowed(label)})
+        keyword_label, keyword_confidence = None, 0.0
+        if scores:
+            (keyword_label, best), *rest = scores.most_common(2)
+            runner_up = rest[0][1] if rest else 0.0
+            # Margin over the runner-up, saturating with the amount of evidence
+            keyword_confidence = (best - runner_up) / best * (1 - math.exp(-1.5 * best))
+
+        if merchant_label and merchant_label == keyword_label:
+            result = Categorization(*merchant_label, 1 - (1 - merchant_confidence) * (1 - keyword_confidence), "merchant")
+        elif merchant_confidence >= keyword_confidence and merchant_label:
+            result = Categorization(*merchant_label, merchant_confidence, "merchant")
+        elif keyword_label:
+            result = Categorization(*keyword_label, keyword_confidence, "keywords")
+        else:
+            result = Categorization(None, None, 0.0, "none")
+
+        with self._lock:
+            if result.confidence >= self.threshold:
+                self.hits[result.source] += 1
+            else:
+                self.fallbacks += 1
+        return result
+
+    def is_confident(self, result: Categorization) -> bool:
+        return result.category is not None and result.confidence >= self.threshold
+
+    def is_loaded(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._loaded
+
+    def learn(self, transaction: dict) -> None:
+        """Teach the merchant cache of the transaction's user the category of a stored transaction."""
+        category, subcategory = transaction.get("category"), transaction.get("subcategory")
+        if category not in self.taxonomy or not transaction.get("notes"):
+            return
+        user_id = transaction.get("user_id")
+        with self._lock:
+            if user_id not in self._loaded and transaction.get("transaction_id"):
+                self._learned_before_load[user_id].add(transaction["transaction_id"])
+            self._learn(user_id, transaction["notes"], (category, subcategory or ""))
+
+    def _learn(self, user_id: Optional[str], text: str, label: Label) -> None:
+        merchants = self.merchants.get(user_id)
+        if merchants is None:
+            merchants = self.merchants[user_id] = MerchantCache()
+        merchants.learn(text, label)
+
+    def learn_from_storage(self, storage, user_id: str, today: Optional[date] = None) -> int:
+        """
+        Learn a user's merchants from their recent transactions, unless they are learned already.
+
+        Only the newest ``CATEGORIZER_HISTORY_LIMIT`` transactions of the last
+        ``CATEGORIZER_HISTORY_DAYS`` days are read. This blocks on storage:
+        from async code go through ``aget_categorizer``.
+
+        Returns:
+            int: The number of transactions read.
+        """
+        if self.is_loaded(user_id):
+            return 0
+        since = (today or date.today()) - timedelta(days=CATEGORIZER_HISTORY_DAYS)
+        rows = storage.scan_transactions(user_id, since=since.isoformat(), limit=CATEGORIZER_HISTORY_LIMIT)
+        with self._lock:
+            if user_id in self._loaded:
+                return 0
+            learned = self._learned_before_load.pop(user_id, set())
+            for row in rows:
+                if row.get("transaction_id") in learned:
+                    continue
+                if row.get("category") in self.taxonomy and row.get("notes"):
+                    self._learn(user_id, row["notes"], (row["category"], row.get("subcategory") or ""))
+            self._loaded.add(user_id)
+            self.loads += 1
+        return len(rows)
+
+    def stats(self) -> dict:
+        """Return how many descriptions were categorized locally and how many were left to the LLM."""
+        with self._lock:
+            return {
+                "local": dict(self.hits),
+                "fallbacks": self.fallbacks,
+                "users": len(self.merchants),
+                "loads": self.loads,
+                "merchants": sum(len(merchants.counts) for merchants in self.merchants.values()),
+            }
+
+
+categorizer = None
+_categorizer_lock = threading.Lock()
+
+
+def get_categorizer() -> Categorizer:
+    """Get the shared categorizer; it learns each user's merchants on first use, see ``aget_categorizer``."""
+    global categorizer
+    with _categorizer_lock:
+        if categorizer is None:
+            categorizer = Categorizer()
+    return categorizer
+
+
+async def aget_categorizer(user_id: Optional[str]) -> Categorizer:
+    """Get the shared categorizer, learning the user's recent history on the database executor first."""
+    categorizer = get_categorizer()
+    if user_id and not categorizer.is_loaded(user_id):
+        try:
+            # Imported here to keep the taxonomy usable without a storage backend
+            from finassist.utils.async_database import run_blocking
+            from finassist.utils.storage import get_storage
+            await run_blocking(categorizer.learn_from_storage, get_storage(), user_id)
+        except Exception as e:
+            print(f"Error loading the transaction history of {user_id} for the categorizer: {e}")
+    return categorizer
@@ -0,0 +1,522 @@
+import json
+import mmap
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from finassist.utils.cache import TTLCache
+from finassist.utils.ledger import transaction_month
+from finassist.utils.utils import get_var_env
+
+COLUMNAR_STORE_ENABLED = get_var_env("COLUMNAR_STORE", "false").lower() in ("1", "true", "yes")
+COLUMNAR_STORE_PATH = get_var_env("COLUMNAR_STORE_PATH", "finassist_columns")
+COLUMNAR_STORE_REFRESH_INTERVAL = float(get_var_env("COLUMNAR_STORE_REFRESH_INTERVAL", "300"))
+COLUMNAR_STORE_CATCH_UP_LAG = float(get_var_env("COLUMNAR_STORE_CATCH_UP_LAG", "300"))
+COLUMNAR_STORE_CACHE_SIZE = int(get_var_env("COLUMNAR_STORE_CACHE_SIZE", "10000"))
+
+TRANSACTION_TYPES = ("expense", "income")
+# Column files of a partition and their little-endian dtypes. Dates are days
+# since 1970-01-01, so they view as datetime64[D]; the string columns are
+# codes into the user's dictionary.
+COLUMNS = {
+    "amount": "<f8",
+    "day": "<i4",
+    "transaction_type": "i1",
+    "account": "<i2",
+    "currency": "<i2",
+    "category": "<i2",
+    "subcategory": "<i2",
+}
+# Dictionary lists of the coded columns, and the row field each one encodes
+CODED_COLUMNS = {
+    "account": ("accounts", "account_id"),
+    "currency": ("currencies", "currency"),
+    "category": ("categories", "category"),
+    "subcategory": ("subcategories", "subcategory"),
+}
+GROUP_KEYS = ("account", "currency", "category", "subcategory", "transaction_type", "month")
+IDS_FILE = "transaction_ids.txt"
+DICTIONARY_FILE = "dictionary.json"
+META_FILE = "meta.json"
+
+columnar_store = None
+_columnar_store_lock = threading.Lock()
+
+
+@dataclass
+class TransactionColumns:
+    """
+    Transactions of one user as numpy columns, one entry per transaction.
+
+    ``account``, ``currency``, ``category`` and ``subcategory`` are codes
+    into the matching label lists; uncategorized transactions have the
+    label "". ``transaction_type`` indexes TRANSACTION_TYPES.
+    ``transaction_ids`` is only filled by ``ColumnarStore.scan`` with
+    ``with_ids``.
+    """
+    amount: np.ndarray
+    day: np.ndarray
+    transaction_type: np.ndarray
+    account: np.ndarray
+    currency: np.ndarray
+    category: np.ndarray
+    subcategory: np.ndarray
+    accounts: List[str] = field(default_factory=list)
+    currencies: List[str] = field(default_factory=list)
+    categories: List[str] = field(default_factory=list)
+    subcategories: List[str] = field(default_factory=list)
+    transaction_ids: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def _codes(self, column: str, *values: str) -> np.ndarray:
+        labels = getattr(self, CODED_COLUMNS[column][0])
+        wanted = {value.lower() for value in values}
+        return np.array([code for code, label in enumerate(labels) if label.lower() in wanted], dtype=np.int16)
+
+    def where(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        account_id: Optional[str] = None,
+        currency: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> np.ndarray:
+        """
+        Boolean mask of the transactions matching every given filter.
+
+        Args:
+            since (str): First date included, as YYYY-MM-DD.
+            until (str): Last date included, as YYYY-MM-DD.
+            transaction_type (str): ``expense`` or ``income``.
+            account_id (str): Only this account.
+            currency (str): Only this currency.
+            category (str): Only this category or subcategory, case-insensitive.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.day >= np.datetime64(since, "D")
+        if until is not None:
+            mask &= self.day <= np.datetime64(until, "D")
+        if transaction_type is not None:
+            mask &= self.transaction_type == TRANSACTION_TYPES.index(transaction_type)
+        if account_id is not None:
+            mask &= np.isin(self.account, self._codes("account", account_id))
+        if currency is not None:
+            mask &= np.isin(self.currency, self._codes("currency", currency))
+        if category is not None:
+            mask &= (np.isin(self.category, self._codes("category", category))
+                     | np.isin(self.subcategory, self._codes("subcategory", category)))
+        return mask
+
+    def total(self, mask: Optional[np.ndarray] = None) -> float:
+        """Sum of the amounts, of the masked transactions if a mask is given."""
+        amounts = self.amount if mask is None else self.amount[mask]
+        return round(float(amounts.sum()), 2)
+
+    def converted(self, to_currency: str, rates=None) -> np.ndarray:
+        """
+        The amounts in one currency, each at the rate of its own date.
+
+        Args:
+            to_currency (str): The currency to convert to.
+            rates (RateTable): Defaults to the shared table, see ``finassist.utils.fx``.
+
+        Returns:
+            np.ndarray: The converted amounts, NaN where a rate is missing.
+        """
+        if rates is None:
+            # Imported here so that the store works without the rate table
+            from finassist.utils.fx import get_rate_table
+            rates = get_rate_table()
+        currencies = np.array(self.currencies or [""])[self.currency]
+        return rates.convert(self.amount, currencies, self.day, to_currency)
+
+    def group_sum(self, by: str, mask: Optional[np.ndarray] = None) -> Dict[str, Tuple[float, int]]:
+        """
+        Total and count of the transactions per value of one column.
+
+        Args:
+            by (str): One of GROUP_KEYS; ``month`` groups by ``YYYY-MM``.
+            mask (np.ndarray): Only group the transactions it selects.
+
+        Returns:
+            dict: ``{label: (total, count)}`` for each label with transactions.
+        """
+        if by not in GROUP_KEYS:
+            raise ValueError(f"Cannot group by '{by}'. Use one of {', '.join(GROUP_KEYS)}.")
+        amounts = self.amount if mask is None else self.amount[mask]
+        if by == "month":
+            months = self.day.astype("datetime64[M]")
+            months = months if mask is None else months[mask]
+            first = months.min() if len(months) else np.datetime64("1970-01", "M")
+            codes = (months - first).astype(np.int64)
+            labels = [str(first + offset) for offset in range(int(codes.max()) + 1 if len(codes) else 0)]
+        else:
+            codes = getattr(self, by)
+            codes = (codes if mask is None else codes[mask]).astype(np.int64)
+            labels = list(TRANSACTION_TYPES) if by == "transaction_type" else getattr(self, CODED_COLUMNS[by][0])
+        totals = np.bincount(codes, weights=amounts, minlength=len(labels))
+        counts = np.bincount(codes, minlength=len(labels))
+        return {
+            labels[code]: (round(float(totals[code]), 2), int(counts[code]))
+            for code in np.flatnonzero(counts)
+        }
+
+
+def map_column(path: str, dtype: str) -> np.ndarray:
+    """The complete values of a column file, memory-mapped read-only; empty if the file is."""
+    # Cheaper than np.memmap, which costs more than reading a month of one user
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return np.empty(0, dtype=dtype)
+    try:
+        size = os.fstat(descriptor).st_size
+        if size < np.dtype(dtype).itemsize:
+            return np.empty(0, dtype=dtype)
+        mapped = mmap.mmap(descriptor, size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(descriptor)
+    return np.frombuffer(mapped, dtype=dtype, count=size // np.dtype(dtype).itemsize)
+
+
+def empty_columns() -> TransactionColumns:
+    return TransactionColumns(**{
+        name: np.empty(0, dtype="datetime64[D]" if name == "day" else dtype) for name, dtype in COLUMNS.items()
+    })
+
+
+class ColumnarStore:
+    """
+    Local columnar copy of the transactions, for fast scans of one user's history.
+
+    Transactions are partitioned by user and month into a directory per
+    partition, ``<path>/<user_id>/<YYYY-MM>/``, with one append-only file
+    per column (see COLUMNS). Scans memory-map the column files of the
+    months they need, so they never read other users' data and a year of
+    history maps a dozen partitions; filters and group-bys then run as
+    numpy operations on the columns.
+
+    Strings are stored as codes into a per-user dictionary. The ids of a
+    partition's transactions are kept next to its columns, so appending a
+    transaction twice (from the write path and from a catch-up) stores it
+    once. Those ids and the dictionaries are cached for the next appends
+    (the ``cache_size`` most recently written partitions and users). A
+    partition whose files were left at different lengths by an interrupted
+    append is truncated back to its last complete row when it is loaded.
+
+    Writes go through the transaction writer, see
+    ``finassist.utils.writer.store_transactions``. ``catch_up`` appends the
+    transactions recorded in storage since its last run, which covers
+    appends that failed and writes from other processes. Each run re-reads
+    the ``catch_up_lag`` seconds before its watermark, as a row stamped
+    before the watermark can commit after the run that set it; the rows
+    already stored are skipped by id. Only one process should append to
+    a directory.
+    """
+
+    def __init__(
+        self,
+        path: str = COLUMNAR_STORE_PATH,
+        refresh_interval: float = COLUMNAR_STORE_REFRESH_INTERVAL,
+        cache_size: int = COLUMNAR_STORE_CACHE_SIZE,
+        catch_up_lag: float = COLUMNAR_STORE_CATCH_UP_LAG,
+    ):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.catch_up_lag = catch_up_lag
+        os.makedirs(path, exist_ok=True)
+        self.watermark: Optional[str] = self._read_json(os.path.join(path, META_FILE), {}).get("watermark")
+        self.rows_appended = 0
+        self.rows_skipped = 0
+        self.catch_ups = 0
+        # Partition ids and user dictionaries as last written, valid while this is the only appending process
+        self._cache = TTLCache(maxsize=cache_size, ttl=float("inf"))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _user_path(self, user_id: str) -> str:
+        return os.path.join(self.path, quote(user_id, safe=""))
+
+    @staticmethod
+    def _read_json(path: str, default):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return default
+
+    @staticmethod
+    def _write_json(path: str, data) -> None:
+        # Written aside and renamed, so a scan never reads a half-written file
+        with open(path + ".tmp", "w") as file:
+            json.dump(data, file)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _length(partition: str) -> int:
+        """Number of complete rows of a partition, the shortest column."""
+        lengths = []
+        for name, dtype in COLUMNS.items():
+            try:
+                lengths.append(os.path.getsize(os.path.join(partition, f"{name}.bin")) // np.dtype(dtype).itemsize)
+            except FileNotFoundError:
+                return 0
+        return min(lengths)
+
+    def _cached(self, path: str, loader):
+        value = self._cache.get(path)
+        if value is None:
+            value = loader(path)
+            self._cache.set(path, value)
+        return value
+
+    def _load_dictionary(self, path: str) -> tuple:
+        """A user's label lists, and the code of each label."""
+        dictionary = self._read_json(path, {labels: [] for labels, _ in CODED_COLUMNS.values()})
+        codes = {labels: {label: code for code, label in enumerate(values)} for labels, values in dictionary.items()}
+        return dictionary, codes
+
+    @staticmethod
+    def _read_ids(partition: str) -> List[str]:
+        try:
+            with open(os.path.join(partition, IDS_FILE)) as file:
+                return file.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def _load_ids(self, partition: str) -> Set[str]:
+        """The ids of a partition's transactions, truncating any column an interrupted append left longer."""
+        os.makedirs(partition, exist_ok=True)
+        ids = self._read_ids(partition)
+        length = min(self._length(partition), len(ids))
+        if length < len(ids):
+            ids = ids[:length]
+            with open(os.path.join(partition, IDS_FILE), "w") as file:
+                file.write("".join(f"{transaction_id}\n" for transaction_id in ids))
+        for name, dtype in COLUMNS.items():
+            path = os.path.join(partition, f"{name}.bin")
+            if os.path.exists(path) and os.path.getsize(path) != length * np.dtype(dtype).itemsize:
+                os.truncate(path, length * np.dtype(dtype).itemsize)
+        return set(ids)
+
+    def append(self, rows: Iterable[dict]) -> int:
+        """
+        Append stored transactions to their partitions, skipping the ones already there.
+
+        Returns:
+            int: The number of transactions appended.
+        """
+        partitions: Dict[str, Dict[str, List[dict]]] = defaultdict(lambda: defaultdict(list))
+        for row in rows:
+            partitions[row["user_id"]][transaction_month(row["transaction_date"])].append(row)
+
+        appended = 0
+        with self._lock:
+            for user_id, months in partitions.items():
+                user_path = self._user_path(user_id)
+                dictionary_path = os.path.join(user_path, DICTIONARY_FILE)
+                dictionary, codes = self._cached(dictionary_path, self._load_dictionary)
+                labels_before = sum(len(values) for values in dictionary.values())
+                batches = []
+                for month, month_rows in months.items():
+                    partition = os.path.join(user_path, month)
+                    stored = self._cached(partition, self._load_ids)
+                    new_rows = []
+                    for row in month_rows:
+                        if row["transaction_id"] not in stored:
+                            stored.add(row["transaction_id"])
+                            new_rows.append(row)
+                    self.rows_skipped += len(month_rows) - len(new_rows)
+                    if new_rows:
+                        batches.append((partition, new_rows, self._encode(new_rows, dictionary, codes)))
+                if not batches:
+                    continue
+
+                try:
+                    # New labels are saved before the codes that use them
+                    if sum(len(values) for values in dictionary.values()) != labels_before:
+                        self._write_json(dictionary_path, dictionary)
+                    for partition, new_rows, columns in batches:
+                        for name, values in columns.items():
+                            with open(os.path.join(partition, f"{name}.bin"), "ab") as file:
+                                file.write(values.tobytes())
+                        # The ids go last: a row counts as stored once its id is written
+                        with open(os.path.join(partition, IDS_FILE), "a") as file:
+                            file.write("".join(f"{row['transaction_id']}\n" for row in new_rows))
+                        appended += len(new_rows)
+                except Exception:
+                    # Reloaded from disk, and repaired, on the next append
+                    self._cache.invalidate(dictionary_path)
+                    for partition, _, _ in batches:
+                        self._cache.invalidate(partition)
+                    raise
+                finally:
+                    self.rows_appended += appended
+        return appended
+
+    @staticmethod
+    def _encode(rows: List[dict], dictionary: Dict[str, List[str]], codes: Dict[str, Dict[str, int]]) -> dict:
+        """The column values of ``rows``, adding their new labels to the user's dictionary."""
+        columns = {
+            "amount": np.array([float(row["amount"]) for row in rows], dtype=COLUMNS["amount"]),
+            "day": np.array([str(row["transaction_date"])[:10] for row in rows],
+                            dtype="datetime64[D]").astype(COLUMNS["day"]),
+            "transaction_type": np.array(
+                [TRANSACTION_TYPES.index(row["transaction_type"]) for row in rows], dtype=COLUMNS["transaction_type"]
+            ),
+        }
+        for column, (labels, row_field) in CODED_COLUMNS.items():
+            column_codes = []
+            for row in rows:
+                label = row.get(row_field) or ""
+                if label not in codes[labels]:
+                    codes[labels][label] = len(dictionary[labels])
+                    dictionary[labels].append(label)
+                column_codes.append(codes[labels][label])
+            columns[column] = np.array(column_codes, dtype=COLUMNS[column])
+        return columns
+
+    def catch_up(self, storage) -> int:
+        """
+        Append the transactions recorded in storage since the last catch-up, less ``catch_up_lag``.
+
+        Returns:
+            int: The number of transactions appended.
+        """
+        since = self.watermark
+        if since is not None and self.catch_up_lag > 0:
+            since = (datetime.fromisoformat(since) - timedelta(seconds=self.catch_up_lag)).isoformat()
+        rows = storage.fetch_transactions(since)
+        appended = self.append(rows)
+        stamps = [str(row["recorded_date"]) for row in rows if row.get("recorded_date")]
+        if stamps:
+            self.watermark = max(stamps + [self.watermark or ""])
+            self._write_json(os.path.join(self.path, META_FILE), {"watermark": self.watermark})
+        self.catch_ups += 1
+        return appended
+
+    def scan(
+        self,
+        user_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        with_ids: bool = False,
+    ) -> TransactionColumns:
+        """
+        Read a user's transactions between two dates as columns.
+
+        Only the partitions of the months in range are mapped.
+
+        Args:
+            user_id (str): The user identifier.
+            since (str): First date included, as YYYY-MM-DD, None for the first transaction.
+            until (str): Last date included, as YYYY-MM-DD, None for the last transaction.
+            with_ids (bool): Also read the ``transaction_ids``, e.g. to tell which rows a scan saw.
+        """
+        user_path = self._user_path(user_id)
+        try:
+            months = sorted(entry for entry in os.listdir(user_path) if entry != DICTIONARY_FILE)
+        except FileNotFoundError:
+            return empty_columns()
+        months = [month for month in months
+                  if (since is None or month >= since[:7]) and (until is None or month <= until[:7])]
+
+        parts: Dict[str, list] = {name: [] for name in COLUMNS}
+        ids: List[str] = []
+        for month in months:
+            partition = os.path.join(user_path, month)
+            # Read before the columns: every row whose id is written has all its columns
+            partition_ids = self._read_ids(partition) if with_ids else None
+            columns = {name: map_column(os.path.join(partition, f"{name}.bin"), dtype) for name, dtype in COLUMNS.items()}
+            # Rows an append in progress has not finished writing to every column are left out
+            length = min(len(values) for values in columns.values())
+            if with_ids:
+                length = min(length, len(partition_ids))
+                ids += partition_ids[:length]
+            if length:
+                for name, values in columns.items():
+                    parts[name].append(values[:length])
+        if not parts["amount"]:
+            return empty_columns()
+        # Read after the columns, so it holds every label their codes refer to
+        dictionary = self._read_json(os.path.join(user_path, DICTIONARY_FILE), {})
+        columns = TransactionColumns(
+            **{name: np.concatenate(arrays) for name, arrays in parts.items()},
+            **{labels: dictionary.get(labels, []) for labels, _ in CODED_COLUMNS.values()},
+            transaction_ids=ids,
+        )
+        columns.day = columns.day.astype("datetime64[D]")
+        if since is not None or until is not None:
+            mask = columns.where(since=since, until=until)
+            if not mask.all():
+                for name in COLUMNS:
+                    setattr(columns, name, getattr(columns, name)[mask])
+                if with_ids:
+                    columns.transaction_ids = list(compress(ids, mask))
+        return columns
+
+    def start(self) -> None:
+        """Keep catching up with storage on a background thread."""
+        if self._thread is None and self.refresh_interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="finassist-columnar", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background catch-up thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_loop(self) -> None:
+        # Imported here to keep the store usable without a storage backend
+        from finassist.utils.storage import get_storage
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                start = time.monotonic()
+                appended = self.catch_up(get_storage())
+                if appended:
+                    print(f"Columnar store caught up {appended} transactions in {time.monotonic() - start:.2f}s")
+            except Exception as e:
+                print(f"Error catching up the columnar store: {e}")
+
+    def stats(self) -> dict:
+        """Return append counters and the catch-up watermark."""
+        return {
+            "rows_appended": self.rows_appended,
+            "rows_skipped": self.rows_skipped,
+            "catch_ups": self.catch_ups,
+            "watermark": self.watermark,
+        }
+
+
+def get_columnar_store() -> ColumnarStore:
+    """Get the shared columnar store at COLUMNAR_STORE_PATH, caught up with storage."""
+    global columnar_store
+    # Writer batches flush on several executor threads; only one may build the store
+    with _columnar_store_lock:
+        if columnar_store is None:
+            store = ColumnarStore()
+            try:
+                # Imported here to keep the store usable without a storage backend
+                from finassist.utils.storage import get_storage
+                store.catch_up(get_storage())
+            except Exception as e:
+                print(f"Error loading transactions into the columnar store: {e}")
+            store.start()
+            columnar_store = store
+    return columnar_store
@@ -1,9 +1,31 @@
+import asyncio
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+
 from google.cloud import bigquery
+from finassist.utils.async_database import DB_QUERY_TIMEOUT, get_db_executor, run_blocking
+from finassist.utils.ledger import (
+    BALANCE_TOLERANCE,
+    OWED_BALANCE_ACCOUNT_TYPES,
+    DeltaQueue,
+    balance_deltas,
+    rollup_deltas,
+    with_opening_balance,
+)
+from finassist.utils.storage import Account, Storage, UserContext, format_user_context, invalidate_user_context
 from finassist.utils.utils import get_var_env
 
 bq_client = None  # <-- Añade esta línea
 bq_dataset = None  # <-- Y esta si usas get_bq_dataset
 
+# Seconds between the batched MERGE jobs that apply queued balance and rollup changes
+BQ_DELTA_FLUSH_INTERVAL = float(get_var_env("BQ_DELTA_FLUSH_INTERVAL", "5"))
+# DML errors BigQuery asks to retry: rows still in the streaming buffer, concurrent DML on the table
+RETRYABLE_DML_ERRORS = ("streaming buffer", "could not serialize access", "concurrent update")
+
+
 def get_bq_client():
     """Get BigQuery client."""
     global bq_client
@@ -18,86 +40,713 @@ def get_bq_dataset():
         bq_dataset = get_bq_client().dataset(get_var_env("BQ_DATASET_ID"))
     return bq_dataset
 
-def get_user_context_info(user_id: str) -> str:
+def get_table_id(table: str) -> str:
+    """Get the fully qualified ID of a dataset table."""
+    project_id = get_var_env("BQ_PROJECT_ID")
+    dataset_id = get_var_env("BQ_DATASET_ID")
+    return f"{project_id}.{dataset_id}.{table}"
+
+def get_table_name(table: str) -> str:
+    """Get the fully qualified, backtick-quoted name of a dataset table."""
+    return f"`{get_table_id(table)}`"
+
+def to_plain_value(value):
+    """Convert BigQuery's DATE/TIMESTAMP and NUMERIC values to ISO strings and floats."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+async def run_query(
+    query: str,
+    job_config: Optional[bigquery.QueryJobConfig] = None,
+    timeout: Optional[float] = DB_QUERY_TIMEOUT,
+) -> list:
     """
-    Get user context information from BigQuery.
+    Run a BigQuery query without blocking the event loop.
+
+    If the call times out or the awaiting task is cancelled, the query job
+    is cancelled on the server as well, so abandoned lookups stop consuming
+    slots and executor threads.
+
+    Args:
+        query (str): The SQL text.
+        job_config (bigquery.QueryJobConfig): Query parameters and options.
+        timeout (float): Seconds to wait for the whole query, None to wait forever.
 
     Returns:
-        dict with user info and account list.
+        list: The result rows.
     """
-    client = get_bq_client()
-    dataset_id = get_var_env("BQ_DATASET_ID")
-    project_id = get_var_env("BQ_PROJECT_ID")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
+
+    def remaining() -> Optional[float]:
+        return max(deadline - loop.time(), 0) if deadline is not None else None
+
+    job = await run_blocking(get_bq_client().query, query, job_config=job_config, timeout=remaining())
+    try:
+        # The job's own timeout frees the executor thread shortly after ours fires
+        return await run_blocking(
+            lambda: list(job.result(timeout=remaining())),
+            timeout=remaining(),
+        )
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        get_db_executor().submit(job.cancel)
+        raise
 
-    users_table = f"`{project_id}.{dataset_id}.users`"
-    accounts_table = f"`{project_id}.{dataset_id}.accounts`"
+def build_user_context_query(user_id: str) -> Tuple[str, bigquery.QueryJobConfig]:
+    """
+    Build the query that loads a user and all of its accounts in a single job.
+
+    The accounts are folded into the user row with a correlated ARRAY
+    subquery, so a user without accounts still comes back with an empty list.
+
+    Args:
+        user_id (str): The user identifier.
 
-    # Primero verificar si el usuario existe
-    user_query = f"""
+    Returns:
+        tuple: The SQL text and its job config.
+    """
+    query = f"""
     SELECT
-        user_id,
-        full_name,
-        preferred_currency,
-        language,
-        timezone
-    FROM {users_table}
-    WHERE user_id = @user_id
+        u.user_id,
+        u.full_name,
+        u.preferred_currency,
+        u.language,
+        u.timezone,
+        ARRAY(
+            SELECT AS STRUCT
+                a.account_id,
+                a.account_name,
+                a.account_type,
+                a.institution,
+                a.currency,
+                a.balance
+            FROM {get_table_name("accounts")} a
+            WHERE a.user_id = u.user_id
+        ) AS accounts
+    FROM {get_table_name("users")} u
+    WHERE u.user_id = @user_id
     """
 
-    user_job_config = bigquery.QueryJobConfig(
+    job_config = bigquery.QueryJobConfig(
         query_parameters=[
             bigquery.ScalarQueryParameter("user_id", "STRING", user_id)
         ]
     )
+    return query, job_config
+
+def parse_user_context(results: list) -> Optional[UserContext]:
+    """Turn the rows returned by the user context query into a UserContext."""
+    if not results:
+        return None
+
+    row = results[0]
+    return UserContext(
+        user_id=row.user_id,
+        full_name=row.full_name,
+        preferred_currency=row.preferred_currency,
+        language=row.language,
+        timezone=row.timezone,
+        accounts=[
+            Account(
+                account_id=acc["account_id"],
+                account_name=acc["account_name"],
+                account_type=acc["account_type"],
+                institution=acc["institution"],
+                currency=acc["currency"],
+                balance=float(acc["balance"]) if acc["balance"] is not None else None,
+            )
+            for acc in row.accounts
+        ],
+    )
+
+def load_user_context(user_id: str) -> Optional[UserContext]:
+    """
+    Load a user and all of its accounts from BigQuery in a single query job.
 
-    user_job = client.query(user_query, job_config=user_job_config)
-    user_results = list(user_job.result())
+    Args:
+        user_id (str): The user identifier.
 
-    if not user_results:
-        return str({
-            "error": "User not found."
-        })
+    Returns:
+        UserContext: The user and its accounts, or None if the user does not exist.
+    """
+    query, job_config = build_user_context_query(user_id)
+    results = list(get_bq_client().query(query, job_config=job_config).result())
+    return parse_user_context(results)
 
-    user_row = user_results[0]
+ROLLUP_KEY_COLUMNS = ("user_id", "month", "account_id", "category", "currency", "transaction_type")
+ROLLUP_KEY_MATCH = " AND ".join(f"r.{column} = e.{column}" for column in ROLLUP_KEY_COLUMNS)
+# Budget column -> BigQuery type, in table order
+BUDGET_COLUMNS = {
+    "budget_id": "STRING",
+    "user_id": "STRING",
+    "category": "STRING",
+    "period": "STRING",
+    "amount": "NUMERIC",
+    "currency": "STRING",
+    "alert_thresholds": "STRING",
+    "created_at": "TIMESTAMP",
+    "updated_at": "TIMESTAMP",
+}
+
+def build_rollup_aggregate_query() -> str:
+    """
+    Build the query that recomputes the spending rollups from the transactions.
 
-    # Luego obtener las cuentas del usuario
-    accounts_query = f"""
+    It reads the ``@user_id`` parameter, NULL to aggregate every user, and
+    ``@watermark``, the last ``recorded_date`` counted, NULL to count every
+    transaction.
+    """
+    return f"""
     SELECT
+        user_id,
+        FORMAT_DATE('%Y-%m', transaction_date) AS month,
         account_id,
-        account_name,
-        account_type,
-        institution,
+        COALESCE(category, '') AS category,
         currency,
-        balance
-    FROM {accounts_table}
-    WHERE user_id = @user_id
+        transaction_type,
+        CAST(ROUND(SUM(amount), 2) AS NUMERIC) AS total,
+        COUNT(*) AS count
+    FROM {get_table_name("transactions")}
+    WHERE (@user_id IS NULL OR user_id = @user_id) AND (@watermark IS NULL OR recorded_date <= @watermark)
+    GROUP BY user_id, month, account_id, category, currency, transaction_type
     """
 
-    accounts_job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id)
+def is_retryable_dml_error(error: Exception) -> bool:
+    """Tell whether a failed DML job is one BigQuery asks to retry, see RETRYABLE_DML_ERRORS."""
+    message = str(error).lower()
+    return any(text in message for text in RETRYABLE_DML_ERRORS)
+
+def get_user_context_info(user_id: str) -> str:
+    """
+    Get user context information from BigQuery.
+
+    Returns:
+        str: The user info and account list, or an error if the user does not exist.
+    """
+    return format_user_context(load_user_context(user_id))
+
+
+class BigQueryStorage(Storage):
+    """
+    Storage backend on the BigQuery dataset named by BQ_PROJECT_ID / BQ_DATASET_ID.
+
+    Transactions are streamed in. Their balance and spending rollup changes
+    are queued and applied by a background thread with one MERGE per table
+    every BQ_DELTA_FLUSH_INTERVAL seconds, so concurrent writers do not each
+    run DML on the accounts and rollups tables; errors
+    BigQuery asks to retry, such as accounts still in the streaming buffer,
+    are retried on the next flush. Accounts are written with load jobs,
+    which skip the streaming buffer, so they can be updated right away.
+    None of this is atomic in BigQuery: what still fails is logged and left
+    to the periodic reconciliation.
+    """
+
+    ledger_ready = False
+    budgets_ready = False
+
+    def __init__(self, flush_interval: float = BQ_DELTA_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.balance_queue = DeltaQueue(self._apply_balance_deltas, is_retryable_dml_error)
+        self.rollup_queue = DeltaQueue(self.apply_rollup_deltas, is_retryable_dml_error)
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def get_user_context(self, user_id: str) -> Optional[UserContext]:
+        return load_user_context(user_id)
+
+    async def aget_user_context(self, user_id: str, timeout: Optional[float] = DB_QUERY_TIMEOUT) -> Optional[UserContext]:
+        query, job_config = build_user_context_query(user_id)
+        return parse_user_context(await run_query(query, job_config, timeout=timeout))
+
+    def list_accounts(self, user_id: str) -> List[Account]:
+        query = f"""
+        SELECT
+            account_id,
+            account_name,
+            account_type,
+            institution,
+            currency,
+            balance
+        FROM {get_table_name("accounts")}
+        WHERE user_id = @user_id
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("user_id", "STRING", user_id)
+            ]
+        )
+        return [
+            Account(
+                account_id=row.account_id,
+                account_name=row.account_name,
+                account_type=row.account_type,
+                institution=row.institution,
+                currency=row.currency,
+                balance=float(row.balance) if row.balance is not None else None,
+            )
+            for row in get_bq_client().query(query, job_config=job_config).result()
         ]
-    )
 
-    accounts_job = client.query(accounts_query, job_config=accounts_job_config)
-    accounts_results = list(accounts_job.result())
-
-    # Construir la respuesta
-    return str({
-        "user_id": user_row.user_id,
-        "full_name": user_row.full_name,
-        "preferred_currency": user_row.preferred_currency,
-        "language": user_row.language,
-        "timezone": user_row.timezone,
-        "accounts": [
-            {
-                "account_id": acc.account_id,
-                "account_name": acc.account_name,
-                "account_type": acc.account_type,
-                "institution": acc.institution,
-                "currency": acc.currency,
-                "balance": float(acc.balance) if acc.balance is not None else None,
-            }
-            for acc in accounts_results
+    def insert_users(self, rows: List[dict]) -> List[dict]:
+        return self._insert("users", rows, "user_id")
+
+    def insert_accounts(self, rows: List[dict]) -> List[dict]:
+        self._ensure_ledger()
+        # A load job rather than a streaming insert, so the balance MERGE can update the new accounts at once
+        try:
+            get_bq_client().load_table_from_json(
+                with_opening_balance(rows),
+                get_table_id("accounts"),
+                job_config=bigquery.LoadJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_APPEND),
+            ).result()
+        except Exception as e:
+            return [{"index": index, "errors": [str(e)]} for index in range(len(rows))]
+        return []
+
+    def insert_transactions(self, rows: List[dict]) -> List[dict]:
+        self._ensure_ledger()
+        errors = self._insert("transactions", rows, "transaction_id")
+        rejected = {error["index"] for error in errors or []}
+        accepted = [row for index, row in enumerate(rows) if index not in rejected]
+        if accepted:
+            self.balance_queue.add(accepted)
+            self.rollup_queue.add(accepted)
+            self._start_flusher()
+        return errors
+
+    def flush_deltas(self) -> int:
+        """
+        Apply the queued balance and rollup changes now.
+
+        Returns:
+            int: The number of queued transactions applied.
+        """
+        error = None
+        applied = 0
+        for queue in (self.balance_queue, self.rollup_queue):
+            try:
+                applied = max(applied, queue.flush())
+            except Exception as e:
+                # One table failing does not hold back the other
+                error = e
+        if error is not None:
+            raise error
+        return applied
+
+    def _start_flusher(self) -> None:
+        with self._flusher_lock:
+            if self._flusher is None and self.flush_interval > 0:
+                self._flusher = threading.Thread(target=self._flush_loop, name="finassist-bq-deltas", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush_deltas()
+            except Exception:
+                # Logged by the queue, which keeps the batch for the next flush
+                pass
+
+    def _apply_balance_deltas(self, rows: List[dict]) -> None:
+        self.apply_balance_deltas(rows)
+        # The cached contexts of these users hold the balances from before the flush
+        for user_id in {row["user_id"] for row in rows}:
+            invalidate_user_context(user_id)
+
+    def apply_balance_deltas(self, rows: List[dict]) -> None:
+        """Apply stored transactions to their account balances with a single MERGE."""
+        deltas = balance_deltas(rows)
+        if not deltas:
+            return
+        query = f"""
+        MERGE {get_table_name("accounts")} a
+        USING UNNEST(@deltas) d
+        ON a.account_id = d.account_id AND a.currency = d.currency
+        WHEN MATCHED THEN
+            UPDATE SET
+                balance = COALESCE(a.balance, 0) + IF(a.account_type IN UNNEST(@owed_types), -d.delta, d.delta),
+                updated_at = CURRENT_TIMESTAMP()
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("owed_types", "STRING", list(OWED_BALANCE_ACCOUNT_TYPES)),
+                bigquery.ArrayQueryParameter("deltas", "STRUCT", [
+                    bigquery.StructQueryParameter(
+                        None,
+                        bigquery.ScalarQueryParameter("account_id", "STRING", account_id),
+                        bigquery.ScalarQueryParameter("currency", "STRING", currency),
+                        bigquery.ScalarQueryParameter("delta", "NUMERIC", Decimal(str(delta))),
+                    )
+                    for (account_id, currency), delta in deltas.items()
+                ]),
+            ]
+        )
+        get_bq_client().query(query, job_config=job_config).result()
+
+    def apply_rollup_deltas(self, rows: List[dict]) -> None:
+        """Add stored transactions to the spending rollups with a single MERGE."""
+        deltas = rollup_deltas(rows)
+        if not deltas:
+            return
+        query = f"""
+        MERGE {get_table_name("spending_rollups")} r
+        USING UNNEST(@deltas) e
+        ON {ROLLUP_KEY_MATCH}
+        WHEN MATCHED THEN
+            UPDATE SET total = r.total + e.total, count = r.count + e.count
+        WHEN NOT MATCHED THEN
+            INSERT ({", ".join(ROLLUP_KEY_COLUMNS)}, total, count)
+            VALUES ({", ".join(f"e.{column}" for column in ROLLUP_KEY_COLUMNS)}, e.total, e.count)
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("deltas", "STRUCT", [
+                    bigquery.StructQueryParameter(
+                        None,
+                        *(bigquery.ScalarQueryParameter(column, "STRING", value)
+                          for column, value in zip(ROLLUP_KEY_COLUMNS, key)),
+                        bigquery.ScalarQueryParameter("total", "NUMERIC", Decimal(str(total))),
+                        bigquery.ScalarQueryParameter("count", "INT64", count),
+                    )
+                    for key, (total, count) in deltas.items()
+                ]),
+            ]
+        )
+        get_bq_client().query(query, job_config=job_config).result()
+
+    def fetch_rollups(self, user_id: str, months: Optional[Iterable[str]] = None) -> List[dict]:
+        query = f"""
+        SELECT month, account_id, category, currency, transaction_type, total, count
+        FROM {get_table_name("spending_rollups")}
+        WHERE user_id = @user_id
+        """
+        query_parameters = [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
+        if months is not None:
+            query += " AND month IN UNNEST(@months)"
+            query_parameters.append(bigquery.ArrayQueryParameter("months", "STRING", list(months)))
+        return [
+            {key: to_plain_value(value) for key, value in row.items()}
+            for row in get_bq_client().query(
+                query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters)
+            ).result()
+        ]
+
+    def reconcile_rollups(self, user_id: Optional[str] = None) -> List[dict]:
+        self._ensure_ledger()
+        # Recomputed up to the newest applied transaction, and the queued ones it counts are not applied again
+        return self.rollup_queue.reconcile(lambda watermark: self._reconcile_rollups(user_id, watermark), user_id)
+
+    def _reconcile_rollups(self, user_id: Optional[str], watermark: str) -> List[dict]:
+        rollups = get_table_name("spending_rollups")
+        expected = build_rollup_aggregate_query()
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+                bigquery.ScalarQueryParameter("tolerance", "FLOAT64", BALANCE_TOLERANCE),
+                bigquery.ScalarQueryParameter("watermark", "TIMESTAMP", watermark),
+            ]
+        )
+        drift = [
+            {key: to_plain_value(value) for key, value in row.items()}
+            for row in get_bq_client().query(
+                f"""
+                SELECT DISTINCT COALESCE(e.user_id, r.user_id) AS user_id, COALESCE(e.month, r.month) AS month
+                FROM ({expected}) e
+                FULL OUTER JOIN (SELECT * FROM {rollups} WHERE @user_id IS NULL OR user_id = @user_id) r
+                ON {ROLLUP_KEY_MATCH}
+                WHERE e.user_id IS NULL OR r.user_id IS NULL OR e.count != r.count
+                    OR ABS(e.total - r.total) > @tolerance
+                ORDER BY user_id, month
+                """,
+                job_config=job_config,
+            ).result()
+        ]
+        if drift:
+            # The MERGE recomputes the aggregate itself, so writes since the SELECT are not undone
+            get_bq_client().query(
+                f"""
+                MERGE {rollups} r
+                USING ({expected}) e
+                ON {ROLLUP_KEY_MATCH}
+                WHEN MATCHED AND (r.count != e.count OR ABS(r.total - e.total) > @tolerance) THEN
+                    UPDATE SET total = e.total, count = e.count
+                WHEN NOT MATCHED THEN
+                    INSERT ({", ".join(ROLLUP_KEY_COLUMNS)}, total, count)
+                    VALUES ({", ".join(f"e.{column}" for column in ROLLUP_KEY_COLUMNS)}, e.total, e.count)
+                WHEN NOT MATCHED BY SOURCE AND (@user_id IS NULL OR r.user_id = @user_id) THEN
+                    DELETE
+                """,
+                job_config=job_config,
+            ).result()
+        return drift
+
+    def scan_transactions(
+        self,
+        user_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        account_id: Optional[str] = None,
+        category: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        text: Optional[str] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        conditions = ["user_id = @user_id"]
+        query_parameters = [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
+        for condition, name, type_, value in (
+            ("transaction_date >= @since", "since", "DATE", since),
+            ("transaction_date <= @until", "until", "DATE", until),
+            ("account_id = @account_id", "account_id", "STRING", account_id),
+            ("transaction_type = @transaction_type", "transaction_type", "STRING", transaction_type),
+            ("amount >= @min_amount", "min_amount", "FLOAT64", min_amount),
+            ("amount <= @max_amount", "max_amount", "FLOAT64", max_amount),
+            ("(LOWER(category) = LOWER(@category) OR LOWER(subcategory) = LOWER(@category))",
+             "category", "STRING", category),
+            ("STRPOS(LOWER(notes), LOWER(@text)) > 0", "text", "STRING", text),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                query_parameters.append(bigquery.ScalarQueryParameter(name, type_, value))
+        query = f"""
+        SELECT * FROM {get_table_name("transactions")}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY transaction_date DESC, recorded_date DESC
+        """
+        if limit is not None:
+            query += f"LIMIT {int(limit)}\n"
+        return [
+            {key: to_plain_value(value) for key, value in row.items()}
+            for row in get_bq_client().query(
+                query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters)
+            ).result()
+        ]
+
+    def reconcile_balances(self, user_id: Optional[str] = None) -> List[dict]:
+        self._ensure_ledger()
+        # Recomputed up to the newest applied transaction, and the queued ones it counts are not applied again
+        return self.balance_queue.reconcile(lambda watermark: self._reconcile_balances(user_id, watermark), user_id)
+
+    def _reconcile_balances(self, user_id: Optional[str], watermark: str) -> List[dict]:
+        expected = f"""
+        SELECT
+            a.account_id,
+            a.user_id,
+            a.balance,
+            ROUND(COALESCE(a.opening_balance, 0)
+                + IF(a.account_type IN UNNEST(@owed_types), -1, 1) * COALESCE(t.total, 0), 2) AS expected
+        FROM {get_table_name("accounts")} a
+        LEFT JOIN (
+            SELECT account_id, currency, SUM(IF(transaction_type = 'income', amount, -amount)) AS total
+            FROM {get_table_name("transactions")}
+            WHERE recorded_date <= @watermark
+            GROUP BY account_id, currency
+        ) t ON t.account_id = a.account_id AND t.currency = a.currency
+        WHERE (@user_id IS NULL OR a.user_id = @user_id) AND a.opening_balance IS NOT NULL
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("owed_types", "STRING", list(OWED_BALANCE_ACCOUNT_TYPES)),
+                bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+                bigquery.ScalarQueryParameter("tolerance", "FLOAT64", BALANCE_TOLERANCE),
+                bigquery.ScalarQueryParameter("watermark", "TIMESTAMP", watermark),
+            ]
+        )
+        drift = [
+            {key: to_plain_value(value) for key, value in row.items()}
+            for row in get_bq_client().query(
+                f"SELECT * FROM ({expected}) WHERE balance IS NULL OR ABS(balance - expected) > @tolerance",
+                job_config=job_config,
+            ).result()
+        ]
+        if drift:
+            # The MERGE recomputes the aggregate itself, so writes since the SELECT are not undone
+            get_bq_client().query(
+                f"""
+                MERGE {get_table_name("accounts")} a
+                USING ({expected}) e
+                ON a.account_id = e.account_id
+                WHEN MATCHED AND (a.balance IS NULL OR ABS(a.balance - e.expected) > @tolerance) THEN
+                    UPDATE SET balance = e.expected, updated_at = CURRENT_TIMESTAMP()
+                """,
+                job_config=job_config,
+            ).result()
+        return drift
+
+    def _ensure_ledger(self) -> None:
+        """Add the opening_balance column and the spending rollups to datasets created before them."""
+        if self.ledger_ready:
+            return
+        table = get_table_name("accounts")
+        rollups = get_table_name("spending_rollups")
+        get_bq_client().query(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS opening_balance NUMERIC").result()
+        get_bq_client().query(
+            f"""
+            CREATE TABLE IF NOT EXISTS {rollups} (
+                user_id STRING NOT NULL,
+                month STRING NOT NULL,
+                account_id STRING NOT NULL,
+                category STRING NOT NULL,
+                currency STRING NOT NULL,
+                transaction_type STRING NOT NULL,
+                total NUMERIC NOT NULL,
+                count INT64 NOT NULL
+            )
+            CLUSTER BY user_id, month
+            """
+        ).result()
+        self.ledger_ready = True
+        try:
+            # Transactions never changed balances before, so the balances are the opening balances
+            get_bq_client().query(
+                f"UPDATE {table} SET opening_balance = CAST(COALESCE(balance, 0) AS NUMERIC) WHERE opening_balance IS NULL"
+            ).result()
+        except Exception as e:
+            # e.g. rows still in the streaming buffer; accounts without an opening balance are not reconciled
+            print(f"Error backfilling opening balances: {e}")
+        try:
+            # Roll up the transactions stored before the rollups existed
+            get_bq_client().query(
+                f"""
+                INSERT INTO {rollups} ({", ".join(ROLLUP_KEY_COLUMNS)}, total, count)
+                SELECT * FROM ({build_rollup_aggregate_query()})
+                WHERE NOT EXISTS (SELECT 1 FROM {rollups})
+                """,
+                job_config=bigquery.QueryJobConfig(
+                    query_parameters=[
+                        bigquery.ScalarQueryParameter("user_id", "STRING", None),
+                        bigquery.ScalarQueryParameter("watermark", "TIMESTAMP", None),
+                    ]
+                ),
+            ).result()
+        except Exception as e:
+            print(f"Error backfilling spending rollups: {e}")
+
+    def list_budgets(self, user_id: str) -> List[dict]:
+        self._ensure_budgets()
+        query = f"""
+        SELECT * FROM {get_table_name("budgets")}
+        WHERE user_id = @user_id
+        ORDER BY created_at
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("user_id", "STRING", user_id)
+            ]
+        )
+        return [
+            {key: to_plain_value(value) for key, value in row.items()}
+            for row in get_bq_client().query(query, job_config=job_config).result()
+        ]
+
+    def upsert_budgets(self, rows: List[dict]) -> List[dict]:
+        """Insert or replace budgets with a single MERGE, as rows still in the streaming buffer cannot be updated."""
+        self._ensure_budgets()
+        if not rows:
+            return []
+        query = f"""
+        MERGE {get_table_name("budgets")} b
+        USING UNNEST(@budgets) n
+        ON b.budget_id = n.budget_id
+        WHEN MATCHED THEN
+            UPDATE SET category = n.category, period = n.period, amount = n.amount, currency = n.currency,
+                alert_thresholds = n.alert_thresholds, updated_at = n.updated_at
+        WHEN NOT MATCHED THEN
+            INSERT ({", ".join(BUDGET_COLUMNS)})
+            VALUES ({", ".join(f"n.{column}" for column in BUDGET_COLUMNS)})
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("budgets", "STRUCT", [
+                    bigquery.StructQueryParameter(
+                        None,
+                        *(bigquery.ScalarQueryParameter(
+                            column, type_, Decimal(str(row[column])) if type_ == "NUMERIC" else row[column]
+                        ) for column, type_ in BUDGET_COLUMNS.items()),
+                    )
+                    for row in rows
+                ]),
+            ]
+        )
+        get_bq_client().query(query, job_config=job_config).result()
+        return []
+
+    def delete_budgets(self, user_id: str, budget_ids: Iterable[str]) -> int:
+        self._ensure_budgets()
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+                bigquery.ArrayQueryParameter("budget_ids", "STRING", list(budget_ids)),
+            ]
+        )
+        job = get_bq_client().query(
+            f"DELETE FROM {get_table_name('budgets')} WHERE user_id = @user_id AND budget_id IN UNNEST(@budget_ids)",
+            job_config=job_config,
+        )
+        job.result()
+        return job.num_dml_affected_rows or 0
+
+    def _ensure_budgets(self) -> None:
+        """Create the budgets table in datasets created before it."""
+        if self.budgets_ready:
+            return
+        get_bq_client().query(
+            f"""
+            CREATE TABLE IF NOT EXISTS {get_table_name("budgets")} (
+                budget_id STRING NOT NULL,
+                user_id STRING NOT NULL,
+                category STRING NOT NULL,
+                period STRING NOT NULL,
+                amount NUMERIC NOT NULL,
+                currency STRING NOT NULL,
+                alert_thresholds STRING NOT NULL,
+                created_at TIMESTAMP,
+                updated_at TIMESTAMP
+            )
+            CLUSTER BY user_id
+            """
+        ).result()
+        self.budgets_ready = True
+
+    def fetch_changes(self, table: str, since: Optional[str] = None) -> List[dict]:
+        # Only the changed rows are returned, but the bytes billed depend on how
+        # the table is partitioned/clustered on updated_at
+        query = f"SELECT * FROM {get_table_name(table)}"
+        job_config = bigquery.QueryJobConfig()
+        if since is not None:
+            query += " WHERE updated_at > @since"
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("since", "TIMESTAMP", since)
+                ]
+            )
+        return [
+            {key: to_plain_value(value) for key, value in row.items()}
+            for row in get_bq_client().query(query, job_config=job_config).result()
         ]
-    })
\ No newline at end of file
+
+    def fetch_transactions(self, since: Optional[str] = None) -> List[dict]:
+        query = f"SELECT * FROM {get_table_name('transactions')}"
+        job_config = bigquery.QueryJobConfig()
+        if since is not None:
+            query += " WHERE recorded_date > @since"
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("since", "TIMESTAMP", since)
+                ]
+            )
+        return [
+            {key: to_plain_value(value) for key, value in row.items()}
+            for row in get_bq_client().query(query + " ORDER BY recorded_date", job_config=job_config).result()
+        ]
+
+    def _insert(self, table: str, rows: List[dict], id_field: str) -> List[dict]:
+        # Row IDs let BigQuery drop duplicates when a streaming insert is retried
+        return get_bq_client().insert_rows_json(
+            get_table_id(table), rows, row_ids=[row[id_field] for row in rows]
+        )
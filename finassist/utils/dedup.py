@@ -0,0 +1,383 @@
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from finassist.utils.async_database import run_blocking
+from finassist.utils.cache import TTLCache
+from finassist.utils.categorizer import STOPWORDS, normalize_words
+from finassist.utils.utils import get_var_env
+from finassist.utils.writer import get_transaction_writer
+
+DEDUP_DATE_WINDOW_DAYS = int(get_var_env("DEDUP_DATE_WINDOW_DAYS", "2"))
+DEDUP_HORIZON_DAYS = int(get_var_env("DEDUP_HORIZON_DAYS", "400"))
+DEDUP_INDEX_SIZE = int(get_var_env("DEDUP_INDEX_SIZE", "1000000"))
+IDEMPOTENCY_KEY_TTL = float(get_var_env("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(get_var_env("IDEMPOTENCY_CACHE_SIZE", "100000"))
+
+DedupKey = Tuple[str, str, int, str, str, str]
+
+dedup_index = None
+
+
+def normalize_merchant(notes: Optional[str]) -> str:
+    """
+    The merchant part of a description, as used in duplicate keys.
+
+    Lowercase words without digits or stopwords, so "STARBUCKS #1234" and
+    "Starbucks" give the same key.
+    """
+    return " ".join(word for word in normalize_words(notes or "") if word not in STOPWORDS and len(word) > 1)
+
+
+def dedup_key(row: dict) -> Optional[DedupKey]:
+    """
+    The key two copies of the same transaction share, the date aside.
+
+    Returns None for rows without a merchant: two untitled expenses of the
+    same amount are as likely to be two purchases as one, so they are only
+    deduplicated by idempotency key.
+    """
+    merchant = normalize_merchant(row.get("notes"))
+    if not merchant:
+        return None
+    return (
+        row["user_id"],
+        row["account_id"],
+        round(float(row["amount"]) * 100),
+        row["currency"],
+        row["transaction_type"],
+        merchant,
+    )
+
+
+def idempotency_payload(row: dict) -> tuple:
+    """What every retry under one idempotency key must repeat: the amount, date, account and description."""
+    return (
+        row["account_id"],
+        round(float(row["amount"]) * 100),
+        str(row["transaction_date"])[:10],
+        (row.get("notes") or "").strip(),
+    )
+
+
+def _ordinal(transaction_date) -> int:
+    # Storage backends may return the date as a date, a datetime or an ISO string
+    return date.fromisoformat(str(transaction_date)[:10]).toordinal()
+
+
+class DedupIndex:
+    """
+    In-memory index of the stored transactions, to find a duplicate before insert.
+
+    Transactions are bucketed by ``dedup_key`` and then by date, so a
+    lookup is ``2 * window_days + 1`` dict reads whatever the number of
+    transactions. Only transactions dated within ``horizon_days`` are kept:
+    the days that fall out of it are dropped once a day, and past ``maxsize``
+    the transactions indexed first are evicted one per insert.
+
+    Idempotency keys map to the transaction they created for
+    ``IDEMPOTENCY_KEY_TTL`` seconds, along with its ``idempotency_payload``.
+    While that transaction is still being written the key maps to its future,
+    so concurrent retries wait for the first write instead of racing it. A
+    key reused for a different payload is rejected rather than answered with
+    the transaction it first created.
+
+    The index lives in the process. A user's stored transactions within the
+    horizon are read the first time that user submits one, see
+    ``load_user``; writes made by other processes afterwards are not seen.
+    """
+
+    def __init__(
+        self,
+        window_days: int = DEDUP_DATE_WINDOW_DAYS,
+        horizon_days: int = DEDUP_HORIZON_DAYS,
+        maxsize: int = DEDUP_INDEX_SIZE,
+    ):
+        self.window_days = window_days
+        self.horizon_days = horizon_days
+        self.maxsize = maxsize
+        self._entries: Dict[DedupKey, Dict[int, List[str]]] = defaultdict(dict)
+        # transaction_id -> (key, date ordinal), in insertion order for eviction
+        self._order: "OrderedDict[str, Tuple[DedupKey, int]]" = OrderedDict()
+        # date ordinal -> transaction ids, so the horizon is pruned a day at a time
+        self._by_day: Dict[int, Set[str]] = defaultdict(set)
+        self._pruned_on: Optional[date] = None
+        self._loaded: Set[str] = set()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.idempotency = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_KEY_TTL)
+        self.duplicates = 0
+        self.idempotent_replays = 0
+        self.evicted = 0
+        self.loads = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._order)
+
+    def _oldest_ordinal(self) -> int:
+        return (date.today() - timedelta(days=self.horizon_days)).toordinal()
+
+    def find(self, row: dict, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        Return the id of a stored transaction ``row`` duplicates, nearest date first.
+
+        Args:
+            row (dict): A validated transaction row.
+            exclude (iterable): Transaction ids that may not be matched again.
+        """
+        key = dedup_key(row)
+        if key is None:
+            return None
+        dates = self._entries.get(key)
+        if not dates:
+            return None
+        ordinal = _ordinal(row["transaction_date"])
+        for offset in range(self.window_days + 1):
+            for day in (ordinal - offset, ordinal + offset) if offset else (ordinal,):
+                for transaction_id in dates.get(day, ()):
+                    if transaction_id not in exclude:
+                        return transaction_id
+        return None
+
+    def add(self, row: dict) -> None:
+        key = dedup_key(row)
+        ordinal = _ordinal(row["transaction_date"])
+        transaction_id = row["transaction_id"]
+        if key is None or ordinal < self._oldest_ordinal() or transaction_id in self._order:
+            return
+        self._entries[key].setdefault(ordinal, []).append(transaction_id)
+        self._order[transaction_id] = (key, ordinal)
+        self._by_day[ordinal].add(transaction_id)
+        if len(self._order) > self.maxsize:
+            # Over capacity the transaction indexed first goes
+            evicted, (evicted_key, evicted_ordinal) = self._order.popitem(last=False)
+            self._discard(evicted, evicted_key, evicted_ordinal)
+            self.evicted += 1
+
+    def remove(self, row: dict) -> None:
+        entry = self._order.pop(row["transaction_id"], None)
+        if entry is not None:
+            self._discard(row["transaction_id"], *entry)
+
+    def _discard(self, transaction_id: str, key: DedupKey, ordinal: int) -> None:
+        dates = self._entries.get(key)
+        ids = dates.get(ordinal) if dates else None
+        if ids and transaction_id in ids:
+            ids.remove(transaction_id)
+            if not ids:
+                del dates[ordinal]
+            if not dates:
+                del self._entries[key]
+        day = self._by_day.get(ordinal)
+        if day is not None:
+            day.discard(transaction_id)
+            if not day:
+                del self._by_day[ordinal]
+
+    def prune(self, today: Optional[date] = None) -> int:
+        """
+        Drop the transactions that fell out of the horizon, at most once a day.
+
+        Only the expired days are visited, so the cost is the number of
+        transactions dropped.
+
+        Returns:
+            int: The number of transactions dropped.
+        """
+        today = today or date.today()
+        if self._pruned_on == today:
+            return 0
+        self._pruned_on = today
+        oldest = (today - timedelta(days=self.horizon_days)).toordinal()
+        dropped = 0
+        for ordinal in [ordinal for ordinal in self._by_day if ordinal < oldest]:
+            for transaction_id in list(self._by_day.get(ordinal, ())):
+                key, _ = self._order.pop(transaction_id)
+                self._discard(transaction_id, key, ordinal)
+                dropped += 1
+        return dropped
+
+    def claim(
+        self,
+        row: dict,
+        idempotency_key: Optional[str] = None,
+        allow_duplicate: bool = False,
+        exclude: Optional[Set[str]] = None,
+    ):
+        """
+        Find what ``row`` duplicates, or reserve it as the transaction to write.
+
+        Checking and reserving happen under one lock, so of two concurrent
+        copies only the first is written.
+
+        Returns:
+            str | asyncio.Future | None: The id of the existing transaction, the
+            future of a write in flight for the same idempotency key, or None if
+            the row was reserved and should be written.
+
+        Raises:
+            ValueError: If the idempotency key was already used for a
+                transaction with a different amount, date, account or description.
+        """
+        key = (row["user_id"], idempotency_key) if idempotency_key else None
+        payload = idempotency_payload(row) if key is not None else None
+        with self._lock:
+            self.prune()
+            if key is not None:
+                previous = self.idempotency.get(key)
+                if previous is not None:
+                    previous_payload, result = previous
+                    if previous_payload != payload:
+                        raise ValueError(
+                            f"Idempotency key {idempotency_key!r} was already used for a different transaction."
+                        )
+                    self.idempotent_replays += 1
+                    return result
+            existing = None if allow_duplicate else self.find(row, exclude or ())
+            if existing is not None:
+                self.duplicates += 1
+                if key is not None:
+                    self.idempotency.set(key, (payload, existing))
+                return existing
+            self.add(row)
+            if key is not None:
+                self.idempotency.set(key, (payload, asyncio.get_running_loop().create_future()))
+            return None
+
+    def settle(self, row: dict, idempotency_key: Optional[str], error: Optional[Exception] = None) -> None:
+        """Record how the write of a claimed row ended, releasing it if it failed."""
+        key = (row["user_id"], idempotency_key) if idempotency_key else None
+        with self._lock:
+            entry = self.idempotency.get(key) if key is not None else None
+            pending = entry[1] if entry is not None else None
+            if error is not None:
+                self.remove(row)
+                if key is not None:
+                    self.idempotency.invalidate(key)
+            elif key is not None:
+                self.idempotency.set(key, (idempotency_payload(row), row["transaction_id"]))
+        if isinstance(pending, asyncio.Future) and not pending.done():
+            if error is not None:
+                pending.set_exception(error)
+                # Mark the exception as retrieved when no retry is waiting on it
+                pending.exception()
+            else:
+                pending.set_result(row["transaction_id"])
+
+    def is_loaded(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._loaded
+
+    def load_user(self, storage, user_id: str) -> int:
+        """
+        Index a user's stored transactions dated within the horizon, unless they are indexed already.
+
+        This blocks on storage: from async code go through ``aload_user``.
+
+        Returns:
+            int: The number of transactions read.
+        """
+        if self.is_loaded(user_id):
+            return 0
+        since = date.fromordinal(self._oldest_ordinal()).isoformat()
+        rows = storage.scan_transactions(user_id, since=since)
+        with self._lock:
+            if user_id in self._loaded:
+                return 0
+            # Rows claimed while the scan ran are indexed once, add skips known ids
+            for row in rows:
+                if row.get("transaction_date") and row.get("amount") is not None and row.get("notes"):
+                    self.add(row)
+            self._loaded.add(user_id)
+            self.loads += 1
+        return len(rows)
+
+    async def aload_user(self, user_id: str) -> None:
+        """Index a user's stored transactions on the database executor; concurrent calls share one read."""
+        if self.is_loaded(user_id):
+            return
+        loading = self._loading.get(user_id)
+        if loading is None:
+            # Imported here to keep the index usable without a storage backend
+            from finassist.utils.storage import get_storage
+            loading = self._loading[user_id] = asyncio.ensure_future(run_blocking(self.load_user, get_storage(), user_id))
+            loading.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        await asyncio.shield(loading)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "indexed": self.size,
+                "keys": len(self._entries),
+                "evicted": self.evicted,
+                "users_loaded": self.loads,
+                "duplicates": self.duplicates,
+                "idempotent_replays": self.idempotent_replays,
+                "idempotency_keys": len(self.idempotency),
+            }
+
+
+def get_dedup_index() -> DedupIndex:
+    """Get the shared duplicate index; each user's transactions are indexed on their first submit."""
+    global dedup_index
+    if dedup_index is None:
+        dedup_index = DedupIndex()
+    return dedup_index
+
+
+async def submit_transaction(
+    row: dict,
+    idempotency_key: Optional[str] = None,
+    allow_duplicate: bool = False,
+    exclude: Optional[Set[str]] = None,
+) -> Tuple[str, bool]:
+    """
+    Store a transaction through the transaction writer unless it is already stored.
+
+    A row with the idempotency key of an earlier call, or one that matches a
+    stored transaction (same user, account, amount, currency, type and
+    merchant, dated within DEDUP_DATE_WINDOW_DAYS), is not written again.
+
+    Args:
+        row (dict): A validated transaction row.
+        idempotency_key (str): A client-chosen key, the same for every retry.
+        allow_duplicate (bool): Skip the content match, e.g. when the user
+            confirmed a second identical purchase. Idempotency keys still apply.
+        exclude (set): Transaction ids that may not be matched; the id of the
+            transaction ``row`` resolves to is added to it. A bulk import passes
+            one set, so each stored transaction absorbs at most one of its rows.
+
+    Returns:
+        tuple: The transaction id, and whether it was an existing transaction.
+
+    Raises:
+        ValueError: If ``idempotency_key`` was already used for a different transaction.
+        InsertError: If the writer rejected the row, also raised to retries
+            waiting on the same idempotency key.
+    """
+    index = get_dedup_index()
+    try:
+        await index.aload_user(row["user_id"])
+    except Exception as e:
+        # Without the stored history only this process's writes are matched
+        print(f"Error loading the transactions of {row['user_id']} for the duplicate index: {e}")
+    existing = index.claim(row, idempotency_key, allow_duplicate, exclude)
+    if existing is not None:
+        if isinstance(existing, asyncio.Future):
+            existing = await asyncio.shield(existing)
+        if exclude is not None:
+            exclude.add(existing)
+        return existing, True
+
+    if exclude is not None:
+        exclude.add(row["transaction_id"])
+    try:
+        await get_transaction_writer().submit(row)
+    except Exception as e:
+        index.settle(row, idempotency_key, e)
+        raise
+    index.settle(row, idempotency_key)
+    return row["transaction_id"], False
@@ -0,0 +1,305 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from finassist.utils.storage import Account, UserContext
+
+# Currencies whose symbol is "$"; a bare "$" means the user's currency if it is one of them
+DOLLAR_SIGN_CURRENCIES = ("USD", "MXN", "CAD", "AUD", "ARS", "CLP", "COP", "UYU")
+PESO_CURRENCIES = ("MXN", "ARS", "CLP", "COP", "UYU")
+ISO_CURRENCIES = (
+    "USD", "EUR", "GBP", "JPY", "CAD", "AUD", "CHF", "CNY",
+    "MXN", "BRL", "ARS", "CLP", "COP", "PEN", "UYU",
+)
+CURRENCY_SYMBOLS = {"€": "EUR", "£": "GBP", "¥": "JPY", "r$": "BRL", "s/": "PEN"}
+CURRENCY_WORDS = {
+    "dollar": "USD", "dollars": "USD", "bucks": "USD",
+    "euro": "EUR", "euros": "EUR",
+    "pound": "GBP", "pounds": "GBP",
+    "yen": "JPY",
+    "real": "BRL", "reais": "BRL",
+    "sol": "PEN", "soles": "PEN",
+    "peso": None, "pesos": None,  # resolved against the user's currency
+}
+
+MONTHS = {
+    name: index
+    for index, names in enumerate(
+        [("jan", "january", "enero"), ("feb", "february", "febrero"), ("mar", "march", "marzo"),
+         ("apr", "april", "abril"), ("may", "mayo"), ("jun", "june", "junio"),
+         ("jul", "july", "julio"), ("aug", "august", "agosto"), ("sep", "sept", "september", "septiembre"),
+         ("oct", "october", "octubre"), ("nov", "november", "noviembre"), ("dec", "december", "diciembre")],
+        start=1,
+    )
+    for name in names
+}
+WEEKDAYS = {name: index for index, name in enumerate(
+    ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+)}
+RELATIVE_DAYS = {
+    "day before yesterday": 2, "anteayer": 2,
+    "yesterday": 1, "last night": 1, "ayer": 1,
+    "today": 0, "this morning": 0, "this afternoon": 0, "tonight": 0, "hoy": 0,
+}
+
+INCOME_WORDS = re.compile(
+    r"\b(?:salary|paycheck|payroll|got paid|received|earned|refund(?:ed)?|deposit(?:ed)?|bonus|sold|income|cashback)\b",
+    re.IGNORECASE,
+)
+EXPENSE_WORDS = re.compile(
+    r"\b(?:spent|spend|paid|pay|bought|buy|purchased?|ordered|charged|tipped|withdrew|expense|cost)\b",
+    re.IGNORECASE,
+)
+ACCOUNT_TYPE_WORDS = {
+    "credit_card": re.compile(r"\bcredit(?: card)?\b|\btarjeta de cr[eé]dito\b", re.IGNORECASE),
+    "checking": re.compile(r"\b(?:debit|checking|bank account|d[eé]bito)\b", re.IGNORECASE),
+    "savings": re.compile(r"\bsavings?\b|\bahorros?\b", re.IGNORECASE),
+    "cash": re.compile(r"\b(?:cash|efectivo|wallet)\b", re.IGNORECASE),
+    "loan": re.compile(r"\b(?:loan|mortgage)\b", re.IGNORECASE),
+    "investment": re.compile(r"\b(?:brokerage|investment)\b", re.IGNORECASE),
+}
+GENERIC_ACCOUNT_WORDS = {"account", "card", "credit", "debit", "checking", "savings", "bank", "my", "the", "cash"}
+
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_AMOUNT_WITH_PREFIX = re.compile(
+    rf"(?P<symbol>r\$|s/|[$€£¥])\s?(?P<number>{_NUMBER})|\b(?P<code>[A-Z]{{3}})\s?(?P<number2>{_NUMBER})\b",
+    re.IGNORECASE,
+)
+_AMOUNT_WITH_SUFFIX = re.compile(
+    rf"\b(?P<number>{_NUMBER})\s?(?P<unit>[A-Za-z]{{3,7}})\b", re.IGNORECASE
+)
+_BARE_NUMBER = re.compile(rf"(?<![\w/$€£¥.,-])(?P<number>{_NUMBER})(?![\w/%:])")
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTH_DAY = re.compile(r"\b([a-z]{3,10})\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4}))?", re.IGNORECASE)
+_DAY_MONTH = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+|de\s+)?([a-z]{3,10})\b(?:,?\s+(?:de\s+)?(\d{4}))?", re.IGNORECASE)
+_ORDINAL_DAY = re.compile(r"\b(?:the|el)\s+(\d{1,2})(?:st|nd|rd|th)?\b(?!\s+(?:of\s+|de\s+)?[a-z]{3,10}\b)", re.IGNORECASE)
+_WEEKDAY = re.compile(r"\b(?:on|last)\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9áéíóúñ]+", re.IGNORECASE)
+
+# Fields the transaction agent needs before it can call add_transaction
+RESOLVABLE_FIELDS = ("amount", "currency", "transaction_date", "transaction_type", "account_id")
+
+
+@dataclass
+class ExtractionResult:
+    """Fields pre-parsed from a user message, plus what is still unresolved."""
+    fields: Dict[str, object] = field(default_factory=dict)
+    account_candidates: List[str] = field(default_factory=list)
+
+    @property
+    def missing(self) -> List[str]:
+        return [name for name in RESOLVABLE_FIELDS if self.fields.get(name) in (None, "")]
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.missing
+
+
+def user_today(timezone: Optional[str]) -> date:
+    """Get today's date in the user's timezone, falling back to the server's."""
+    try:
+        return datetime.now(ZoneInfo(timezone)).date() if timezone else date.today()
+    except (ZoneInfoNotFoundError, ValueError):
+        return date.today()
+
+
+def _to_number(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _resolve_currency(token: str, preferred: Optional[str]) -> Optional[str]:
+    token = token.lower()
+    if token == "$":
+        return preferred if preferred in DOLLAR_SIGN_CURRENCIES else "USD"
+    if token in CURRENCY_SYMBOLS:
+        return CURRENCY_SYMBOLS[token]
+    if token.upper() in ISO_CURRENCIES:
+        return token.upper()
+    if token in CURRENCY_WORDS:
+        if token.startswith("peso"):
+            return preferred if preferred in PESO_CURRENCIES else "MXN"
+        return CURRENCY_WORDS[token]
+    return None
+
+
+def _date_spans(message: str) -> List[tuple]:
+    spans = []
+    for pattern in (_ISO_DATE, _MONTH_DAY, _DAY_MONTH, _ORDINAL_DAY):
+        for match in pattern.finditer(message):
+            if pattern in (_ISO_DATE, _ORDINAL_DAY) or (match.group(1).lower() in MONTHS or match.group(2).lower() in MONTHS):
+                spans.append(match.span())
+    return spans
+
+
+def extract_amount(message: str, preferred_currency: Optional[str] = None) -> tuple:
+    """
+    Find the transaction amount and its currency.
+
+    Amounts next to a currency symbol, code or word win over bare numbers,
+    and numbers that are part of a date ("June 1st") are ignored.
+
+    Returns:
+        tuple: (amount or None, currency or None)
+    """
+    date_spans = _date_spans(message)
+
+    def in_date(span) -> bool:
+        return any(start <= span[0] < end for start, end in date_spans)
+
+    for match in _AMOUNT_WITH_PREFIX.finditer(message):
+        if match.group("symbol"):
+            return _to_number(match.group("number")), _resolve_currency(match.group("symbol"), preferred_currency)
+        if match.group("code").upper() in ISO_CURRENCIES:
+            return _to_number(match.group("number2")), match.group("code").upper()
+
+    for match in _AMOUNT_WITH_SUFFIX.finditer(message):
+        currency = _resolve_currency(match.group("unit"), preferred_currency)
+        if currency and not in_date(match.span()):
+            return _to_number(match.group("number")), currency
+
+    for match in _BARE_NUMBER.finditer(message):
+        if not in_date(match.span()) and not re.match(r"\s?(?:st|nd|rd|th)\b", message[match.end():]):
+            return _to_number(match.group("number")), None
+    return None, None
+
+
+def extract_date(message: str, today: date) -> Optional[date]:
+    """Resolve explicit and relative dates ("yesterday", "last friday", "June 1st") against ``today``."""
+    lowered = message.lower()
+    match = _ISO_DATE.search(message)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+
+    for pattern, month_group, day_group in ((_MONTH_DAY, 1, 2), (_DAY_MONTH, 2, 1)):
+        for match in pattern.finditer(message):
+            month = MONTHS.get(match.group(month_group).lower())
+            if not month:
+                continue
+            year = int(match.group(3)) if match.group(3) else today.year
+            try:
+                resolved = date(year, month, int(match.group(day_group)))
+            except ValueError:
+                continue
+            if not match.group(3) and resolved > today:
+                # "December 30" said in January means last year
+                resolved = resolved.replace(year=year - 1)
+            return resolved
+
+    match = _ORDINAL_DAY.search(message)
+    if match:
+        # "the 15th" is the most recent 15th, this month or the previous one
+        day = int(match.group(1))
+        month_start = today.replace(day=1)
+        for candidate_month in (month_start, (month_start - timedelta(days=1)).replace(day=1)):
+            try:
+                resolved = candidate_month.replace(day=day)
+            except ValueError:
+                continue
+            if resolved <= today:
+                return resolved
+
+    for phrase, days_ago in RELATIVE_DAYS.items():
+        if re.search(rf"\b{phrase}\b", lowered):
+            return today - timedelta(days=days_ago)
+
+    match = _WEEKDAY.search(message)
+    if match:
+        days_ago = (today.weekday() - WEEKDAYS[match.group(1).lower()]) % 7 or 7
+        return today - timedelta(days=days_ago)
+    return None
+
+
+def extract_transaction_type(message: str) -> Optional[str]:
+    """Tell incoming money from outgoing money by its verbs."""
+    if INCOME_WORDS.search(message):
+        return "income"
+    if EXPENSE_WORDS.search(message):
+        return "expense"
+    return None
+
+
+def match_accounts(message: str, accounts: List[Account]) -> List[Account]:
+    """
+    Rank the user's accounts by how well the message refers to them.
+
+    The institution and distinctive words of the account name weigh more
+    than the account type, so "BBVA credit card" picks the BBVA card out of
+    several credit cards, while "credit card" alone keeps all of them.
+
+    Returns:
+        list: The best-scoring accounts (several on a tie), or an empty list.
+    """
+    words = {word.lower() for word in _WORD.findall(message)}
+    types_mentioned = {account_type for account_type, pattern in ACCOUNT_TYPE_WORDS.items() if pattern.search(message)}
+    scored = []
+    for account in accounts:
+        score = 0.0
+        if account.institution and account.institution.lower() in message.lower():
+            score += 3
+        name_words = {word.lower() for word in _WORD.findall(account.account_name or "")} - GENERIC_ACCOUNT_WORDS
+        if account.institution:
+            name_words -= {word.lower() for word in _WORD.findall(account.institution)}
+        score += 2 * len(name_words & words)
+        if account.account_type in types_mentioned:
+            score += 1
+        elif types_mentioned:
+            score -= 1
+        if score > 0:
+            scored.append((score, account))
+    if not scored:
+        return []
+    best = max(score for score, _ in scored)
+    return [account for score, account in scored if score == best]
+
+
+def extract_transaction_fields(
+    message: str,
+    user_context: Optional[UserContext] = None,
+    today: Optional[date] = None,
+) -> ExtractionResult:
+    """
+    Pre-parse a free-text message into a partial transaction.
+
+    Args:
+        message (str): The user message.
+        user_context (UserContext): The user's currency, timezone and accounts.
+        today (date): Overrides "today" in the user's timezone, for tests and replays.
+
+    Returns:
+        ExtractionResult: The fields that could be resolved deterministically.
+    """
+    preferred_currency = user_context.preferred_currency if user_context else None
+    if today is None:
+        today = user_today(user_context.timezone if user_context else None)
+
+    result = ExtractionResult()
+    amount, currency = extract_amount(message, preferred_currency)
+    if amount is not None and amount > 0:
+        result.fields["amount"] = amount
+    if currency:
+        result.fields["currency"] = currency
+
+    transaction_date = extract_date(message, today)
+    if transaction_date is not None and transaction_date <= today:
+        result.fields["transaction_date"] = transaction_date.isoformat()
+
+    transaction_type = extract_transaction_type(message)
+    if transaction_type:
+        result.fields["transaction_type"] = transaction_type
+
+    if user_context and user_context.accounts:
+        matches = match_accounts(message, user_context.accounts)
+        if len(matches) == 1:
+            result.fields["account_id"] = matches[0].account_id
+            result.fields.setdefault("currency", matches[0].currency)
+        else:
+            result.account_candidates = [account.account_id for account in matches]
+
+    if "amount" in result.fields and "currency" not in result.fields and preferred_currency:
+        result.fields["currency"] = preferred_currency
+    return result
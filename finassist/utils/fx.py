@@ -0,0 +1,262 @@
+import csv
+import os
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from finassist.utils.cache import TTLCache
+from finassist.utils.utils import get_var_env
+
+FX_RATES_PATH = get_var_env("FX_RATES_PATH", "fx_rates.csv")
+FX_BASE_CURRENCY = get_var_env("FX_BASE_CURRENCY", "USD")
+FX_MAX_RATE_AGE_DAYS = int(get_var_env("FX_MAX_RATE_AGE_DAYS", "7"))
+FX_CACHE_SIZE = int(get_var_env("FX_CACHE_SIZE", "100000"))
+
+# (date, base, quote, rate): one unit of base is worth ``rate`` units of quote
+RateRow = Tuple[Union[str, date], str, str, float]
+DateLike = Union[str, date, np.datetime64]
+
+rate_table = None
+_rate_table_lock = threading.Lock()
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+CURRENCY_KEYS = 26 ** 3
+
+
+def _day(value: DateLike) -> int:
+    """Days since 1970-01-01 of a date, datetime or ISO string."""
+    if isinstance(value, np.datetime64):
+        return int(value.astype("datetime64[D]").astype(np.int64))
+    if not isinstance(value, date):
+        value = date.fromisoformat(str(value)[:10])
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def currency_codes(currencies: Union[np.ndarray, Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The distinct currencies of an array and the index of each entry in them.
+
+    The same result as ``np.unique(currencies, return_inverse=True)``.
+    ISO 4217 codes, three uppercase letters, are counted into a table of
+    every possible code instead of sorted, which is several times faster
+    on large arrays.
+    """
+    currencies = np.asarray(currencies)
+    if currencies.dtype == np.dtype("<U3") and len(currencies):
+        letters = currencies.view(np.uint32).reshape(-1, 3).astype(np.int64) - ord("A")
+        if letters.min() >= 0 and letters.max() < 26:
+            keys = letters[:, 0] * 676 + letters[:, 1] * 26 + letters[:, 2]
+            present = np.flatnonzero(np.bincount(keys, minlength=CURRENCY_KEYS))
+            lookup = np.zeros(CURRENCY_KEYS, dtype=np.int64)
+            lookup[present] = np.arange(len(present))
+            labels = np.array(["".join(chr(ord("A") + key // 26 ** power % 26) for power in (2, 1, 0))
+                               for key in present])
+            return labels, lookup[keys]
+    return np.unique(currencies, return_inverse=True)
+
+
+class RateTable:
+    """
+    Daily exchange rates, converting amounts between any two currencies.
+
+    Rates are kept per pair as sorted date and rate arrays, whichever
+    direction the rows quote it in. A pair missing from the rows is crossed
+    through the ``pivot`` currency. The rate of a date is the latest one on or before
+    it (rates are not published on weekends and holidays) unless that is
+    more than ``max_age_days`` old, in which case the date has no rate.
+
+    Lookups are memoized per pair and date: the first lookup of a pair
+    resolves its rate for every day from its first rate to
+    ``max_age_days`` after its last one into one array, so any later
+    lookup is an index into it, and single-date lookups are also cached
+    (the ``cache_size`` most recent).
+    """
+
+    def __init__(self, rows: Iterable[RateRow] = (), pivot: str = FX_BASE_CURRENCY,
+                 max_age_days: int = FX_MAX_RATE_AGE_DAYS, cache_size: int = FX_CACHE_SIZE):
+        self.pivot = pivot.upper()
+        self.max_age_days = max_age_days
+        by_pair: Dict[Tuple[str, str], Dict[int, float]] = defaultdict(dict)
+        for rate_date, base, quote, rate in rows:
+            rate = float(rate)
+            if rate <= 0:
+                raise ValueError(f"Invalid rate {rate} for {base}/{quote} on {rate_date}.")
+            base, quote = base.upper(), quote.upper()
+            # Both directions of a pair are kept as one series, in alphabetical order
+            if base > quote:
+                base, quote, rate = quote, base, 1.0 / rate
+            by_pair[(base, quote)][_day(rate_date)] = rate
+        self._series: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+        for pair, rates in by_pair.items():
+            days = np.array(sorted(rates), dtype=np.int64)
+            self._series[pair] = (days, np.array([rates[day] for day in days], dtype=np.float64))
+        self._daily: Dict[Tuple[str, str], Optional[Tuple[int, np.ndarray]]] = {}
+        self._memo = TTLCache(maxsize=cache_size, ttl=float("inf"))
+        # Reentrant: an inverse or crossed pair resolves the pairs it is derived from
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "RateTable":
+        """
+        Load rates from a CSV file with a ``date,base,quote,rate`` header.
+
+        Raises:
+            ValueError: If a row is malformed or a rate is not positive.
+        """
+        with open(path, newline="") as file:
+            reader = csv.DictReader(file)
+            missing = {"date", "base", "quote", "rate"} - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"FX rates file {path} is missing the columns {sorted(missing)}.")
+            return cls(((row["date"], row["base"], row["quote"], row["rate"]) for row in reader), **kwargs)
+
+    @property
+    def currencies(self) -> set:
+        return {currency for pair in self._series for currency in pair}
+
+    def _resolve(self, base: str, quote: str) -> Optional[Tuple[int, np.ndarray]]:
+        """Daily rates of a pair as ``(first_day, rates)``, NaN on days without a recent rate."""
+        if (base, quote) in self._series:
+            days, rates = self._series[(base, quote)]
+            first = int(days[0])
+            daily = np.full(int(days[-1]) - first + self.max_age_days + 1, np.nan)
+            # Index of the latest rate on or before each day, and how old it is
+            offsets = np.arange(len(daily)) + first
+            latest = np.searchsorted(days, offsets, side="right") - 1
+            fresh = offsets - days[latest] <= self.max_age_days
+            daily[fresh] = rates[latest[fresh]]
+            return first, daily
+        if (quote, base) in self._series:
+            first, daily = self._daily_rates(quote, base)
+            return first, 1.0 / daily
+        if self.pivot not in (base, quote):
+            to_base, to_quote = self._daily_rates(self.pivot, base), self._daily_rates(self.pivot, quote)
+            if to_base is not None and to_quote is not None:
+                first = max(to_base[0], to_quote[0])
+                last = min(to_base[0] + len(to_base[1]), to_quote[0] + len(to_quote[1]))
+                if first < last:
+                    return first, (to_quote[1][first - to_quote[0]:last - to_quote[0]]
+                                   / to_base[1][first - to_base[0]:last - to_base[0]])
+        return None
+
+    def _daily_rates(self, base: str, quote: str) -> Optional[Tuple[int, np.ndarray]]:
+        pair = (base, quote)
+        if pair not in self._daily:
+            with self._lock:
+                if pair not in self._daily:
+                    self._daily[pair] = self._resolve(base, quote)
+        return self._daily[pair]
+
+    def rates(self, base: str, quote: str, days: np.ndarray) -> np.ndarray:
+        """
+        Rates of a pair for an array of dates, NaN where there is none.
+
+        Args:
+            base (str): The currency converted from.
+            quote (str): The currency converted to.
+            days (np.ndarray): Dates as datetime64[D], or days since 1970-01-01.
+        """
+        days = np.asarray(days)
+        if days.dtype.kind == "M":
+            days = days.astype("datetime64[D]").astype(np.int64)
+        base, quote = base.upper(), quote.upper()
+        if base == quote:
+            return np.ones(len(days))
+        daily = self._daily_rates(base, quote)
+        if daily is None:
+            return np.full(len(days), np.nan)
+        first, values = daily
+        index = days - first
+        inside = (index >= 0) & (index < len(values))
+        result = np.full(len(days), np.nan)
+        result[inside] = values[index[inside]]
+        return result
+
+    def rate(self, base: str, quote: str, on: DateLike) -> Optional[float]:
+        """The rate of a pair on one date, None if there is none."""
+        key = (base.upper(), quote.upper(), _day(on))
+        rate = self._memo.get(key, False)
+        if rate is False:
+            base, quote, day = key
+            daily = None if base == quote else self._daily_rates(base, quote)
+            if base == quote:
+                rate = 1.0
+            elif daily is not None and 0 <= day - daily[0] < len(daily[1]):
+                value = daily[1][day - daily[0]]
+                rate = None if np.isnan(value) else float(value)
+            else:
+                rate = None
+            self._memo.set(key, rate)
+        return rate
+
+    def convert(self, amounts: np.ndarray, currencies: Union[np.ndarray, Sequence[str]], days: np.ndarray,
+                to_currency: str) -> np.ndarray:
+        """
+        Convert amounts given in several currencies on several dates to one currency.
+
+        Each amount is converted at the rate of its own date, looked up in a
+        currency by day matrix of the rates to ``to_currency`` with one
+        gather, whatever the number of amounts.
+
+        Args:
+            amounts (np.ndarray): The amounts.
+            currencies (np.ndarray): The currency of each amount.
+            days (np.ndarray): The date of each amount, as datetime64[D] or days since 1970-01-01.
+            to_currency (str): The currency to convert to.
+
+        Returns:
+            np.ndarray: The converted amounts, NaN where a rate is missing.
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        days = np.asarray(days)
+        if days.dtype.kind == "M":
+            days = days.astype("datetime64[D]").astype(np.int64)
+        to_currency = to_currency.upper()
+        labels, codes = currency_codes(currencies)
+        series = [None if label.upper() == to_currency else self._daily_rates(label.upper(), to_currency)
+                  for label in labels]
+        known = [daily for daily in series if daily is not None]
+        rates = np.full(len(amounts), np.nan)
+        if known:
+            first = min(daily[0] for daily in known)
+            matrix = np.full((len(labels), max(daily[0] + len(daily[1]) for daily in known) - first), np.nan)
+            for code, daily in enumerate(series):
+                if daily is not None:
+                    matrix[code, daily[0] - first:daily[0] - first + len(daily[1])] = daily[1]
+            index = days - first
+            inside = (index >= 0) & (index < matrix.shape[1])
+            rates[inside] = matrix[codes[inside], index[inside]]
+        # A currency converts to itself on any date, with or without rates
+        for code, label in enumerate(labels):
+            if label.upper() == to_currency:
+                rates[codes == code] = 1.0
+        return amounts * rates
+
+    def convert_one(self, amount: float, currency: str, to_currency: str, on: DateLike) -> Optional[float]:
+        """Convert one amount at the rate of a date, None if there is no rate."""
+        rate = self.rate(currency, to_currency, on)
+        return None if rate is None else amount * rate
+
+
+def get_rate_table() -> RateTable:
+    """
+    Get the shared rate table, loaded from FX_RATES_PATH.
+
+    Without a rates file the table is empty and only converts a currency
+    to itself.
+    """
+    global rate_table
+    with _rate_table_lock:
+        if rate_table is None:
+            if os.path.exists(FX_RATES_PATH):
+                try:
+                    rate_table = RateTable.from_file(FX_RATES_PATH)
+                except Exception as e:
+                    print(f"Error loading FX rates from {FX_RATES_PATH}: {e}")
+            if rate_table is None:
+                rate_table = RateTable()
+    return rate_table
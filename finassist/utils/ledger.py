@@ -0,0 +1,290 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from finassist.utils.utils import get_var_env
+
+BALANCE_RECONCILE_INTERVAL = float(get_var_env("BALANCE_RECONCILE_INTERVAL", "3600"))
+BALANCE_TOLERANCE = 0.005
+# Failed applies of queued deltas retried before the batch is left to reconciliation
+DELTA_MAX_ATTEMPTS = int(get_var_env("DELTA_MAX_ATTEMPTS", "10"))
+
+# Accounts whose balance is the amount owed, so an expense raises it. Credit
+# card balances go negative when money is owed (see the account agent prompt),
+# so they move like checking accounts.
+OWED_BALANCE_ACCOUNT_TYPES = ("loan",)
+
+# (user_id, month, account_id, category, currency, transaction_type)
+RollupKey = Tuple[str, str, str, str, str, str]
+
+balance_reconciler = None
+
+
+def transaction_delta(row: dict) -> float:
+    """The change a transaction makes to an asset account balance: income adds, expenses subtract."""
+    amount = float(row["amount"])
+    return amount if row["transaction_type"] == "income" else -amount
+
+
+def balance_deltas(rows: Iterable[dict]) -> Dict[Tuple[str, str], float]:
+    """
+    Sum the balance changes of stored transactions per ``(account_id, currency)``.
+
+    The storage backends apply each sum to the account only if the account
+    holds that currency and flip it for OWED_BALANCE_ACCOUNT_TYPES;
+    transactions in another currency leave the balance unchanged.
+    """
+    deltas: Dict[Tuple[str, str], float] = defaultdict(float)
+    for row in rows:
+        deltas[(row["account_id"], row["currency"])] += transaction_delta(row)
+    return {key: round(delta, 2) for key, delta in deltas.items() if round(delta, 2)}
+
+
+def transaction_month(transaction_date) -> str:
+    """The ``YYYY-MM`` month of a transaction date given as a date or an ISO string."""
+    return str(transaction_date)[:7]
+
+
+def rollup_deltas(rows: Iterable[dict]) -> Dict[RollupKey, Tuple[float, int]]:
+    """
+    Sum stored transactions into the keys of the spending rollups.
+
+    Keys are ``(user_id, month, account_id, category, currency,
+    transaction_type)``; uncategorized transactions count under the
+    category "". Amounts are summed as stored, the type tells income from
+    expenses.
+    """
+    deltas: Dict[RollupKey, List] = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        key = (
+            row["user_id"],
+            transaction_month(row["transaction_date"]),
+            row["account_id"],
+            row.get("category") or "",
+            row["currency"],
+            row["transaction_type"],
+        )
+        deltas[key][0] += float(row["amount"])
+        deltas[key][1] += 1
+    return {key: (round(total, 2), count) for key, (total, count) in deltas.items()}
+
+
+def with_opening_balance(rows: List[dict]) -> List[dict]:
+    """Account rows with ``opening_balance`` defaulted to their initial balance."""
+    return [
+        row if row.get("opening_balance") is not None else {**row, "opening_balance": row.get("balance") or 0.0}
+        for row in rows
+    ]
+
+
+class DeltaQueue:
+    """
+    Stored transactions whose changes to an incremental aggregate are not applied yet.
+
+    Writers ``add`` the transactions they stored and a background thread
+    calls ``flush``, which applies everything queued with one ``apply``
+    call. A failed apply puts the batch back for the next flush: errors
+    ``is_retryable`` accepts are retried until they succeed, other errors
+    ``max_attempts`` times before the batch is logged and left to the
+    periodic reconciliation.
+
+    Reconciliation recomputes the aggregate from the stored transactions, so
+    it runs through ``reconcile``, which holds off flushes and passes a
+    watermark: the newest ``recorded_date`` applied so far. The aggregate
+    already holds every applied transaction and the recompute counts every
+    transaction up to the watermark, so queued transactions at or before it
+    are dropped instead of being applied a second time.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[List[dict]], None],
+        is_retryable: Callable[[Exception], bool] = lambda error: False,
+        max_attempts: int = DELTA_MAX_ATTEMPTS,
+    ):
+        self.apply = apply
+        self.is_retryable = is_retryable
+        self.max_attempts = max_attempts
+        self.applied_through: Optional[str] = None
+        self.reconciled_through: Dict[Optional[str], str] = {}
+        self.rows_applied = 0
+        self.rows_dropped = 0
+        self.retries = 0
+        self.last_error: Optional[str] = None
+        self._rows: List[dict] = []
+        self._attempts = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def _reconciled(self, row: dict) -> bool:
+        watermark = max(self.reconciled_through.get(None, ""), self.reconciled_through.get(row["user_id"], ""))
+        return bool(watermark) and str(row["recorded_date"]) <= watermark
+
+    def add(self, rows: Iterable[dict]) -> None:
+        with self._lock:
+            self._rows.extend(row for row in rows if not self._reconciled(row))
+
+    def flush(self) -> int:
+        """
+        Apply the queued transactions.
+
+        Returns:
+            int: The number of transactions applied.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                self.apply(rows)
+            except Exception as e:
+                self.last_error = str(e)
+                retryable = self.is_retryable(e)
+                self._attempts += not retryable
+                if retryable or self._attempts < self.max_attempts:
+                    self.retries += 1
+                    print(f"Applying {len(rows)} queued transactions failed, retrying: {e}")
+                    with self._lock:
+                        self._rows[:0] = rows
+                else:
+                    self._attempts = 0
+                    self.rows_dropped += len(rows)
+                    print(f"Applying {len(rows)} queued transactions failed {self.max_attempts} times, "
+                          f"left to reconciliation: {e}")
+                raise
+            self._attempts = 0
+            self.rows_applied += len(rows)
+            newest = max(str(row["recorded_date"]) for row in rows)
+            if self.applied_through is None or newest > self.applied_through:
+                self.applied_through = newest
+            return len(rows)
+
+    def reconcile(self, recompute: Callable[[str], List[dict]], user_id: Optional[str] = None) -> List[dict]:
+        """
+        Run ``recompute(watermark)`` with flushes held off, then drop what it counted from the queue.
+
+        Args:
+            recompute (Callable): Recomputes the aggregate from the transactions
+                recorded up to the watermark it is given, returns the drift.
+            user_id (str): The user ``recompute`` is limited to, None for every user.
+        """
+        with self._flush_lock:
+            watermark = self.applied_through or datetime.now(timezone.utc).isoformat()
+            drift = recompute(watermark)
+            with self._lock:
+                self.reconciled_through[user_id] = max(self.reconciled_through.get(user_id, ""), watermark)
+                self._rows = [row for row in self._rows if not self._reconciled(row)]
+            return drift
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self),
+            "rows_applied": self.rows_applied,
+            "rows_dropped": self.rows_dropped,
+            "retries": self.retries,
+            "last_error": self.last_error,
+            "applied_through": self.applied_through,
+        }
+
+
+class BalanceReconciler:
+    """
+    Periodically checks the incremental aggregates against the transactions.
+
+    Balances and spending rollups are maintained incrementally as
+    transactions are written; this recomputes balances as
+    ``opening_balance`` plus the sum of the account's transactions and the
+    rollups from a full aggregate, corrects any that drifted (e.g. an
+    update lost after its transaction was stored) and drops the cached
+    context of the users whose balances changed. Runs every ``interval``
+    seconds on a background thread.
+    """
+
+    def __init__(self, storage, interval: float = BALANCE_RECONCILE_INTERVAL):
+        self.storage = storage
+        self.interval = interval
+        self.runs = 0
+        self.corrections = 0
+        self.rollup_corrections = 0
+        self.last_drift: List[dict] = []
+        self.last_rollup_drift: List[dict] = []
+        self.last_duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def reconcile(self, user_id: Optional[str] = None) -> List[dict]:
+        """
+        Reconcile the balances and rollups of one user, or of every user.
+
+        Returns:
+            list: ``{"account_id", "user_id", "balance", "expected"}`` for each corrected account.
+        """
+        # Imported here because storage imports this module
+        from finassist.utils.storage import invalidate_user_context
+
+        start = time.perf_counter()
+        drift = self.storage.reconcile_balances(user_id)
+        for user in {item["user_id"] for item in drift}:
+            invalidate_user_context(user)
+        self.last_rollup_drift = self.storage.reconcile_rollups(user_id)
+        self.rollup_corrections += len(self.last_rollup_drift)
+        self.runs += 1
+        self.corrections += len(drift)
+        self.last_drift = drift
+        self.last_duration = time.perf_counter() - start
+        return drift
+
+    def start(self) -> None:
+        """Keep reconciling on a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="finassist-reconciler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                drift = self.reconcile()
+                if drift:
+                    print(f"Corrected {len(drift)} drifted account balances: {drift[:5]}")
+                if self.last_rollup_drift:
+                    print(f"Corrected the spending rollups of {len(self.last_rollup_drift)} user months: "
+                          f"{self.last_rollup_drift[:5]}")
+            except Exception as e:
+                print(f"Error reconciling account balances: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "corrections": self.corrections,
+            "last_drift": len(self.last_drift),
+            "rollup_corrections": self.rollup_corrections,
+            "last_rollup_drift": len(self.last_rollup_drift),
+            "last_duration_ms": round(self.last_duration * 1000, 2),
+        }
+
+
+def start_balance_reconciler(storage, interval: float = BALANCE_RECONCILE_INTERVAL) -> Optional[BalanceReconciler]:
+    """Start the shared reconciler for a storage backend, unless the interval is 0."""
+    global balance_reconciler
+    if balance_reconciler is not None:
+        balance_reconciler.stop()
+        balance_reconciler = None
+    if interval > 0:
+        balance_reconciler = BalanceReconciler(storage, interval)
+        balance_reconciler.start()
+    return balance_reconciler
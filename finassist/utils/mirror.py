@@ -0,0 +1,170 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from finassist.utils.storage import Account, SQLiteStorage, Storage, UserContext
+
+MIRRORED_TABLES = ("users", "accounts")
+
+
+class MirroredStorage(Storage):
+    """
+    Serves user and account reads from a local, indexed copy of another backend.
+
+    The mirror is an in-memory SQLite database keyed by ``user_id``. It is
+    kept current incrementally: each refresh only pulls the rows whose
+    ``updated_at`` is newer than the last sync watermark of their table,
+    less ``catch_up_lag`` seconds. A row stamped before the watermark can
+    commit after the refresh that set it (e.g. a BigQuery MERGE stamping
+    ``CURRENT_TIMESTAMP()`` when it starts, or a client-stamped streaming
+    insert), and the next refresh re-reads that window to pick it up.
+    Refreshes run on a background thread every ``refresh_interval`` seconds,
+    and on demand when a user is missing from the mirror.
+
+    Writes go to the source backend and are copied into the mirror as soon
+    as the source accepts them, so a new account or a balance changed by a
+    transaction shows up on the next turn without waiting for a refresh.
+    Deleted rows are not propagated. Transactions, their spending rollups
+    and budgets are only read from the source.
+    """
+
+    def __init__(
+        self,
+        source: Storage,
+        mirror: Optional[SQLiteStorage] = None,
+        refresh_interval: float = 30.0,
+        min_miss_refresh_interval: float = 1.0,
+        catch_up_lag: float = 300.0,
+    ):
+        self.source = source
+        self.mirror = mirror or SQLiteStorage(":memory:")
+        self.refresh_interval = refresh_interval
+        self.catch_up_lag = catch_up_lag
+        self.min_miss_refresh_interval = min_miss_refresh_interval
+        self.watermarks: Dict[str, Optional[str]] = {table: None for table in MIRRORED_TABLES}
+        self.last_refresh = 0.0
+        self.refreshes = 0
+        self.rows_synced = 0
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> int:
+        """
+        Pull the rows changed since the last sync, less ``catch_up_lag``, into the mirror.
+
+        Returns:
+            int: The number of rows synced.
+        """
+        with self._refresh_lock:
+            synced = 0
+            for table in MIRRORED_TABLES:
+                since = self.watermarks[table]
+                if since is not None and self.catch_up_lag > 0:
+                    since = (datetime.fromisoformat(since) - timedelta(seconds=self.catch_up_lag)).isoformat()
+                rows = self.source.fetch_changes(table, since)
+                if not rows:
+                    continue
+                self.mirror.upsert_rows(table, rows)
+                stamps = [row["updated_at"] for row in rows if row.get("updated_at")]
+                if stamps:
+                    self.watermarks[table] = max(stamps + [self.watermarks[table] or ""])
+                synced += len(rows)
+            self.last_refresh = time.monotonic()
+            self.refreshes += 1
+            self.rows_synced += synced
+            return synced
+
+    def start(self) -> None:
+        """Run a full sync, then keep refreshing on a background thread."""
+        self.refresh()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="finassist-mirror", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing accounts mirror: {e}")
+
+    def get_user_context(self, user_id: str) -> Optional[UserContext]:
+        user_context = self.mirror.get_user_context(user_id)
+        if user_context is None and time.monotonic() - self.last_refresh >= self.min_miss_refresh_interval:
+            # The user may have been created since the last sync
+            self.refresh()
+            user_context = self.mirror.get_user_context(user_id)
+        return user_context
+
+    def list_accounts(self, user_id: str) -> List[Account]:
+        return self.mirror.list_accounts(user_id)
+
+    def insert_users(self, rows: List[dict]) -> List[dict]:
+        return self._write_through("users", rows, self.source.insert_users(rows))
+
+    def insert_accounts(self, rows: List[dict]) -> List[dict]:
+        return self._write_through("accounts", rows, self.source.insert_accounts(rows))
+
+    def insert_transactions(self, rows: List[dict]) -> List[dict]:
+        errors = self.source.insert_transactions(rows)
+        # Apply the same balance changes locally, so the next turn sees them without a refresh
+        rejected = {error["index"] for error in errors or []}
+        accepted = [row for index, row in enumerate(rows) if index not in rejected]
+        if accepted:
+            self.mirror.apply_balance_deltas(accepted)
+        return errors
+
+    def reconcile_balances(self, user_id: Optional[str] = None) -> List[dict]:
+        drift = self.source.reconcile_balances(user_id)
+        if drift:
+            self.refresh()
+        return drift
+
+    def fetch_rollups(self, user_id: str, months: Optional[Iterable[str]] = None) -> List[dict]:
+        return self.source.fetch_rollups(user_id, months)
+
+    def reconcile_rollups(self, user_id: Optional[str] = None) -> List[dict]:
+        return self.source.reconcile_rollups(user_id)
+
+    def scan_transactions(self, user_id: str, **filters) -> List[dict]:
+        return self.source.scan_transactions(user_id, **filters)
+
+    def list_budgets(self, user_id: str) -> List[dict]:
+        return self.source.list_budgets(user_id)
+
+    def upsert_budgets(self, rows: List[dict]) -> List[dict]:
+        return self.source.upsert_budgets(rows)
+
+    def delete_budgets(self, user_id: str, budget_ids: Iterable[str]) -> int:
+        return self.source.delete_budgets(user_id, budget_ids)
+
+    def fetch_changes(self, table: str, since: Optional[str] = None) -> List[dict]:
+        return self.source.fetch_changes(table, since)
+
+    def fetch_transactions(self, since: Optional[str] = None) -> List[dict]:
+        return self.source.fetch_transactions(since)
+
+    def _write_through(self, table: str, rows: List[dict], errors: List[dict]) -> List[dict]:
+        rejected = {error["index"] for error in errors or []}
+        accepted = [row for index, row in enumerate(rows) if index not in rejected]
+        if accepted:
+            self.mirror.upsert_rows(table, accepted)
+        return errors
+
+    def stats(self) -> dict:
+        """Return sync counters and the current watermarks."""
+        return {
+            "refreshes": self.refreshes,
+            "rows_synced": self.rows_synced,
+            "watermarks": dict(self.watermarks),
+        }
@@ -0,0 +1,302 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncGenerator, Callable, Dict, Optional
+
+import httpx
+from google.adk.models.base_llm import BaseLlm
+from pydantic import PrivateAttr
+
+from finassist.utils.utils import get_var_env
+
+MODEL_MAX_CONNECTIONS = int(get_var_env("MODEL_MAX_CONNECTIONS", "20"))
+MODEL_MAX_KEEPALIVE_CONNECTIONS = int(get_var_env("MODEL_MAX_KEEPALIVE_CONNECTIONS", "20"))
+MODEL_KEEPALIVE_EXPIRY = float(get_var_env("MODEL_KEEPALIVE_EXPIRY", "60"))
+MODEL_REQUEST_TIMEOUT = float(get_var_env("MODEL_REQUEST_TIMEOUT", "120"))
+AGENT_MAX_CONCURRENCY = int(get_var_env("AGENT_MAX_CONCURRENCY", "16"))
+
+# Providers litellm talks to through the OpenAI SDK, which takes an AsyncOpenAI client
+OPENAI_SDK_PROVIDERS = ("openai",)
+
+models: Dict[str, "LazyLiteLlm"] = {}
+agent_models: Dict[str, "ConcurrencyLimitedLlm"] = {}
+provider_pools: Dict[str, "PooledTransport"] = {}
+http_clients: Dict[str, httpx.AsyncClient] = {}
+_models_lock = threading.Lock()
+
+
+def _wait_stats(wait_times: deque) -> dict:
+    ordered = sorted(wait_times)
+    return {
+        "wait_avg_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "wait_p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 3) if ordered else 0.0,
+        "wait_max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that gives the connection slot back once it is read or closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """
+    Keep-alive connection pool for one model provider, with usage metrics.
+
+    At most ``max_connections`` requests are in flight at once; the others
+    wait for a slot, and that wait is recorded. Connections are kept open
+    between calls so consecutive agent hops reuse them instead of starting a
+    new TLS handshake. Like any async connection pool it belongs to the
+    event loop that first uses it.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        max_connections: int = MODEL_MAX_CONNECTIONS,
+        max_keepalive_connections: int = MODEL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = MODEL_KEEPALIVE_EXPIRY,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.provider = provider
+        self.max_connections = max_connections
+        self.transport = transport or httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            )
+        )
+        self.in_use = 0
+        self.waiting = 0
+        self.requests = 0
+        self.wait_times: deque = deque(maxlen=1000)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_times.append(time.perf_counter() - start)
+        self.in_use += 1
+        self.requests += 1
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self._release),
+            extensions=response.extensions,
+        )
+
+    def _release(self) -> None:
+        self.in_use -= 1
+        self._slots.release()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    def idle_connections(self) -> Optional[int]:
+        """Open connections not serving a request, or None if the transport does not expose its pool."""
+        pool = getattr(self.transport, "_pool", None)
+        if pool is None:
+            return None
+        return sum(1 for connection in pool.connections if connection.is_idle())
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "in_use": self.in_use,
+            "idle": self.idle_connections(),
+            "waiting": self.waiting,
+            "requests": self.requests,
+            **_wait_stats(self.wait_times),
+        }
+
+
+def get_provider(model_name: str) -> str:
+    """Get the litellm provider prefix of a model name, e.g. ``openai`` for ``openai/gpt-4o``."""
+    return model_name.split("/", 1)[0] if "/" in model_name else "openai"
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """Get the shared, pooled HTTP client of a provider, creating it on the first call."""
+    with _models_lock:
+        if provider not in http_clients:
+            provider_pools[provider] = PooledTransport(provider)
+            http_clients[provider] = httpx.AsyncClient(
+                transport=provider_pools[provider],
+                timeout=httpx.Timeout(MODEL_REQUEST_TIMEOUT, connect=10.0),
+            )
+        return http_clients[provider]
+
+
+def build_litellm_client(provider: str):
+    """Wrap the provider's pooled HTTP client in the client type litellm expects for it."""
+    if provider in OPENAI_SDK_PROVIDERS:
+        # Imported here so that importing this module does not load the OpenAI SDK
+        from openai import AsyncOpenAI
+        # litellm uses a given client as is, so it needs the key and endpoint litellm would have read
+        return AsyncOpenAI(
+            api_key=get_var_env("OPENAI_API_KEY"),
+            base_url=os.environ.get("OPENAI_API_BASE") or os.environ.get("OPENAI_BASE_URL"),
+            http_client=get_http_client(provider),
+        )
+
+    # Imported here so that importing this module does not load litellm
+    from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+    class PooledHTTPHandler(AsyncHTTPHandler):
+        def create_client(self, *args, **kwargs) -> httpx.AsyncClient:
+            return get_http_client(provider)
+
+    return PooledHTTPHandler(timeout=MODEL_REQUEST_TIMEOUT, client_alias=f"finassist-{provider}")
+
+
+class LazyLiteLlm(BaseLlm):
+    """
+    A LiteLlm that is only built, and litellm only imported, on the first model call.
+
+    Importing litellm takes seconds, so agents hold this placeholder and
+    workers that never reach a given agent never pay for it. The LiteLlm it
+    builds sends its requests through the provider's pooled HTTP client.
+    """
+
+    _delegate: BaseLlm = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def get_delegate(self) -> BaseLlm:
+        """Get the underlying LiteLlm, building it on the first call."""
+        if self._delegate is None:
+            with self._lock:
+                if self._delegate is None:
+                    from finassist.utils.async_lite_llm import AsyncStreamingLiteLlm
+                    self._delegate = AsyncStreamingLiteLlm(
+                        model=self.model, client=build_litellm_client(get_provider(self.model))
+                    )
+        return self._delegate
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator:
+        async for response in self.get_delegate().generate_content_async(llm_request, stream=stream):
+            yield response
+
+    def connect(self, llm_request):
+        return self.get_delegate().connect(llm_request)
+
+
+class ConcurrencyLimitedLlm(BaseLlm):
+    """
+    Caps the model calls one agent can have in flight on a shared model.
+
+    Calls over ``max_concurrency`` wait for a slot, so a burst on one agent
+    cannot take every pooled connection from the others.
+    """
+
+    agent_name: str
+    max_concurrency: int = AGENT_MAX_CONCURRENCY
+    delegate: BaseLlm
+
+    _slots: Optional[asyncio.Semaphore] = PrivateAttr(default=None)
+    _in_flight: int = PrivateAttr(default=0)
+    _waiting: int = PrivateAttr(default=0)
+    _calls: int = PrivateAttr(default=0)
+    _wait_times: deque = PrivateAttr(default_factory=lambda: deque(maxlen=1000))
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._wait_times.append(time.perf_counter() - start)
+        self._in_flight += 1
+        self._calls += 1
+        try:
+            async for response in self.delegate.generate_content_async(llm_request, stream=stream):
+                yield response
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    def connect(self, llm_request):
+        return self.delegate.connect(llm_request)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "calls": self._calls,
+            **_wait_stats(self._wait_times),
+        }
+
+
+def get_model(env_var: str, agent_name: Optional[str] = None) -> BaseLlm:
+    """
+    Get the model named by an environment variable.
+
+    Agents whose variables name the same model share one instance, and so
+    one pooled HTTP client per provider.
+
+    Args:
+        env_var (str): e.g. ``TRANSACTION_AGENT_MODEL``.
+        agent_name (str): Limits the agent's concurrent calls to
+            ``<AGENT_NAME>_MAX_CONCURRENCY`` (default AGENT_MAX_CONCURRENCY).
+
+    Raises:
+        ValueError: If the variable is not set.
+    """
+    model_name = get_var_env(env_var)
+    with _models_lock:
+        if model_name not in models:
+            models[model_name] = LazyLiteLlm(model=model_name)
+        model = models[model_name]
+        if agent_name is None:
+            return model
+        limited = agent_models.get(agent_name)
+        if limited is None or limited.delegate is not model:
+            limited = agent_models[agent_name] = ConcurrencyLimitedLlm(
+                model=model_name,
+                agent_name=agent_name,
+                max_concurrency=int(get_var_env(f"{agent_name.upper()}_MAX_CONCURRENCY", str(AGENT_MAX_CONCURRENCY))),
+                delegate=model,
+            )
+        return limited
+
+
+def model_pool_stats() -> dict:
+    """Return connection pool metrics per provider and concurrency metrics per agent."""
+    return {
+        "providers": {provider: pool.stats() for provider, pool in provider_pools.items()},
+        "agents": {agent_name: model.stats() for agent_name, model in agent_models.items()},
+    }
@@ -0,0 +1,113 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from finassist.utils.utils import get_var_env
+
+PROMPT_VARIANT = get_var_env("PROMPT_VARIANT", "full")
+PROMPT_VARIANTS = ("full", "compact")
+TOKEN_ENCODING = "cl100k_base"
+
+# The tiktoken encoding, False once it failed to load
+_encoding = None
+
+
+def select_prompt(full: str, compact: str, variant: Optional[str] = None) -> str:
+    """
+    Pick the full or compact version of an agent prompt.
+
+    Args:
+        full (str): The original, detailed prompt.
+        compact (str): The short prompt with the same rules.
+        variant (str): "full" or "compact", defaults to the PROMPT_VARIANT environment variable.
+    """
+    variant = (variant or PROMPT_VARIANT).lower()
+    if variant not in PROMPT_VARIANTS:
+        raise ValueError(f"Unknown prompt variant '{variant}'. Use 'full' or 'compact'.")
+    return compact if variant == "compact" else full
+
+
+def format_segment(title: str, body: str) -> str:
+    """Render one dynamic block, e.g. ``<USER_CONTEXT>...</USER_CONTEXT>``."""
+    return f"<{title}>\n{body.strip()}\n</{title}>"
+
+
+def build_instruction(static_prompt: str, segments: Iterable[Tuple[str, str]] = ()) -> str:
+    """
+    Assemble an agent instruction from its static prompt and per-turn segments.
+
+    The static prompt is kept byte for byte at the start of the instruction,
+    and everything that changes between users or turns goes after it. The
+    system prompt of every turn then shares the same prefix, which is what
+    provider-side prompt caching keys on.
+
+    Args:
+        static_prompt (str): The agent prompt, identical on every turn.
+        segments (iterable): ``(title, body)`` pairs of dynamic content, in order.
+
+    Returns:
+        str: The instruction to give the agent.
+    """
+    dynamic = "\n".join(format_segment(title, body) for title, body in segments)
+    return f"{static_prompt}\n{dynamic}\n" if dynamic else static_prompt
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with tiktoken's cl100k_base encoding.
+
+    The encoding is loaded on first use. tiktoken downloads it the first
+    time, so if that fails (e.g. offline) tokens are estimated as one per
+    four characters instead.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            # Imported here so agents that never report tokens do not load tiktoken
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            print(f"Error loading the {TOKEN_ENCODING} encoding, estimating tokens from characters: {e}")
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4
+    return len(_encoding.encode(text))
+
+
+def agent_prompts() -> Dict[str, Dict[str, str]]:
+    """Get the full and compact static prompt of every agent, by agent name."""
+    from finassist.prompt import (
+        FLAT_AGENT_PROMPT,
+        FLAT_AGENT_PROMPT_COMPACT,
+        MAIN_AGENT_PROMPT,
+        MAIN_AGENT_PROMPT_COMPACT,
+    )
+    from finassist.subagents.data_manager.account.prompt import ACCOUNT_AGENT_PROMPT, ACCOUNT_AGENT_PROMPT_COMPACT
+    from finassist.subagents.data_manager.budget.prompt import BUDGET_AGENT_PROMPT, BUDGET_AGENT_PROMPT_COMPACT
+    from finassist.subagents.data_manager.prompt import (
+        DATABASE_MANAGER_INSTRUCTION,
+        DATABASE_MANAGER_INSTRUCTION_COMPACT,
+    )
+    from finassist.subagents.data_manager.transaction.prompt import (
+        TRANSACTION_AGENT_PROMPT,
+        TRANSACTION_AGENT_PROMPT_COMPACT,
+    )
+    from finassist.subagents.analytics.prompt import ANALYTICS_AGENT_PROMPT, ANALYTICS_AGENT_PROMPT_COMPACT
+    from finassist.subagents.question.prompt import QUESTION_AGENT_PROMPT, QUESTION_AGENT_PROMPT_COMPACT
+
+    return {
+        "root_agent": {"full": MAIN_AGENT_PROMPT, "compact": MAIN_AGENT_PROMPT_COMPACT},
+        "root_agent (flat)": {"full": FLAT_AGENT_PROMPT, "compact": FLAT_AGENT_PROMPT_COMPACT},
+        "database_manager": {"full": DATABASE_MANAGER_INSTRUCTION, "compact": DATABASE_MANAGER_INSTRUCTION_COMPACT},
+        "transaction_agent": {"full": TRANSACTION_AGENT_PROMPT, "compact": TRANSACTION_AGENT_PROMPT_COMPACT},
+        "account_agent": {"full": ACCOUNT_AGENT_PROMPT, "compact": ACCOUNT_AGENT_PROMPT_COMPACT},
+        "budget_agent": {"full": BUDGET_AGENT_PROMPT, "compact": BUDGET_AGENT_PROMPT_COMPACT},
+        "question_agent": {"full": QUESTION_AGENT_PROMPT, "compact": QUESTION_AGENT_PROMPT_COMPACT},
+        "analytics_agent": {"full": ANALYTICS_AGENT_PROMPT, "compact": ANALYTICS_AGENT_PROMPT_COMPACT},
+    }
+
+
+def prompt_token_report() -> Dict[str, Dict[str, int]]:
+    """Count the static prompt tokens of every agent, for each prompt variant."""
+    return {
+        agent_name: {variant: count_tokens(prompt) for variant, prompt in variants.items()}
+        for agent_name, variants in agent_prompts().items()
+    }
@@ -0,0 +1,60 @@
+import importlib
+import threading
+from typing import Callable, Dict, Union
+
+# Agent name -> "module:factory" of the function that builds it
+AGENT_FACTORIES = {
+    "root_agent": "finassist.agent:create_root_agent",
+    "database_manager": "finassist.subagents.data_manager.agent:create_database_manager",
+    "transaction_agent": "finassist.subagents.data_manager.transaction.agent:create_transaction_manager",
+    "account_agent": "finassist.subagents.data_manager.account.agent:create_account_manager",
+    "budget_agent": "finassist.subagents.data_manager.budget.agent:create_budget_manager",
+    "question_agent": "finassist.subagents.question.agent:create_question_agent",
+    "analytics_agent": "finassist.subagents.analytics.agent:create_analytics_agent",
+}
+
+
+class AgentRegistry:
+    """
+    Builds each agent on first use and keeps that one instance.
+
+    Factories are registered as ``"module:function"`` strings, so neither the
+    agent modules nor the SDKs they import are loaded until an agent is
+    actually requested.
+    """
+
+    def __init__(self, factories: Dict[str, Union[str, Callable]] = None):
+        self._factories: Dict[str, Union[str, Callable]] = dict(factories or {})
+        self._agents: Dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Union[str, Callable]) -> None:
+        """Register the factory of an agent, replacing any previous one."""
+        with self._lock:
+            self._factories[name] = factory
+            self._agents.pop(name, None)
+
+    def get(self, name: str):
+        """
+        Get an agent, building it on the first call.
+
+        Raises:
+            KeyError: If no factory is registered under ``name``.
+        """
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        with self._lock:
+            if name not in self._agents:
+                factory = self._factories[name]
+                if isinstance(factory, str):
+                    module_name, function_name = factory.split(":")
+                    factory = getattr(importlib.import_module(module_name), function_name)
+                self._agents[name] = factory()
+            return self._agents[name]
+
+    def is_built(self, name: str) -> bool:
+        return name in self._agents
+
+
+agent_registry = AgentRegistry(AGENT_FACTORIES)
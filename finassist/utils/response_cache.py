@@ -0,0 +1,276 @@
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from finassist.utils.cache import TTLCache
+from finassist.utils.utils import get_var_env
+
+RESPONSE_CACHE_ENABLED = get_var_env("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(get_var_env("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_TTL = float(get_var_env("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(get_var_env("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.9"))
+EMBEDDING_DIM = 1024
+DEFAULT_LANGUAGE = "default"
+
+# Question words that carry no topic, so "what is a bond" and "explain bonds" land close together
+QUESTION_STOPWORDS = {
+    "a", "an", "the", "what", "whats", "is", "are", "was", "how", "do", "does", "did", "can", "could", "should",
+    "would", "i", "me", "my", "you", "your", "we", "to", "of", "in", "on", "for", "and", "or", "vs", "versus",
+    "between", "difference", "explain", "tell", "about", "please", "mean", "means", "meaning", "define",
+    "definition", "work", "works", "there", "be", "with", "que", "es", "son", "como", "cual", "cuales", "el",
+    "la", "los", "las", "un", "una", "de", "del", "y", "o", "entre", "diferencia", "explica", "significa",
+    "por", "favor", "para", "en", "mi", "me",
+}
+# Words that point back at the conversation; such questions are answered by the model every time
+CONTEXT_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "he", "she", "again", "more",
+    "above", "previous", "earlier", "else", "also", "instead", "eso", "esto", "ese", "esa", "ello", "otra",
+    "mas", "anterior", "tambien",
+}
+MIN_QUESTION_WORDS = 2
+
+_WORD = re.compile(r"[a-z0-9]+")
+_BRACKETED_LETTER = re.compile(r"\((\w)\)")
+
+
+def normalize_question(text: str) -> List[str]:
+    """
+    Lowercase, accent-free words of a question, with apostrophes dropped
+    ("what's" -> "whats") and single bracketed letters joined ("401(k)" -> "401k").
+    """
+    text = unicodedata.normalize("NFKD", (text or "").lower().replace("'", "").replace("’", ""))
+    text = _BRACKETED_LETTER.sub(r"\1", text)
+    return _WORD.findall(text.encode("ascii", "ignore").decode())
+
+
+def singular(word: str) -> str:
+    """Fold the common English and Spanish plurals: "funds" -> "fund", "policies" -> "policy"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("xes", "ches", "shes", "ses")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def embed_question(words: List[str], dim: int = EMBEDDING_DIM) -> Optional[np.ndarray]:
+    """
+    Hash a question into a unit vector: topic words plus their character trigrams.
+
+    Topic words are singularized and counted once, so word order, plurals
+    and repetition do not change the vector; the trigrams keep small typos
+    ("intrest") close to the word they come from. Returns None if the
+    question has no topic words.
+    """
+    topic_words = dict.fromkeys(singular(word) for word in words if word not in QUESTION_STOPWORDS)
+    if not topic_words:
+        return None
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in topic_words:
+        features = [(word, 1.0)]
+        padded = f"#{word}#"
+        features += [(padded[start:start + 3], 0.25) for start in range(len(padded) - 2)]
+        for feature, weight in features:
+            bucket = zlib.crc32(feature.encode())
+            vector[bucket % dim] += weight if bucket & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+def normalize_language(language: Optional[str]) -> str:
+    """Reduce a language setting to its primary tag: "en-US" -> "en"."""
+    return re.split(r"[-_]", language.strip().lower())[0] if language and language.strip() else DEFAULT_LANGUAGE
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    slot: int
+
+
+@dataclass
+class CacheLookup:
+    """The outcome of looking a question up, kept until its answer can be stored."""
+    kind: str  # "exact", "semantic", "miss" or "bypass"
+    language: str
+    key: str
+    answer: Optional[str] = None
+    similarity: float = 0.0
+    vector: Optional[np.ndarray] = None
+
+    @property
+    def cacheable(self) -> bool:
+        return self.kind == "miss"
+
+
+class _LanguagePartition:
+    """
+    The cached answers of one language: an LRU/TTL map from normalized
+    question to answer, and a matrix with the embedding of every live entry.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, dim: int):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl, on_remove=self._free_slot)
+        # One spare row: a new entry takes its slot before the LRU entry is evicted
+        self.vectors = np.zeros((maxsize + 1, dim), dtype=np.float32)
+        self.slot_keys: List[Optional[str]] = [None] * (maxsize + 1)
+        self.live = np.zeros(maxsize + 1, dtype=bool)
+        self.free_slots = list(range(maxsize, -1, -1))
+        # Reentrant, and always taken before the TTLCache lock, which calls _free_slot while held
+        self.lock = threading.RLock()
+
+    def _free_slot(self, key: str, entry: CachedAnswer) -> None:
+        with self.lock:
+            self.live[entry.slot] = False
+            self.slot_keys[entry.slot] = None
+            self.free_slots.append(entry.slot)
+
+    def get_exact(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry.answer if entry is not None else None
+
+    def get_nearest(self, vector: np.ndarray, threshold: float):
+        with self.lock:
+            if not self.live.any():
+                return None, 0.0
+            similarities = self.vectors @ vector
+            similarities[~self.live] = -1.0
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            if similarity < threshold:
+                return None, similarity
+            entry = self.entries.get(self.slot_keys[slot])
+            return (entry.answer if entry is not None else None), similarity
+
+    def put(self, key: str, vector: Optional[np.ndarray], answer: str) -> None:
+        with self.lock:
+            slot = self.free_slots.pop()
+            if vector is not None:
+                self.vectors[slot] = vector
+                self.live[slot] = True
+            self.slot_keys[slot] = key
+            self.entries.set(key, CachedAnswer(answer, slot))
+
+
+class ResponseCache:
+    """
+    Cache of question_agent answers, looked up by exact question first and
+    then by nearest neighbour over local hashed embeddings.
+
+    Answers are partitioned by the user's language, so a Spanish question
+    never gets an English answer. Each partition keeps at most ``maxsize``
+    answers for ``ttl`` seconds, evicting the least recently used first.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        threshold: float = RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+        dim: int = EMBEDDING_DIM,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.dim = dim
+        self._partitions: Dict[str, _LanguagePartition] = {}
+        self._lock = threading.Lock()
+        self.counts = {"exact": 0, "semantic": 0, "miss": 0, "bypass": 0, "stored": 0}
+        self.lookup_times: deque = deque(maxlen=1000)
+        self.model_times: deque = deque(maxlen=1000)
+
+    def _partition(self, language: str) -> _LanguagePartition:
+        partition = self._partitions.get(language)
+        if partition is None:
+            with self._lock:
+                partition = self._partitions.get(language)
+                if partition is None:
+                    partition = self._partitions[language] = _LanguagePartition(self.maxsize, self.ttl, self.dim)
+        return partition
+
+    def lookup(self, question: str, language: Optional[str] = None) -> CacheLookup:
+        """
+        Find a cached answer for a question.
+
+        Questions that refer back to the conversation ("explain it again") or
+        are too short to stand on their own bypass the cache.
+
+        Args:
+            question (str): The user's message.
+            language (str): The user's language; answers are only shared within it.
+
+        Returns:
+            CacheLookup: ``answer`` is set on an exact or semantic hit.
+        """
+        start = time.perf_counter()
+        language = normalize_language(language)
+        words = normalize_question(question)
+        key = " ".join(words)
+        if len(words) < MIN_QUESTION_WORDS or CONTEXT_WORDS.intersection(words):
+            result = CacheLookup("bypass", language, key)
+        else:
+            partition = self._partition(language)
+            answer = partition.get_exact(key)
+            if answer is not None:
+                result = CacheLookup("exact", language, key, answer, 1.0)
+            else:
+                vector = embed_question(words, self.dim)
+                answer, similarity = partition.get_nearest(vector, self.threshold) if vector is not None else (None, 0.0)
+                kind = "semantic" if answer is not None else "miss"
+                result = CacheLookup(kind, language, key, answer, similarity, vector)
+        with self._lock:
+            self.counts[result.kind] += 1
+            self.lookup_times.append(time.perf_counter() - start)
+        return result
+
+    def store(self, lookup: CacheLookup, answer: str, model_seconds: Optional[float] = None) -> None:
+        """Cache the model's answer to a question that missed."""
+        if not lookup.cacheable or not answer or not answer.strip():
+            return
+        self._partition(lookup.language).put(lookup.key, lookup.vector, answer)
+        with self._lock:
+            self.counts["stored"] += 1
+            if model_seconds is not None:
+                self.model_times.append(model_seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> dict:
+        """Return hit rates, lookup latency and, for comparison, the model latency of misses."""
+        with self._lock:
+            counts = dict(self.counts)
+            lookup_times = sorted(self.lookup_times)
+            model_times = sorted(self.model_times)
+            entries = {language: len(partition.entries) for language, partition in self._partitions.items()}
+        lookups = sum(counts[kind] for kind in ("exact", "semantic", "miss"))
+        hits = counts["exact"] + counts["semantic"]
+        return {
+            **counts,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "lookup_avg_ms": round(sum(lookup_times) / len(lookup_times) * 1000, 3) if lookup_times else 0.0,
+            "lookup_p95_ms": round(lookup_times[int(len(lookup_times) * 0.95)] * 1000, 3) if lookup_times else 0.0,
+            "model_avg_ms": round(sum(model_times) / len(model_times) * 1000, 1) if model_times else 0.0,
+            "entries": entries,
+        }
+
+
+response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the shared question_agent response cache."""
+    global response_cache
+    if response_cache is None:
+        response_cache = ResponseCache()
+    return response_cache
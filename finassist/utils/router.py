@@ -0,0 +1,203 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from finassist.prompt import MAIN_AGENT_PROMPT
+from finassist.subagents.analytics.prompt import ANALYTICS_AGENT_PROMPT
+from finassist.subagents.data_manager.account.prompt import ACCOUNT_AGENT_PROMPT
+from finassist.subagents.data_manager.budget.prompt import BUDGET_AGENT_PROMPT
+from finassist.subagents.data_manager.prompt import DATABASE_MANAGER_INSTRUCTION
+from finassist.subagents.data_manager.transaction.prompt import TRANSACTION_AGENT_PROMPT
+from finassist.subagents.question.prompt import QUESTION_AGENT_PROMPT
+from finassist.utils.utils import get_var_env
+
+TRANSACTION_AGENT = "transaction_agent"
+ACCOUNT_AGENT = "account_agent"
+QUESTION_AGENT = "question_agent"
+ANALYTICS_AGENT = "analytics_agent"
+BUDGET_AGENT = "budget_agent"
+ROUTES = (TRANSACTION_AGENT, ACCOUNT_AGENT, QUESTION_AGENT, ANALYTICS_AGENT, BUDGET_AGENT)
+
+ROUTER_CONFIDENCE_THRESHOLD = float(get_var_env("ROUTER_CONFIDENCE_THRESHOLD", "0.85"))
+
+# (pattern, route, weight): matches add ``weight`` to the route's log-score
+ROUTING_RULES = [
+    (r"[$€£]\s?\d|\d+(?:[.,]\d+)?\s?(?:usd|mxn|eur|pesos?|dollars?|euros?)\b", TRANSACTION_AGENT, 1.5),
+    (r"\b(?:spent|spend|paid|pay|bought|buy|purchased?|ordered|tipped|withdrew)\b", TRANSACTION_AGENT, 1.5),
+    (r"\b(?:got|received|earned)\b.*\b(?:salary|paid|paycheck|refund|bonus|payment)\b", TRANSACTION_AGENT, 2.0),
+    (r"\b(?:transaction|expense|income|deposit(?:ed)?)\b", TRANSACTION_AGENT, 1.0),
+    (r"\b(?:add|create|open|register|set up|close)\b.*\b(?:account|card|wallet|mortgage|loan)\b", ACCOUNT_AGENT, 2.5),
+    (r"\b(?:new|track my)\b.*\b(?:account|card|cash)\b", ACCOUNT_AGENT, 1.5),
+    (r"\b(?:statement closes|due date|closing date)\b", ACCOUNT_AGENT, 1.5),
+    (r"^\s*(?:what|how|why|when should|should i|is it|can you explain|explain|define|tell me about)\b", QUESTION_AGENT, 2.0),
+    (r"\b(?:difference between|what is|what are|meaning of|vs\.?|versus|pros and cons)\b", QUESTION_AGENT, 1.5),
+    (r"\?\s*$", QUESTION_AGENT, 0.75),
+    # Questions about the user's own money outweigh the "how"/"spent" rules above
+    (r"\bhow much (?:did|have|do) (?:i|we) (?:spend|spent|earn|earned|make|made|pay|paid|get|got)\b", ANALYTICS_AGENT, 4.0),
+    (r"\b(?:my|our) (?:spending|expenses|income|purchases|transactions)\b", ANALYTICS_AGENT, 2.0),
+    (r"\b(?:top|biggest|largest) (?:\d+ )?(?:categories|expenses|spending)\b|\bbreakdown\b", ANALYTICS_AGENT, 2.5),
+    (r"\b(?:this|last|previous) (?:month|week|year)\b.*\b(?:vs\.?|versus|compared?|than)\b", ANALYTICS_AGENT, 2.0),
+    (r"\bmonth[ -]over[ -]month\b|\bwhere (?:does|did) my money go\b", ANALYTICS_AGENT, 3.0),
+    # Any mention of a budget outweighs the amount and question rules
+    (r"\bbudgets?\b|\bpresupuestos?\b", BUDGET_AGENT, 5.0),
+    (r"\b(?:spending limit|limit my spending|over budget)\b", BUDGET_AGENT, 3.0),
+]
+
+# Extra examples for intents the agent prompts barely illustrate
+SEED_EXAMPLES = [
+    ("What is an index fund?", QUESTION_AGENT),
+    ("How does a credit score work?", QUESTION_AGENT),
+    ("Should I pay off debt or invest first?", QUESTION_AGENT),
+    ("Explain what an ETF is", QUESTION_AGENT),
+    ("What is inflation and how does it affect my savings?", QUESTION_AGENT),
+    ("How much should I save for retirement?", QUESTION_AGENT),
+    ("Open a new investment account at Fidelity", ACCOUNT_AGENT),
+    ("I want to register my BBVA debit account", ACCOUNT_AGENT),
+    ("I paid 200 pesos for lunch with my BBVA card", TRANSACTION_AGENT),
+    ("Received my paycheck of 3000 dollars", TRANSACTION_AGENT),
+    ("How much did I spend on groceries in March?", ANALYTICS_AGENT),
+    ("Did I spend more on transport this month than last month?", ANALYTICS_AGENT),
+    ("Show me my income for this year", ANALYTICS_AGENT),
+    ("How much is left of my food budget?", BUDGET_AGENT),
+    ("Am I over budget on restaurants this month?", BUDGET_AGENT),
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9$€£]+")
+_compiled_rules = [(re.compile(pattern, re.IGNORECASE), route, weight) for pattern, route, weight in ROUTING_RULES]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word unigrams and bigrams, with digits collapsed to ``0``."""
+    words = _TOKEN_RE.findall(re.sub(r"\d+(?:[.,]\d+)*", "0", text.lower()))
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def extract_prompt_examples() -> List[Tuple[str, str]]:
+    """
+    Collect labeled opening messages from the conversation examples in the agent prompts.
+
+    Short follow-ups such as "$15.99" or "This morning" only make sense in
+    the middle of a dialogue, so messages under three words are skipped.
+    """
+    examples = []
+
+    def add(text: str, route: str) -> None:
+        text = text.strip().strip('"')
+        if len(text.split()) >= 3:
+            examples.append((text, route))
+
+    for prompt, route in (
+        (TRANSACTION_AGENT_PROMPT, TRANSACTION_AGENT),
+        (ACCOUNT_AGENT_PROMPT, ACCOUNT_AGENT),
+        (QUESTION_AGENT_PROMPT, QUESTION_AGENT),
+        (ANALYTICS_AGENT_PROMPT, ANALYTICS_AGENT),
+        (BUDGET_AGENT_PROMPT, BUDGET_AGENT),
+    ):
+        for text in re.findall(r"User: (.+)", prompt):
+            add(text, route)
+
+    for text, agent in re.findall(r'User: "(.+)"\n- Call to: (\w+)', DATABASE_MANAGER_INSTRUCTION):
+        route = {
+            "transaction_manager": TRANSACTION_AGENT,
+            "account_manager": ACCOUNT_AGENT,
+            "budget_manager": BUDGET_AGENT,
+        }.get(agent)
+        if route:
+            add(text, route)
+
+    for text, agent in re.findall(r'User: (.+)\nAgent: .*?"(\w+_agent)"', MAIN_AGENT_PROMPT):
+        if agent in ROUTES:
+            add(text, agent)
+    return examples
+
+
+class NaiveBayesRouter:
+    """Multinomial naive Bayes over word unigrams and bigrams, with Laplace smoothing."""
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.token_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.total_tokens: Counter = Counter()
+        self.doc_counts: Counter = Counter()
+        self.vocabulary = set()
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "NaiveBayesRouter":
+        for text, route in examples:
+            tokens = tokenize(text)
+            self.token_counts[route].update(tokens)
+            self.total_tokens[route] += len(tokens)
+            self.doc_counts[route] += 1
+            self.vocabulary.update(tokens)
+        return self
+
+    def log_scores(self, text: str) -> Dict[str, float]:
+        tokens = [token for token in tokenize(text) if token in self.vocabulary]
+        total_docs = sum(self.doc_counts.values())
+        vocabulary_size = len(self.vocabulary)
+        scores = {}
+        for route in ROUTES:
+            score = math.log((self.doc_counts[route] + self.alpha) / (total_docs + self.alpha * len(ROUTES)))
+            denominator = self.total_tokens[route] + self.alpha * vocabulary_size
+            for token in tokens:
+                score += math.log((self.token_counts[route][token] + self.alpha) / denominator)
+            scores[route] = score
+        return scores
+
+
+class IntentRouter:
+    """
+    Routes a user message straight to a leaf agent when the intent is clear.
+
+    Keyword/regex rules and a naive Bayes model trained on the prompt
+    examples are combined into one score per route. ``classify`` returns the
+    best route and its confidence (its softmax probability), and ``route``
+    only returns a route when that confidence clears the threshold, leaving
+    ambiguous messages to the LLM.
+    """
+
+    def __init__(self, threshold: float = ROUTER_CONFIDENCE_THRESHOLD, examples: Optional[List[Tuple[str, str]]] = None):
+        self.threshold = threshold
+        self.model = NaiveBayesRouter().fit(
+            examples if examples is not None else extract_prompt_examples() + SEED_EXAMPLES
+        )
+        self._lock = threading.Lock()
+        self.routed = Counter()
+        self.fallbacks = 0
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """
+        Score a message against every route.
+
+        Returns:
+            tuple: The best route and its confidence between 0 and 1.
+        """
+        scores = self.model.log_scores(text)
+        for pattern, route, weight in _compiled_rules:
+            if pattern.search(text):
+                scores[route] += weight
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+    def route(self, text: str) -> Optional[str]:
+        """Return the leaf agent for a message, or None if the LLM should decide."""
+        route, confidence = self.classify(text) if text and text.strip() else (None, 0.0)
+        with self._lock:
+            if route is None or confidence < self.threshold:
+                self.fallbacks += 1
+                return None
+            self.routed[route] += 1
+        return route
+
+    def stats(self) -> dict:
+        """Return how many messages were routed locally and how many went to the LLM."""
+        with self._lock:
+            return {
+                "routed": dict(self.routed),
+                "fallbacks": self.fallbacks,
+            }
+
+
+intent_router = IntentRouter()
@@ -0,0 +1,488 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from google.adk.events.event import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.genai import types
+
+from finassist.utils.async_database import run_blocking
+from finassist.utils.cache import TTLCache
+from finassist.utils.prompt_builder import count_tokens
+from finassist.utils.storage import UserContext, user_context_cache
+from finassist.utils.utils import USER_ID_STATE_KEY, get_var_env
+
+SESSION_HISTORY_TOKENS = int(get_var_env("SESSION_HISTORY_TOKENS", "1500"))
+SESSION_SUMMARY_TOKENS = int(get_var_env("SESSION_SUMMARY_TOKENS", "300"))
+SESSION_MIN_TURNS = int(get_var_env("SESSION_MIN_TURNS", "2"))
+# Characters of each message kept in the summary of earlier turns
+SUMMARY_LINE_CHARS = 160
+SUMMARY_INVOCATION_ID = "session_summary"
+SUMMARY_HEADER = "Summary of the earlier conversation (oldest first):"
+
+SESSIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    user_context TEXT,
+    user_context_at REAL,
+    last_update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id)
+);
+
+CREATE TABLE IF NOT EXISTS session_events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+"""
+
+session_service = None
+# Token counts of recent events by id, so compaction counts each event once
+_event_tokens = TTLCache(maxsize=100_000, ttl=3600)
+
+
+def event_text(event: Event) -> str:
+    """Render the content of an event on one line: its text, tool calls and tool results."""
+    texts = []
+    for part in (event.content.parts or []) if event.content else []:
+        if part.text:
+            texts.append(part.text)
+        elif part.function_call:
+            texts.append(f"called {part.function_call.name}({json.dumps(part.function_call.args, default=str)})")
+        elif part.function_response:
+            texts.append(f"{part.function_response.name} returned {json.dumps(part.function_response.response, default=str)}")
+    return " ".join(" ".join(texts).split())
+
+
+def event_tokens(event: Event) -> int:
+    tokens = _event_tokens.get(event.id) if event.id else None
+    if tokens is None:
+        tokens = count_tokens(event_text(event))
+        if event.id:
+            _event_tokens.set(event.id, tokens)
+    return tokens
+
+
+def is_summary(event: Event) -> bool:
+    return event.invocation_id == SUMMARY_INVOCATION_ID
+
+
+def is_user_message(event: Event) -> bool:
+    """Whether an event is a message typed by the user, which starts a turn."""
+    return (
+        event.author == "user"
+        and not is_summary(event)
+        and event.content is not None
+        and any(part.text for part in event.content.parts or [])
+    )
+
+
+def _summary_lines(turn: List[Event]) -> List[str]:
+    lines = []
+    for event in turn:
+        text = event_text(event)
+        if text:
+            if len(text) > SUMMARY_LINE_CHARS:
+                text = text[:SUMMARY_LINE_CHARS - 3] + "..."
+            lines.append(f"- {event.author}: {text}")
+    return lines
+
+
+def compact_events(
+    events: List[Event],
+    history_tokens: int = SESSION_HISTORY_TOKENS,
+    summary_tokens: int = SESSION_SUMMARY_TOKENS,
+    min_turns: int = SESSION_MIN_TURNS,
+) -> Optional[List[Event]]:
+    """
+    Fold the oldest turns of a session's events into one summary event, to bound the history sent to the model.
+
+    A turn is a user message and every event up to the next one. The most
+    recent turns are kept whole while they fit in ``history_tokens``, and
+    never fewer than ``min_turns``, so a tool call is never separated from
+    its result and the agent that answered last keeps the conversation.
+    Every older turn becomes one line per message in the summary, cut to
+    SUMMARY_LINE_CHARS, and the oldest lines are dropped past
+    ``summary_tokens``. What the agents need from earlier turns, such as the
+    transaction draft, lives in the session state and is not affected.
+
+    Returns:
+        list: The summary event followed by the kept events, or None if the events already fit.
+    """
+    lines: List[str] = []
+    turns: List[List[Event]] = []
+    for event in events:
+        if is_summary(event):
+            lines = event.content.parts[0].text.splitlines()[1:]
+        elif not turns or is_user_message(event):
+            turns.append([event])
+        else:
+            turns[-1].append(event)
+
+    kept = used = 0
+    for turn in reversed(turns):
+        tokens = sum(event_tokens(event) for event in turn)
+        if kept >= min_turns and used + tokens > history_tokens:
+            break
+        used += tokens
+        kept += 1
+    if kept == len(turns):
+        return None
+
+    for turn in turns[:len(turns) - kept]:
+        lines += _summary_lines(turn)
+    # Keep the newest lines that fit in the summary budget
+    budget = summary_tokens - count_tokens(SUMMARY_HEADER)
+    start = len(lines)
+    while start > 0:
+        # One more token for the line break
+        tokens = count_tokens(lines[start - 1]) + 1
+        if tokens > budget:
+            break
+        budget -= tokens
+        start -= 1
+    summary = Event(
+        invocation_id=SUMMARY_INVOCATION_ID,
+        author="user",
+        id=Event.new_id(),
+        timestamp=turns[len(turns) - kept - 1][-1].timestamp,
+        content=types.Content(role="user", parts=[types.Part(text="\n".join([SUMMARY_HEADER] + lines[start:]))]),
+    )
+    return [summary] + [event for turn in turns[len(turns) - kept:] for event in turn]
+
+
+def with_user_id(state: Optional[Dict[str, Any]], user_id: str) -> Dict[str, Any]:
+    """The initial state of a session, with the user it serves under USER_ID_STATE_KEY unless given."""
+    state = dict(state or {})
+    state.setdefault(USER_ID_STATE_KEY, user_id)
+    return state
+
+
+class MemorySessionService(InMemorySessionService):
+    """
+    ADK's in-memory session service, with compact event histories.
+
+    Sessions start with their user_id in the state. When a user message is
+    appended, the history is compacted with ``compact_events``, both in the
+    session the runner holds, so the current turn already sends the compact
+    history, and in the stored one, so that copying it on the next turn
+    stays as cheap.
+    """
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        return await super().create_session(
+            app_name=app_name, user_id=user_id, state=with_user_id(state, user_id), session_id=session_id,
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if not event.partial and is_user_message(event):
+            compacted = await run_blocking(compact_events, session.events)
+            if compacted is not None:
+                session.events[:] = compacted
+                stored = self.sessions.get(session.app_name, {}).get(session.user_id, {}).get(session.id)
+                if stored is not None:
+                    stored.events = list(compacted)
+        return event
+
+
+def _session_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """The keys of a state that belong to the session itself, without app, user and temp ones."""
+    prefixes = (State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX)
+    return {key: value for key, value in state.items() if not key.startswith(prefixes)}
+
+
+def _prefixed_state(state: Dict[str, Any], prefix: str) -> Dict[str, Any]:
+    return {key[len(prefix):]: value for key, value in state.items() if key.startswith(prefix)}
+
+
+class SQLiteSessionService(BaseSessionService):
+    """
+    Session service persisted in an embedded SQLite database, with compact event histories.
+
+    Sessions survive restarts and can be served by any process sharing the
+    database file. State follows ADK's scopes: ``app:`` and ``user:`` keys
+    are shared by every session of the app or user, ``temp:`` keys are not
+    stored. Histories are compacted like in ``MemorySessionService``, so a
+    long conversation reads and sends a bounded number of events per turn.
+
+    Each session also keeps a snapshot of its user's context as cached by
+    this process when its last event was appended, or none after the cache
+    dropped it. A process that picks the session up without the context
+    cached seeds its cache from the snapshot, for what remains of its
+    USER_CONTEXT_CACHE_TTL, instead of querying storage on the first turn.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SESSIONS_SCHEMA)
+        # The user context last snapshotted per session, so unchanged contexts are not written again
+        self._snapshots = TTLCache(maxsize=100_000, ttl=user_context_cache.ttl)
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        state = with_user_id(state, user_id)
+        now = time.time()
+        await run_blocking(self._create, app_name, user_id, session_id, state, now)
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=_session_state(state),
+                          last_update_time=now)
+        return await run_blocking(self._merge_state, session)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        return await run_blocking(self._get, app_name, user_id, session_id, config)
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return await run_blocking(self._list, app_name, user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await run_blocking(self._delete, app_name, user_id, session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        compacted = await run_blocking(compact_events, session.events) if is_user_message(event) else None
+        if compacted is not None:
+            session.events[:] = compacted
+        await run_blocking(self._store_event, session, event, compacted)
+        return event
+
+    def _list(self, app_name: str, user_id: str) -> ListSessionsResponse:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, last_update_time FROM sessions WHERE app_name = ? AND user_id = ?",
+                (app_name, user_id),
+            ).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=user_id, id=row["session_id"], last_update_time=row["last_update_time"])
+            for row in rows
+        ])
+
+    def _delete(self, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+                self._conn.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        self._snapshots.invalidate(key)
+
+    def _create(self, app_name: str, user_id: str, session_id: str, state: Dict[str, Any], now: float) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO sessions (app_name, user_id, session_id, state, last_update_time)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (app_name, user_id, session_id, json.dumps(_session_state(state)), now),
+                )
+                self._update_shared_state(app_name, user_id, state)
+            except sqlite3.IntegrityError:
+                self._conn.execute("ROLLBACK")
+                raise ValueError(f"Session '{session_id}' already exists.")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _get(self, app_name: str, user_id: str, session_id: str, config: Optional[GetSessionConfig]) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        conditions = "app_name = ? AND user_id = ? AND session_id = ?"
+        with self._lock:
+            row = self._conn.execute(f"SELECT * FROM sessions WHERE {conditions}", key).fetchone()
+            if row is None:
+                return None
+            params = list(key)
+            query = f"SELECT event FROM session_events WHERE {conditions}"
+            if config and config.after_timestamp:
+                query += " AND timestamp >= ?"
+                params.append(config.after_timestamp)
+            query += " ORDER BY position DESC"
+            if config and config.num_recent_events:
+                query += " LIMIT ?"
+                params.append(config.num_recent_events)
+            events = [Event.model_validate_json(event["event"]) for event in self._conn.execute(query, params)]
+        events.reverse()
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=json.loads(row["state"]),
+                          events=events, last_update_time=row["last_update_time"])
+        if row["user_context"]:
+            self._seed_user_context(session, row["user_context"], row["user_context_at"])
+        return self._merge_state(session)
+
+    def _seed_user_context(self, session: Session, snapshot: str, cached_at: float) -> None:
+        user_id = session.state.get(USER_ID_STATE_KEY) or session.user_id
+        remaining = user_context_cache.ttl - (time.time() - cached_at)
+        if remaining > 0 and user_id not in user_context_cache:
+            user_context = UserContext.from_dict(json.loads(snapshot))
+            user_context_cache.set(user_id, user_context, ttl=remaining)
+            self._snapshots.set((session.app_name, session.user_id, session.id), (user_context, cached_at))
+
+    def _merge_state(self, session: Session) -> Session:
+        with self._lock:
+            app_state = self._conn.execute("SELECT state FROM app_states WHERE app_name = ?", (session.app_name,)).fetchone()
+            user_state = self._conn.execute(
+                "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?", (session.app_name, session.user_id),
+            ).fetchone()
+        for prefix, row in ((State.APP_PREFIX, app_state), (State.USER_PREFIX, user_state)):
+            if row is not None:
+                session.state.update({prefix + key: value for key, value in json.loads(row["state"]).items()})
+        return session
+
+    def _update_shared_state(self, app_name: str, user_id: str, state: Dict[str, Any]) -> None:
+        """Merge the app and user keys of a state into their tables; call with the lock held, in a transaction."""
+        app_delta = _prefixed_state(state, State.APP_PREFIX)
+        if app_delta:
+            row = self._conn.execute("SELECT state FROM app_states WHERE app_name = ?", (app_name,)).fetchone()
+            merged = {**(json.loads(row["state"]) if row else {}), **app_delta}
+            self._conn.execute(
+                "INSERT INTO app_states (app_name, state) VALUES (?, ?)"
+                " ON CONFLICT (app_name) DO UPDATE SET state = excluded.state",
+                (app_name, json.dumps(merged)),
+            )
+        user_delta = _prefixed_state(state, State.USER_PREFIX)
+        if user_delta:
+            row = self._conn.execute(
+                "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?", (app_name, user_id),
+            ).fetchone()
+            merged = {**(json.loads(row["state"]) if row else {}), **user_delta}
+            self._conn.execute(
+                "INSERT INTO user_states (app_name, user_id, state) VALUES (?, ?, ?)"
+                " ON CONFLICT (app_name, user_id) DO UPDATE SET state = excluded.state",
+                (app_name, user_id, json.dumps(merged)),
+            )
+
+    def _user_context_snapshot(self, session: Session) -> Optional[tuple]:
+        """
+        The snapshot to store for a session, as ``(context, cached_at)``, or None if it did not change.
+
+        ``(None, None)`` clears a stored snapshot whose context the cache dropped.
+        """
+        key = (session.app_name, session.user_id, session.id)
+        user_id = session.state.get(USER_ID_STATE_KEY) or session.user_id
+        # Peeked so that snapshotting does not count as a use of the cached context
+        user_context = user_context_cache.peek(user_id)
+        previous = self._snapshots.get(key)
+        if user_context is None:
+            if previous is not None and previous[0] is None:
+                return None
+            snapshot = (None, None)
+        elif previous is not None and previous[0] is user_context:
+            return None
+        else:
+            snapshot = (user_context, time.time())
+        self._snapshots.set(key, snapshot)
+        return snapshot
+
+    def _store_event(self, session: Session, event: Event, compacted: Optional[List[Event]]) -> None:
+        key = (session.app_name, session.user_id, session.id)
+        conditions = "app_name = ? AND user_id = ? AND session_id = ?"
+        snapshot = self._user_context_snapshot(session)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    f"UPDATE sessions SET state = ?, last_update_time = ? WHERE {conditions}",
+                    (json.dumps(_session_state(session.state)), session.last_update_time, *key),
+                )
+                if snapshot is not None:
+                    user_context, cached_at = snapshot
+                    self._conn.execute(
+                        f"UPDATE sessions SET user_context = ?, user_context_at = ? WHERE {conditions}",
+                        (json.dumps(user_context.to_dict()) if user_context else None, cached_at, *key),
+                    )
+                if event.actions and event.actions.state_delta:
+                    self._update_shared_state(session.app_name, session.user_id, event.actions.state_delta)
+                if compacted is None:
+                    self._conn.execute(
+                        "INSERT INTO session_events (app_name, user_id, session_id, position, timestamp, event)"
+                        f" SELECT ?, ?, ?, COALESCE(MAX(position), 0) + 1, ?, ? FROM session_events WHERE {conditions}",
+                        (*key, event.timestamp, event.model_dump_json(exclude_none=True), *key),
+                    )
+                else:
+                    # The compacted history replaces the stored one
+                    self._conn.execute(f"DELETE FROM session_events WHERE {conditions}", key)
+                    self._conn.executemany(
+                        "INSERT INTO session_events (app_name, user_id, session_id, position, timestamp, event)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        [(*key, position, stored.timestamp, stored.model_dump_json(exclude_none=True))
+                         for position, stored in enumerate(compacted, 1)],
+                    )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+
+def get_session_service() -> BaseSessionService:
+    """
+    Get the session service selected by the SESSION_BACKEND environment variable.
+
+    ``memory`` (the default) keeps sessions in this process, ``sqlite``
+    persists them in the database at SESSION_DB_PATH. Both compact the
+    event histories to SESSION_HISTORY_TOKENS.
+    """
+    global session_service
+    if session_service is None:
+        backend = get_var_env("SESSION_BACKEND", "memory").lower()
+        if backend == "memory":
+            session_service = MemorySessionService()
+        elif backend == "sqlite":
+            session_service = SQLiteSessionService(get_var_env("SESSION_DB_PATH", "finassist_sessions.db"))
+        else:
+            raise ValueError(f"Unknown session backend '{backend}'. Use 'memory' or 'sqlite'.")
+    return session_service
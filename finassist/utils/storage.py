@@ -0,0 +1,772 @@
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from finassist.utils.async_database import DB_QUERY_TIMEOUT, run_blocking
+from finassist.utils.cache import TTLCache
+from finassist.utils.ledger import (
+    BALANCE_TOLERANCE,
+    OWED_BALANCE_ACCOUNT_TYPES,
+    balance_deltas,
+    rollup_deltas,
+    start_balance_reconciler,
+    with_opening_balance,
+)
+from finassist.utils.utils import get_var_env
+
+storage = None
+user_context_cache = TTLCache(
+    maxsize=int(get_var_env("USER_CONTEXT_CACHE_SIZE", "1024")),
+    ttl=float(get_var_env("USER_CONTEXT_CACHE_TTL", "300")),
+)
+# Shared loads by user_id, with the cache generation they started at
+_inflight_user_contexts: Dict[str, Tuple[asyncio.Future, int]] = {}
+
+
+@dataclass
+class Account:
+    """An account row as seen by the agents."""
+    account_id: str
+    account_name: str
+    account_type: str
+    institution: Optional[str]
+    currency: str
+    balance: Optional[float]
+
+
+@dataclass
+class UserContext:
+    """A user row together with all of its accounts."""
+    user_id: str
+    full_name: str
+    preferred_currency: str
+    language: str
+    timezone: str
+    accounts: List[Account] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserContext":
+        """Rebuild a context from ``to_dict``, e.g. one kept with a stored session."""
+        return cls(**{**data, "accounts": [Account(**account) for account in data.get("accounts", [])]})
+
+    def total_balance(self) -> Optional[float]:
+        """
+        The net of the account balances in the preferred currency, at today's rates.
+
+        Balances of OWED_BALANCE_ACCOUNT_TYPES are what the user owes, so
+        they are subtracted. None when every balance is already in the
+        preferred currency, as the total then adds nothing to the listed
+        balances, or when a rate is missing (see ``finassist.utils.fx``).
+        """
+        balances = [account for account in self.accounts if account.balance is not None]
+        if not self.preferred_currency or all(account.currency == self.preferred_currency for account in balances):
+            return None
+        # Imported here so that building single-currency contexts does not load the rate table
+        from finassist.utils.fx import get_rate_table
+        rates = get_rate_table()
+        today = datetime.now(timezone.utc).date()
+        converted = [
+            rates.convert_one(
+                -account.balance if account.account_type in OWED_BALANCE_ACCOUNT_TYPES else account.balance,
+                account.currency, self.preferred_currency, today,
+            )
+            for account in balances
+        ]
+        return None if None in converted else round(sum(converted), 2)
+
+    @cached_property
+    def prompt_text(self) -> str:
+        """
+        The context rendered for agent instructions, computed once per cached context.
+
+        A ``key=value`` header for the user and one pipe-separated row per
+        account, in a fixed column order with balances rounded to cents. It is
+        about half the size of ``str(to_dict())``. With accounts in other
+        currencies, the header adds their ``total_balance`` in the preferred one.
+        """
+        fields = [
+            ("user_id", self.user_id),
+            ("name", self.full_name),
+            ("currency", self.preferred_currency),
+            ("language", self.language),
+            ("timezone", self.timezone),
+        ]
+        total_balance = self.total_balance()
+        if total_balance is not None:
+            fields.append(("total_balance", f"{total_balance:.2f}"))
+        header = "; ".join(f"{name}={_escape_prompt_value(value)}" for name, value in fields)
+        lines = [header, f"accounts ({'|'.join(PROMPT_ACCOUNT_COLUMNS)}):"]
+        for account in self.accounts:
+            balance = "" if account.balance is None else f"{account.balance:.2f}"
+            lines.append("|".join(
+                [_escape_prompt_value(getattr(account, column)) for column in PROMPT_ACCOUNT_COLUMNS[:-1]] + [balance]
+            ))
+        if not self.accounts:
+            lines.append("(none)")
+        return "\n".join(lines)
+
+
+# Account fields the agents need, in the order they are rendered; balance must stay last
+PROMPT_ACCOUNT_COLUMNS = ("account_id", "account_name", "account_type", "institution", "currency", "balance")
+
+
+def _escape_prompt_value(value) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+class Storage(ABC):
+    """
+    Interface every storage backend implements.
+
+    Every method a backend must provide is abstract, so a backend missing
+    one fails when it is instantiated rather than when the method is called.
+
+    Insert methods follow BigQuery's ``insert_rows_json`` contract: they
+    return a list of ``{"index": int, "errors": list}`` entries for the rows
+    that were rejected, and an empty list when every row was stored.
+    """
+
+    @abstractmethod
+    def get_user_context(self, user_id: str) -> Optional[UserContext]:
+        """Get a user and all of its accounts, or None if the user does not exist."""
+
+    async def aget_user_context(self, user_id: str, timeout: Optional[float] = DB_QUERY_TIMEOUT) -> Optional[UserContext]:
+        """Async version of ``get_user_context``, run on the database executor."""
+        return await run_blocking(self.get_user_context, user_id, timeout=timeout)
+
+    def list_accounts(self, user_id: str) -> List[Account]:
+        """Get all the accounts of a user; backends with a cheaper query than the full context override this."""
+        user_context = self.get_user_context(user_id)
+        return user_context.accounts if user_context is not None else []
+
+    @abstractmethod
+    def insert_users(self, rows: List[dict]) -> List[dict]:
+        """Insert user rows."""
+
+    @abstractmethod
+    def insert_accounts(self, rows: List[dict]) -> List[dict]:
+        """Insert account rows."""
+
+    @abstractmethod
+    def insert_transactions(self, rows: List[dict]) -> List[dict]:
+        """Insert transaction rows and apply the accepted ones to their account balances and spending rollups."""
+
+    @abstractmethod
+    def reconcile_balances(self, user_id: Optional[str] = None) -> List[dict]:
+        """
+        Recompute account balances as ``opening_balance`` plus all their transactions.
+
+        Only transactions in the account's currency count. Balances that
+        drifted from the aggregate are corrected.
+
+        Args:
+            user_id (str): Reconcile this user's accounts only, None for every account.
+
+        Returns:
+            list: ``{"account_id", "user_id", "balance", "expected"}`` for each corrected account.
+        """
+
+    @abstractmethod
+    def fetch_rollups(self, user_id: str, months: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Get the spending rollups of a user.
+
+        Args:
+            user_id (str): The user identifier.
+            months (iterable): ``YYYY-MM`` months to read, None for every month.
+
+        Returns:
+            list: ``{"month", "account_id", "category", "currency", "transaction_type", "total", "count"}``
+            rows, one per combination with transactions. Uncategorized transactions have the category "".
+        """
+
+    @abstractmethod
+    def reconcile_rollups(self, user_id: Optional[str] = None) -> List[dict]:
+        """
+        Recompute the spending rollups from the transactions and correct the ones that drifted.
+
+        Args:
+            user_id (str): Reconcile this user's rollups only, None for every user.
+
+        Returns:
+            list: ``{"user_id", "month"}`` for each corrected month.
+        """
+
+    @abstractmethod
+    def scan_transactions(
+        self,
+        user_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        account_id: Optional[str] = None,
+        category: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        text: Optional[str] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Get the transactions of a user that match ad-hoc filters, newest first.
+
+        This reads the transactions themselves; monthly totals are cheaper
+        to read from ``fetch_rollups``.
+
+        Args:
+            user_id (str): The user identifier.
+            since (str): First ``transaction_date`` included, as YYYY-MM-DD.
+            until (str): Last ``transaction_date`` included, as YYYY-MM-DD.
+            account_id (str): Only this account.
+            category (str): Only this category or subcategory, case-insensitive.
+            transaction_type (str): ``expense`` or ``income``.
+            text (str): Only transactions whose notes contain this text, case-insensitive.
+            min_amount (float): Smallest amount included.
+            max_amount (float): Largest amount included.
+            limit (int): Only the newest ``limit`` transactions, None for all of them.
+
+        Returns:
+            list: The transaction rows as dicts, with dates as ISO 8601 strings.
+        """
+
+    @abstractmethod
+    def list_budgets(self, user_id: str) -> List[dict]:
+        """Get the budgets of a user, as dicts with the columns of ``finassist.utils.budgets.BUDGET_FIELDS``."""
+
+    @abstractmethod
+    def upsert_budgets(self, rows: List[dict]) -> List[dict]:
+        """Insert budget rows, replacing the stored budget with the same ``budget_id``."""
+
+    @abstractmethod
+    def delete_budgets(self, user_id: str, budget_ids: Iterable[str]) -> int:
+        """
+        Delete budgets of a user.
+
+        Returns:
+            int: The number of budgets deleted.
+        """
+
+    @abstractmethod
+    def fetch_changes(self, table: str, since: Optional[str] = None) -> List[dict]:
+        """
+        Get the rows of ``table`` whose ``updated_at`` is newer than ``since``.
+
+        Args:
+            table (str): ``users`` or ``accounts``.
+            since (str): ISO 8601 watermark, None to fetch every row.
+
+        Returns:
+            list: The changed rows as dicts, with timestamps as ISO 8601 strings.
+        """
+
+    @abstractmethod
+    def fetch_transactions(self, since: Optional[str] = None) -> List[dict]:
+        """
+        Get the transactions recorded after ``since``.
+
+        Args:
+            since (str): ISO 8601 ``recorded_date`` watermark, None to fetch every row.
+
+        Returns:
+            list: The transaction rows as dicts, with dates as ISO 8601 strings.
+        """
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    full_name TEXT,
+    preferred_currency TEXT,
+    language TEXT,
+    timezone TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    account_name TEXT NOT NULL,
+    account_type TEXT NOT NULL,
+    institution TEXT,
+    balance REAL,
+    opening_balance REAL,
+    currency TEXT NOT NULL,
+    due_date TEXT,
+    statement_closing_date TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_user_id ON accounts (user_id);
+CREATE INDEX IF NOT EXISTS idx_accounts_updated_at ON accounts (updated_at);
+CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users (updated_at);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    transaction_type TEXT NOT NULL,
+    transaction_date TEXT NOT NULL,
+    recorded_date TEXT,
+    category TEXT,
+    subcategory TEXT,
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, transaction_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_id ON transactions (account_id);
+
+CREATE TABLE IF NOT EXISTS spending_rollups (
+    user_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    transaction_type TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, month, account_id, category, currency, transaction_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS budgets (
+    budget_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    period TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    alert_thresholds TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_budgets_user_id ON budgets (user_id);
+"""
+
+# The spending rollups recomputed from the transactions, for the :user_id user or every user if it is NULL
+ROLLUP_AGGREGATE_SQL = """
+SELECT user_id, substr(transaction_date, 1, 7) AS month, account_id, COALESCE(category, '') AS category,
+    currency, transaction_type, ROUND(SUM(amount), 2) AS total, COUNT(*) AS count
+FROM transactions
+WHERE :user_id IS NULL OR user_id = :user_id
+GROUP BY user_id, month, account_id, category, currency, transaction_type
+"""
+ROLLUP_KEY_COLUMNS = ("user_id", "month", "account_id", "category", "currency", "transaction_type")
+_ROLLUP_KEYS = ", ".join(ROLLUP_KEY_COLUMNS)
+# The user months whose stored rollups differ from the recomputed ones, missing or stale keys included
+ROLLUP_DRIFT_SQL = f"""
+WITH expected AS ({ROLLUP_AGGREGATE_SQL}),
+stored AS (SELECT * FROM spending_rollups WHERE :user_id IS NULL OR user_id = :user_id)
+SELECT e.user_id, e.month FROM expected e LEFT JOIN stored s USING ({_ROLLUP_KEYS})
+WHERE s.count IS NULL OR s.count != e.count OR ABS(s.total - e.total) > :tolerance
+UNION
+SELECT s.user_id, s.month FROM stored s LEFT JOIN expected e USING ({_ROLLUP_KEYS})
+WHERE e.count IS NULL
+ORDER BY 1, 2
+"""
+
+OWED_TYPES_SQL = ", ".join(f"'{account_type}'" for account_type in OWED_BALANCE_ACCOUNT_TYPES)
+ACCOUNT_COLUMNS = ("account_id", "account_name", "account_type", "institution", "currency", "balance")
+PRIMARY_KEYS = {"users": "user_id", "accounts": "account_id", "transactions": "transaction_id", "budgets": "budget_id"}
+
+
+class SQLiteStorage(Storage):
+    """
+    Embedded storage backend for local development and load testing.
+
+    Per-turn reads are point lookups on ``user_id``, served from indexes in
+    well under a millisecond. A single connection guarded by a lock is
+    shared by the executor threads.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        tables = {row["name"] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._migrate(tables)
+        self._columns = {
+            table: [row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            for table in ("users", "accounts", "transactions", "budgets")
+        }
+
+    def get_user_context(self, user_id: str) -> Optional[UserContext]:
+        with self._lock:
+            user = self._conn.execute(
+                "SELECT user_id, full_name, preferred_currency, language, timezone"
+                " FROM users WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+            if user is None:
+                return None
+            accounts = self._select_accounts(user_id)
+        return UserContext(**dict(user), accounts=accounts)
+
+    def list_accounts(self, user_id: str) -> List[Account]:
+        with self._lock:
+            return self._select_accounts(user_id)
+
+    def insert_users(self, rows: List[dict]) -> List[dict]:
+        return self._insert("users", rows)
+
+    def insert_accounts(self, rows: List[dict]) -> List[dict]:
+        return self._insert("accounts", with_opening_balance(rows))
+
+    def insert_transactions(self, rows: List[dict]) -> List[dict]:
+        # The balances and rollups change in the same database transaction as the inserts
+        return self._insert("transactions", rows, on_inserted=self._apply_transaction_aggregates)
+
+    def _apply_transaction_aggregates(self, rows: List[dict]) -> None:
+        self._apply_balance_deltas(rows)
+        self._apply_rollup_deltas(rows)
+
+    def apply_balance_deltas(self, rows: List[dict]) -> None:
+        """Apply stored transactions to their account balances, e.g. in a mirror of another backend."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._apply_balance_deltas(rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _apply_balance_deltas(self, rows: List[dict]) -> None:
+        # One update per account touched, whatever the number of transactions
+        now = datetime.now(timezone.utc).isoformat()
+        self._conn.executemany(
+            f"UPDATE accounts SET balance = COALESCE(balance, 0) + CASE WHEN account_type IN ({OWED_TYPES_SQL})"
+            " THEN -? ELSE ? END, updated_at = ? WHERE account_id = ? AND currency = ?",
+            [(delta, delta, now, account_id, currency) for (account_id, currency), delta in balance_deltas(rows).items()],
+        )
+
+    def _apply_rollup_deltas(self, rows: List[dict]) -> None:
+        # One upsert per user, month, account, category, currency and type touched
+        self._conn.executemany(
+            f"INSERT INTO spending_rollups ({', '.join(ROLLUP_KEY_COLUMNS)}, total, count)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            f" ON CONFLICT ({', '.join(ROLLUP_KEY_COLUMNS)}) DO UPDATE SET"
+            " total = ROUND(total + excluded.total, 2), count = count + excluded.count",
+            [key + (total, count) for key, (total, count) in rollup_deltas(rows).items()],
+        )
+
+    def fetch_rollups(self, user_id: str, months: Optional[Iterable[str]] = None) -> List[dict]:
+        query = (
+            "SELECT month, account_id, category, currency, transaction_type, total, count"
+            " FROM spending_rollups WHERE user_id = ?"
+        )
+        params = [user_id]
+        if months is not None:
+            months = list(months)
+            query += f" AND month IN ({', '.join('?' * len(months))})"
+            params += months
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def reconcile_rollups(self, user_id: Optional[str] = None) -> List[dict]:
+        params = {"user_id": user_id, "tolerance": BALANCE_TOLERANCE}
+        # Checked and corrected in SQL within one database transaction, which writes cannot interleave with
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                drift = [dict(row) for row in self._conn.execute(ROLLUP_DRIFT_SQL, params)]
+                if drift:
+                    self._conn.execute(
+                        f"DELETE FROM spending_rollups WHERE (:user_id IS NULL OR user_id = :user_id)"
+                        f" AND ({_ROLLUP_KEYS}) NOT IN (SELECT {_ROLLUP_KEYS} FROM ({ROLLUP_AGGREGATE_SQL}))",
+                        params,
+                    )
+                    # WHERE true tells SQLite the ON CONFLICT clause belongs to the INSERT
+                    self._conn.execute(
+                        f"INSERT INTO spending_rollups ({_ROLLUP_KEYS}, total, count)"
+                        f" SELECT * FROM ({ROLLUP_AGGREGATE_SQL}) WHERE true"
+                        f" ON CONFLICT ({_ROLLUP_KEYS}) DO UPDATE SET total = excluded.total, count = excluded.count"
+                        " WHERE count != excluded.count OR ABS(total - excluded.total) > :tolerance",
+                        params,
+                    )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return drift
+
+    def scan_transactions(
+        self,
+        user_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        account_id: Optional[str] = None,
+        category: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        text: Optional[str] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        conditions = ["user_id = ?"]
+        params = [user_id]
+        for condition, value in (
+            ("transaction_date >= ?", since),
+            ("transaction_date <= ?", until),
+            ("account_id = ?", account_id),
+            ("transaction_type = ?", transaction_type),
+            ("amount >= ?", min_amount),
+            ("amount <= ?", max_amount),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        if category is not None:
+            conditions.append("(category = ? COLLATE NOCASE OR subcategory = ? COLLATE NOCASE)")
+            params += [category, category]
+        if text is not None:
+            # LIKE is case-insensitive for ASCII in SQLite
+            conditions.append("notes LIKE ? ESCAPE '\\'")
+            params.append("%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT * FROM transactions WHERE {' AND '.join(conditions)}"
+                " ORDER BY transaction_date DESC, recorded_date DESC LIMIT ?",
+                params + [-1 if limit is None else limit],
+            )
+            return [dict(row) for row in cursor]
+
+    def reconcile_balances(self, user_id: Optional[str] = None) -> List[dict]:
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                drift = [
+                    dict(row) for row in self._conn.execute(
+                        f"""
+                        SELECT a.account_id, a.user_id, a.balance,
+                            ROUND(COALESCE(a.opening_balance, 0) + CASE WHEN a.account_type IN ({OWED_TYPES_SQL})
+                                THEN -COALESCE(t.total, 0) ELSE COALESCE(t.total, 0) END, 2) AS expected
+                        FROM accounts a
+                        LEFT JOIN (
+                            SELECT account_id, currency,
+                                SUM(CASE WHEN transaction_type = 'income' THEN amount ELSE -amount END) AS total
+                            FROM transactions GROUP BY account_id, currency
+                        ) t ON t.account_id = a.account_id AND t.currency = a.currency
+                        WHERE ? IS NULL OR a.user_id = ?
+                        """,
+                        (user_id, user_id),
+                    )
+                ]
+                drift = [
+                    item for item in drift
+                    if item["balance"] is None or abs(item["balance"] - item["expected"]) > BALANCE_TOLERANCE
+                ]
+                self._conn.executemany(
+                    "UPDATE accounts SET balance = ?, updated_at = ? WHERE account_id = ?",
+                    [(item["expected"], now, item["account_id"]) for item in drift],
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return drift
+
+    def list_budgets(self, user_id: str) -> List[dict]:
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM budgets WHERE user_id = ? ORDER BY created_at", (user_id,))
+            return [dict(row) for row in cursor]
+
+    def upsert_budgets(self, rows: List[dict]) -> List[dict]:
+        self.upsert_rows("budgets", rows)
+        return []
+
+    def delete_budgets(self, user_id: str, budget_ids: Iterable[str]) -> int:
+        budget_ids = list(budget_ids)
+        with self._lock:
+            return self._conn.execute(
+                f"DELETE FROM budgets WHERE user_id = ? AND budget_id IN ({', '.join('?' * len(budget_ids))})",
+                [user_id] + budget_ids,
+            ).rowcount
+
+    def fetch_changes(self, table: str, since: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT * FROM {table} WHERE ? IS NULL OR updated_at > ?",
+                (since, since),
+            )
+            return [dict(row) for row in cursor]
+
+    def fetch_transactions(self, since: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM transactions WHERE ? IS NULL OR recorded_date > ? ORDER BY recorded_date",
+                (since, since),
+            )
+            return [dict(row) for row in cursor]
+
+    def upsert_rows(self, table: str, rows: List[dict]) -> None:
+        """Insert rows, replacing the stored row when the primary key already exists."""
+        columns = self._columns[table]
+        key = PRIMARY_KEYS[table]
+        query = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            f" ON CONFLICT ({key}) DO UPDATE SET "
+            + ", ".join(f"{column} = excluded.{column}" for column in columns if column != key)
+        )
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(query, ([row.get(column) for column in columns] for row in rows))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _select_accounts(self, user_id: str) -> List[Account]:
+        cursor = self._conn.execute(
+            f"SELECT {', '.join(ACCOUNT_COLUMNS)} FROM accounts WHERE user_id = ? ORDER BY rowid",
+            (user_id,),
+        )
+        return [Account(**dict(row)) for row in cursor]
+
+    def _insert(self, table: str, rows: List[dict], on_inserted=None) -> List[dict]:
+        columns = self._columns[table]
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        errors = []
+        inserted = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for index, row in enumerate(rows):
+                    unknown = set(row) - set(columns)
+                    if unknown:
+                        errors.append({"index": index, "errors": [{"message": f"Unknown fields: {sorted(unknown)}"}]})
+                        continue
+                    try:
+                        self._conn.execute(query, [row.get(column) for column in columns])
+                        inserted.append(row)
+                    except sqlite3.Error as e:
+                        errors.append({"index": index, "errors": [{"message": str(e)}]})
+                if on_inserted is not None and inserted:
+                    on_inserted(inserted)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return errors
+
+    def _migrate(self, tables: Set[str]) -> None:
+        if "transactions" in tables and "spending_rollups" not in tables:
+            # Roll up the transactions stored before the rollups existed
+            self._conn.execute(
+                f"INSERT INTO spending_rollups ({_ROLLUP_KEYS}, total, count) {ROLLUP_AGGREGATE_SQL}",
+                {"user_id": None},
+            )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(accounts)")}
+        if "opening_balance" not in columns:
+            # Transactions never changed balances before, so the balances are the opening balances
+            self._conn.execute("ALTER TABLE accounts ADD COLUMN opening_balance REAL")
+            self._conn.execute("UPDATE accounts SET opening_balance = COALESCE(balance, 0)")
+
+
+def get_storage() -> Storage:
+    """
+    Get the storage backend selected by the STORAGE_BACKEND environment variable.
+
+    ``bigquery`` (the default) uses the BigQuery dataset, ``sqlite`` uses the
+    embedded database at SQLITE_DB_PATH. With ACCOUNTS_MIRROR enabled, user
+    and account reads are served from a local mirror of the backend. Account
+    balances are reconciled every BALANCE_RECONCILE_INTERVAL seconds.
+    """
+    global storage
+    if storage is None:
+        backend = get_var_env("STORAGE_BACKEND", "bigquery").lower()
+        if backend == "bigquery":
+            # Imported here so the embedded backend works without google-cloud-bigquery
+            from finassist.utils.database import BigQueryStorage
+            storage = BigQueryStorage()
+        elif backend == "sqlite":
+            storage = SQLiteStorage(get_var_env("SQLITE_DB_PATH", "finassist.db"))
+        else:
+            raise ValueError(f"Unknown storage backend '{backend}'. Use 'bigquery' or 'sqlite'.")
+
+        if get_var_env("ACCOUNTS_MIRROR", "false").lower() in ("1", "true", "yes"):
+            from finassist.utils.mirror import MirroredStorage
+            storage = MirroredStorage(
+                storage,
+                refresh_interval=float(get_var_env("ACCOUNTS_MIRROR_REFRESH_INTERVAL", "30")),
+                catch_up_lag=float(get_var_env("ACCOUNTS_MIRROR_CATCH_UP_LAG", "300")),
+            )
+            storage.start()
+
+        start_balance_reconciler(storage)
+    return storage
+
+def get_cached_user_context(user_id: str) -> Optional[UserContext]:
+    """
+    Get the user context, reading through the per-user TTL cache.
+
+    Args:
+        user_id (str): The user identifier.
+
+    Returns:
+        UserContext: The user and its accounts, or None if the user does not exist.
+    """
+    return user_context_cache.get_or_load(user_id, get_storage().get_user_context)
+
+async def aget_cached_user_context(user_id: str, timeout: Optional[float] = DB_QUERY_TIMEOUT) -> Optional[UserContext]:
+    """
+    Async version of ``get_cached_user_context``.
+
+    Concurrent misses for the same user share one query instead of each
+    starting their own. A load that an invalidation overtook is returned
+    but not cached, and later misses start a new one.
+
+    Args:
+        user_id (str): The user identifier.
+        timeout (float): Seconds to wait for the query on a cache miss.
+
+    Returns:
+        UserContext: The user and its accounts, or None if the user does not exist.
+    """
+    user_context = user_context_cache.get(user_id)
+    if user_context is not None:
+        return user_context
+
+    generation = user_context_cache.generation(user_id)
+    inflight = _inflight_user_contexts.get(user_id)
+    if inflight is None or inflight[1] != generation:
+        future = asyncio.ensure_future(get_storage().aget_user_context(user_id, timeout=timeout))
+        inflight = _inflight_user_contexts[user_id] = (future, generation)
+
+        def done(_, inflight=inflight):
+            if _inflight_user_contexts.get(user_id) is inflight:
+                del _inflight_user_contexts[user_id]
+        future.add_done_callback(done)
+
+    # Shield the shared load so one cancelled caller does not cancel it for the others
+    user_context = await asyncio.shield(inflight[0])
+    if user_context is not None:
+        user_context_cache.set(user_id, user_context, generation=inflight[1])
+    return user_context
+
+def invalidate_user_context(user_id: str) -> None:
+    """Drop the cached context of a user after its accounts or balances change."""
+    if user_id:
+        user_context_cache.invalidate(user_id)
+
+def format_user_context(user_context: Optional[UserContext]) -> str:
+    """Render a user context for an agent instruction."""
+    if user_context is None:
+        return "error: User not found."
+    return user_context.prompt_text
@@ -0,0 +1,108 @@
+import json
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, AsyncGenerator, Dict, List
+
+if TYPE_CHECKING:
+    from google.adk.events import Event
+    from google.adk.runners import Runner
+    from google.genai import types
+
+
+@dataclass
+class StreamChunk:
+    """A piece of an agent's reply as it should reach the user."""
+    author: str
+    text: str
+    final: bool  # True on the last chunk of a message
+    replace: bool = False  # True when text is the whole message and replaces what was streamed
+
+    def to_sse(self) -> str:
+        """Render the chunk as a server-sent event."""
+        return f"data: {json.dumps(asdict(self), ensure_ascii=False)}\n\n"
+
+
+def event_text(event: "Event") -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text and not part.thought)
+
+
+def routing_agent_names(runner: "Runner") -> set:
+    """Names of the agents that hand off to sub-agents, i.e. the root and the database_manager."""
+    names, pending = set(), [runner.agent]
+    while pending:
+        agent = pending.pop()
+        if agent.sub_agents:
+            names.add(agent.name)
+            pending.extend(agent.sub_agents)
+    return names
+
+
+async def stream_reply(
+    runner: "Runner",
+    user_id: str,
+    session_id: str,
+    new_message: "types.Content",
+) -> AsyncGenerator[StreamChunk, None]:
+    """
+    Run one turn and yield the reply as it is generated.
+
+    The model is called in SSE mode, so leaf agents' text is forwarded token
+    by token as soon as it arrives. Routing is not shown to the user:
+    function calls and tool results are dropped, and text from the agents
+    that route is held back until the turn ends, then dropped if they
+    handed off anyway and sent otherwise (e.g. a greeting answered by the
+    root itself).
+
+    Args:
+        runner (Runner): The runner of the agent tree.
+        user_id (str): The user identifier.
+        session_id (str): The session of the conversation.
+        new_message (types.Content): The user's message.
+
+    Yields:
+        StreamChunk: Text deltas, ``final`` on the last chunk of each message.
+        If the final text does not extend what was streamed, the last chunk
+        carries the whole message with ``replace`` set.
+    """
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+
+    routers = routing_agent_names(runner)
+    streamed: Dict[str, str] = {}
+    held: List[StreamChunk] = []
+    handed_off = False
+
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=new_message,
+        run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+    ):
+        if event.get_function_calls() or event.get_function_responses():
+            if event.author in routers:
+                handed_off = True
+            continue
+        text = event_text(event)
+        if not text:
+            continue
+
+        if event.author in routers:
+            if not event.partial:
+                held.append(StreamChunk(event.author, text, True))
+            continue
+
+        if event.partial:
+            streamed[event.author] = streamed.get(event.author, "") + text
+            yield StreamChunk(event.author, text, False)
+        else:
+            # The final event repeats the whole message; only send what was not streamed yet
+            already = streamed.pop(event.author, "")
+            if text.startswith(already):
+                yield StreamChunk(event.author, text[len(already):], True)
+            else:
+                yield StreamChunk(event.author, text, True, replace=True)
+
+    if not handed_off:
+        for chunk in held:
+            yield chunk
+
@@ -1,16 +1,35 @@
 import os
 
-def get_var_env(var_name: str) -> str:
+def get_var_env(var_name: str, default: str = None) -> str:
     """
     Get the value of an environment variable.
     
     Args:
         var_name (str): The name of the environment variable.
+        default (str): Value returned when the variable is not set.
     
     Returns:
-        str: The value of the environment variable, or None if not set.
+        str: The value of the environment variable, or the default if not set.
+
+    Raises:
+        ValueError: If the variable is not set and no default is given.
     """
-    var = os.getenv(var_name, None)
+    var = os.getenv(var_name, default)
     if var is None:
         raise ValueError(f"Environment variable '{var_name}' is not set.")
-    return var
\ No newline at end of file
+    return var
+
+
+USER_ID_STATE_KEY = "user_id"
+
+def get_user_id(context) -> str:
+    """
+    Get the id of the user an agent is serving.
+
+    Args:
+        context (ReadonlyContext): The callback, tool or instruction context of the invocation.
+
+    Returns:
+        str: ``user_id`` from the session state if set, otherwise the user the session belongs to.
+    """
+    return context.state.get(USER_ID_STATE_KEY) or context._invocation_context.user_id
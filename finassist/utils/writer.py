@@ -0,0 +1,345 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from finassist.utils.async_database import run_blocking
+from finassist.utils.budgets import get_budget_tracker
+from finassist.utils.columnar import COLUMNAR_STORE_ENABLED, get_columnar_store
+from finassist.utils.storage import get_storage
+from finassist.utils.utils import get_var_env
+
+TRANSACTION_FIELDS = (
+    "transaction_id",
+    "user_id",
+    "account_id",
+    "amount",
+    "currency",
+    "transaction_type",
+    "transaction_date",
+    "recorded_date",
+    "category",
+    "subcategory",
+    "notes",
+)
+REQUIRED_TRANSACTION_FIELDS = (
+    "user_id",
+    "account_id",
+    "amount",
+    "currency",
+    "transaction_type",
+    "transaction_date",
+)
+TRANSACTION_TYPES = ("expense", "income")
+
+ACCOUNT_FIELDS = (
+    "account_id",
+    "user_id",
+    "account_name",
+    "account_type",
+    "institution",
+    "balance",
+    "opening_balance",
+    "currency",
+    "due_date",
+    "statement_closing_date",
+    "created_at",
+    "updated_at",
+)
+REQUIRED_ACCOUNT_FIELDS = (
+    "user_id",
+    "account_name",
+    "account_type",
+    "currency",
+)
+ACCOUNT_TYPES = ("checking", "savings", "credit_card", "loan", "investment", "cash", "other")
+# The timezone where the date changes first, whose today no user is ahead of
+LATEST_TIMEZONE = timezone(timedelta(hours=14))
+
+transaction_writer = None
+
+
+class InsertError(Exception):
+    """Raised for a row that the storage sink rejected."""
+
+
+def parse_transaction(data_transaction: str, today: Optional[date] = None) -> dict:
+    """
+    Parse and validate the JSON a transaction agent passes to add_transaction.
+
+    ``transaction_id`` and ``recorded_date`` are always generated here, so the
+    GENERATE_UUID() and TIME_NOW() placeholders the model is told to emit (or
+    any value it invents) never reach storage.
+
+    Args:
+        data_transaction (str): A string in JSON format containing the transaction details.
+        today (date): Today in the user's timezone, see ``validate_transaction``.
+
+    Returns:
+        dict: The transaction row, restricted to the known fields.
+
+    Raises:
+        ValueError: If the JSON is malformed or a field is missing or invalid.
+    """
+    try:
+        data = json.loads(data_transaction)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Transaction is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("Transaction must be a JSON object.")
+    return validate_transaction(data, today)
+
+
+def validate_transaction(data: dict, today: Optional[date] = None) -> dict:
+    """
+    Validate transaction fields and build the row to store, like ``parse_transaction`` does for JSON.
+
+    A transaction dated after ``today``, the user's today as given by
+    ``finassist.utils.extraction.user_today``, is rejected. Without it, only
+    dates after today in every timezone are.
+
+    Raises:
+        ValueError: If a field is missing or invalid.
+    """
+    missing = [name for name in REQUIRED_TRANSACTION_FIELDS if data.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}.")
+
+    try:
+        amount = float(data["amount"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Amount must be a number, got {data['amount']!r}.")
+    if amount <= 0:
+        raise ValueError("Amount must be a positive number.")
+
+    currency = str(data["currency"]).strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"Currency must be a 3-letter ISO 4217 code, got {data['currency']!r}.")
+
+    transaction_type = str(data["transaction_type"]).strip().lower()
+    if transaction_type not in TRANSACTION_TYPES:
+        raise ValueError(f"Transaction type must be one of {', '.join(TRANSACTION_TYPES)}.")
+
+    try:
+        transaction_date = date.fromisoformat(str(data["transaction_date"]))
+    except ValueError:
+        raise ValueError("Transaction date must use the YYYY-MM-DD format.")
+    if transaction_date > (today or datetime.now(LATEST_TIMEZONE).date()):
+        raise ValueError("Transaction date cannot be in the future.")
+
+    row = {name: data.get(name) for name in TRANSACTION_FIELDS}
+    row.update(
+        transaction_id=str(uuid.uuid4()),
+        recorded_date=datetime.now(timezone.utc).isoformat(),
+        amount=amount,
+        currency=currency,
+        transaction_type=transaction_type,
+        transaction_date=transaction_date.isoformat(),
+    )
+    return row
+
+
+def parse_account(data_account: str) -> dict:
+    """
+    Parse and validate the JSON an account agent passes to add_account.
+
+    ``account_id``, ``created_at`` and ``updated_at`` are always generated here.
+
+    Args:
+        data_account (str): A string in JSON format containing the account details.
+
+    Returns:
+        dict: The account row, restricted to the known fields.
+
+    Raises:
+        ValueError: If the JSON is malformed or a field is missing or invalid.
+    """
+    try:
+        data = json.loads(data_account)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Account is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("Account must be a JSON object.")
+
+    missing = [name for name in REQUIRED_ACCOUNT_FIELDS if data.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}.")
+
+    account_type = str(data["account_type"]).strip().lower()
+    if account_type not in ACCOUNT_TYPES:
+        raise ValueError(f"Account type must be one of {', '.join(ACCOUNT_TYPES)}.")
+
+    currency = str(data["currency"]).strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"Currency must be a 3-letter ISO 4217 code, got {data['currency']!r}.")
+
+    try:
+        balance = float(data.get("balance") or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"Balance must be a number, got {data['balance']!r}.")
+
+    now = datetime.now(timezone.utc).isoformat()
+    row = {name: data.get(name) for name in ACCOUNT_FIELDS}
+    row.update(
+        account_id=str(uuid.uuid4()),
+        account_type=account_type,
+        currency=currency,
+        balance=balance,
+        # Transactions are applied on top of this, see finassist.utils.ledger
+        opening_balance=balance,
+        created_at=now,
+        updated_at=now,
+    )
+    return row
+
+
+class BatchWriter:
+    """
+    Buffers rows into micro-batches and writes each batch with one sink call.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` rows, or
+    ``max_delay`` seconds after its first row arrived, whichever comes first.
+    Every ``submit`` call still gets its own ack: the stored row, or an
+    ``InsertError`` if the sink rejected that row.
+
+    The sink is a blocking callable that takes a list of rows and returns a
+    list of ``{"index": int, "errors": list}`` entries for rejected rows, the
+    same contract as BigQuery's ``insert_rows_json``.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[List[dict]], List[dict]],
+        max_batch_size: int = 500,
+        max_delay: float = 0.05,
+    ):
+        self.sink = sink
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: set = set()
+        self._started_at: Optional[float] = None
+        self._flush_latencies: deque = deque(maxlen=1024)
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+
+    async def submit(self, row: dict) -> dict:
+        """
+        Queue a row and wait until the batch containing it has been written.
+
+        Returns:
+            dict: The stored row.
+
+        Raises:
+            InsertError: If the sink rejected the row.
+        """
+        loop = asyncio.get_running_loop()
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        return await future
+
+    async def flush(self) -> None:
+        """Write everything buffered so far and wait for in-flight batches."""
+        self._start_flush()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write_batch(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _write_batch(self, batch: List[tuple]) -> None:
+        start = time.perf_counter()
+        try:
+            errors = await run_blocking(self.sink, [row for row, _ in batch], timeout=None)
+        except Exception as e:
+            self.rows_failed += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(InsertError(str(e)))
+            return
+
+        self._flush_latencies.append(time.perf_counter() - start)
+        self.batches += 1
+        errors_by_index: Dict[int, list] = {error["index"]: error["errors"] for error in errors or []}
+        for index, (row, future) in enumerate(batch):
+            if index in errors_by_index:
+                self.rows_failed += 1
+                if not future.done():
+                    future.set_exception(InsertError(str(errors_by_index[index])))
+            else:
+                self.rows_written += 1
+                if not future.done():
+                    future.set_result(row)
+
+    def stats(self) -> dict:
+        """Return throughput and flush latency figures since the first submit."""
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        latencies = sorted(self._flush_latencies)
+        return {
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "rows_per_sec": self.rows_written / elapsed if elapsed else 0.0,
+            "avg_batch_size": self.rows_written / self.batches if self.batches else 0.0,
+            "flush_latency_avg_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            "flush_latency_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+            "flush_latency_max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+
+def store_transactions(rows: List[dict]) -> List[dict]:
+    """
+    Write transactions to storage, then apply the accepted ones to the budgets and the columnar store.
+
+    The budget tracker adds them to the spend-to-date of the budgets they
+    count against and keeps any alerts they raise for add_transaction. The
+    columnar store is only written with COLUMNAR_STORE enabled. Neither
+    fails the write: budgets are recomputed on their next reload and the
+    columnar store's next catch-up picks the rows up from storage.
+
+    Returns:
+        list: The rejected rows, as returned by ``Storage.insert_transactions``.
+    """
+    errors = get_storage().insert_transactions(rows)
+    rejected = {error["index"] for error in errors or []}
+    accepted = [row for index, row in enumerate(rows) if index not in rejected]
+    try:
+        get_budget_tracker().record(accepted)
+    except Exception as e:
+        print(f"Error updating budget spend, left to the next reload: {e}")
+    if COLUMNAR_STORE_ENABLED:
+        try:
+            get_columnar_store().append(accepted)
+        except Exception as e:
+            print(f"Error appending transactions to the columnar store, left to catch-up: {e}")
+    return errors
+
+
+def get_transaction_writer() -> BatchWriter:
+    """Get the batch writer that stores transactions."""
+    global transaction_writer
+    if transaction_writer is None:
+        transaction_writer = BatchWriter(
+            store_transactions,
+            max_batch_size=int(get_var_env("WRITER_MAX_BATCH_SIZE", "500")),
+            max_delay=float(get_var_env("WRITER_MAX_DELAY", "0.05")),
+        )
+    return transaction_writer